@@ -8,6 +8,7 @@ from .etl_bennett_sales import SalesDailyETL, CashFlowETL, run_bennett_etl
 from .etl_customer_activity import CustomerActivityETL, run_customer_activity_etl
 from .etl_ceo_dashboard import CEODashboardETL, run_ceo_dashboard_etl
 from .etl_department_metrics import DepartmentMetricsETL, run_department_metrics_etl
+from .etl_snapshots import SnapshotETL, run_snapshot_etl
 from .tenant_discovery import TenantInfo, discover_softbase_tenants, run_etl_for_all_tenants
 from .etl_vital import (
     VitalHubSpotContactsETL, 
@@ -18,6 +19,7 @@ from .etl_vital import (
     VitalAppAnalyticsETL,
     run_vital_etl
 )
+from .orchestrator import ETLJob, ETLOrchestrator, NIGHTLY_JOBS
 from .scheduler import run_all_etl, setup_scheduler, init_etl_scheduler, register_etl_routes
 
 # Backward compatibility aliases
@@ -37,6 +39,8 @@ __all__ = [
     'run_ceo_dashboard_etl',
     'DepartmentMetricsETL',
     'run_department_metrics_etl',
+    'SnapshotETL',
+    'run_snapshot_etl',
     'TenantInfo',
     'discover_softbase_tenants',
     'run_etl_for_all_tenants',
@@ -47,6 +51,9 @@ __all__ = [
     'VitalQuickBooksETL',
     'VitalAppAnalyticsETL',
     'run_vital_etl',
+    'ETLJob',
+    'ETLOrchestrator',
+    'NIGHTLY_JOBS',
     'run_all_etl',
     'setup_scheduler',
     'init_etl_scheduler',
@@ -3,14 +3,45 @@ Base ETL Class
 Provides common functionality for all ETL jobs
 """
 
+import io
 import os
+import csv
+import json
+import time
 import logging
-from datetime import datetime
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
 from abc import ABC, abstractmethod
 
+from src.services.scheduler_coordinator import check_leadership
+
+# NULL marker for COPY ... FORMAT csv (distinguishes NULL from an empty string)
+COPY_NULL = '\\N'
+
+# Incremental extraction: months before the open period are frozen in
+# mart_etl_watermark and only the open period is re-aggregated. The previous
+# month stays open for the first ETL_CLOSE_GRACE_DAYS days while books close.
+ETL_CLOSE_GRACE_DAYS = int(os.environ.get('ETL_CLOSE_GRACE_DAYS', '10'))
+ETL_FORCE_FULL_REFRESH = os.environ.get('ETL_FORCE_FULL_REFRESH', 'false').lower() == 'true'
+
+# Concurrent extraction: the independent read-only extractors of one ETL run
+# (i.e. one tenant) run on at most this many threads
+ETL_EXTRACT_WORKERS = int(os.environ.get('ETL_EXTRACT_WORKERS', '4'))
+
 logger = logging.getLogger(__name__)
 
 
+def _row_count(value) -> int:
+    """Rows an extractor produced: list length, entries of a dict, 0 for None, else 1"""
+    if value is None:
+        return 0
+    if isinstance(value, (list, tuple, dict)):
+        return len(value)
+    return 1
+
+
 class BaseETL(ABC):
     """Abstract base class for all ETL jobs"""
     
@@ -23,6 +54,9 @@ class BaseETL(ABC):
         self.records_processed = 0
         self.records_inserted = 0
         self.records_updated = 0
+        self.full_refresh = ETL_FORCE_FULL_REFRESH
+        self.extractor_stats = {}
+        self._pending_watermarks = {}
         self._pg = None
     
     @property
@@ -35,6 +69,12 @@ class BaseETL(ABC):
     
     def run(self) -> bool:
         """Execute the ETL job with logging"""
+        from src.services.query_telemetry import query_source
+        # Attribute this job's queries to it in query telemetry (worker threads inherit it via run_extractors)
+        with query_source(f"etl:{self.job_name}"):
+            return self._run()
+    
+    def _run(self) -> bool:
         self.started_at = datetime.now()
         log_id = self._log_start()
         
@@ -57,11 +97,16 @@ class BaseETL(ABC):
             transformed = self.transform(data)
             logger.info(f"  [2/3] Transformed {len(transformed)} records")
             
-            # Load
+            # Load (unless a newer scheduler leader has taken over this job)
+            check_leadership()
             logger.info("  [3/3] Loading data...")
             self.load(transformed)
             logger.info(f"  [3/3] Loaded {self.records_inserted} inserted, {self.records_updated} updated")
             
+            # Only advance watermarks once the data built from them is in the mart
+            check_leadership()
+            self._save_watermarks()
+            
             self._log_complete(log_id, 'success')
             logger.info(f"ETL job completed: {self.job_name}")
             return True
@@ -115,11 +160,158 @@ class BaseETL(ABC):
             records_updated = %s, error_message = %s
         WHERE id = %s
         """
+        failed_extractors = [name for name, stats in self.extractor_stats.items() if stats['status'] == 'failed']
+        if failed_extractors and not error_message:
+            error_message = f"Extractors failed: {', '.join(failed_extractors)}"
         self.pg.execute_update(
             query,
             (datetime.now(), status, self.records_processed, 
              self.records_inserted, self.records_updated, error_message, log_id)
         )
+        if self.extractor_stats:
+            try:
+                self.pg.execute_update(
+                    "UPDATE mart_etl_log SET extractor_stats = %s WHERE id = %s",
+                    (json.dumps(self.extractor_stats), log_id)
+                )
+            except Exception as e:
+                # Column added by alter_mart_etl_log_extractor_stats.sql
+                logger.warning(f"  Could not save extractor stats for {self.job_name}: {e}")
+    
+    # ==================== Concurrent extraction ====================
+    
+    def run_extractors(self, extractors: Dict[str, Callable[[], Any]],
+                       max_workers: int = ETL_EXTRACT_WORKERS) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """
+        Run independent, read-only extractors concurrently, at most max_workers
+        at a time for this tenant. Returns (results, failures): a failing
+        extractor is logged and reported in failures instead of aborting the
+        others. Per-extractor status, seconds and row counts are kept in
+        self.extractor_stats and saved with the run's mart_etl_log row.
+        
+        Extractors share self (azure_sql, pg, watermarks), so anything they
+        memoize on the instance must be guarded by a lock.
+        """
+        label = getattr(self, 'schema', self.org_id)
+        
+        def timed(name, func):
+            started = time.monotonic()
+            try:
+                result = func()
+            except Exception as e:
+                self.extractor_stats[name] = {'status': 'failed', 'seconds': round(time.monotonic() - started, 2),
+                                              'rows': 0, 'error': str(e)[:500]}
+                raise
+            self.extractor_stats[name] = {'status': 'success', 'seconds': round(time.monotonic() - started, 2),
+                                          'rows': _row_count(result)}
+            return result
+        
+        results, failures = {}, {}
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(extractors))),
+                                thread_name_prefix=f"extract-{label}") as executor:
+            futures = {
+                name: executor.submit(contextvars.copy_context().run, timed, name, func)
+                for name, func in extractors.items()
+            }
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                    stats = self.extractor_stats[name]
+                    logger.info(f"  [{label}] ✓ {name}: {stats['rows']} rows in {stats['seconds']}s")
+                except Exception as e:
+                    failures[name] = str(e)
+                    logger.error(f"  [{label}] {name} extraction failed: {e}")
+        return results, failures
+    
+    # ==================== Incremental extraction ====================
+    
+    def open_period_start(self) -> date:
+        """First day of the earliest month that is still re-aggregated on every run"""
+        today = datetime.now().date()
+        month_start = today.replace(day=1)
+        if today.day <= ETL_CLOSE_GRACE_DAYS:
+            month_start = (month_start - timedelta(days=1)).replace(day=1)
+        return month_start
+    
+    def extract_monthly_incremental(self, metric: str, extract_since: Callable[[Optional[str]], list],
+                                    window_start: date) -> list:
+        """
+        Build a monthly series from frozen closed months plus a fresh open period.
+        
+        extract_since(since) must return rows with 'year' and 'month' keys for
+        every month on/after `since` ('YYYY-MM-DD'), or for the metric's whole
+        window when `since` is None. Closed months come from the watermark left
+        by the last successful run; months older than window_start are dropped.
+        """
+        open_from = self.open_period_start()
+        state = None if self.full_refresh else self.load_watermark(metric)
+        
+        if state and state['closed_through'] and state['closed_through'] <= open_from:
+            since = state['closed_through']
+            since_key = (since.year, since.month)
+            window_key = (window_start.year, window_start.month)
+            frozen = [
+                row for row in (state['frozen_rows'] or [])
+                if window_key <= (row['year'], row['month']) < since_key
+            ]
+            fresh = extract_since(since.strftime('%Y-%m-%d'))
+            logger.info(f"  {metric}: {len(frozen)} frozen months, re-aggregated since {since}")
+        else:
+            frozen = []
+            fresh = extract_since(None)
+            logger.info(f"  {metric}: full rebuild ({len(fresh)} months)")
+        
+        rows = sorted(frozen + list(fresh or []), key=lambda row: (row['year'], row['month']))
+        open_key = (open_from.year, open_from.month)
+        self.stage_watermark(metric, open_from, [row for row in rows if (row['year'], row['month']) < open_key])
+        return rows
+    
+    def load_watermark(self, metric: str) -> Optional[dict]:
+        """Last saved {closed_through, frozen_rows} for a metric, or None"""
+        query = """
+        SELECT closed_through, frozen_rows
+        FROM mart_etl_watermark
+        WHERE org_id = %s AND job_name = %s AND metric = %s
+        """
+        try:
+            rows = self.pg.execute_query(query, (self.org_id, self.job_name, metric))
+        except Exception as e:
+            logger.warning(f"  Could not read watermark for {self.job_name}.{metric}, doing a full rebuild: {e}")
+            return None
+        if not rows:
+            return None
+        frozen_rows = rows[0]['frozen_rows']
+        if isinstance(frozen_rows, str):
+            frozen_rows = json.loads(frozen_rows)
+        return {'closed_through': rows[0]['closed_through'], 'frozen_rows': frozen_rows}
+    
+    def stage_watermark(self, metric: str, closed_through: date, frozen_rows: list):
+        """Remember a watermark to save after the load succeeds"""
+        self._pending_watermarks[metric] = (closed_through, frozen_rows)
+    
+    def _save_watermarks(self):
+        if not self._pending_watermarks:
+            return
+        query = """
+        INSERT INTO mart_etl_watermark (org_id, job_name, metric, closed_through, frozen_rows, updated_at)
+        VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+        ON CONFLICT (org_id, job_name, metric)
+        DO UPDATE SET closed_through = EXCLUDED.closed_through,
+                      frozen_rows = EXCLUDED.frozen_rows,
+                      updated_at = CURRENT_TIMESTAMP
+        """
+        try:
+            with self.pg.get_connection() as conn:
+                if not conn:
+                    return
+                with conn.cursor() as cursor:
+                    for metric, (closed_through, frozen_rows) in self._pending_watermarks.items():
+                        cursor.execute(query, (self.org_id, self.job_name, metric, closed_through,
+                                               json.dumps(frozen_rows, default=str)))
+        except Exception as e:
+            # Not fatal - the next run just re-aggregates from the old watermark
+            logger.warning(f"  Failed to save watermarks for {self.job_name}: {e}")
+        self._pending_watermarks = {}
     
     def upsert_record(self, data: dict, unique_columns: list) -> str:
         """
@@ -152,3 +344,93 @@ class BaseETL(ABC):
         else:
             self.records_updated += 1
             return 'updated'
+    
+    def bulk_upsert(self, records: list, unique_columns: list,
+                    after_merge: Optional[Callable[[Any, dict], None]] = None) -> dict:
+        """
+        Set-based equivalent of upsert_record() for a whole batch.
+        
+        COPYs the records into a temp staging table and merges them into
+        target_table with a single INSERT ... ON CONFLICT, all in one
+        transaction - readers see either the old rows or the whole new load.
+        Later records win when several share the same unique key (same as
+        calling upsert_record() in order).
+        
+        after_merge(cursor, counts) runs in that transaction after the merge,
+        e.g. to publish a snapshot pointer that must switch with the data.
+        
+        Returns {'inserted': n, 'updated': n} and adds them to the job counters.
+        """
+        if not records:
+            return {'inserted': 0, 'updated': 0}
+        
+        columns = list(records[0].keys())
+        
+        # Dedupe on the conflict key; ON CONFLICT can't touch the same row twice
+        deduped = {}
+        for record in records:
+            deduped[tuple(record.get(col) for col in unique_columns)] = record
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for record in deduped.values():
+            writer.writerow([self._copy_value(record.get(col)) for col in columns])
+        buffer.seek(0)
+        
+        column_list = ', '.join(columns)
+        unique_clause = ', '.join(unique_columns)
+        update_clause = ', '.join([f"{col} = EXCLUDED.{col}" for col in columns if col not in unique_columns])
+        stage_table = f"_stage_{self.target_table}"
+        
+        merge_query = f"""
+        WITH merged AS (
+            INSERT INTO {self.target_table} ({column_list})
+            SELECT {column_list} FROM {stage_table}
+            ON CONFLICT ({unique_clause})
+            DO UPDATE SET {update_clause}, updated_at = CURRENT_TIMESTAMP
+            RETURNING (xmax = 0) as inserted
+        )
+        SELECT COUNT(*) FILTER (WHERE inserted) as inserted,
+               COUNT(*) FILTER (WHERE NOT inserted) as updated
+        FROM merged
+        """
+        
+        with self.pg.get_connection() as conn:
+            if not conn:
+                raise RuntimeError("PostgreSQL connection pool not initialized")
+            with conn.cursor() as cursor:
+                cursor.execute(f"""
+                    CREATE TEMP TABLE {stage_table} ON COMMIT DROP AS
+                    SELECT {column_list} FROM {self.target_table} WITH NO DATA
+                """)
+                cursor.copy_expert(
+                    f"COPY {stage_table} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+                    buffer
+                )
+                cursor.execute(merge_query)
+                result = cursor.fetchone()
+                counts = {'inserted': int(result['inserted']), 'updated': int(result['updated'])}
+                if after_merge:
+                    after_merge(cursor, counts)
+                # Raising here rolls the whole load back
+                check_leadership()
+            # get_connection() commits on exit (and drops the staging table)
+        
+        self.records_inserted += counts['inserted']
+        self.records_updated += counts['updated']
+        logger.info(f"  Bulk loaded {len(deduped)} rows into {self.target_table} "
+                    f"({counts['inserted']} inserted, {counts['updated']} updated)")
+        return counts
+    
+    @staticmethod
+    def _copy_value(value):
+        """Render a Python value as a COPY csv field"""
+        if value is None:
+            return COPY_NULL
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        return str(value)
@@ -141,8 +141,7 @@ class SalesDailyETL(BaseETL):
     
     def load(self, data: list) -> None:
         """Load transformed data into mart_sales_daily"""
-        for record in data:
-            self.upsert_record(record, unique_columns=['org_id', 'sales_date'])
+        self.bulk_upsert(data, unique_columns=['org_id', 'sales_date'])
 
 
 class CashFlowETL(BaseETL):
@@ -271,8 +270,7 @@ class CashFlowETL(BaseETL):
     
     def load(self, data: list) -> None:
         """Load cash flow data"""
-        for record in data:
-            self.upsert_record(record, unique_columns=['org_id', 'year', 'month'])
+        self.bulk_upsert(data, unique_columns=['org_id', 'year', 'month'])
 
 
 def run_bennett_etl(org_id=None):
@@ -11,8 +11,11 @@ import os
 import json
 import logging
 import time
+import threading
 from datetime import datetime, timedelta
+from dateutil.relativedelta import relativedelta
 from .base_etl import BaseETL
+from src.services.gl_query_builder import GLQueryBuilder
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +23,17 @@ logger = logging.getLogger(__name__)
 class CEODashboardETL(BaseETL):
     """ETL job for CEO Dashboard metrics from Softbase"""
     
-    def __init__(self, org_id=4, schema='ben002', azure_sql=None, fiscal_year_start_month=11):
+    # Trailing window (in months) for the monthly series
+    WINDOW_MONTHS = 25
+    
+    # Extractors that return a dict of columns rather than one JSON series
+    COLUMN_SET_EXTRACTORS = ('kpi_metrics', 'work_order_metrics')
+    
+    # mart_ceo_metrics columns that belong to the snapshot itself, never carried forward
+    SNAPSHOT_COLUMNS = {'id', 'org_id', 'snapshot_timestamp', 'snapshot_date', 'fiscal_year_start',
+                        'source_system', 'etl_duration_seconds', 'created_at', 'updated_at'}
+    
+    def __init__(self, org_id=4, schema='ben002', azure_sql=None, fiscal_year_start_month=11, full_refresh=False):
         """
         Initialize CEO Dashboard ETL for a specific tenant.
         
@@ -29,6 +42,7 @@ class CEODashboardETL(BaseETL):
             schema: Database schema for the tenant (e.g., 'ben002', 'ind004')
             azure_sql: Pre-configured AzureSQLService instance for the tenant
             fiscal_year_start_month: Month number (1-12) when fiscal year starts
+            full_refresh: Re-aggregate closed months instead of reusing the frozen ones
         """
         super().__init__(
             job_name='etl_ceo_dashboard',
@@ -43,6 +57,13 @@ class CEODashboardETL(BaseETL):
         self.month_start = self.current_date.replace(day=1).strftime('%Y-%m-%d')
         self.thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
         self.fiscal_year_start_month = fiscal_year_start_month
+        self.full_refresh = full_refresh or self.full_refresh
+        self.window_start = (self.current_date.date().replace(day=1) - relativedelta(months=self.WINDOW_MONTHS))
+        self._gl_monthly = None
+        self._prior_year_partial = None
+        # Shared by concurrent extractors (KPIs and monthly sales both use them)
+        self._gl_monthly_lock = threading.Lock()
+        self._prior_year_lock = threading.Lock()
         
         # Fiscal year start (dynamic per tenant)
         if self.current_date.month >= self.fiscal_year_start_month:
@@ -58,6 +79,16 @@ class CEODashboardETL(BaseETL):
             self._azure_sql = AzureSQLService()
         return self._azure_sql
     
+    def _since_sql(self, since) -> str:
+        """Lower date bound for an incremental extract (the full window when since is None)"""
+        if since:
+            return f"'{since}'"
+        return f"DATEADD(month, -{self.WINDOW_MONTHS}, GETDATE())"
+    
+    def _since_date(self, since):
+        """Lower date bound as a GLQueryBuilder parameter (the window start when since is None)"""
+        return datetime.strptime(since, '%Y-%m-%d').date() if since else self.window_start
+    
     def extract(self) -> list:
         """Extract all CEO Dashboard metrics from Softbase"""
         self.start_time = time.time()
@@ -69,87 +100,88 @@ class CEODashboardETL(BaseETL):
             'fiscal_year_start': self.fiscal_year_start,
         }
         
-        # Extract each metric set
-        logger.info(f"  [{self.schema}] Extracting KPI metrics...")
-        metrics.update(self._extract_kpi_metrics())
-        
-        logger.info(f"  [{self.schema}] Extracting work order metrics...")
-        metrics.update(self._extract_work_order_metrics())
-        
-        logger.info(f"  [{self.schema}] Extracting monthly sales...")
-        metrics['monthly_sales'] = self._extract_monthly_sales()
-        metrics['monthly_sales_excluding_equipment'] = self._extract_monthly_sales_excluding_equipment()
-        metrics['monthly_sales_by_stream'] = self._extract_monthly_sales_by_stream()
-        
-        logger.info(f"  [{self.schema}] Extracting equipment sales...")
-        metrics['monthly_equipment_sales'] = self._extract_monthly_equipment_sales()
-        
-        logger.info(f"  [{self.schema}] Extracting monthly work orders...")
-        metrics['monthly_work_orders'] = self._extract_monthly_work_orders()
-        
-        logger.info(f"  [{self.schema}] Extracting monthly quotes...")
-        metrics['monthly_quotes'] = self._extract_monthly_quotes()
-        
-        logger.info(f"  [{self.schema}] Extracting top customers...")
-        metrics['top_customers'] = self._extract_top_customers()
+        # The metric sets are independent read-only queries; run them concurrently.
+        # KPI and work order extractors return several columns, the rest one JSON series.
+        results, failures = self.run_extractors({
+            'kpi_metrics': self._extract_kpi_metrics,
+            'work_order_metrics': self._extract_work_order_metrics,
+            'monthly_sales': self._extract_monthly_sales,
+            'monthly_sales_excluding_equipment': self._extract_monthly_sales_excluding_equipment,
+            'monthly_sales_by_stream': self._extract_monthly_sales_by_stream,
+            'monthly_equipment_sales': self._extract_monthly_equipment_sales,
+            'monthly_work_orders': self._extract_monthly_work_orders,
+            'monthly_quotes': self._extract_monthly_quotes,
+            'top_customers': self._extract_top_customers,
+            'monthly_invoice_delays': self._extract_monthly_invoice_delays,
+        })
+        if not results:
+            raise RuntimeError(f"Every CEO dashboard extractor failed: {', '.join(failures)}")
+        
+        for name, value in results.items():
+            if name in self.COLUMN_SET_EXTRACTORS:
+                metrics.update(value)
+            else:
+                metrics[name] = value
         
-        logger.info(f"  [{self.schema}] Extracting invoice delays...")
-        metrics['monthly_invoice_delays'] = self._extract_monthly_invoice_delays()
+        if failures:
+            self._carry_forward(metrics)
         
         # Calculate ETL duration
         metrics['etl_duration_seconds'] = round(time.time() - self.start_time, 2)
         
         return [metrics]
     
+    def _carry_forward(self, metrics: dict):
+        """
+        Fill the columns of failed extractors from the previous snapshot, so one
+        broken query leaves its widgets a run stale instead of empty.
+        """
+        try:
+            previous = self.pg.execute_query(f"""
+                SELECT * FROM {self.target_table}
+                WHERE org_id = %s
+                ORDER BY snapshot_timestamp DESC
+                LIMIT 1
+            """, (self.org_id,))
+        except Exception as e:
+            logger.warning(f"  [{self.schema}] Could not read the previous snapshot to carry forward: {e}")
+            return
+        if not previous:
+            return
+        carried = [
+            column for column in previous[0]
+            if column not in metrics and column not in self.SNAPSHOT_COLUMNS
+        ]
+        for column in carried:
+            metrics[column] = previous[0][column]
+        logger.warning(f"  [{self.schema}] Carried {len(carried)} columns forward from the previous snapshot")
+    
     def _extract_kpi_metrics(self) -> dict:
         """Extract KPI card metrics using dynamic LIKE queries"""
         schema = self.schema
         
-        # Current month sales - dynamic revenue query
-        query = f"""
-        SELECT -SUM(Amount) as total_sales
-        FROM {schema}.GLDetail
-        WHERE AccountNo LIKE '4%'
-            AND MONTH(EffectiveDate) = {self.current_date.month}
-            AND YEAR(EffectiveDate) = {self.current_date.year}
-            AND Posted = 1
-        """
-        result = self.azure_sql.execute_query(query)
-        current_month_sales = float(result[0]['total_sales'] or 0) if result else 0
+        # Current month, YTD and prior-year YTD all come from the GL monthly
+        # series (closed months frozen) instead of three more GLDetail scans
+        gl_monthly = self._gl_monthly_totals()
+        current_key = (self.current_date.year, self.current_date.month)
+        current_month_sales = sum(row['revenue'] for row in gl_monthly if (row['year'], row['month']) == current_key)
         
         # YTD sales and margin - revenue (4%) and COGS (5%)
-        query = f"""
-        SELECT 
-            -SUM(CASE WHEN AccountNo LIKE '4%' THEN Amount ELSE 0 END) as ytd_sales,
-            SUM(CASE WHEN AccountNo LIKE '5%' THEN Amount ELSE 0 END) as ytd_cogs
-        FROM {schema}.GLDetail
-        WHERE (AccountNo LIKE '4%' OR AccountNo LIKE '5%')
-            AND EffectiveDate >= '{self.fiscal_year_start}'
-            AND EffectiveDate < DATEADD(DAY, 1, GETDATE())
-            AND Posted = 1
-        """
-        result = self.azure_sql.execute_query(query)
-        ytd_sales = float(result[0]['ytd_sales'] or 0) if result else 0
-        ytd_cogs = float(result[0]['ytd_cogs'] or 0) if result else 0
+        fy_start = datetime.strptime(self.fiscal_year_start, '%Y-%m-%d')
+        fy_key = (fy_start.year, fy_start.month)
+        ytd_rows = [row for row in gl_monthly if (row['year'], row['month']) >= fy_key]
+        ytd_sales = sum(row['revenue'] for row in ytd_rows)
+        ytd_cogs = sum(row['cost'] for row in ytd_rows)
         ytd_margin = round(((ytd_sales - ytd_cogs) / ytd_sales) * 100, 1) if ytd_sales > 0 else 0
         
-        # Prior year YTD sales and margin (same period last year)
-        fy_start = datetime.strptime(self.fiscal_year_start, '%Y-%m-%d')
-        prior_fy_start = fy_start.replace(year=fy_start.year - 1)
-        prior_year_today = self.current_date.replace(year=self.current_date.year - 1)
-        query = f"""
-        SELECT 
-            -SUM(CASE WHEN AccountNo LIKE '4%' THEN Amount ELSE 0 END) as ytd_sales,
-            SUM(CASE WHEN AccountNo LIKE '5%' THEN Amount ELSE 0 END) as ytd_cogs
-        FROM {schema}.GLDetail
-        WHERE (AccountNo LIKE '4%' OR AccountNo LIKE '5%')
-            AND EffectiveDate >= '{prior_fy_start.strftime('%Y-%m-%d')}'
-            AND EffectiveDate < DATEADD(DAY, 1, '{prior_year_today.strftime('%Y-%m-%d')}')
-            AND Posted = 1
-        """
-        result = self.azure_sql.execute_query(query)
-        prior_year_ytd_sales = float(result[0]['ytd_sales'] or 0) if result else 0
-        prior_year_ytd_cogs = float(result[0]['ytd_cogs'] or 0) if result else 0
+        # Prior year YTD sales and margin (same period last year): the prior fiscal
+        # year's complete months plus the same month last year up to today's day
+        prior_fy_key = (fy_start.year - 1, fy_start.month)
+        prior_current_key = (self.current_date.year - 1, self.current_date.month)
+        prior_rows = [row for row in gl_monthly if prior_fy_key <= (row['year'], row['month']) < prior_current_key]
+        prior_partial = self._prior_year_mtd()
+        prior_year_ytd_sales = sum(row['revenue'] for row in prior_rows) + prior_partial['revenue']
+        prior_year_ytd_cogs = sum(row['cost'] for row in prior_rows) + prior_partial['cost']
         prior_year_ytd_margin = round(((prior_year_ytd_sales - prior_year_ytd_cogs) / prior_year_ytd_sales) * 100, 1) if prior_year_ytd_sales > 0 else 0
         
         # Inventory count
@@ -354,67 +386,99 @@ class CEODashboardETL(BaseETL):
             'awaiting_invoice_avg_days': awaiting_avg_days,
         }
     
-    def _extract_monthly_sales(self) -> list:
-        """Extract monthly sales with trailing 13 months using dynamic LIKE queries"""
+    def _gl_monthly_totals(self) -> list:
+        """
+        Posted revenue (4%) and COGS (5%) per month over the trailing window.
+        Closed months are frozen in the watermark; only the open period hits GLDetail.
+        """
+        if self._gl_monthly is not None:
+            return self._gl_monthly
+        
         schema = self.schema
-        now = self.current_date
-        today_day = now.day
-        current_year = now.year
-        current_month = now.month
-
-        # Bennett (ben002): exclude February 2024 - full ERP migration data dump from prior system
-        bennett_exclude_clause = ""
-        if schema == 'ben002':
-            bennett_exclude_clause = "AND NOT (YEAR(EffectiveDate) = 2024 AND MONTH(EffectiveDate) = 2)"
-
-        query = f"""
-        SELECT 
-            YEAR(EffectiveDate) as year,
-            MONTH(EffectiveDate) as month,
-            -SUM(CASE WHEN AccountNo LIKE '4%' THEN Amount ELSE 0 END) as total_revenue,
-            SUM(CASE WHEN AccountNo LIKE '5%' THEN Amount ELSE 0 END) as total_cost
-        FROM {schema}.GLDetail
-        WHERE (AccountNo LIKE '4%' OR AccountNo LIKE '5%')
-            AND EffectiveDate >= DATEADD(month, -25, GETDATE())
-            AND Posted = 1
-            {bennett_exclude_clause}
-        GROUP BY YEAR(EffectiveDate), MONTH(EffectiveDate)
-        ORDER BY YEAR(EffectiveDate), MONTH(EffectiveDate)
+        
+        def extract_since(since):
+            qb = GLQueryBuilder()
+            query = f"""
+            SELECT 
+                YEAR(EffectiveDate) as year,
+                MONTH(EffectiveDate) as month,
+                -SUM(CASE WHEN AccountNo LIKE '4%' THEN Amount ELSE 0 END) as total_revenue,
+                SUM(CASE WHEN AccountNo LIKE '5%' THEN Amount ELSE 0 END) as total_cost
+            FROM {schema}.GLDetail
+            WHERE (AccountNo LIKE '4%' OR AccountNo LIKE '5%')
+                AND EffectiveDate >= {qb.param(self._since_date(since))}
+                AND Posted = 1
+            GROUP BY YEAR(EffectiveDate), MONTH(EffectiveDate)
+            ORDER BY YEAR(EffectiveDate), MONTH(EffectiveDate)
+            """
+            return [{
+                'year': row['year'],
+                'month': row['month'],
+                'revenue': float(row['total_revenue'] or 0),
+                'cost': float(row['total_cost'] or 0),
+            } for row in (qb.execute(self.azure_sql, query) or [])]
+        
+        with self._gl_monthly_lock:
+            if self._gl_monthly is None:
+                self._gl_monthly = self.extract_monthly_incremental('gl_monthly_totals', extract_since, self.window_start)
+        return self._gl_monthly
+    
+    def _prior_year_mtd(self) -> dict:
         """
-
-        # Prior-year same month limited to same day-of-month as today
-        # E.g. on March 7 2026, show March 1-7 2025 (not all of March 2025)
-        prior_year = current_year - 1
+        Prior-year same month limited to same day-of-month as today
+        E.g. on March 7 2026, returns March 1-7 2025 (not all of March 2025)
+        """
+        if self._prior_year_partial is not None:
+            return self._prior_year_partial
+        
+        now = self.current_date
+        prior_year_month_start = now.date().replace(year=now.year - 1, day=1)
+        qb = GLQueryBuilder()
         prior_year_mtd_query = f"""
         SELECT 
             -SUM(CASE WHEN AccountNo LIKE '4%' THEN Amount ELSE 0 END) as revenue,
             SUM(CASE WHEN AccountNo LIKE '5%' THEN Amount ELSE 0 END) as cost
-        FROM {schema}.GLDetail
+        FROM {self.schema}.GLDetail
         WHERE (AccountNo LIKE '4%' OR AccountNo LIKE '5%')
-            AND YEAR(EffectiveDate) = {prior_year}
-            AND MONTH(EffectiveDate) = {current_month}
-            AND DAY(EffectiveDate) <= {today_day}
+            AND {qb.date_range(prior_year_month_start, prior_year_month_start + timedelta(days=now.day), end_inclusive=False)}
             AND Posted = 1
         """
+        with self._prior_year_lock:
+            if self._prior_year_partial is None:
+                results = qb.execute(self.azure_sql, prior_year_mtd_query)
+                row = results[0] if results else {}
+                self._prior_year_partial = {
+                    'revenue': float(row.get('revenue') or 0),
+                    'cost': float(row.get('cost') or 0),
+                }
+        return self._prior_year_partial
+    
+    def _extract_monthly_sales(self) -> list:
+        """Extract monthly sales with trailing 13 months using dynamic LIKE queries"""
+        schema = self.schema
+        now = self.current_date
+        today_day = now.day
+        current_year = now.year
+        current_month = now.month
 
-        results = self.azure_sql.execute_query(query)
-        prior_year_mtd_results = self.azure_sql.execute_query(prior_year_mtd_query)
+        results = self._gl_monthly_totals()
+
+        # Bennett (ben002): exclude February 2024 - full ERP migration data dump from prior system
+        if schema == 'ben002':
+            results = [row for row in results if (row['year'], row['month']) != (2024, 2)]
 
         # Build prior-year MTD lookup for current month
         prior_year_partial = None
-        if prior_year_mtd_results:
-            row = prior_year_mtd_results[0]
-            py_rev = float(row.get('revenue') or 0)
-            py_cost = float(row.get('cost') or 0)
-            if py_rev > 0 or py_cost > 0:
-                prior_year_partial = {'revenue': py_rev, 'cost': py_cost}
+        py = self._prior_year_mtd()
+        if py['revenue'] > 0 or py['cost'] > 0:
+            prior_year_partial = py
 
         monthly_sales = []
         
         if results:
             for row in results:
-                revenue = float(row['total_revenue'] or 0)
-                cost = float(row['total_cost'] or 0)
+                revenue = row['revenue']
+                cost = row['cost']
                 margin = round(((revenue - cost) / revenue) * 100, 1) if revenue > 0 else None
                 is_current = (row['year'] == current_year and row['month'] == current_month)
 
@@ -469,51 +533,46 @@ class CEODashboardETL(BaseETL):
             logger.warning(f"No GL account config found for {schema}, falling back to LIKE queries")
             return self._extract_monthly_sales()  # Fall back to all sales
         
-        # Format for SQL IN clause
-        revenue_list = "', '".join(all_revenue_accounts)
-        cost_list = "', '".join(all_cost_accounts)
-        all_accounts = all_revenue_accounts + all_cost_accounts
-        all_list = "', '".join(all_accounts)
-
-        # Bennett (ben002): exclude February 2024 - ERP migration data dump
-        bennett_exclude_clause = ""
-        if schema == 'ben002':
-            bennett_exclude_clause = "AND NOT (YEAR(EffectiveDate) = 2024 AND MONTH(EffectiveDate) = 2)"
-
-        query = f"""
-        SELECT 
-            YEAR(EffectiveDate) as year,
-            MONTH(EffectiveDate) as month,
-            -SUM(CASE WHEN AccountNo IN ('{revenue_list}') THEN Amount ELSE 0 END) as total_revenue,
-            SUM(CASE WHEN AccountNo IN ('{cost_list}') THEN Amount ELSE 0 END) as total_cost
-        FROM {schema}.GLDetail
-        WHERE AccountNo IN ('{all_list}')
-            AND EffectiveDate >= DATEADD(month, -25, GETDATE())
-            AND Posted = 1
-            {bennett_exclude_clause}
-        GROUP BY YEAR(EffectiveDate), MONTH(EffectiveDate)
-        ORDER BY YEAR(EffectiveDate), MONTH(EffectiveDate)
-        """
-        
-        results = self.azure_sql.execute_query(query)
-        monthly_sales = []
-        
-        if results:
-            for row in results:
-                revenue = float(row['total_revenue'] or 0)
-                cost = float(row['total_cost'] or 0)
-                margin = round(((revenue - cost) / revenue) * 100, 1) if revenue > 0 else None
-                
-                monthly_sales.append({
-                    'year': row['year'],
-                    'month': row['month'],
-                    'amount': revenue,
-                    'cost': cost,
-                    'margin': margin,
-                    'gross_margin_dollars': revenue - cost
-                })
+        def extract_since(since):
+            qb = GLQueryBuilder()
+            # Bennett (ben002): exclude February 2024 - ERP migration data dump
+            bennett_exclude_clause = f"AND NOT ({qb.month(2024, 2, column='gl.EffectiveDate')})" if schema == 'ben002' else ""
+            query = f"""
+            SELECT 
+                YEAR(gl.EffectiveDate) as year,
+                MONTH(gl.EffectiveDate) as month,
+                -SUM(CASE WHEN acct.bucket = 'revenue' THEN gl.Amount ELSE 0 END) as total_revenue,
+                SUM(CASE WHEN acct.bucket = 'cost' THEN gl.Amount ELSE 0 END) as total_cost
+            FROM {schema}.GLDetail gl
+            JOIN {qb.account_buckets({'revenue': all_revenue_accounts, 'cost': all_cost_accounts})} ON acct.AccountNo = gl.AccountNo
+            WHERE gl.EffectiveDate >= {qb.param(self._since_date(since))}
+                AND gl.Posted = 1
+                {bennett_exclude_clause}
+            GROUP BY YEAR(gl.EffectiveDate), MONTH(gl.EffectiveDate)
+            ORDER BY YEAR(gl.EffectiveDate), MONTH(gl.EffectiveDate)
+            """
+            
+            results = qb.execute(self.azure_sql, query)
+            monthly_sales = []
+            
+            if results:
+                for row in results:
+                    revenue = float(row['total_revenue'] or 0)
+                    cost = float(row['total_cost'] or 0)
+                    margin = round(((revenue - cost) / revenue) * 100, 1) if revenue > 0 else None
+                    
+                    monthly_sales.append({
+                        'year': row['year'],
+                        'month': row['month'],
+                        'amount': revenue,
+                        'cost': cost,
+                        'margin': margin,
+                        'gross_margin_dollars': revenue - cost
+                    })
+            
+            return monthly_sales
         
-        return monthly_sales
+        return self.extract_monthly_incremental('monthly_sales_excluding_equipment', extract_since, self.window_start)
     
     def _extract_monthly_sales_by_stream(self) -> list:
         """
@@ -528,41 +587,44 @@ class CEODashboardETL(BaseETL):
         if schema == 'ben002':
             bennett_exclude_clause = "AND NOT (YEAR(InvoiceDate) = 2024 AND MONTH(InvoiceDate) = 2)"
 
-        query = f"""
-        SELECT 
-            YEAR(InvoiceDate) as year,
-            MONTH(InvoiceDate) as month,
-            SUM(COALESCE(LaborTaxable, 0) + COALESCE(LaborNonTax, 0)) as labor_revenue,
-            SUM(COALESCE(PartsTaxable, 0) + COALESCE(PartsNonTax, 0)) as parts_revenue,
-            SUM(COALESCE(RentalTaxable, 0) + COALESCE(RentalNonTax, 0)) as rental_revenue
-        FROM {schema}.InvoiceReg
-        WHERE InvoiceDate >= DATEADD(month, -25, GETDATE())
-            {bennett_exclude_clause}
-        GROUP BY YEAR(InvoiceDate), MONTH(InvoiceDate)
-        ORDER BY YEAR(InvoiceDate), MONTH(InvoiceDate)
-        """
-        
-        results = self.azure_sql.execute_query(query)
-        monthly_data = []
-        
-        if results:
-            for row in results:
-                labor_rev = float(row['labor_revenue'] or 0)
-                parts_rev = float(row['parts_revenue'] or 0)
-                rental_rev = float(row['rental_revenue'] or 0)
-                
-                monthly_data.append({
-                    'year': row['year'],
-                    'month': row['month'],
-                    'parts': parts_rev,
-                    'labor': labor_rev,
-                    'rental': rental_rev,
-                    'parts_margin': None,  # Will be refined with CoA mapping
-                    'labor_margin': None,
-                    'rental_margin': None,
-                })
+        def extract_since(since):
+            query = f"""
+            SELECT 
+                YEAR(InvoiceDate) as year,
+                MONTH(InvoiceDate) as month,
+                SUM(COALESCE(LaborTaxable, 0) + COALESCE(LaborNonTax, 0)) as labor_revenue,
+                SUM(COALESCE(PartsTaxable, 0) + COALESCE(PartsNonTax, 0)) as parts_revenue,
+                SUM(COALESCE(RentalTaxable, 0) + COALESCE(RentalNonTax, 0)) as rental_revenue
+            FROM {schema}.InvoiceReg
+            WHERE InvoiceDate >= {self._since_sql(since)}
+                {bennett_exclude_clause}
+            GROUP BY YEAR(InvoiceDate), MONTH(InvoiceDate)
+            ORDER BY YEAR(InvoiceDate), MONTH(InvoiceDate)
+            """
+            
+            results = self.azure_sql.execute_query(query)
+            monthly_data = []
+            
+            if results:
+                for row in results:
+                    labor_rev = float(row['labor_revenue'] or 0)
+                    parts_rev = float(row['parts_revenue'] or 0)
+                    rental_rev = float(row['rental_revenue'] or 0)
+                    
+                    monthly_data.append({
+                        'year': row['year'],
+                        'month': row['month'],
+                        'parts': parts_rev,
+                        'labor': labor_rev,
+                        'rental': rental_rev,
+                        'parts_margin': None,  # Will be refined with CoA mapping
+                        'labor_margin': None,
+                        'rental_margin': None,
+                    })
+            
+            return monthly_data
         
-        return monthly_data
+        return self.extract_monthly_incremental('monthly_sales_by_stream', extract_since, self.window_start)
     
     def _extract_monthly_equipment_sales(self) -> list:
         """
@@ -586,176 +648,183 @@ class CEODashboardETL(BaseETL):
             logger.warning(f"  [{schema}] No new_equipment revenue accounts configured, skipping equipment sales")
             return []
         
-        all_accounts = revenue_accounts + cogs_accounts
-        accounts_str = ", ".join(f"'{a}'" for a in all_accounts)
-        revenue_str = ", ".join(f"'{a}'" for a in revenue_accounts)
-        cogs_str = ", ".join(f"'{a}'" for a in cogs_accounts) if cogs_accounts else "'NONE'"
-        
-        # Bennett (ben002): exclude February 2024 - ERP migration data dump
-        bennett_exclude_clause = ""
-        if schema == 'ben002':
-            bennett_exclude_clause = "AND NOT (YEAR(EffectiveDate) = 2024 AND MONTH(EffectiveDate) = 2)"
-
-        # 1. Get Revenue/Cost from GLDetail using tenant-specific accounts
-        gl_query = f"""
-        SELECT 
-            YEAR(EffectiveDate) as year,
-            MONTH(EffectiveDate) as month,
-            ABS(SUM(CASE WHEN AccountNo IN ({revenue_str}) THEN Amount ELSE 0 END)) as equipment_revenue,
-            ABS(SUM(CASE WHEN AccountNo IN ({cogs_str}) THEN Amount ELSE 0 END)) as equipment_cost
-        FROM {schema}.GLDetail
-        WHERE AccountNo IN ({accounts_str})
-            AND EffectiveDate >= DATEADD(month, -25, GETDATE())
-            AND Posted = 1
-            {bennett_exclude_clause}
-        GROUP BY YEAR(EffectiveDate), MONTH(EffectiveDate)
-        ORDER BY YEAR(EffectiveDate), MONTH(EffectiveDate)
-        """
-        
-        gl_results = self.azure_sql.execute_query(gl_query)
-        
-        # 2. Get Unit Counts from InvoiceReg (SaleCode LINDEN)
-        unit_query = f"""
-        SELECT 
-            YEAR(InvoiceDate) as year,
-            MONTH(InvoiceDate) as month,
-            COUNT(*) as unit_count
+        # Unit counts come from LINDEN invoices when the tenant has any in the
+        # window; decide once so every month (frozen or fresh) uses the same source
+        linden_query = f"""
+        SELECT TOP 1 1 as has_linden
         FROM {schema}.InvoiceReg
         WHERE SaleCode = 'LINDEN'
-            AND InvoiceDate >= DATEADD(month, -25, GETDATE())
-        GROUP BY YEAR(InvoiceDate), MONTH(InvoiceDate)
+            AND InvoiceDate >= DATEADD(month, -{self.WINDOW_MONTHS}, GETDATE())
         """
-        
-        unit_results = self.azure_sql.execute_query(unit_query)
-        
-        # Build unit count lookup
-        units_by_month = {}
-        if unit_results:
-            for row in unit_results:
-                units_by_month[(row['year'], row['month'])] = int(row['unit_count'])
-        
-        # 3. If no LINDEN invoices found, fall back to counting distinct GL references
-        #    on the primary revenue account (first in the list)
-        if not units_by_month:
-            primary_revenue = revenue_accounts[0]
-            logger.info(f"  [{schema}] No LINDEN SaleCode invoices found, falling back to GL reference count on {primary_revenue}")
-            gl_unit_query = f"""
+        has_linden = bool(self.azure_sql.execute_query(linden_query))
+        if not has_linden:
+            logger.info(f"  [{schema}] No LINDEN SaleCode invoices found, falling back to GL reference count on {revenue_accounts[0]}")
+        
+        def extract_since(since):
+            # 1. Get Revenue/Cost from GLDetail using tenant-specific accounts
+            qb = GLQueryBuilder()
+            # Bennett (ben002): exclude February 2024 - ERP migration data dump
+            bennett_exclude_clause = f"AND NOT ({qb.month(2024, 2, column='gl.EffectiveDate')})" if schema == 'ben002' else ""
+            gl_query = f"""
             SELECT 
-                YEAR(EffectiveDate) as year,
-                MONTH(EffectiveDate) as month,
-                COUNT(DISTINCT Reference) as unit_count
-            FROM {schema}.GLDetail
-            WHERE AccountNo = '{primary_revenue}'
-                AND EffectiveDate >= DATEADD(month, -25, GETDATE())
-                AND Posted = 1
-                AND Reference IS NOT NULL AND Reference != ''
-            GROUP BY YEAR(EffectiveDate), MONTH(EffectiveDate)
+                YEAR(gl.EffectiveDate) as year,
+                MONTH(gl.EffectiveDate) as month,
+                ABS(SUM(CASE WHEN acct.bucket = 'revenue' THEN gl.Amount ELSE 0 END)) as equipment_revenue,
+                ABS(SUM(CASE WHEN acct.bucket = 'cogs' THEN gl.Amount ELSE 0 END)) as equipment_cost
+            FROM {schema}.GLDetail gl
+            JOIN {qb.account_buckets({'revenue': revenue_accounts, 'cogs': cogs_accounts})} ON acct.AccountNo = gl.AccountNo
+            WHERE gl.EffectiveDate >= {qb.param(self._since_date(since))}
+                AND gl.Posted = 1
+                {bennett_exclude_clause}
+            GROUP BY YEAR(gl.EffectiveDate), MONTH(gl.EffectiveDate)
+            ORDER BY YEAR(gl.EffectiveDate), MONTH(gl.EffectiveDate)
             """
-            gl_unit_results = self.azure_sql.execute_query(gl_unit_query)
-            if gl_unit_results:
-                for row in gl_unit_results:
-                    units_by_month[(row['year'], row['month'])] = int(row['unit_count'])
-        
-        # Build monthly data
-        monthly_data = []
-        
-        if gl_results:
-            for row in gl_results:
-                revenue = float(row['equipment_revenue'] or 0)
-                cost = float(row['equipment_cost'] or 0)
-                margin = None
-                if revenue > 0:
-                    margin = round(((revenue - cost) / revenue) * 100, 1)
-                
-                key = (row['year'], row['month'])
-                monthly_data.append({
-                    'year': row['year'],
-                    'month': row['month'],
-                    'amount': revenue,
-                    'cost': cost,
-                    'margin': margin,
-                    'unit_count': units_by_month.get(key, 0),
-                })
+            
+            gl_results = qb.execute(self.azure_sql, gl_query)
+            
+            if has_linden:
+                # 2. Get Unit Counts from InvoiceReg (SaleCode LINDEN)
+                unit_query = f"""
+                SELECT 
+                    YEAR(InvoiceDate) as year,
+                    MONTH(InvoiceDate) as month,
+                    COUNT(*) as unit_count
+                FROM {schema}.InvoiceReg
+                WHERE SaleCode = 'LINDEN'
+                    AND InvoiceDate >= {self._since_sql(since)}
+                GROUP BY YEAR(InvoiceDate), MONTH(InvoiceDate)
+                """
+            else:
+                # 3. If no LINDEN invoices found, fall back to counting distinct GL references
+                #    on the primary revenue account (first in the list)
+                unit_query = f"""
+                SELECT 
+                    YEAR(EffectiveDate) as year,
+                    MONTH(EffectiveDate) as month,
+                    COUNT(DISTINCT Reference) as unit_count
+                FROM {schema}.GLDetail
+                WHERE AccountNo = '{revenue_accounts[0]}'
+                    AND EffectiveDate >= {self._since_sql(since)}
+                    AND Posted = 1
+                    AND Reference IS NOT NULL AND Reference != ''
+                GROUP BY YEAR(EffectiveDate), MONTH(EffectiveDate)
+                """
+            
+            # Build unit count lookup
+            units_by_month = {}
+            for row in (self.azure_sql.execute_query(unit_query) or []):
+                units_by_month[(row['year'], row['month'])] = int(row['unit_count'])
+            
+            # Build monthly data
+            monthly_data = []
+            
+            if gl_results:
+                for row in gl_results:
+                    revenue = float(row['equipment_revenue'] or 0)
+                    cost = float(row['equipment_cost'] or 0)
+                    margin = None
+                    if revenue > 0:
+                        margin = round(((revenue - cost) / revenue) * 100, 1)
+                    
+                    key = (row['year'], row['month'])
+                    monthly_data.append({
+                        'year': row['year'],
+                        'month': row['month'],
+                        'amount': revenue,
+                        'cost': cost,
+                        'margin': margin,
+                        'unit_count': units_by_month.get(key, 0),
+                    })
+            
+            return monthly_data
         
-        return monthly_data
+        return self.extract_monthly_incremental('monthly_equipment_sales', extract_since, self.window_start)
     
     def _extract_monthly_work_orders(self) -> list:
         """Extract monthly work order counts"""
         schema = self.schema
         
-        query = f"""
-        SELECT 
-            YEAR(OpenDate) as year,
-            MONTH(OpenDate) as month,
-            COUNT(*) as opened,
-            COUNT(CASE WHEN CompletedDate IS NOT NULL THEN 1 END) as completed,
-            COUNT(CASE WHEN ClosedDate IS NOT NULL THEN 1 END) as closed
-        FROM {schema}.WO
-        WHERE OpenDate >= DATEADD(month, -25, GETDATE())
-        GROUP BY YEAR(OpenDate), MONTH(OpenDate)
-        ORDER BY YEAR(OpenDate), MONTH(OpenDate)
-        """
-        
-        results = self.azure_sql.execute_query(query)
-        monthly_data = []
-        
-        if results:
-            for row in results:
-                monthly_data.append({
-                    'year': row['year'],
-                    'month': row['month'],
-                    'opened': int(row['opened']),
-                    'completed': int(row['completed']),
-                    'closed': int(row['closed']),
-                })
+        def extract_since(since):
+            query = f"""
+            SELECT 
+                YEAR(OpenDate) as year,
+                MONTH(OpenDate) as month,
+                COUNT(*) as opened,
+                COUNT(CASE WHEN CompletedDate IS NOT NULL THEN 1 END) as completed,
+                COUNT(CASE WHEN ClosedDate IS NOT NULL THEN 1 END) as closed
+            FROM {schema}.WO
+            WHERE OpenDate >= {self._since_sql(since)}
+            GROUP BY YEAR(OpenDate), MONTH(OpenDate)
+            ORDER BY YEAR(OpenDate), MONTH(OpenDate)
+            """
+            
+            results = self.azure_sql.execute_query(query)
+            monthly_data = []
+            
+            if results:
+                for row in results:
+                    monthly_data.append({
+                        'year': row['year'],
+                        'month': row['month'],
+                        'opened': int(row['opened']),
+                        'completed': int(row['completed']),
+                        'closed': int(row['closed']),
+                    })
+            
+            return monthly_data
         
-        return monthly_data
+        return self.extract_monthly_incremental('monthly_work_orders', extract_since, self.window_start)
     
     def _extract_monthly_quotes(self) -> list:
         """Extract monthly quote values"""
         schema = self.schema
         
-        query = f"""
-        WITH LatestQuotes AS (
-            SELECT 
-                YEAR(CreationTime) as year,
-                MONTH(CreationTime) as month,
-                WONo,
-                MAX(CAST(CreationTime AS DATE)) as latest_quote_date
-            FROM {schema}.WOQuote
-            WHERE CreationTime >= DATEADD(month, -25, GETDATE())
-            AND Amount > 0
-            GROUP BY YEAR(CreationTime), MONTH(CreationTime), WONo
-        ),
-        QuoteTotals AS (
-            SELECT 
-                lq.year,
-                lq.month,
-                lq.WONo,
-                SUM(wq.Amount) as wo_total
-            FROM LatestQuotes lq
-            INNER JOIN {schema}.WOQuote wq
-                ON lq.WONo = wq.WONo
-                AND lq.year = YEAR(wq.CreationTime)
-                AND lq.month = MONTH(wq.CreationTime)
-                AND CAST(wq.CreationTime AS DATE) = lq.latest_quote_date
-            WHERE wq.Amount > 0
-            GROUP BY lq.year, lq.month, lq.WONo
-        )
-        SELECT year, month, SUM(wo_total) as amount
-        FROM QuoteTotals
-        GROUP BY year, month
-        ORDER BY year, month
-        """
+        def extract_since(since):
+            query = f"""
+            WITH LatestQuotes AS (
+                SELECT 
+                    YEAR(CreationTime) as year,
+                    MONTH(CreationTime) as month,
+                    WONo,
+                    MAX(CAST(CreationTime AS DATE)) as latest_quote_date
+                FROM {schema}.WOQuote
+                WHERE CreationTime >= {self._since_sql(since)}
+                AND Amount > 0
+                GROUP BY YEAR(CreationTime), MONTH(CreationTime), WONo
+            ),
+            QuoteTotals AS (
+                SELECT 
+                    lq.year,
+                    lq.month,
+                    lq.WONo,
+                    SUM(wq.Amount) as wo_total
+                FROM LatestQuotes lq
+                INNER JOIN {schema}.WOQuote wq
+                    ON lq.WONo = wq.WONo
+                    AND lq.year = YEAR(wq.CreationTime)
+                    AND lq.month = MONTH(wq.CreationTime)
+                    AND CAST(wq.CreationTime AS DATE) = lq.latest_quote_date
+                WHERE wq.Amount > 0
+                GROUP BY lq.year, lq.month, lq.WONo
+            )
+            SELECT year, month, SUM(wo_total) as amount
+            FROM QuoteTotals
+            GROUP BY year, month
+            ORDER BY year, month
+            """
+            return [{
+                'year': row['year'],
+                'month': row['month'],
+                'amount': float(row['amount']),
+            } for row in (self.azure_sql.execute_query(query) or [])]
         
-        results = self.azure_sql.execute_query(query)
+        results = self.extract_monthly_incremental('monthly_quotes', extract_since, self.window_start)
         
         # Build lookup of actual data
         existing = {}
-        if results:
-            for row in results:
-                key = f"{row['year']}-{row['month']}"
-                existing[key] = float(row['amount'])
+        for row in results:
+            key = f"{row['year']}-{row['month']}"
+            existing[key] = row['amount']
         
         # Pad with zero-amount months for the full 13-month window
         from datetime import datetime, timedelta
@@ -780,88 +849,116 @@ class CEODashboardETL(BaseETL):
         return monthly_data
     
     def _extract_top_customers(self) -> list:
-        """Extract top 10 customers by all-time sales"""
+        """
+        Extract top 10 customers by all-time sales.
+        All-time totals through the last closed month are frozen per customer;
+        only invoices since then are re-aggregated and added on top.
+        """
         schema = self.schema
+        open_from = self.open_period_start()
+        
+        state = None if self.full_refresh else self.load_watermark('top_customers')
+        if state and state['closed_through'] and state['closed_through'] <= open_from:
+            since = state['closed_through']
+            frozen = state['frozen_rows'] or []
+            date_filter = f"AND InvoiceDate >= '{since.strftime('%Y-%m-%d')}'"
+        else:
+            frozen = []
+            date_filter = ""
         
         query = f"""
-        SELECT TOP 10
+        SELECT 
             BillToName as customer_name,
             SUM(GrandTotal) as total_sales,
-            COUNT(*) as invoice_count
+            COUNT(*) as invoice_count,
+            SUM(CASE WHEN InvoiceDate < '{open_from}' THEN GrandTotal ELSE 0 END) as closed_sales,
+            COUNT(CASE WHEN InvoiceDate < '{open_from}' THEN 1 END) as closed_count
         FROM {schema}.InvoiceReg
         WHERE BillToName IS NOT NULL
         AND BillToName != ''
+        {date_filter}
         GROUP BY BillToName
-        ORDER BY total_sales DESC
         """
         
         results = self.azure_sql.execute_query(query)
-        top_customers = []
-        
-        if results:
-            for row in results:
-                top_customers.append({
-                    'customer_name': row['customer_name'],
-                    'total_sales': float(row['total_sales']),
-                    'invoice_count': int(row['invoice_count']),
-                })
         
-        return top_customers
+        totals = {row['customer_name']: dict(row) for row in frozen}
+        closed_totals = {row['customer_name']: dict(row) for row in frozen}
+        for row in (results or []):
+            name = row['customer_name']
+            for target, sales, count in ((totals, row['total_sales'], row['invoice_count']),
+                                         (closed_totals, row['closed_sales'], row['closed_count'])):
+                entry = target.setdefault(name, {'customer_name': name, 'total_sales': 0.0, 'invoice_count': 0})
+                entry['total_sales'] += float(sales or 0)
+                entry['invoice_count'] += int(count or 0)
+        
+        self.stage_watermark('top_customers', open_from,
+                             [entry for entry in closed_totals.values() if entry['invoice_count']])
+        
+        top_customers = sorted(totals.values(), key=lambda entry: entry['total_sales'], reverse=True)[:10]
+        return [{
+            'customer_name': entry['customer_name'],
+            'total_sales': float(entry['total_sales']),
+            'invoice_count': int(entry['invoice_count']),
+        } for entry in top_customers]
     
     def _extract_monthly_invoice_delays(self) -> list:
         """Extract monthly average invoice delay"""
         schema = self.schema
         
-        query = f"""
-        WITH MonthEnds AS (
-            SELECT DISTINCT 
-                YEAR(CompletedDate) as year,
-                MONTH(CompletedDate) as month,
-                EOMONTH(CompletedDate) as month_end
-            FROM {schema}.WO
-            WHERE CompletedDate >= DATEADD(month, -25, GETDATE())
-                AND CompletedDate <= GETDATE()
-                AND Type IN ('S', 'SH', 'PM')
-        ),
-        MonthlyDelays AS (
+        def extract_since(since):
+            query = f"""
+            WITH MonthEnds AS (
+                SELECT DISTINCT 
+                    YEAR(CompletedDate) as year,
+                    MONTH(CompletedDate) as month,
+                    EOMONTH(CompletedDate) as month_end
+                FROM {schema}.WO
+                WHERE CompletedDate >= {self._since_sql(since)}
+                    AND CompletedDate <= GETDATE()
+                    AND Type IN ('S', 'SH', 'PM')
+            ),
+            MonthlyDelays AS (
+                SELECT 
+                    me.year,
+                    me.month,
+                    CASE 
+                        WHEN COALESCE(w.InvoiceDate, w.ClosedDate) <= me.month_end 
+                        THEN DATEDIFF(day, w.CompletedDate, COALESCE(w.InvoiceDate, w.ClosedDate))
+                        ELSE DATEDIFF(day, w.CompletedDate, me.month_end)
+                    END as DaysWaiting
+                FROM MonthEnds me
+                INNER JOIN {schema}.WO w 
+                    ON YEAR(w.CompletedDate) = me.year 
+                    AND MONTH(w.CompletedDate) = me.month
+                WHERE w.CompletedDate IS NOT NULL
+                    AND w.Type IN ('S', 'SH', 'PM')
+            )
             SELECT 
-                me.year,
-                me.month,
-                CASE 
-                    WHEN COALESCE(w.InvoiceDate, w.ClosedDate) <= me.month_end 
-                    THEN DATEDIFF(day, w.CompletedDate, COALESCE(w.InvoiceDate, w.ClosedDate))
-                    ELSE DATEDIFF(day, w.CompletedDate, me.month_end)
-                END as DaysWaiting
-            FROM MonthEnds me
-            INNER JOIN {schema}.WO w 
-                ON YEAR(w.CompletedDate) = me.year 
-                AND MONTH(w.CompletedDate) = me.month
-            WHERE w.CompletedDate IS NOT NULL
-                AND w.Type IN ('S', 'SH', 'PM')
-        )
-        SELECT 
-            year,
-            month,
-            COUNT(*) as completed_count,
-            AVG(CAST(DaysWaiting as FLOAT)) as avg_days_waiting
-        FROM MonthlyDelays
-        GROUP BY year, month
-        ORDER BY year, month
-        """
-        
-        results = self.azure_sql.execute_query(query)
-        monthly_data = []
-        
-        if results:
-            for row in results:
-                monthly_data.append({
-                    'year': row['year'],
-                    'month': row['month'],
-                    'avg_days': round(float(row['avg_days_waiting']), 1),
-                    'completed_count': int(row['completed_count']),
-                })
+                year,
+                month,
+                COUNT(*) as completed_count,
+                AVG(CAST(DaysWaiting as FLOAT)) as avg_days_waiting
+            FROM MonthlyDelays
+            GROUP BY year, month
+            ORDER BY year, month
+            """
+            
+            results = self.azure_sql.execute_query(query)
+            monthly_data = []
+            
+            if results:
+                for row in results:
+                    monthly_data.append({
+                        'year': row['year'],
+                        'month': row['month'],
+                        'avg_days': round(float(row['avg_days_waiting']), 1),
+                        'completed_count': int(row['completed_count']),
+                    })
+            
+            return monthly_data
         
-        return monthly_data
+        return self.extract_monthly_incremental('monthly_invoice_delays', extract_since, self.window_start)
     
     def transform(self, data: list) -> list:
         """Transform - convert JSON fields to strings for PostgreSQL"""
@@ -892,12 +989,13 @@ class CEODashboardETL(BaseETL):
             self.records_inserted += 1
 
 
-def run_ceo_dashboard_etl(org_id=None):
+def run_ceo_dashboard_etl(org_id=None, full_refresh=False):
     """
     Run the CEO Dashboard ETL job.
     
     If org_id is provided, runs for that specific org only.
     Otherwise, runs for ALL discovered Softbase tenants.
+    full_refresh re-aggregates closed months instead of reusing the frozen ones.
     """
     if org_id is not None:
         try:
@@ -920,7 +1018,8 @@ def run_ceo_dashboard_etl(org_id=None):
                     org_id=org_id,
                     schema=org.database_schema,
                     azure_sql=azure_sql,
-                    fiscal_year_start_month=org.fiscal_year_start_month or 11
+                    fiscal_year_start_month=org.fiscal_year_start_month or 11,
+                    full_refresh=full_refresh
                 )
                 return etl.run()
             else:
@@ -931,7 +1030,7 @@ def run_ceo_dashboard_etl(org_id=None):
             return False
     else:
         from .tenant_discovery import run_etl_for_all_tenants
-        results = run_etl_for_all_tenants(CEODashboardETL, 'CEO Dashboard')
+        results = run_etl_for_all_tenants(CEODashboardETL, 'CEO Dashboard', full_refresh=full_refresh)
         return all(results.values()) if results else False
 
 
@@ -232,9 +232,32 @@ class CustomerActivityETL(BaseETL):
         return transformed
     
     def load(self, data: list) -> None:
-        """Load transformed data into mart_customer_activity"""
-        for record in data:
-            self.upsert_record(record, unique_columns=['org_id', 'customer_name', 'snapshot_date'])
+        """
+        Load transformed data into today's mart_customer_activity partition and,
+        in the same transaction, point mart_latest_snapshot at it. Then drop
+        partitions past the retention period.
+        """
+        if not data:
+            # Nothing to load: keep the pointer on the last snapshot and skip retention
+            return
+        
+        from .snapshot_partitions import (
+            ensure_snapshot_partition, publish_latest_snapshot, drop_expired_snapshot_partitions
+        )
+        snapshot_date = data[0]['snapshot_date']
+        ensure_snapshot_partition(self.pg, self.target_table, self.org_id, snapshot_date)
+        
+        def publish(cursor, counts):
+            publish_latest_snapshot(cursor, self.target_table, self.org_id, snapshot_date,
+                                    counts['inserted'] + counts['updated'])
+        
+        self.bulk_upsert(data, unique_columns=['org_id', 'customer_name', 'snapshot_date'], after_merge=publish)
+        
+        try:
+            drop_expired_snapshot_partitions(self.pg, self.target_table, self.org_id)
+        except Exception as e:
+            # Retention is housekeeping - the new snapshot is already live
+            logger.warning(f"  Failed to drop expired {self.target_table} partitions: {e}")
 
 
 def run_customer_activity_etl(org_id=None):
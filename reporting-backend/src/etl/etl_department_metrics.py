@@ -16,6 +16,8 @@ import time
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from .base_etl import BaseETL
+from src.services.gl_query_builder import GLQueryBuilder
+from src.services.mart_delta import build_delta_base
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +31,7 @@ def format_month_label(year: int, month: int) -> str:
 class DepartmentMetricsETL(BaseETL):
     """ETL job for Department page metrics from Softbase"""
     
-    def __init__(self, org_id=4, schema='ben002', azure_sql=None, fiscal_year_start_month=11):
+    def __init__(self, org_id=4, schema='ben002', azure_sql=None, fiscal_year_start_month=11, full_refresh=False):
         """
         Initialize Department Metrics ETL for a specific tenant.
         
@@ -38,6 +40,7 @@ class DepartmentMetricsETL(BaseETL):
             schema: Database schema for the tenant (e.g., 'ben002', 'ind004')
             azure_sql: Pre-configured AzureSQLService instance for the tenant
             fiscal_year_start_month: Month number (1-12) when fiscal year starts
+            full_refresh: Re-aggregate closed months instead of reusing the frozen ones
         """
         super().__init__(
             job_name='etl_department_metrics',
@@ -50,6 +53,7 @@ class DepartmentMetricsETL(BaseETL):
         self.start_time = None
         self.current_date = datetime.now()
         self.fiscal_year_start_month = fiscal_year_start_month
+        self.full_refresh = full_refresh or self.full_refresh
         
         # Fiscal year calculation (dynamic per tenant)
         if self.current_date.month >= self.fiscal_year_start_month:
@@ -73,50 +77,51 @@ class DepartmentMetricsETL(BaseETL):
             self._azure_sql = AzureSQLService()
         return self._azure_sql
     
+    def _invoice_revenue_by_month(self, metric: str, revenue_sql: str) -> dict:
+        """
+        Monthly InvoiceReg revenue for the trailing 25 months, keyed by (year, month).
+        Closed months are frozen in the watermark; only the open period is re-queried.
+        """
+        schema = self.schema
+        window_start = self.current_date.date().replace(day=1) - relativedelta(months=25)
+        
+        def extract_since(since):
+            since_sql = f"'{since}'" if since else "DATEADD(month, -25, GETDATE())"
+            query = f"""
+            SELECT 
+                YEAR(InvoiceDate) as year,
+                MONTH(InvoiceDate) as month,
+                SUM({revenue_sql}) as revenue
+            FROM {schema}.InvoiceReg
+            WHERE InvoiceDate >= {since_sql}
+            GROUP BY YEAR(InvoiceDate), MONTH(InvoiceDate)
+            ORDER BY YEAR(InvoiceDate), MONTH(InvoiceDate)
+            """
+            return [{
+                'year': row['year'],
+                'month': row['month'],
+                'revenue': float(row['revenue'] or 0),
+            } for row in (self.azure_sql.execute_query(query) or [])]
+        
+        rows = self.extract_monthly_incremental(metric, extract_since, window_start)
+        return {(row['year'], row['month']): row for row in rows}
+    
     def extract(self) -> list:
         """Extract all department metrics from Softbase"""
         self.start_time = time.time()
         logger.info(f"Starting Department Metrics extraction for {self.schema} (org_id={self.org_id})...")
         
-        all_metrics = []
-        
-        # Extract each department
-        try:
-            service_data = self._extract_service()
-            all_metrics.append(('service', service_data))
-            logger.info(f"  [{self.schema}] ✓ Service metrics extracted")
-        except Exception as e:
-            logger.error(f"  [{self.schema}] Service extraction failed: {e}")
-        
-        try:
-            parts_data = self._extract_parts()
-            all_metrics.append(('parts', parts_data))
-            logger.info(f"  [{self.schema}] ✓ Parts metrics extracted")
-        except Exception as e:
-            logger.error(f"  [{self.schema}] Parts extraction failed: {e}")
-        
-        try:
-            rental_data = self._extract_rental()
-            all_metrics.append(('rental', rental_data))
-            logger.info(f"  [{self.schema}] ✓ Rental metrics extracted")
-        except Exception as e:
-            logger.error(f"  [{self.schema}] Rental extraction failed: {e}")
-        
-        try:
-            accounting_data = self._extract_accounting()
-            all_metrics.append(('accounting', accounting_data))
-            logger.info(f"  [{self.schema}] ✓ Accounting metrics extracted")
-        except Exception as e:
-            logger.error(f"  [{self.schema}] Accounting extraction failed: {e}")
-        
-        try:
-            financial_data = self._extract_financial()
-            all_metrics.append(('financial', financial_data))
-            logger.info(f"  [{self.schema}] ✓ Financial metrics extracted")
-        except Exception as e:
-            import traceback
-            logger.error(f"  [{self.schema}] Financial extraction failed: {e}")
-            logger.error(f"  [{self.schema}] Financial traceback: {traceback.format_exc()}")
+        # Departments are independent read-only extractions; run them concurrently.
+        # A failed department is left out, so its previous mart rows stay current.
+        extractors = {
+            'service': self._extract_service,
+            'parts': self._extract_parts,
+            'rental': self._extract_rental,
+            'accounting': self._extract_accounting,
+            'financial': self._extract_financial,
+        }
+        results, _ = self.run_extractors(extractors)
+        all_metrics = [(department, results[department]) for department in extractors if department in results]
         
         return all_metrics
     
@@ -125,27 +130,10 @@ class DepartmentMetricsETL(BaseETL):
         Extract Service department metrics using InvoiceReg for generic tenant support.
         Uses LaborTaxable/LaborNonTax fields which are available across all Softbase schemas.
         """
-        schema = self.schema
-        
         # Monthly Labor Revenue from InvoiceReg
-        query = f"""
-        SELECT 
-            YEAR(InvoiceDate) as year,
-            MONTH(InvoiceDate) as month,
-            SUM(COALESCE(LaborTaxable, 0) + COALESCE(LaborNonTax, 0)) as labor_revenue
-        FROM {schema}.InvoiceReg
-        WHERE InvoiceDate >= DATEADD(month, -25, GETDATE())
-        GROUP BY YEAR(InvoiceDate), MONTH(InvoiceDate)
-        ORDER BY YEAR(InvoiceDate), MONTH(InvoiceDate)
-        """
-        
-        results = self.azure_sql.execute_query(query)
-        
-        # Build lookup by year-month
-        data_by_month = {}
-        for row in results:
-            key = (row['year'], row['month'])
-            data_by_month[key] = row
+        data_by_month = self._invoice_revenue_by_month(
+            'service_labor_revenue', 'COALESCE(LaborTaxable, 0) + COALESCE(LaborNonTax, 0)'
+        )
         
         # Build monthly arrays for fiscal year
         monthly_revenue = []
@@ -158,8 +146,8 @@ class DepartmentMetricsETL(BaseETL):
             row = data_by_month.get(key, {})
             prior_row = data_by_month.get(prior_key, {})
             
-            labor_rev = float(row.get('labor_revenue', 0) or 0)
-            prior_labor = float(prior_row.get('labor_revenue', 0) or 0)
+            labor_rev = float(row.get('revenue', 0) or 0)
+            prior_labor = float(prior_row.get('revenue', 0) or 0)
             
             monthly_revenue.append({
                 'month': month_label, 'year': year, 'month_num': month,
@@ -185,27 +173,10 @@ class DepartmentMetricsETL(BaseETL):
         Extract Parts department metrics using InvoiceReg for generic tenant support.
         Uses PartsTaxable/PartsNonTax fields which are available across all Softbase schemas.
         """
-        schema = self.schema
-        
         # Monthly Parts Revenue from InvoiceReg
-        query = f"""
-        SELECT 
-            YEAR(InvoiceDate) as year,
-            MONTH(InvoiceDate) as month,
-            SUM(COALESCE(PartsTaxable, 0) + COALESCE(PartsNonTax, 0)) as parts_revenue
-        FROM {schema}.InvoiceReg
-        WHERE InvoiceDate >= DATEADD(month, -25, GETDATE())
-        GROUP BY YEAR(InvoiceDate), MONTH(InvoiceDate)
-        ORDER BY YEAR(InvoiceDate), MONTH(InvoiceDate)
-        """
-        
-        results = self.azure_sql.execute_query(query)
-        
-        # Build lookup by year-month
-        data_by_month = {}
-        for row in results:
-            key = (row['year'], row['month'])
-            data_by_month[key] = row
+        data_by_month = self._invoice_revenue_by_month(
+            'parts_revenue', 'COALESCE(PartsTaxable, 0) + COALESCE(PartsNonTax, 0)'
+        )
         
         # Build monthly arrays for fiscal year
         monthly_revenue = []
@@ -218,8 +189,8 @@ class DepartmentMetricsETL(BaseETL):
             row = data_by_month.get(key, {})
             prior_row = data_by_month.get(prior_key, {})
             
-            parts_rev = float(row.get('parts_revenue', 0) or 0)
-            prior_parts = float(prior_row.get('parts_revenue', 0) or 0)
+            parts_rev = float(row.get('revenue', 0) or 0)
+            prior_parts = float(prior_row.get('revenue', 0) or 0)
             
             monthly_revenue.append({
                 'month': month_label, 'year': year, 'month_num': month,
@@ -250,7 +221,8 @@ class DepartmentMetricsETL(BaseETL):
             (SELECT COUNT(*) FROM {schema}.Equipment WHERE WebRentalFlag = 1) as totalFleetSize,
             (SELECT COUNT(*) FROM {schema}.Equipment WHERE RentalStatus = 'Rented') as unitsOnRent,
             (SELECT SUM(GrandTotal) FROM {schema}.InvoiceReg 
-             WHERE MONTH(InvoiceDate) = MONTH(GETDATE()) AND YEAR(InvoiceDate) = YEAR(GETDATE())) as monthlyRevenue
+             WHERE InvoiceDate >= DATEFROMPARTS(YEAR(GETDATE()), MONTH(GETDATE()), 1)
+               AND InvoiceDate < DATEADD(month, 1, DATEFROMPARTS(YEAR(GETDATE()), MONTH(GETDATE()), 1))) as monthlyRevenue
         """
         
         summary_result = self.azure_sql.execute_query(summary_query)
@@ -331,6 +303,9 @@ class DepartmentMetricsETL(BaseETL):
                 'total_revenue': float(row['total_revenue'] or 0)
             })
         
+        # Delta base: lets the page add invoices posted after this snapshot with one small query
+        delta_base = build_delta_base(self.azure_sql, schema, self.current_date.date())
+        
         return {
             'monthly_revenue': monthly_trend,
             'sub_category_1': fleet_by_category,
@@ -348,7 +323,8 @@ class DepartmentMetricsETL(BaseETL):
                     'utilizationRate': utilization,
                     'monthlyRevenue': monthly_revenue_val
                 },
-                'topCustomers': top_customers
+                'topCustomers': top_customers,
+                'delta_base': delta_base
             }
         }
     
@@ -356,31 +332,37 @@ class DepartmentMetricsETL(BaseETL):
         """Extract Accounting department metrics using dynamic LIKE '6%' query"""
         schema = self.schema
         
-        # G&A expenses from GLDetail
-        expenses_query = f"""
-        SELECT
-            YEAR(EffectiveDate) as year,
-            MONTH(EffectiveDate) as month,
-            SUM(Amount) as total_expenses
-        FROM {schema}.GLDetail
-        WHERE AccountNo LIKE '6%'
-            AND EffectiveDate >= DATEADD(month, -13, GETDATE())
-            AND EffectiveDate < DATEADD(DAY, 1, GETDATE())
-        GROUP BY YEAR(EffectiveDate), MONTH(EffectiveDate)
-        ORDER BY YEAR(EffectiveDate), MONTH(EffectiveDate)
-        """
-        
-        expenses_result = self.azure_sql.execute_query(expenses_query)
-        
-        monthly_expenses = []
-        for row in (expenses_result or []):
-            month_label = format_month_label(row['year'], row['month'])
-            monthly_expenses.append({
-                'month': month_label,
-                'year': row['year'],
-                'month_num': row['month'],
-                'expenses': float(row['total_expenses'] or 0)
-            })
+        window_start = self.current_date.date().replace(day=1) - relativedelta(months=13)
+        
+        # G&A expenses from GLDetail (closed months frozen, open period re-queried)
+        def extract_since(since):
+            qb = GLQueryBuilder()
+            expenses_query = f"""
+            SELECT
+                YEAR(EffectiveDate) as year,
+                MONTH(EffectiveDate) as month,
+                SUM(Amount) as total_expenses
+            FROM {schema}.GLDetail
+            WHERE AccountNo LIKE '6%'
+                AND {qb.date_range(since or window_start, self.current_date)}
+            GROUP BY YEAR(EffectiveDate), MONTH(EffectiveDate)
+            ORDER BY YEAR(EffectiveDate), MONTH(EffectiveDate)
+            """
+            
+            expenses_result = qb.execute(self.azure_sql, expenses_query)
+            
+            monthly_expenses = []
+            for row in (expenses_result or []):
+                month_label = format_month_label(row['year'], row['month'])
+                monthly_expenses.append({
+                    'month': month_label,
+                    'year': row['year'],
+                    'month_num': row['month'],
+                    'expenses': float(row['total_expenses'] or 0)
+                })
+            return monthly_expenses
+        
+        monthly_expenses = self.extract_monthly_incremental('accounting_expenses', extract_since, window_start)
         
         # Expense categories - generic grouping by first 3 digits
         categories_query = f"""
@@ -595,12 +577,13 @@ class DepartmentMetricsETL(BaseETL):
         return loaded_count
 
 
-def run_department_metrics_etl(org_id=None):
+def run_department_metrics_etl(org_id=None, full_refresh=False):
     """
     Run the Department Metrics ETL job.
     
     If org_id is provided, runs for that specific org only.
     Otherwise, runs for ALL discovered Softbase tenants.
+    full_refresh re-aggregates closed months instead of reusing the frozen ones.
     """
     if org_id is not None:
         try:
@@ -622,7 +605,8 @@ def run_department_metrics_etl(org_id=None):
                 etl = DepartmentMetricsETL(
                     org_id=org_id,
                     schema=org.database_schema,
-                    azure_sql=azure_sql
+                    azure_sql=azure_sql,
+                    full_refresh=full_refresh
                 )
                 return etl.run()
             else:
@@ -633,5 +617,5 @@ def run_department_metrics_etl(org_id=None):
             return False
     else:
         from .tenant_discovery import run_etl_for_all_tenants
-        results = run_etl_for_all_tenants(DepartmentMetricsETL, 'Department Metrics')
+        results = run_etl_for_all_tenants(DepartmentMetricsETL, 'Department Metrics', full_refresh=full_refresh)
         return all(results.values()) if results else False
@@ -0,0 +1,180 @@
+"""
+Closed Period Snapshot ETL (Multi-Tenant)
+Copies closed months of the tables in SNAPSHOT_TABLES (the GL summary) from
+Softbase into the per-tenant columnar snapshot store (src/services/snapshot_store.py),
+so GLRollupEngine.load only queries the open month live.
+
+Each run snapshots the closed months of the window that are missing, and
+re-checks the most recently closed ones (SNAPSHOT_VERIFY_MONTHS, every month
+on a full refresh) against a row count / checksum fingerprint, rewriting a
+month whose rows were back-dated or corrected after it closed.
+"""
+
+import os
+import logging
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+
+from .base_etl import BaseETL
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MONTHS = int(os.environ.get('SNAPSHOT_MONTHS', '36'))
+SNAPSHOT_VERIFY_MONTHS = int(os.environ.get('SNAPSHOT_VERIFY_MONTHS', '3'))
+
+
+class SnapshotETL(BaseETL):
+    """ETL job that writes closed accounting months to the snapshot store"""
+
+    def __init__(self, org_id=4, schema='ben002', azure_sql=None, fiscal_year_start_month=11,
+                 full_refresh=False, tables=None):
+        """
+        Initialize the snapshot ETL for a specific tenant.
+
+        Args:
+            org_id: Organization ID from the organization table
+            schema: Database schema for the tenant (e.g., 'ben002', 'ind004')
+            azure_sql: Pre-configured AzureSQLService instance for the tenant
+            fiscal_year_start_month: Unused, accepted for run_etl_for_all_tenants
+            full_refresh: Re-check every closed month, not just the most recent ones
+            tables: Restrict to these SNAPSHOT_TABLES names (default: all)
+        """
+        super().__init__(
+            job_name='etl_snapshots',
+            org_id=org_id,
+            source_system='softbase',
+            target_table='snapshot_store'
+        )
+        from src.services.snapshot_store import SNAPSHOT_TABLES, get_snapshot_store
+        self.schema = schema
+        self._azure_sql = azure_sql
+        self.full_refresh = full_refresh or self.full_refresh
+        self.store = get_snapshot_store()
+        self.tables = [SNAPSHOT_TABLES[name] for name in (tables or SNAPSHOT_TABLES)]
+
+    @property
+    def azure_sql(self):
+        """Lazy load Azure SQL service if not provided"""
+        if self._azure_sql is None:
+            from src.services.azure_sql_service import AzureSQLService
+            self._azure_sql = AzureSQLService()
+        return self._azure_sql
+
+    def closed_periods(self) -> list:
+        """(year, month) of every closed month in the snapshot window, oldest first"""
+        from src.services.snapshot_store import month_span
+        last_closed = self.open_period_start() - timedelta(days=1)
+        first = last_closed.replace(day=1) - relativedelta(months=SNAPSHOT_MONTHS - 1)
+        return month_span((first.year, first.month), (last_closed.year, last_closed.month))
+
+    def fingerprint(self, spec, period) -> str:
+        """Row count plus an aggregate checksum of one table-month in Softbase"""
+        from src.services.gl_query_builder import GLQueryBuilder
+        from src.services.snapshot_store import period_filter
+        qb = GLQueryBuilder()
+        query = f"""
+        SELECT COUNT_BIG(*) AS row_count, CHECKSUM_AGG(BINARY_CHECKSUM(*)) AS checksum
+        FROM ({spec.select.format(schema=self.schema)} WHERE {period_filter(qb, spec, period, period)}) s
+        """
+        results = qb.execute(self.azure_sql, query)
+        row = results[0] if results else {}
+        return f"{row.get('row_count') or 0}-{row.get('checksum') or 0}"
+
+    def extract(self) -> list:
+        """
+        Work out which table-months need (re)writing. The months themselves are
+        pulled one at a time in load() so only one is in memory at once.
+        """
+        from src.services.snapshot_store import period_key
+
+        if not self.store.enabled:
+            logger.warning("  Snapshot store disabled (pyarrow missing or SNAPSHOT_STORE_ENABLED=false), skipping")
+            return []
+
+        periods = self.closed_periods()
+        verify_from = periods[-SNAPSHOT_VERIFY_MONTHS:][0] if SNAPSHOT_VERIFY_MONTHS > 0 else None
+        tasks = []
+        for spec in self.tables:
+            try:
+                manifest = self.store.manifest(self.schema, spec.name)
+                missing = changed = 0
+                for period in periods:
+                    entry = manifest.get(period_key(period))
+                    if entry and self.store.has(self.schema, spec.name, period):
+                        if not (self.full_refresh or (verify_from and period >= verify_from)):
+                            continue
+                        fingerprint = self.fingerprint(spec, period)
+                        if fingerprint == entry.get('fingerprint'):
+                            continue
+                        changed += 1
+                        tasks.append({'spec': spec, 'period': period, 'fingerprint': fingerprint, 'changed': True})
+                    else:
+                        missing += 1
+                        tasks.append({'spec': spec, 'period': period, 'fingerprint': self.fingerprint(spec, period),
+                                      'changed': False})
+                logger.info(f"  {spec.name}: {missing} months to snapshot, {changed} changed since snapshotted")
+            except Exception as e:
+                # e.g. a tenant without the table - any others still get snapshotted
+                logger.warning(f"  Skipping {spec.name} snapshots for {self.schema}: {e}")
+        return tasks
+
+    def transform(self, data: list) -> list:
+        """Nothing to transform - months are stored as they are in Softbase"""
+        return data
+
+    def load(self, data: list) -> None:
+        """Pull each pending month from Softbase and write it to the snapshot store"""
+        from src.services.snapshot_store import fetch_periods, period_key
+
+        for task in data:
+            spec, period = task['spec'], task['period']
+            frame = fetch_periods(self.azure_sql, self.schema, spec, period, period)
+            size = self.store.write(self.schema, spec.name, period, frame, fingerprint=task['fingerprint'])
+            if task['changed']:
+                self.records_updated += 1
+            else:
+                self.records_inserted += 1
+            logger.info(f"  {spec.name} {period_key(period)}: {len(frame)} rows, {size / 1024:.0f} KB")
+
+
+def run_snapshot_etl(org_id=None, full_refresh=False):
+    """
+    Run the closed period snapshot ETL job.
+
+    If org_id is provided, runs for that specific org only.
+    Otherwise, runs for ALL discovered Softbase tenants.
+    full_refresh re-checks every snapshotted month against Softbase.
+    """
+    if org_id is not None:
+        try:
+            from .tenant_discovery import create_tenant_azure_sql
+            from src.models.user import Organization
+            org = Organization.query.get(org_id)
+            azure_sql = create_tenant_azure_sql(org_id)
+            if org is None or azure_sql is None:
+                return False
+            etl = SnapshotETL(
+                org_id=org_id,
+                schema=org.database_schema,
+                azure_sql=azure_sql,
+                full_refresh=full_refresh
+            )
+            return etl.run()
+        except Exception as e:
+            logger.error(f"Failed to run snapshot ETL for org_id={org_id}: {e}")
+            return False
+    else:
+        from .tenant_discovery import run_etl_for_all_tenants
+        results = run_etl_for_all_tenants(SnapshotETL, 'Snapshots', full_refresh=full_refresh)
+        return all(results.values()) if results else False
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    success = run_snapshot_etl()
+    exit(0 if success else 1)
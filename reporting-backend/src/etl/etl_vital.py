@@ -79,8 +79,7 @@ class VitalHubSpotContactsETL(BaseETL):
         }]
     
     def load(self, data: list) -> None:
-        for record in data:
-            self.upsert_record(record, unique_columns=['org_id', 'snapshot_date'])
+        self.bulk_upsert(data, unique_columns=['org_id', 'snapshot_date'])
 
 
 class VitalHubSpotDealsETL(BaseETL):
@@ -151,8 +150,7 @@ class VitalHubSpotDealsETL(BaseETL):
         }]
     
     def load(self, data: list) -> None:
-        for record in data:
-            self.upsert_record(record, unique_columns=['org_id', 'snapshot_date'])
+        self.bulk_upsert(data, unique_columns=['org_id', 'snapshot_date'])
 
 
 class VitalZoomETL(BaseETL):
@@ -218,8 +216,7 @@ class VitalZoomETL(BaseETL):
         }]
     
     def load(self, data: list) -> None:
-        for record in data:
-            self.upsert_record(record, unique_columns=['org_id', 'metric_date'])
+        self.bulk_upsert(data, unique_columns=['org_id', 'metric_date'])
 
 
 class VitalCaseDataETL(BaseETL):
@@ -279,8 +276,7 @@ class VitalCaseDataETL(BaseETL):
         }]
     
     def load(self, data: list) -> None:
-        for record in data:
-            self.upsert_record(record, unique_columns=['org_id', 'snapshot_date'])
+        self.bulk_upsert(data, unique_columns=['org_id', 'snapshot_date'])
 
 
 class VitalQuickBooksETL(BaseETL):
@@ -358,8 +354,7 @@ class VitalQuickBooksETL(BaseETL):
         }]
     
     def load(self, data: list) -> None:
-        for record in data:
-            self.upsert_record(record, unique_columns=['org_id', 'year', 'month'])
+        self.bulk_upsert(data, unique_columns=['org_id', 'year', 'month'])
 
 
 class VitalAppAnalyticsETL(BaseETL):
@@ -417,8 +412,7 @@ class VitalAppAnalyticsETL(BaseETL):
         }]
     
     def load(self, data: list) -> None:
-        for record in data:
-            self.upsert_record(record, unique_columns=['org_id', 'metric_date'])
+        self.bulk_upsert(data, unique_columns=['org_id', 'metric_date'])
 
 
 def run_vital_etl():
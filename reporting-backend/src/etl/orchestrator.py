@@ -0,0 +1,470 @@
+"""
+ETL Orchestrator
+Runs the nightly ETL as a dependency graph of (job x tenant) nodes instead of
+one job after another, each looping over every tenant.
+
+Every node is one job for one tenant (or one global job such as VITAL).
+Dependencies are declared per job and resolved per tenant, e.g. a tenant's CEO
+metrics run after that tenant's GL discovery, while other tenants proceed
+independently:
+- requires: hard dependency - the node is skipped if the upstream node failed
+- after: ordering only - the node waits for the upstream node but still runs
+  if it failed (e.g. the previous run's mappings are still usable)
+
+Ready nodes run in parallel on a small thread pool, throttled per resource:
+at most ETL_MAX_PER_SQL_SERVER nodes per Azure SQL server (tenants may share a
+server) and ETL_MAX_PG_WRITERS nodes writing the Postgres mart at once. Slots
+are claimed by the scheduling loop before a node is submitted, so a throttled
+node never occupies a worker thread. Failed nodes are retried up to
+ETL_NODE_RETRIES times with a linear backoff.
+
+Each node attempt is recorded in mart_etl_log (job_name 'etl_dag:<job>',
+source_system 'orchestrator') next to the rows the ETL classes write
+themselves, and the run ends with a summary row ('etl_dag') plus the critical
+path - the longest dependency chain, which is what bounds the nightly window.
+
+Usage:
+    success = ETLOrchestrator(NIGHTLY_JOBS).run()
+"""
+
+import os
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from src.services.scheduler_coordinator import check_leadership
+
+logger = logging.getLogger(__name__)
+
+ETL_MAX_WORKERS = int(os.environ.get('ETL_MAX_WORKERS', '6'))
+ETL_MAX_PER_SQL_SERVER = int(os.environ.get('ETL_MAX_PER_SQL_SERVER', '2'))
+ETL_MAX_PG_WRITERS = int(os.environ.get('ETL_MAX_PG_WRITERS', '4'))
+ETL_NODE_RETRIES = int(os.environ.get('ETL_NODE_RETRIES', '1'))
+ETL_RETRY_DELAY_SECONDS = float(os.environ.get('ETL_RETRY_DELAY_SECONDS', '60'))
+
+DAG_JOB_PREFIX = 'etl_dag'
+PG_RESOURCE = 'pg'
+
+
+class ETLJob(NamedTuple):
+    name: str
+    # per tenant: run(tenant, azure_sql) -> bool; global: run() -> bool
+    run: Callable[..., bool]
+    per_tenant: bool = True
+    requires: Tuple[str, ...] = ()
+    after: Tuple[str, ...] = ()
+    target_table: str = ''
+
+
+class ETLNode:
+    """One job for one tenant (tenant is None for global jobs)"""
+
+    def __init__(self, job: ETLJob, tenant=None):
+        self.job = job
+        self.tenant = tenant
+        self.key = f"{job.name}:{tenant.schema}" if tenant is not None else job.name
+        self.requires: List['ETLNode'] = []
+        self.after: List['ETLNode'] = []
+        self.dependents: List['ETLNode'] = []
+        self.status = 'pending'  # pending, running, success, failed, skipped
+        self.attempts = 0
+        self.not_before = 0.0
+        self.started_at: Optional[datetime] = None
+        self.duration = 0.0
+        self.error: Optional[str] = None
+
+    @property
+    def org_id(self) -> Optional[int]:
+        return self.tenant.org_id if self.tenant is not None else None
+
+    @property
+    def resources(self) -> List[str]:
+        """Throttled resources this node holds while it runs, in a fixed order"""
+        resources = [PG_RESOURCE]
+        if self.tenant is not None:
+            resources.append(f"sql:{self.tenant.db_server or 'default'}")
+        return sorted(resources)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ('success', 'failed', 'skipped')
+
+    def __repr__(self):
+        return f"ETLNode({self.key}, {self.status})"
+
+
+class ETLOrchestrator:
+    """Builds the job x tenant graph and runs it with per-resource limits"""
+
+    def __init__(self, jobs: List[ETLJob], tenants: Optional[list] = None,
+                 max_workers: int = ETL_MAX_WORKERS, retries: int = ETL_NODE_RETRIES,
+                 retry_delay: float = ETL_RETRY_DELAY_SECONDS):
+        self.jobs = jobs
+        self.max_workers = max_workers
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._tenants = tenants
+        self._limits: Dict[str, int] = {}
+        self._in_use: Dict[str, int] = {}
+        self._pg = None
+        self.nodes: Dict[str, ETLNode] = {}
+
+    @property
+    def pg(self):
+        """Lazy load PostgreSQL service"""
+        if self._pg is None:
+            from src.services.postgres_service import PostgreSQLService
+            self._pg = PostgreSQLService()
+        return self._pg
+
+    # ==================== Graph ====================
+
+    def build(self) -> Dict[str, ETLNode]:
+        """Expand jobs into nodes (one per tenant for per-tenant jobs) and wire dependencies"""
+        tenants = self._tenants
+        if tenants is None and any(job.per_tenant for job in self.jobs):
+            from .tenant_discovery import discover_softbase_tenants
+            tenants = discover_softbase_tenants()
+        tenants = tenants or []
+
+        by_job: Dict[str, List[ETLNode]] = {}
+        for job in self.jobs:
+            nodes = [ETLNode(job, tenant) for tenant in tenants] if job.per_tenant else [ETLNode(job)]
+            by_job[job.name] = nodes
+            for node in nodes:
+                self.nodes[node.key] = node
+
+        def upstream(node: ETLNode, job_name: str) -> List[ETLNode]:
+            if job_name not in by_job:
+                raise ValueError(f"ETL job {node.job.name} depends on unknown job {job_name}")
+            candidates = by_job[job_name]
+            # Per-tenant on per-tenant: the same tenant's node; otherwise every node of the job
+            if node.tenant is not None and candidates and candidates[0].tenant is not None:
+                return [c for c in candidates if c.tenant.schema == node.tenant.schema]
+            return candidates
+
+        for node in self.nodes.values():
+            for job_name in node.job.requires:
+                node.requires.extend(upstream(node, job_name))
+            for job_name in node.job.after:
+                node.after.extend(upstream(node, job_name))
+            for dependency in node.requires + node.after:
+                dependency.dependents.append(node)
+
+        self._check_acyclic()
+        return self.nodes
+
+    def _check_acyclic(self):
+        state: Dict[str, int] = {}
+
+        def visit(node: ETLNode):
+            if state.get(node.key) == 1:
+                raise ValueError(f"ETL dependency cycle through {node.key}")
+            if state.get(node.key) == 2:
+                return
+            state[node.key] = 1
+            for dependent in node.dependents:
+                visit(dependent)
+            state[node.key] = 2
+
+        for node in self.nodes.values():
+            visit(node)
+
+    def critical_path(self) -> Tuple[float, List[str]]:
+        """(seconds, node keys) of the longest chain of measured node durations"""
+        memo: Dict[str, Tuple[float, List[str]]] = {}
+
+        def longest(node: ETLNode) -> Tuple[float, List[str]]:
+            if node.key not in memo:
+                best = (0.0, [])
+                for dependency in node.requires + node.after:
+                    candidate = longest(dependency)
+                    if candidate[0] > best[0]:
+                        best = candidate
+                memo[node.key] = (best[0] + node.duration, best[1] + [node.key])
+            return memo[node.key]
+
+        return max((longest(node) for node in self.nodes.values()), default=(0.0, []), key=lambda item: item[0])
+
+    # ==================== Scheduling ====================
+
+    def _limit(self, resource: str) -> int:
+        if resource not in self._limits:
+            self._limits[resource] = ETL_MAX_PG_WRITERS if resource == PG_RESOURCE else ETL_MAX_PER_SQL_SERVER
+        return self._limits[resource]
+
+    def _try_acquire(self, node: ETLNode) -> bool:
+        # Only the scheduling loop touches the counters, so no lock is needed
+        if any(self._in_use.get(resource, 0) >= self._limit(resource) for resource in node.resources):
+            return False
+        for resource in node.resources:
+            self._in_use[resource] = self._in_use.get(resource, 0) + 1
+        return True
+
+    def _release(self, node: ETLNode):
+        for resource in node.resources:
+            self._in_use[resource] -= 1
+
+    def _is_ready(self, node: ETLNode) -> bool:
+        return (node.status == 'pending' and node.not_before <= time.monotonic()
+                and all(dependency.done for dependency in node.requires + node.after))
+
+    def _skip(self, node: ETLNode, reason: str):
+        node.status = 'skipped'
+        node.error = reason
+        logger.warning(f"  Skipping {node.key}: {reason}")
+        self._log_node(node, None)
+
+    def run(self) -> bool:
+        """Run every node; True if all of them succeeded"""
+        run_started = datetime.now()
+        if not self.nodes:
+            self.build()
+        logger.info(f"ETL DAG: {len(self.nodes)} nodes, {self.max_workers} workers, "
+                    f"{ETL_MAX_PER_SQL_SERVER} per SQL server, {ETL_MAX_PG_WRITERS} Postgres writers")
+
+        app = self._current_app()
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='etl-dag') as executor:
+            while True:
+                for node in self.nodes.values():
+                    if node.status != 'pending':
+                        continue
+                    failed = [dependency.key for dependency in node.requires if dependency.status != 'success'
+                              and dependency.done]
+                    if failed:
+                        self._skip(node, f"upstream failed: {', '.join(failed)}")
+                        continue
+                    if len(running) >= self.max_workers or not self._is_ready(node):
+                        continue
+                    # Stop scheduling if a newer scheduler leader has fenced this run off
+                    check_leadership()
+                    if not self._try_acquire(node):
+                        continue
+                    node.status = 'running'
+                    node.attempts += 1
+                    # Nodes run in a copy of this context so they see the run's fencing token
+                    running[executor.submit(contextvars.copy_context().run, self._run_node, node, app)] = node
+
+                if not running:
+                    waiting = [node for node in self.nodes.values() if node.status == 'pending']
+                    if not waiting:
+                        break
+                    # Only retries in backoff are left
+                    time.sleep(max(min(node.not_before for node in waiting) - time.monotonic(), 0.05))
+                    continue
+
+                retry_at = [node.not_before for node in self.nodes.values()
+                            if node.status == 'pending' and node.not_before > time.monotonic()]
+                timeout = max(min(retry_at) - time.monotonic(), 0.05) if retry_at else None
+                done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    self._release(node)
+                    self._finish(node, future)
+
+        return self._summarize(run_started)
+
+    def _finish(self, node: ETLNode, future):
+        try:
+            success = future.result()
+        except Exception as e:
+            success, node.error = False, str(e)
+        if success:
+            node.status = 'success'
+            node.error = None
+        elif node.attempts <= self.retries:
+            node.status = 'pending'
+            node.not_before = time.monotonic() + self.retry_delay * node.attempts
+            logger.warning(f"  {node.key} failed (attempt {node.attempts}), retrying in "
+                           f"{self.retry_delay * node.attempts:.0f}s: {node.error or 'returned failure'}")
+        else:
+            node.status = 'failed'
+            logger.error(f"  {node.key} failed after {node.attempts} attempts: {node.error or 'returned failure'}")
+
+    # ==================== Node execution ====================
+
+    @staticmethod
+    def _current_app():
+        try:
+            from flask import current_app, has_app_context
+            return current_app._get_current_object() if has_app_context() else None
+        except ImportError:
+            return None
+
+    def _run_node(self, node: ETLNode, app) -> bool:
+        """Worker thread: run one attempt of a node inside the caller's app context"""
+        if app is None:
+            return self._run_attempt(node)
+        with app.app_context():
+            return self._run_attempt(node)
+
+    def _run_attempt(self, node: ETLNode) -> bool:
+        node.started_at = datetime.now()
+        node.error = None
+        log_id = self._log_node(node, 'running')
+        started = time.monotonic()
+        logger.info(f"  >> {node.key} (attempt {node.attempts})")
+        success = False
+        try:
+            if node.tenant is None:
+                success = bool(node.job.run())
+            else:
+                success = bool(node.job.run(node.tenant, node.tenant.get_azure_sql_service()))
+            return success
+        except Exception as e:
+            node.error = str(e)
+            raise
+        finally:
+            node.duration += time.monotonic() - started
+            self._complete_node_log(node, log_id, 'success' if success else 'failed')
+            logger.info(f"  << {node.key}: {'SUCCESS' if success else 'FAILED'} in {time.monotonic() - started:.1f}s")
+
+    # ==================== mart_etl_log ====================
+
+    def _log_node(self, node: ETLNode, status: Optional[str]) -> Optional[int]:
+        """Insert a mart_etl_log row for a node attempt (status None: a skipped node, logged complete)"""
+        now = datetime.now()
+        try:
+            result = self.pg.execute_insert_returning(
+                """
+                INSERT INTO mart_etl_log
+                (job_name, org_id, started_at, completed_at, status, error_message, source_system, target_table)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+                """,
+                (f"{DAG_JOB_PREFIX}:{node.job.name}", node.org_id, node.started_at or now,
+                 None if status else now, status or 'skipped', None if status else node.error,
+                 'orchestrator', node.job.target_table or None)
+            )
+            return result['id'] if result else None
+        except Exception as e:
+            logger.warning(f"  Could not log {node.key} to mart_etl_log: {e}")
+            return None
+
+    def _complete_node_log(self, node: ETLNode, log_id: Optional[int], status: str):
+        if not log_id:
+            return
+        error = node.error if status == 'failed' else None
+        if node.attempts > 1:
+            error = f"attempt {node.attempts}" + (f": {error}" if error else '')
+        try:
+            self.pg.execute_update(
+                "UPDATE mart_etl_log SET completed_at = %s, status = %s, error_message = %s WHERE id = %s",
+                (datetime.now(), status, error, log_id)
+            )
+        except Exception as e:
+            logger.warning(f"  Could not complete mart_etl_log row for {node.key}: {e}")
+
+    def _summarize(self, run_started: datetime) -> bool:
+        counts: Dict[str, int] = {}
+        for node in self.nodes.values():
+            counts[node.status] = counts.get(node.status, 0) + 1
+        path_seconds, path = self.critical_path()
+        elapsed = (datetime.now() - run_started).total_seconds()
+        total = sum(node.duration for node in self.nodes.values())
+
+        logger.info("\n" + "=" * 60)
+        logger.info(f"ETL DAG complete in {elapsed:.0f}s ({total:.0f}s of node time)")
+        for status in ('success', 'failed', 'skipped'):
+            logger.info(f"  {status}: {counts.get(status, 0)}")
+        logger.info(f"  Critical path ({path_seconds:.0f}s): {' -> '.join(path)}")
+        for node in self.nodes.values():
+            if node.status != 'success':
+                logger.info(f"  {node.key}: {node.status.upper()} {node.error or ''}")
+        logger.info("=" * 60)
+
+        failed = [node.key for node in self.nodes.values() if node.status != 'success']
+        try:
+            self.pg.execute_update(
+                """
+                INSERT INTO mart_etl_log
+                (job_name, org_id, started_at, completed_at, status, records_processed, error_message,
+                 source_system, target_table)
+                VALUES (%s, NULL, %s, %s, %s, %s, %s, %s, NULL)
+                """,
+                (DAG_JOB_PREFIX, run_started, datetime.now(), 'failed' if failed else 'success', len(self.nodes),
+                 f"critical path {path_seconds:.0f}s: {' -> '.join(path)}"
+                 + (f"; not successful: {', '.join(failed)}" if failed else ''),
+                 'orchestrator')
+            )
+        except Exception as e:
+            logger.warning(f"Could not log ETL DAG summary: {e}")
+        return not failed
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            node.key: {
+                'status': node.status,
+                'attempts': node.attempts,
+                'duration_seconds': round(node.duration, 2),
+                'error': node.error,
+            }
+            for node in self.nodes.values()
+        }
+
+
+# ==================== Nightly jobs ====================
+
+def _gl_discovery(tenant, azure_sql) -> bool:
+    from .etl_gl_discovery import GLDiscoveryETL
+    from src.services.postgres_service import PostgreSQLService
+    GLDiscoveryETL(tenant.org_id, tenant.schema, azure_sql, PostgreSQLService()).discover_accounts()
+    return True
+
+
+def _sales_daily(tenant, azure_sql) -> bool:
+    from .etl_bennett_sales import SalesDailyETL
+    return SalesDailyETL(org_id=tenant.org_id, schema=tenant.schema, azure_sql=azure_sql, days_back=30).run()
+
+
+def _cash_flow(tenant, azure_sql) -> bool:
+    from .etl_bennett_sales import CashFlowETL
+    return CashFlowETL(org_id=tenant.org_id, schema=tenant.schema, azure_sql=azure_sql, months_back=12).run()
+
+
+def _customer_activity(tenant, azure_sql) -> bool:
+    from .etl_customer_activity import CustomerActivityETL
+    return CustomerActivityETL(org_id=tenant.org_id, schema=tenant.schema, azure_sql=azure_sql).run()
+
+
+def _ceo_dashboard(tenant, azure_sql) -> bool:
+    from .etl_ceo_dashboard import CEODashboardETL
+    # Nightly full rebuild re-aggregates closed months, picking up
+    # back-dated postings the bi-hourly incremental refreshes skip
+    return CEODashboardETL(org_id=tenant.org_id, schema=tenant.schema, azure_sql=azure_sql,
+                           fiscal_year_start_month=tenant.fiscal_year_start_month, full_refresh=True).run()
+
+
+def _department_metrics(tenant, azure_sql) -> bool:
+    from .etl_department_metrics import DepartmentMetricsETL
+    return DepartmentMetricsETL(org_id=tenant.org_id, schema=tenant.schema, azure_sql=azure_sql,
+                                fiscal_year_start_month=tenant.fiscal_year_start_month, full_refresh=True).run()
+
+
+def _snapshots(tenant, azure_sql) -> bool:
+    from .etl_snapshots import SnapshotETL
+    return SnapshotETL(org_id=tenant.org_id, schema=tenant.schema, azure_sql=azure_sql).run()
+
+
+def _vital() -> bool:
+    from .etl_vital import run_vital_etl
+    return run_vital_etl()
+
+
+NIGHTLY_JOBS: List[ETLJob] = [
+    ETLJob('gl_discovery', _gl_discovery, target_table='tenant_gl_accounts'),
+    ETLJob('sales_daily', _sales_daily, target_table='mart_sales_daily'),
+    ETLJob('cash_flow', _cash_flow, target_table='mart_cash_flow'),
+    ETLJob('customer_activity', _customer_activity, target_table='mart_customer_activity'),
+    # Metrics wait for the tenant's account discovery, but a failed discovery
+    # still leaves the previous mappings in place, so it doesn't block them
+    ETLJob('ceo_dashboard', _ceo_dashboard, after=('gl_discovery',), target_table='mart_ceo_metrics'),
+    ETLJob('department_metrics', _department_metrics, after=('gl_discovery',),
+           target_table='mart_department_metrics'),
+    ETLJob('snapshots', _snapshots, target_table='snapshot_store'),
+    ETLJob('vital', _vital, per_tenant=False),
+]
@@ -40,35 +40,19 @@ def run_department_metrics_refresh():
 
 
 def run_all_etl():
-    """Run all ETL jobs for all organizations"""
-    from .etl_bennett_sales import run_bennett_etl
-    from .etl_customer_activity import run_customer_activity_etl
-    from .etl_ceo_dashboard import run_ceo_dashboard_etl
-    from .etl_department_metrics import run_department_metrics_etl
-    from .etl_vital import run_vital_etl
+    """
+    Run all ETL jobs for all organizations.
+    Jobs x tenants run as a dependency graph with per-server concurrency
+    limits (see orchestrator.py), so the run takes about as long as its
+    longest chain rather than the sum of every job.
+    """
+    from .orchestrator import ETLOrchestrator, NIGHTLY_JOBS
     
     logger.info("=" * 60)
     logger.info(f"AIOP ETL Run Started: {datetime.now().isoformat()}")
     logger.info("=" * 60)
     
-    results = {
-        'bennett': run_bennett_etl(),
-        'customer_activity': run_customer_activity_etl(),
-        'ceo_dashboard': run_ceo_dashboard_etl(),
-        'department_metrics': run_department_metrics_etl(),
-        'vital': run_vital_etl()
-    }
-    
-    logger.info("\n" + "=" * 60)
-    logger.info("AIOP ETL Run Complete")
-    logger.info(f"  Bennett: {'SUCCESS' if results['bennett'] else 'FAILED'}")
-    logger.info(f"  Customer Activity: {'SUCCESS' if results['customer_activity'] else 'FAILED'}")
-    logger.info(f"  CEO Dashboard: {'SUCCESS' if results['ceo_dashboard'] else 'FAILED'}")
-    logger.info(f"  Department Metrics: {'SUCCESS' if results['department_metrics'] else 'FAILED'}")
-    logger.info(f"  VITAL: {'SUCCESS' if results['vital'] else 'FAILED'}")
-    logger.info("=" * 60)
-    
-    return all(results.values())
+    return ETLOrchestrator(NIGHTLY_JOBS).run()
 
 
 def run_hubspot_sync():
@@ -242,12 +226,14 @@ def setup_scheduler():
     try:
         from apscheduler.schedulers.background import BackgroundScheduler
         from apscheduler.triggers.cron import CronTrigger
+        from src.services.scheduler_coordinator import leader_only
         
+        # Every worker schedules the jobs, but only the elected leader runs them
         scheduler = BackgroundScheduler()
         
         # Run all ETL jobs daily at 2 AM
         scheduler.add_job(
-            run_all_etl,
+            leader_only('daily_etl', run_all_etl),
             CronTrigger(hour=2, minute=0),
             id='daily_etl',
             name='Daily ETL Run',
@@ -256,7 +242,7 @@ def setup_scheduler():
         
         # Run HubSpot sync weekly on Monday at 3 AM
         scheduler.add_job(
-            run_hubspot_sync,
+            leader_only('weekly_hubspot_sync', run_hubspot_sync),
             CronTrigger(day_of_week='mon', hour=3, minute=0),
             id='weekly_hubspot_sync',
             name='Weekly HubSpot Population Sync',
@@ -265,7 +251,7 @@ def setup_scheduler():
         
         # Run High Fives sync daily at 6 AM
         scheduler.add_job(
-            run_high_fives_sync,
+            leader_only('daily_high_fives_sync', run_high_fives_sync),
             CronTrigger(hour=6, minute=0),
             id='daily_high_fives_sync',
             name='Daily High Fives Recognition Sync',
@@ -274,7 +260,7 @@ def setup_scheduler():
         
         # Run CEO Dashboard ETL every 2 hours during business hours (6 AM - 8 PM)
         scheduler.add_job(
-            run_ceo_dashboard_refresh,
+            leader_only('ceo_dashboard_refresh', run_ceo_dashboard_refresh),
             CronTrigger(hour='6,8,10,12,14,16,18,20', minute=0),
             id='ceo_dashboard_refresh',
             name='CEO Dashboard ETL (bi-hourly)',
@@ -284,7 +270,7 @@ def setup_scheduler():
         # Run Department Metrics ETL every 2 hours during business hours (6 AM - 8 PM)
         # Offset by 5 minutes from CEO Dashboard to spread load
         scheduler.add_job(
-            run_department_metrics_refresh,
+            leader_only('department_metrics_refresh', run_department_metrics_refresh),
             CronTrigger(hour='6,8,10,12,14,16,18,20', minute=5),
             id='department_metrics_refresh',
             name='Department Metrics ETL (bi-hourly)',
@@ -365,9 +351,14 @@ def register_etl_routes(app):
             
             results = pg.execute_query(query)
             
+            from src.services.scheduler_coordinator import get_scheduler_coordinator
+            from src.services.snapshot_store import get_snapshot_store
+            
             return jsonify({
                 'success': True,
-                'jobs': [dict(r) for r in results]
+                'jobs': [dict(r) for r in results],
+                'scheduler': get_scheduler_coordinator().get_status(),
+                'snapshots': get_snapshot_store().get_stats()
             })
         except Exception as e:
             return jsonify({
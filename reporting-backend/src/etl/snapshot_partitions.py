@@ -0,0 +1,101 @@
+"""
+Snapshot Mart Partitions
+Helpers for mart tables that keep one full snapshot per org per day
+(mart_customer_activity), partitioned by org and snapshot_date
+(see src/migrations/create_mart_latest_snapshot.sql).
+
+- ensure_snapshot_partition(): create today's partition before loading into it
+- publish_latest_snapshot(): point mart_latest_snapshot at the new snapshot,
+  called inside the load transaction so the switch is atomic
+- drop_expired_snapshot_partitions(): retention - drop day partitions older
+  than MART_SNAPSHOT_RETENTION_DAYS (never the one the pointer references)
+
+Readers join on the pointer rather than looking for MAX(snapshot_date), so
+their cost doesn't grow with history:
+
+    FROM mart_customer_activity a
+    JOIN mart_latest_snapshot latest ON latest.org_id = a.org_id
+        AND latest.table_name = 'mart_customer_activity'
+        AND latest.snapshot_date = a.snapshot_date
+"""
+
+import os
+import re
+import logging
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+MART_SNAPSHOT_RETENTION_DAYS = int(os.environ.get('MART_SNAPSHOT_RETENTION_DAYS', '90'))
+
+
+def ensure_snapshot_partition(pg, table: str, org_id: int, snapshot_date: date) -> str:
+    """
+    Create the org's partition for snapshot_date if it doesn't exist, in its own
+    short transaction (creating a partition locks the parent table). Returns its name.
+    """
+    with pg.get_connection() as conn:
+        if not conn:
+            raise RuntimeError("PostgreSQL connection pool not initialized")
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT mart_ensure_snapshot_partition(%s, %s, %s) as partition_name",
+                           (table, org_id, snapshot_date))
+            return cursor.fetchone()['partition_name']
+
+
+def publish_latest_snapshot(cursor, table: str, org_id: int, snapshot_date: date, row_count: int):
+    """Point readers at snapshot_date. Run on the load's cursor so it commits with the data."""
+    cursor.execute("""
+        INSERT INTO mart_latest_snapshot (org_id, table_name, snapshot_date, row_count, loaded_at)
+        VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+        ON CONFLICT (org_id, table_name) DO UPDATE
+        SET snapshot_date = EXCLUDED.snapshot_date,
+            row_count = EXCLUDED.row_count,
+            loaded_at = EXCLUDED.loaded_at
+    """, (org_id, table, snapshot_date, row_count))
+
+
+def latest_snapshot_date(pg, table: str, org_id: int) -> Optional[date]:
+    """The snapshot readers currently see for an org, or None before the first load"""
+    result = pg.execute_query(
+        "SELECT snapshot_date FROM mart_latest_snapshot WHERE org_id = %s AND table_name = %s",
+        (org_id, table)
+    )
+    return result[0]['snapshot_date'] if result else None
+
+
+def drop_expired_snapshot_partitions(pg, table: str, org_id: int,
+                                     retention_days: int = MART_SNAPSHOT_RETENTION_DAYS) -> List[str]:
+    """
+    Drop the org's day partitions older than retention_days. The partition the
+    pointer references is always kept. Returns the dropped partition names.
+    """
+    org_partition = f"{table}_o{int(org_id)}"
+    pattern = re.compile(rf"^{re.escape(org_partition)}_d(\d{{8}})$")
+    cutoff = datetime.now().date() - timedelta(days=retention_days)
+    current = latest_snapshot_date(pg, table, org_id)
+
+    partitions = pg.execute_query("""
+        SELECT child.relname as partition_name
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = %s
+    """, (org_partition,))
+
+    dropped = []
+    for row in partitions or []:
+        match = pattern.match(row['partition_name'])
+        if not match:
+            continue
+        snapshot_date = datetime.strptime(match.group(1), '%Y%m%d').date()
+        if snapshot_date >= cutoff or snapshot_date == current:
+            continue
+        # Names come from pg_class and match the pattern above, so they are safe to interpolate
+        pg.execute_update(f'DROP TABLE IF EXISTS "{row["partition_name"]}"')
+        dropped.append(row['partition_name'])
+
+    if dropped:
+        logger.info(f"  Dropped {len(dropped)} {table} partitions older than {cutoff} for org_id={org_id}")
+    return dropped
@@ -142,6 +142,7 @@ from src.services.forecast_scheduler import init_forecast_scheduler
 from src.services.cache_warmer import init_cache_warmer
 from src.init_rbac import initialize_all_rbac
 from src.services.cache_service import cache_service
+import gzip
 import hashlib
 import json as json_module
 
@@ -190,18 +191,25 @@ CACHE_SKIP_CONTAINS = (
     'database_query',       # Ad-hoc queries
 )
 
-# Default TTL per route pattern (seconds)
+# Default TTL per route pattern (seconds).
+# Values are either a TTL or a (TTL, stale TTL) tuple. During the stale window
+# the cached response is served immediately with X-Cache: STALE while one
+# background request refreshes it (stale-while-revalidate).
 CACHE_TTL_MAP = {
-    '/api/reports/dashboard': 3600,      # Dashboard: 1 hour
-    '/api/reports/cashflow': 1800,       # Cashflow: 30 min
-    '/api/reports/pl': 1800,             # P&L: 30 min
-    '/api/reports/parts': 1800,          # Parts inventory: 30 min
-    '/api/reports/department': 1800,     # Department reports: 30 min
-    '/api/vital/': 900,                  # VITAL endpoints: 15 min
-    '/api/reports/': 900,                # Other reports: 15 min
-    '/api/': 600,                        # Everything else: 10 min
+    '/api/reports/dashboard': (3600, 3600),   # Dashboard: 1 hour, then 1 hour stale
+    '/api/reports/cashflow': (1800, 1800),    # Cashflow: 30 min, then 30 min stale
+    '/api/reports/pl': (1800, 1800),          # P&L: 30 min, then 30 min stale
+    '/api/reports/parts': (1800, 900),        # Parts inventory: 30 min, then 15 min stale
+    '/api/reports/department': (1800, 1800),  # Department reports: 30 min, then 30 min stale
+    '/api/vital/': (900, 900),                # VITAL endpoints: 15 min, then 15 min stale
+    '/api/reports/': (900, 900),              # Other reports: 15 min, then 15 min stale
+    '/api/': 600,                             # Everything else: 10 min, no stale window
 }
 
+# WSGI environ key set on the internal request that refreshes a stale cache entry.
+# Not a header: clients can't set non-HTTP_ environ keys, so they can't force a cache bypass.
+CACHE_REVALIDATE_ENVIRON = 'aiop.cache_revalidate'
+
 def _should_cache_request():
     """Determine if the current request should be cached"""
     # Only cache GET requests
@@ -247,12 +255,63 @@ def _get_cache_key():
     key_hash = hashlib.md5(raw_key.encode()).hexdigest()
     return f"api_cache:{key_hash}"
 
+def _get_cache_tags():
+    """Invalidation tags for the current request's cached response"""
+    tags = ['report:api']
+    org = getattr(g, 'current_organization', None)
+    schema = getattr(org, 'database_schema', None) if org else None
+    if schema:
+        tags.append(f"tenant:{schema}")
+    if request.path.startswith('/api/reports/dashboard'):
+        tags.append('report:dashboard')
+    return tags
+
 def _get_cache_ttl():
-    """Get the TTL for the current request based on route pattern"""
+    """Get the (TTL, stale TTL) for the current request based on route pattern"""
     for pattern, ttl in CACHE_TTL_MAP.items():
         if request.path.startswith(pattern):
-            return ttl
-    return 600  # Default: 10 minutes
+            if isinstance(ttl, tuple):
+                return ttl
+            return ttl, 0
+    return 600, 0  # Default: 10 minutes, no stale window
+
+def _schedule_cache_revalidation(cache_key):
+    """Replay the current GET request in the background so after_request re-caches a fresh response"""
+    path = request.path
+    query_string = request.query_string
+    headers = {}
+    if request.headers.get('Authorization'):
+        headers['Authorization'] = request.headers['Authorization']
+
+    def refresh():
+        with app.test_client() as client:
+            client.get(path, query_string=query_string, headers=headers,
+                       environ_base={CACHE_REVALIDATE_ENVIRON: True})
+
+    cache_service.schedule_refresh(cache_key, refresh)
+
+def _apply_encoded_body(response, entry):
+    """
+    Fill a response from a pre-encoded cache entry without re-serializing it.
+    Sends 304 when If-None-Match matches the entry's ETag, otherwise the
+    brotli/gzip body as stored for clients that accept it.
+    """
+    response.set_etag(entry['etag'])
+    response.vary.add('Accept-Encoding')
+    if request.if_none_match.contains(entry['etag']):
+        response.status_code = 304
+        response.set_data(b'')
+        return response
+
+    if 'br' in entry and request.accept_encodings['br']:
+        response.set_data(entry['br'])
+        response.headers['Content-Encoding'] = 'br'
+    elif request.accept_encodings['gzip']:
+        response.set_data(entry['gzip'])
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response.set_data(gzip.decompress(entry['gzip']))
+    return response
 
 # NOTE: Cache check happens INSIDE set_tenant_context (below) AFTER tenant is resolved,
 # so cache keys correctly include the tenant schema.
@@ -270,20 +329,27 @@ def after_request(response):
     response.headers['Access-Control-Allow-Credentials'] = 'true'
     response.headers['Access-Control-Max-Age'] = '86400'
     
-    # AUTO-CACHE: Store successful GET API responses in Redis
+    # AUTO-CACHE: Store successful GET API responses in Redis as pre-encoded bytes
     if (
         _should_cache_request()
         and response.status_code == 200
         and response.content_type
         and 'application/json' in response.content_type
-        and response.headers.get('X-Cache') != 'HIT'  # Don't re-cache cached responses
+        and not response.direct_passthrough
+        and 'Content-Encoding' not in response.headers
+        and 'no-store' not in response.headers.get('Cache-Control', '')  # Degraded or otherwise uncacheable
+        and response.headers.get('X-Cache') not in ('HIT', 'STALE')  # Don't re-cache cached responses
     ):
         try:
             cache_key = _get_cache_key()
-            ttl = _get_cache_ttl()
-            response_data = response.get_json()
-            if response_data is not None:
-                cache_service.set(cache_key, response_data, ttl_seconds=ttl)
+            ttl, stale_ttl = _get_cache_ttl()
+            body = response.get_data()
+            if body:
+                entry = cache_service.set_response(
+                    cache_key, body, ttl_seconds=ttl, stale_ttl_seconds=stale_ttl, tags=_get_cache_tags()
+                )
+                if entry:
+                    _apply_encoded_body(response, entry)
                 response.headers['X-Cache'] = 'MISS'
                 response.headers['X-Cache-TTL'] = str(ttl)
         except Exception as e:
@@ -318,14 +384,21 @@ def set_tenant_context():
         pass  # Not authenticated or invalid token - let endpoint handle it
     
     # Step 2: Check Redis cache AFTER tenant is resolved (so cache key includes tenant)
-    if _should_cache_request() and cache_service.enabled:
+    # Background revalidation requests skip the read so they hit the endpoint.
+    if (
+        _should_cache_request()
+        and cache_service.enabled
+        and not request.environ.get(CACHE_REVALIDATE_ENVIRON)
+    ):
         cache_key = _get_cache_key()
         try:
-            cached = cache_service.get(cache_key)
+            cached, is_stale = cache_service.get_response(cache_key)
             if cached is not None:
-                response = app.make_response(jsonify(cached))
-                response.headers['X-Cache'] = 'HIT'
+                response = _apply_encoded_body(app.response_class(mimetype='application/json'), cached)
+                response.headers['X-Cache'] = 'STALE' if is_stale else 'HIT'
                 response.headers['X-Cache-Key'] = cache_key[:20] + '...'
+                if is_stale:
+                    _schedule_cache_revalidation(cache_key)
                 return response
         except Exception as e:
             print(f"[AutoCache] Cache check error: {e}")
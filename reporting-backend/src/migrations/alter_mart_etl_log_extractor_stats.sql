@@ -0,0 +1,7 @@
+-- mart_etl_log.extractor_stats: per-extractor timings for concurrent ETL extraction
+-- {"monthly_sales": {"status": "success", "seconds": 1.42, "rows": 25}, ...}
+-- Failed extractors also carry an "error" message.
+
+ALTER TABLE mart_etl_log ADD COLUMN IF NOT EXISTS extractor_stats JSONB;
+
+COMMENT ON COLUMN mart_etl_log.extractor_stats IS 'Per-extractor status, seconds and row counts of the run (BaseETL.run_extractors)';
@@ -1,10 +1,16 @@
 -- ============================================================
 -- Mart Customer Activity Table
 -- Tracks customer activity for churn analysis
+--
+-- Partitioned by org (LIST) and then snapshot_date (RANGE, one partition per
+-- day), created by mart_ensure_snapshot_partition() - run
+-- create_mart_latest_snapshot.sql first. Readers join mart_latest_snapshot
+-- for the current snapshot; the ETL drops partitions past the retention period.
+-- Existing unpartitioned installs: see partition_mart_customer_activity.sql.
 -- ============================================================
 
 CREATE TABLE IF NOT EXISTS mart_customer_activity (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     org_id INTEGER NOT NULL,
     
     -- Customer Identification
@@ -50,12 +56,12 @@ CREATE TABLE IF NOT EXISTS mart_customer_activity (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     
+    PRIMARY KEY (id, org_id, snapshot_date),
     UNIQUE(org_id, customer_name, snapshot_date)
-);
+) PARTITION BY LIST (org_id);
 
--- Indexes for fast queries
+-- Indexes for fast queries (created on every partition; org/date need none, partitions prune them)
 CREATE INDEX IF NOT EXISTS idx_mart_customer_org_status ON mart_customer_activity(org_id, activity_status);
-CREATE INDEX IF NOT EXISTS idx_mart_customer_org_date ON mart_customer_activity(org_id, snapshot_date);
 CREATE INDEX IF NOT EXISTS idx_mart_customer_name ON mart_customer_activity(org_id, customer_name);
 CREATE INDEX IF NOT EXISTS idx_mart_customer_last_invoice ON mart_customer_activity(org_id, last_invoice_date);
 
@@ -0,0 +1,21 @@
+-- mart_etl_watermark: High-water marks for incremental ETL extraction
+-- Months before closed_through are frozen; each run only re-aggregates the
+-- open period and appends newly closed months to frozen_rows.
+
+CREATE TABLE IF NOT EXISTS mart_etl_watermark (
+    org_id INTEGER NOT NULL,
+    job_name VARCHAR(100) NOT NULL,
+    metric VARCHAR(100) NOT NULL,
+    
+    -- First day of the oldest month still re-aggregated on every run
+    closed_through DATE NOT NULL,
+    
+    -- Frozen per-month (or per-key) rows for everything before closed_through
+    frozen_rows JSONB,
+    
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    
+    PRIMARY KEY (org_id, job_name, metric)
+);
+
+COMMENT ON TABLE mart_etl_watermark IS 'Incremental ETL state: closed months are frozen here and reused by the bi-hourly refreshes. A full refresh rewrites it.';
@@ -0,0 +1,39 @@
+-- mart_latest_snapshot: the snapshot readers should use, per org and mart table
+-- Snapshot marts (e.g. mart_customer_activity) keep one partition per org and
+-- snapshot_date. The ETL points this row at a new snapshot in the same
+-- transaction that loads it, so readers join on the pointer instead of
+-- scanning for MAX(snapshot_date) and never see a half-loaded snapshot.
+
+CREATE TABLE IF NOT EXISTS mart_latest_snapshot (
+    org_id INTEGER NOT NULL,
+    table_name VARCHAR(100) NOT NULL,
+    snapshot_date DATE NOT NULL,
+    row_count INTEGER DEFAULT 0,
+    loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (org_id, table_name)
+);
+
+COMMENT ON TABLE mart_latest_snapshot IS 'Latest successfully loaded snapshot per org and snapshot mart table. Updated by the ETL in the load transaction.';
+
+-- Create (if missing) the partition holding one org's snapshot for one day:
+--   {table}_o{org_id}              PARTITION OF {table} FOR VALUES IN (org_id), by RANGE (snapshot_date)
+--   {table}_o{org_id}_d{YYYYMMDD}  PARTITION OF the org partition for that day
+-- Returns the day partition's name.
+CREATE OR REPLACE FUNCTION mart_ensure_snapshot_partition(p_table TEXT, p_org_id INTEGER, p_snapshot_date DATE)
+RETURNS TEXT AS $$
+DECLARE
+    org_partition TEXT := format('%s_o%s', p_table, p_org_id);
+    day_partition TEXT := format('%s_o%s_d%s', p_table, p_org_id, to_char(p_snapshot_date, 'YYYYMMDD'));
+BEGIN
+    IF to_regclass(org_partition) IS NULL THEN
+        EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES IN (%s) PARTITION BY RANGE (snapshot_date)',
+                       org_partition, p_table, p_org_id);
+    END IF;
+    IF to_regclass(day_partition) IS NULL THEN
+        EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                       day_partition, org_partition, p_snapshot_date, p_snapshot_date + 1);
+    END IF;
+    RETURN day_partition;
+END;
+$$ LANGUAGE plpgsql;
@@ -374,7 +374,10 @@ CREATE TABLE IF NOT EXISTS mart_etl_log (
     
     -- Metadata
     source_system VARCHAR(50),
-    target_table VARCHAR(100)
+    target_table VARCHAR(100),
+    
+    -- Per-extractor {status, seconds, rows, error} for concurrent extraction
+    extractor_stats JSONB
 );
 
 CREATE INDEX IF NOT EXISTS idx_mart_etl_job ON mart_etl_log(job_name, started_at DESC);
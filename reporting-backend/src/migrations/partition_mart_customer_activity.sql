@@ -0,0 +1,66 @@
+-- ============================================================
+-- Convert mart_customer_activity to a partitioned snapshot table
+-- For databases created with the original (unpartitioned) table.
+-- Run create_mart_latest_snapshot.sql first.
+--
+-- Renames the old table to mart_customer_activity_unpartitioned, creates the
+-- partitioned table, copies the last 90 days of snapshots
+-- (MART_SNAPSHOT_RETENTION_DAYS default) into per org/day partitions and
+-- points mart_latest_snapshot at each org's newest snapshot.
+-- Drop mart_customer_activity_unpartitioned once the churn pages check out.
+-- ============================================================
+
+BEGIN;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'mart_customer_activity' AND relkind = 'r') THEN
+        ALTER TABLE mart_customer_activity RENAME TO mart_customer_activity_unpartitioned;
+        ALTER INDEX IF EXISTS idx_mart_customer_org_status RENAME TO idx_mart_customer_unpartitioned_org_status;
+        ALTER INDEX IF EXISTS idx_mart_customer_org_date RENAME TO idx_mart_customer_unpartitioned_org_date;
+        ALTER INDEX IF EXISTS idx_mart_customer_name RENAME TO idx_mart_customer_unpartitioned_name;
+        ALTER INDEX IF EXISTS idx_mart_customer_last_invoice RENAME TO idx_mart_customer_unpartitioned_last_invoice;
+    END IF;
+END $$;
+
+-- Same columns and defaults (id keeps drawing from the existing sequence)
+CREATE TABLE IF NOT EXISTS mart_customer_activity (
+    LIKE mart_customer_activity_unpartitioned INCLUDING DEFAULTS,
+    PRIMARY KEY (id, org_id, snapshot_date),
+    UNIQUE (org_id, customer_name, snapshot_date)
+) PARTITION BY LIST (org_id);
+
+-- Keep the sequence when the old table is dropped
+ALTER SEQUENCE IF EXISTS mart_customer_activity_id_seq OWNED BY mart_customer_activity.id;
+
+CREATE INDEX IF NOT EXISTS idx_mart_customer_org_status ON mart_customer_activity(org_id, activity_status);
+CREATE INDEX IF NOT EXISTS idx_mart_customer_name ON mart_customer_activity(org_id, customer_name);
+CREATE INDEX IF NOT EXISTS idx_mart_customer_last_invoice ON mart_customer_activity(org_id, last_invoice_date);
+
+DO $$
+DECLARE
+    snapshot RECORD;
+BEGIN
+    FOR snapshot IN
+        SELECT DISTINCT org_id, snapshot_date
+        FROM mart_customer_activity_unpartitioned
+        WHERE snapshot_date >= CURRENT_DATE - 90
+    LOOP
+        PERFORM mart_ensure_snapshot_partition('mart_customer_activity', snapshot.org_id, snapshot.snapshot_date);
+    END LOOP;
+END $$;
+
+INSERT INTO mart_customer_activity
+SELECT * FROM mart_customer_activity_unpartitioned
+WHERE snapshot_date >= CURRENT_DATE - 90
+ON CONFLICT DO NOTHING;
+
+INSERT INTO mart_latest_snapshot (org_id, table_name, snapshot_date, row_count)
+SELECT org_id, 'mart_customer_activity', snapshot_date, COUNT(*)
+FROM mart_customer_activity a
+WHERE snapshot_date = (SELECT MAX(snapshot_date) FROM mart_customer_activity WHERE org_id = a.org_id)
+GROUP BY org_id, snapshot_date
+ON CONFLICT (org_id, table_name) DO UPDATE
+SET snapshot_date = EXCLUDED.snapshot_date, row_count = EXCLUDED.row_count, loaded_at = CURRENT_TIMESTAMP;
+
+COMMIT;
@@ -1,17 +1,14 @@
 """
 Accounting inventory report endpoint - GL Based
 """
-from flask import Blueprint, jsonify, send_file
+from flask import Blueprint, jsonify
 from flask_jwt_extended import jwt_required
 from src.utils.tenant_utils import get_tenant_db, get_tenant_schema
 from decimal import Decimal, ROUND_HALF_UP
 import traceback
 import logging
 from datetime import datetime, date
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
-import io
+from src.services.excel_export import StreamingWorkbook, xlsx_response
 
 from flask_jwt_extended import get_jwt_identity
 from src.models.user import User
@@ -601,7 +598,6 @@ def export_inventory_excel():
         new_equipment_result = db.execute_query(new_equipment_query)
         other_accounts = db.execute_query(other_accounts_query)
         ytd_depreciation_result = db.execute_query(ytd_depreciation_query)
-        all_equipment = db.execute_query(all_equipment_query)
         
         # Process results
         allied_gl_balance = format_currency(allied_result[0]['Balance']) if allied_result and allied_result[0]['Balance'] else Decimal('0.00')
@@ -653,33 +649,61 @@ def export_inventory_excel():
             else:
                 return 'used'
         
-        # Categorize all equipment
-        categories = {
-            'rental': [],
-            'new': [],
-            'used': [],
-            'batteries_chargers': [],
-            'allied': []
+        category_definitions = {
+            'allied': {'name': 'Allied Equipment', 'gl_balance': float(allied_gl_balance)},
+            'new': {'name': 'New Equipment', 'gl_balance': float(new_equipment_gl_balance)},
+            'rental': {'name': 'Rental Equipment', 'gl_balance': float(rental_net_book_value)},
+            'used': {'name': 'Used Equipment', 'gl_balance': float(used_gl_amount)},
+            'batteries_chargers': {'name': 'Batteries & Chargers', 'gl_balance': float(batteries_gl_amount)}
         }
         
-        for item in all_equipment:
-            category = categorize_equipment_fixed(item)
-            categories[category].append(item)
-        
-        # Create Excel workbook
-        wb = Workbook()
+        # Write-only workbook: equipment rows are streamed from the cursor straight
+        # into the category sheets, so memory stays flat however many units there are
+        book = StreamingWorkbook()
         
-        # Define styles
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        bold_font = Font(bold=True)
-        currency_format = '"$"#,##0.00'
-        border = Border(left=Side(style='thin'), right=Side(style='thin'), 
-                       top=Side(style='thin'), bottom=Side(style='thin'))
+        # Summary sheet comes first in the workbook but is filled in after the
+        # detail sheets, once the unit counts are known
+        ws_summary = book.create_sheet("Summary", column_widths={'A': 30, 'B': 22, 'C': 18, 'D': 18})
         
-        # Summary Sheet
-        ws_summary = wb.active
-        ws_summary.title = "Summary"
+        detail_sheets = {}
+        for category_key, category_info in category_definitions.items():
+            if category_key == 'rental':
+                headers = ["Control Number", "Make/Model", "Status", "Location", "Book Value", "GL Account Balance", "Net Book Value"]
+                widths = {'A': 20, 'B': 40, 'C': 12, 'D': 40, 'E': 18, 'F': 20, 'G': 18}
+            else:
+                headers = ["Control Number", "Make/Model", "Status", "Book Value", "GL Account Balance"]
+                widths = {'A': 20, 'B': 40, 'C': 12, 'D': 18, 'E': 20}
+            ws = book.create_sheet(category_info['name'], column_widths=widths)
+            ws.append(headers, style='table_header')
+            detail_sheets[category_key] = ws
+        
+        rental_styles = [None, None, None, None, 'currency', 'currency', 'currency']
+        other_styles = [None, None, None, 'currency', 'currency']
+        unit_counts = {category_key: 0 for category_key in category_definitions}
+        
+        for item in db.iter_query(all_equipment_query):
+            category_key = categorize_equipment_fixed(item)
+            unit_counts[category_key] += 1
+            book_value = float(item['book_value']) if item['book_value'] else 0.0
+            
+            if category_key == 'rental':
+                detail_sheets['rental'].append([
+                    item['serial_number'],
+                    f"{item['Make']} {item['Model']}",
+                    item['current_status'],
+                    f"{item.get('location_state', '')} - {item.get('customer_name', '')}".strip(' -'),
+                    book_value,
+                    float(rental_net_book_value),
+                    float(rental_net_book_value)
+                ], style=rental_styles)
+            else:
+                detail_sheets[category_key].append([
+                    item['serial_number'],
+                    f"{item['Make']} {item['Model']}",
+                    item['current_status'],
+                    book_value,
+                    category_definitions[category_key]['gl_balance']
+                ], style=other_styles)
         
         # Summary headers
         ws_summary.append(["Year-End Inventory Report Summary"])
@@ -687,151 +711,35 @@ def export_inventory_excel():
         ws_summary.append(["Period:", "March 1, 2025 - October 31, 2025"])
         ws_summary.append([])  # Empty row
         
-        # Category summary
-        ws_summary.append(["Category", "Units", "GL Account", "Total Value"])
+        # Category summary (the header row and first four categories use the header style)
+        ws_summary.append(["Category", "Units", "GL Account", "Total Value"], style='table_header')
         
         summary_data = [
-            ["Allied Equipment", len(categories['allied']), "131300", float(allied_gl_balance)],
-            ["New Equipment", len(categories['new']), "131000", float(new_equipment_gl_balance)],
-            ["Rental Equipment", len(categories['rental']), "183000/193000", float(rental_net_book_value)],
-            ["Used Equipment", len(categories['used']), "131200 (partial)", float(used_gl_amount)],
-            ["Batteries & Chargers", len(categories['batteries_chargers']), "131200 (partial)", float(batteries_gl_amount)]
+            ["Allied Equipment", unit_counts['allied'], "131300", float(allied_gl_balance)],
+            ["New Equipment", unit_counts['new'], "131000", float(new_equipment_gl_balance)],
+            ["Rental Equipment", unit_counts['rental'], "183000/193000", float(rental_net_book_value)],
+            ["Used Equipment", unit_counts['used'], "131200 (partial)", float(used_gl_amount)],
+            ["Batteries & Chargers", unit_counts['batteries_chargers'], "131200 (partial)", float(batteries_gl_amount)]
         ]
         
-        for row_data in summary_data:
-            ws_summary.append(row_data)
+        header_row_styles = ['table_header', 'table_header', 'table_header', 'table_header_currency']
+        for idx, row_data in enumerate(summary_data):
+            ws_summary.append(row_data, style=header_row_styles if idx < 4 else [None, None, None, 'currency'])
         
         ws_summary.append([])  # Empty row
         
         # Totals
-        total_units = sum(len(cat) for cat in categories.values())
+        total_units = sum(unit_counts.values())
         total_value = float(allied_gl_balance + new_equipment_gl_balance + rental_net_book_value + used_gl_amount + batteries_gl_amount)
         
-        ws_summary.append(["TOTALS", total_units, "", total_value])
-        ws_summary.append(["YTD Depreciation Expense", "", "", float(ytd_depreciation)])
-        
-        # Style the summary sheet
-        for row in range(5, 10):  # Header row for categories
-            for col in range(1, 5):
-                cell = ws_summary.cell(row=row, column=col)
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.border = border
-        
-        # Format currency columns
-        for row in range(6, ws_summary.max_row + 1):
-            ws_summary.cell(row=row, column=4).number_format = currency_format
-        
-        # Auto-size columns
-        for column in ws_summary.columns:
-            max_length = 0
-            column_letter = get_column_letter(column[0].column)
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 30)
-            ws_summary.column_dimensions[column_letter].width = adjusted_width
-        
-        # Create detail sheets for each category
-        category_definitions = {
-            'allied': {'name': 'Allied Equipment', 'data': categories['allied']},
-            'new': {'name': 'New Equipment', 'data': categories['new']},
-            'rental': {'name': 'Rental Equipment', 'data': categories['rental']},
-            'used': {'name': 'Used Equipment', 'data': categories['used']},
-            'batteries_chargers': {'name': 'Batteries & Chargers', 'data': categories['batteries_chargers']}
-        }
-        
-        for category_key, category_info in category_definitions.items():
-            ws = wb.create_sheet(title=category_info['name'])
-            
-            # Headers
-            if category_key == 'rental':
-                headers = ["Control Number", "Make/Model", "Status", "Location", "Book Value", "GL Account Balance", "Net Book Value"]
-            else:
-                headers = ["Control Number", "Make/Model", "Status", "Book Value", "GL Account Balance"]
-            
-            ws.append(headers)
-            
-            # Style headers
-            for col in range(1, len(headers) + 1):
-                cell = ws.cell(row=1, column=col)
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.border = border
-            
-            # Add data
-            for item in category_info['data']:
-                if category_key == 'rental':
-                    row_data = [
-                        item['serial_number'],
-                        f"{item['Make']} {item['Model']}",
-                        item['current_status'],
-                        f"{item.get('location_state', '')} - {item.get('customer_name', '')}".strip(' -'),
-                        float(item['book_value']) if item['book_value'] else 0.0,
-                        float(rental_net_book_value),
-                        float(rental_net_book_value)
-                    ]
-                else:
-                    # Get the appropriate GL balance
-                    if category_key == 'allied':
-                        gl_balance = float(allied_gl_balance)
-                    elif category_key == 'new':
-                        gl_balance = float(new_equipment_gl_balance)
-                    elif category_key == 'used':
-                        gl_balance = float(used_gl_amount)
-                    elif category_key == 'batteries_chargers':
-                        gl_balance = float(batteries_gl_amount)
-                    else:
-                        gl_balance = 0.0
-                    
-                    row_data = [
-                        item['serial_number'],
-                        f"{item['Make']} {item['Model']}",
-                        item['current_status'],
-                        float(item['book_value']) if item['book_value'] else 0.0,
-                        gl_balance
-                    ]
-                
-                ws.append(row_data)
-            
-            # Format currency columns
-            currency_cols = [5, 6, 7] if category_key == 'rental' else [4, 5]
-            for row in range(2, ws.max_row + 1):
-                for col in currency_cols:
-                    if col <= len(headers):
-                        ws.cell(row=row, column=col).number_format = currency_format
-            
-            # Auto-size columns
-            for column in ws.columns:
-                max_length = 0
-                column_letter = get_column_letter(column[0].column)
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 40)
-                ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Save to BytesIO with proper handling
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)  # Reset to beginning of stream
+        ws_summary.append(["TOTALS", total_units, "", total_value], style=[None, None, None, 'currency'])
+        ws_summary.append(["YTD Depreciation Expense", "", "", float(ytd_depreciation)], style=[None, None, None, 'currency'])
         
         # Generate filename with current date
         filename = f'Inventory_Report_{datetime.now().strftime("%Y%m%d")}.xlsx'
         
-        # Return file - Flask will handle closing the BytesIO
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=filename
-        )
+        # Spool to a temp file and stream it back in chunks
+        return xlsx_response(book.spool(), filename)
         
     except Exception as e:
         logger.error(f"Error generating Excel export: {str(e)}")
@@ -849,25 +757,13 @@ def test_excel_export():
     Minimal test Excel export to debug file corruption issues
     """
     try:
-        # Create simple test workbook
-        wb = Workbook()
-        ws = wb.active
-        ws['A1'] = 'Test'
-        ws['B1'] = 'Data'
-        ws['A2'] = 'Hello'
-        ws['B2'] = 'World'
-        
-        # Save to BytesIO with proper handling
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)  # CRITICAL - reset to start
-        
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name='test.xlsx'
-        )
+        # Create simple test workbook, built the same way as the real export
+        book = StreamingWorkbook()
+        ws = book.create_sheet("Sheet")
+        ws.append(['Test', 'Data'])
+        ws.append(['Hello', 'World'])
+        
+        return xlsx_response(book.spool(), 'test.xlsx')
         
     except Exception as e:
         logger.error(f"Error in test Excel export: {str(e)}")
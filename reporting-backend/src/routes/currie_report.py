@@ -3,13 +3,16 @@ Currie Financial Model Report API
 Automates quarterly Currie reporting by extracting data from Softbase
 """
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, g, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.utils.tenant_utils import get_tenant_db, get_tenant_schema
 from src.services.cache_service import cache_service
+from src.services.gl_query_builder import GLQueryBuilder
+from src.services.gl_rollup import GLRollupEngine, get_account_map, rollup_by_description
 from datetime import datetime, timedelta
 import logging
 import calendar
+import pandas as pd
 
 from flask_jwt_extended import get_jwt_identity
 from src.models.user import User
@@ -207,81 +210,97 @@ def _fetch_sales_cogs_gp_data(start_date, end_date, user_identity):
         raise e
 
 
-def get_new_equipment_sales(start_date, end_date):
-    """Get new equipment sales broken down by category using GLDetail table"""
+def _closed_month_periods(start_date, end_date):
+    """
+    (year, month) for every month of the date range when it covers whole
+    calendar months that are all closed, otherwise None.
+    The current month is never closed - in-process months always use GLDetail.
+    """
     try:
-        schema = get_tenant_schema()
-        currie = get_currie_mappings(schema)
-        ne = currie.get('new_equipment', {})
-        ue = currie.get('used_equipment', {})
-
-        # Build account-to-category mapping from currie config
-        revenue_map = {}  # account -> (category, 'sales')
-        cost_map = {}     # account -> (category, 'cogs')
-        
-        for cat_key in ['new_lift_truck_primary', 'new_lift_truck_other', 'new_allied',
-                        'batteries', 'other_new_equipment', 'operator_training', 'ecommerce', 'systems']:
-            cat_config = ne.get(cat_key, {})
-            for acct in cat_config.get('revenue', []):
-                revenue_map[acct] = cat_key
-            for acct in cat_config.get('cogs', []):
-                cost_map[acct] = cat_key
-        
-        # Used equipment accounts
-        for acct in ue.get('revenue', []):
-            revenue_map[acct] = 'used_equipment'
-        for acct in ue.get('cogs', []):
-            cost_map[acct] = 'used_equipment'
-
-        # Collect all accounts for the query
-        all_accounts = list(set(list(revenue_map.keys()) + list(cost_map.keys())))
-        if not all_accounts:
-            return {}
-        accounts_list = "', '".join(all_accounts)
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+    now = datetime.now()
+    if start.day != 1 or end.day != calendar.monthrange(end.year, end.month)[1]:
+        return None
+    if start > end or (end.year, end.month) >= (now.year, now.month):
+        return None
+    
+    periods = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        periods.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
+
 
+def get_currie_category_totals(start_date, end_date):
+    """
+    Posted GL amounts per Currie mapping leaf for a date range, keyed by dotted
+    path ('service.customer_labor.revenue', 'expenses.personnel.detail.payroll', ...)
+    with the ledger sign kept: revenue is a credit (negative), costs are debits.
+    
+    Whole closed months come from GL.MTD (exact Softbase match) through the GL
+    rollup engine, which reads them from the closed-period snapshots when it
+    has them; other ranges sum posted GLDetail. Either way it is one round trip
+    per request, shared by every section of the Currie report.
+    """
+    schema = get_tenant_schema()
+    totals_by_range = g.setdefault('currie_category_totals', {})
+    key = (schema, start_date, end_date)
+    if key in totals_by_range:
+        return totals_by_range[key]
+    
+    account_map = get_account_map(schema, 'currie_category')
+    periods = _closed_month_periods(start_date, end_date)
+    if periods:
+        engine = GLRollupEngine.load(schema, periods, accounts=account_map.accounts, db=get_sql_service())
+        year, month = periods[-1]
+        totals = engine.rollup(account_map, 'MTD', year, month, periods=periods)
+    else:
+        qb = GLQueryBuilder()
         query = f"""
         SELECT 
             AccountNo,
             SUM(Amount) as total_amount
         FROM {schema}.GLDetail
-        WHERE EffectiveDate >= %s 
-          AND EffectiveDate <= %s
+        WHERE {qb.date_range(start_date, end_date)}
           AND Posted = 1
-          AND AccountNo IN ('{accounts_list}')
+          AND {qb.accounts(list(account_map.accounts))}
         GROUP BY AccountNo
         """
-        
-        results = get_sql_service().execute_query(query, [start_date, end_date])
-        
-        # Initialize categories
+        results = qb.execute(get_sql_service(), query) or []
+        amounts = pd.Series(
+            [float(row['total_amount'] or 0) for row in results],
+            index=[str(row['AccountNo']).strip() for row in results],
+            dtype=float
+        )
+        totals = account_map.reduce(amounts.groupby(level=0).sum())
+    
+    totals_by_range[key] = totals
+    return totals
+
+
+def _sales_cogs(totals, path):
+    """{'sales', 'cogs', 'gross_profit'} for a Currie revenue/cogs pair (revenue is a credit)"""
+    sales = 0.0 - totals.get(f"{path}.revenue", 0.0)
+    cogs = totals.get(f"{path}.cogs", 0.0)
+    return {'sales': sales, 'cogs': cogs, 'gross_profit': sales - cogs}
+
+
+def get_new_equipment_sales(start_date, end_date):
+    """Get new and used equipment sales broken down by Currie category"""
+    try:
+        totals = get_currie_category_totals(start_date, end_date)
         categories = {
-            'new_lift_truck_primary': {'sales': 0, 'cogs': 0},
-            'new_lift_truck_other': {'sales': 0, 'cogs': 0},
-            'new_allied': {'sales': 0, 'cogs': 0},
-            'other_new_equipment': {'sales': 0, 'cogs': 0},
-            'operator_training': {'sales': 0, 'cogs': 0},
-            'used_equipment': {'sales': 0, 'cogs': 0},
-            'ecommerce': {'sales': 0, 'cogs': 0},
-            'systems': {'sales': 0, 'cogs': 0},
-            'batteries': {'sales': 0, 'cogs': 0}
+            cat_key: _sales_cogs(totals, f"new_equipment.{cat_key}")
+            for cat_key in ['new_lift_truck_primary', 'new_lift_truck_other', 'new_allied',
+                            'other_new_equipment', 'operator_training']
         }
-        
-        # Map GL accounts to categories dynamically
-        for row in results:
-            account = str(row['AccountNo'])
-            amount = float(row['total_amount'] or 0)
-            
-            if account in revenue_map:
-                cat_key = revenue_map[account]
-                categories[cat_key]['sales'] += -amount  # Revenue is credit (negative)
-            elif account in cost_map:
-                cat_key = cost_map[account]
-                categories[cat_key]['cogs'] += amount  # COGS is debit (positive)
-        
-        # Calculate gross profit for each category
-        for category in categories.values():
-            category['gross_profit'] = category['sales'] - category['cogs']
-        
+        categories['used_equipment'] = _sales_cogs(totals, 'used_equipment')
+        for cat_key in ['ecommerce', 'systems', 'batteries']:
+            categories[cat_key] = _sales_cogs(totals, f"new_equipment.{cat_key}")
         return categories
         
     except Exception as e:
@@ -290,75 +309,15 @@ def get_new_equipment_sales(start_date, end_date):
 
 
 def get_rental_revenue(start_date, end_date):
-    """Get rental revenue, long-term rental, and RTR as separate categories using GLDetail.
+    """Get rental revenue, long-term rental, and RTR as separate categories.
     Returns a dict with 'rental', 'long_term_rental', and 'rtr' keys, each containing sales/cogs/gross_profit.
     For tenants without long_term_rental or RTR config, those will be zeros."""
     try:
-        schema = get_tenant_schema()
-        currie = get_currie_mappings(schema)
-        rental_cfg = currie.get('rental', {})
-        lt_rental_cfg = currie.get('long_term_rental', {})
-        rtr_cfg = currie.get('rtr', {})
-        
-        rental_rev = rental_cfg.get('revenue', [])
-        rental_cos = rental_cfg.get('cogs', [])
-        lt_rental_rev = lt_rental_cfg.get('revenue', [])
-        lt_rental_cos = lt_rental_cfg.get('cogs', [])
-        rtr_rev = rtr_cfg.get('revenue', [])
-        rtr_cos = rtr_cfg.get('cogs', [])
-        
-        all_accounts = rental_rev + rental_cos + lt_rental_rev + lt_rental_cos + rtr_rev + rtr_cos
-        if not all_accounts:
-            return {
-                'rental': {'sales': 0, 'cogs': 0, 'gross_profit': 0},
-                'long_term_rental': {'sales': 0, 'cogs': 0, 'gross_profit': 0},
-                'rtr': {'sales': 0, 'cogs': 0, 'gross_profit': 0}
-            }
-        accounts_list = "', '".join(all_accounts)
-
-        query = f"""
-        SELECT 
-            AccountNo,
-            SUM(Amount) as total_amount
-        FROM {schema}.GLDetail
-        WHERE EffectiveDate >= %s 
-          AND EffectiveDate <= %s
-          AND Posted = 1
-          AND AccountNo IN ('{accounts_list}')
-        GROUP BY AccountNo
-        """
-        
-        results = get_sql_service().execute_query(query, [start_date, end_date])
-        
-        rental_data = {'sales': 0, 'cogs': 0, 'gross_profit': 0}
-        lt_rental_data = {'sales': 0, 'cogs': 0, 'gross_profit': 0}
-        rtr_data = {'sales': 0, 'cogs': 0, 'gross_profit': 0}
-        
-        for row in results:
-            account = str(row['AccountNo'])
-            amount = float(row['total_amount'] or 0)
-            
-            if account in rental_rev:
-                rental_data['sales'] += -amount
-            elif account in rental_cos:
-                rental_data['cogs'] += amount
-            elif account in lt_rental_rev:
-                lt_rental_data['sales'] += -amount
-            elif account in lt_rental_cos:
-                lt_rental_data['cogs'] += amount
-            elif account in rtr_rev:
-                rtr_data['sales'] += -amount
-            elif account in rtr_cos:
-                rtr_data['cogs'] += amount
-        
-        rental_data['gross_profit'] = rental_data['sales'] - rental_data['cogs']
-        lt_rental_data['gross_profit'] = lt_rental_data['sales'] - lt_rental_data['cogs']
-        rtr_data['gross_profit'] = rtr_data['sales'] - rtr_data['cogs']
-        
+        totals = get_currie_category_totals(start_date, end_date)
         return {
-            'rental': rental_data,
-            'long_term_rental': lt_rental_data,
-            'rtr': rtr_data
+            'rental': _sales_cogs(totals, 'rental'),
+            'long_term_rental': _sales_cogs(totals, 'long_term_rental'),
+            'rtr': _sales_cogs(totals, 'rtr')
         }
         
     except Exception as e:
@@ -371,7 +330,7 @@ def get_rental_revenue(start_date, end_date):
 
 
 def get_service_revenue(start_date, end_date):
-    """Get service revenue broken down by customer, internal, warranty, sublet using GLDetail.
+    """Get service revenue broken down by customer, internal, warranty, sublet.
 
     For tenants where interdepartmental (internal) labor WOs post to the same GL accounts
     as customer WOs, the config may include 'internal_labor_bill_to_customers' — a list of
@@ -382,65 +341,26 @@ def get_service_revenue(start_date, end_date):
         schema = get_tenant_schema()
         currie = get_currie_mappings(schema)
         svc = currie.get('service', {})
+        totals = get_currie_category_totals(start_date, end_date)
 
-        # Build category mappings from config
-        categories_config = {
-            'customer_labor': svc.get('customer_labor', {}),
-            'internal_labor': svc.get('internal_labor', {}),
-            'warranty_labor': svc.get('warranty_labor', {}),
-            'sublet': svc.get('sublet', {}),
-            'other': svc.get('other', {})
+        service_data = {
+            cat_key: _sales_cogs(totals, f"service.{cat_key}")
+            for cat_key in ['customer_labor', 'internal_labor', 'warranty_labor', 'sublet', 'other']
         }
 
         # Check if this tenant uses bill-to customer codes to identify internal labor
         internal_bill_to_customers = svc.get('internal_labor', {}).get('internal_labor_bill_to_customers', [])
-        use_bill_to_split = len(internal_bill_to_customers) > 0
-
-        # Build revenue and cost maps
-        revenue_map = {}  # account -> category_key
-        cost_map = {}     # account -> category_key
-        all_accounts = []
-        for cat_key, cat_cfg in categories_config.items():
-            for acct in cat_cfg.get('revenue', []):
-                revenue_map[acct] = cat_key
-                all_accounts.append(acct)
-            for acct in cat_cfg.get('cogs', []):
-                cost_map[acct] = cat_key
-                all_accounts.append(acct)
-
-        # For bill-to split tenants, also include customer_labor revenue accounts in the query
-        # so we can reclassify them based on bill-to customer
-        if use_bill_to_split:
-            cust_labor_rev_accounts = svc.get('customer_labor', {}).get('revenue', [])
-            for acct in cust_labor_rev_accounts:
-                if acct not in all_accounts:
-                    all_accounts.append(acct)
-
-        if not all_accounts:
-            return {}
-        accounts_list = "', '".join(list(set(all_accounts)))
-
-        service_data = {
-            'customer_labor': {'sales': 0, 'cogs': 0},
-            'internal_labor': {'sales': 0, 'cogs': 0},
-            'warranty_labor': {'sales': 0, 'cogs': 0},
-            'sublet': {'sales': 0, 'cogs': 0},
-            'other': {'sales': 0, 'cogs': 0}
-        }
-
-        if use_bill_to_split:
-            # --- Bill-to-aware query using InvoiceReg ---
+        if internal_bill_to_customers:
+            # --- Bill-to-aware labor revenue from InvoiceReg ---
             # GLDetail has no link column to WO in the IPS schema, so we cannot join
             # GLDetail → WO to get BillTo. Instead, we query InvoiceReg directly:
             #   InvoiceReg.BillTo  = customer code (IPS110, IPS130, etc.)
             #   InvoiceReg.LaborTaxable + LaborNonTax = labor revenue
             #   InvoiceReg.InvoiceDate = invoice date
             # This gives us accurate labor revenue split by bill-to customer.
-            # COGS still comes from GLDetail (account-based, no join needed).
+            # COGS still comes from the GL category totals.
             internal_bill_to_set = set(b.strip().upper() for b in internal_bill_to_customers)
-            bill_to_list = "', '".join(internal_bill_to_customers)
 
-            # Query 1: Labor revenue from InvoiceReg, grouped by BillTo
             rev_query = f"""
             SELECT
                 RTRIM(LTRIM(UPPER(ISNULL(ir.BillTo, '')))) AS BillTo,
@@ -452,32 +372,18 @@ def get_service_revenue(start_date, end_date):
             GROUP BY RTRIM(LTRIM(UPPER(ISNULL(ir.BillTo, ''))))
             """
 
-            # Query 2: COGS rows — from GLDetail by account number
-            cogs_acct_list = "', '".join(list(cost_map.keys()))
-            cogs_query = f"""
-            SELECT
-                AccountNo,
-                SUM(Amount) AS total_amount
-            FROM {schema}.GLDetail
-            WHERE EffectiveDate >= %s
-              AND EffectiveDate <= %s
-              AND Posted = 1
-              AND AccountNo IN ('{cogs_acct_list}')
-            GROUP BY AccountNo
-            """
-
             try:
                 rev_results = get_sql_service().execute_query(rev_query, [start_date, end_date])
             except Exception as e_rev:
-                logger.warning(f"InvoiceReg bill-to query failed ({e_rev}), falling back to simple query")
-                rev_results = []
-                use_bill_to_split = False  # fall through to simple query below
-
-            if use_bill_to_split:
-                cogs_results = get_sql_service().execute_query(cogs_query, [start_date, end_date])
-
-                # Process revenue rows — split by BillTo into customer vs internal
-                for row in (rev_results or []):
+                logger.warning(f"InvoiceReg bill-to query failed ({e_rev}), falling back to GL revenue")
+                rev_results = None
+
+            if rev_results is not None:
+                # Labor revenue is split by BillTo into customer vs internal; the
+                # other categories carry COGS only in this mode
+                for category in service_data.values():
+                    category['sales'] = 0.0
+                for row in rev_results:
                     amount = float(row.get('total_labor_revenue') or 0)
                     bill_to = (row.get('BillTo') or '').strip().upper()
 
@@ -486,42 +392,8 @@ def get_service_revenue(start_date, end_date):
                     else:
                         service_data['customer_labor']['sales'] += amount
 
-                # Process COGS rows
-                for row in (cogs_results or []):
-                    account = str(row['AccountNo'])
-                    amount = float(row['total_amount'] or 0)
-                    if account in cost_map:
-                        cat_key = cost_map[account]
-                        service_data[cat_key]['cogs'] += amount
-
-        if not use_bill_to_split:
-            # --- Simple query (no bill-to split needed) ---
-            query = f"""
-            SELECT 
-                AccountNo,
-                SUM(Amount) as total_amount
-            FROM {schema}.GLDetail
-            WHERE EffectiveDate >= %s 
-              AND EffectiveDate <= %s
-              AND Posted = 1
-              AND AccountNo IN ('{accounts_list}')
-            GROUP BY AccountNo
-            """
-            results = get_sql_service().execute_query(query, [start_date, end_date])
-
-            for row in results:
-                account = str(row['AccountNo'])
-                amount = float(row['total_amount'] or 0)
-                if account in revenue_map:
-                    cat_key = revenue_map[account]
-                    service_data[cat_key]['sales'] += -amount
-                elif account in cost_map:
-                    cat_key = cost_map[account]
-                    service_data[cat_key]['cogs'] += amount
-
-        # Calculate gross profit
-        for category in service_data.values():
-            category['gross_profit'] = category['sales'] - category['cogs']
+                for category in service_data.values():
+                    category['gross_profit'] = category['sales'] - category['cogs']
 
         return service_data
 
@@ -533,127 +405,25 @@ def get_service_revenue(start_date, end_date):
 
 
 def get_parts_revenue(start_date, end_date):
-    """Get parts revenue broken down by counter, RO, internal, warranty using GLDetail"""
+    """Get parts revenue broken down by counter, RO, internal, warranty"""
     try:
-        schema = get_tenant_schema()
-        currie = get_currie_mappings(schema)
-        parts_cfg = currie.get('parts', {})
-
-        # Build category mappings from config
-        categories_config = {
-            'counter_primary': parts_cfg.get('counter_primary', {}),
-            'counter_other': parts_cfg.get('counter_other', {}),
-            'ro_primary': parts_cfg.get('ro_primary', {}),
-            'ro_other': parts_cfg.get('ro_other', {}),
-            'internal': parts_cfg.get('internal', {}),
-            'warranty': parts_cfg.get('warranty', {}),
-            'ecommerce': parts_cfg.get('ecommerce', {})
-        }
-
-        # Build revenue and cost maps
-        revenue_map = {}
-        cost_map = {}
-        all_accounts = []
-        for cat_key, cat_cfg in categories_config.items():
-            for acct in cat_cfg.get('revenue', []):
-                revenue_map[acct] = cat_key
-                all_accounts.append(acct)
-            for acct in cat_cfg.get('cogs', []):
-                cost_map[acct] = cat_key
-                all_accounts.append(acct)
-
-        if not all_accounts:
-            return {}
-        accounts_list = "', '".join(list(set(all_accounts)))
-
-        query = f"""
-        SELECT 
-            AccountNo,
-            SUM(Amount) as total_amount
-        FROM {schema}.GLDetail
-        WHERE EffectiveDate >= %s 
-          AND EffectiveDate <= %s
-          AND Posted = 1
-          AND AccountNo IN ('{accounts_list}')
-        GROUP BY AccountNo
-        """
-        
-        results = get_sql_service().execute_query(query, [start_date, end_date])
-        
-        parts_data = {
-            'counter_primary': {'sales': 0, 'cogs': 0},
-            'counter_other': {'sales': 0, 'cogs': 0},
-            'ro_primary': {'sales': 0, 'cogs': 0},
-            'ro_other': {'sales': 0, 'cogs': 0},
-            'internal': {'sales': 0, 'cogs': 0},
-            'warranty': {'sales': 0, 'cogs': 0},
-            'ecommerce': {'sales': 0, 'cogs': 0}
+        totals = get_currie_category_totals(start_date, end_date)
+        return {
+            cat_key: _sales_cogs(totals, f"parts.{cat_key}")
+            for cat_key in ['counter_primary', 'counter_other', 'ro_primary', 'ro_other',
+                            'internal', 'warranty', 'ecommerce']
         }
         
-        for row in results:
-            account = str(row['AccountNo'])
-            amount = float(row['total_amount'] or 0)
-            
-            if account in revenue_map:
-                cat_key = revenue_map[account]
-                parts_data[cat_key]['sales'] += -amount  # Revenue is credit (negative)
-            elif account in cost_map:
-                cat_key = cost_map[account]
-                parts_data[cat_key]['cogs'] += amount  # COGS is debit (positive)
-        
-        # Calculate gross profit
-        for category in parts_data.values():
-            category['gross_profit'] = category['sales'] - category['cogs']
-        
-        return parts_data
-        
     except Exception as e:
         logger.error(f"Error fetching parts revenue: {str(e)}")
         return {}
 
 
 def get_trucking_revenue(start_date, end_date):
-    """Get trucking/delivery revenue using GLDetail with all trucking GL accounts"""
+    """Get trucking/delivery revenue from all trucking GL accounts"""
     try:
-        schema = get_tenant_schema()
-        currie = get_currie_mappings(schema)
-        trucking_cfg = currie.get('trucking', {})
-        
-        revenue_accounts = trucking_cfg.get('revenue', [])
-        cost_accounts = trucking_cfg.get('cogs', [])
-        all_accounts = revenue_accounts + cost_accounts
-        if not all_accounts:
-            return {'sales': 0, 'cogs': 0, 'gross_profit': 0}
-        accounts_list = "', '".join(all_accounts)
-
-        query = f"""
-        SELECT 
-            AccountNo,
-            SUM(Amount) as total_amount
-        FROM {schema}.GLDetail
-        WHERE EffectiveDate >= %s 
-          AND EffectiveDate <= %s
-          AND Posted = 1
-          AND AccountNo IN ('{accounts_list}')
-        GROUP BY AccountNo
-        """
-        
-        results = get_sql_service().execute_query(query, [start_date, end_date])
-        
-        trucking_data = {'sales': 0, 'cogs': 0, 'gross_profit': 0}
-        
-        for row in results:
-            account = str(row['AccountNo'])
-            amount = float(row['total_amount'] or 0)
-            
-            if account in revenue_accounts:
-                trucking_data['sales'] += -amount  # Revenue is credit (negative)
-            elif account in cost_accounts:
-                trucking_data['cogs'] += amount  # COGS is debit (positive)
-        
-        trucking_data['gross_profit'] = trucking_data['sales'] - trucking_data['cogs']
-        
-        return trucking_data
+        totals = get_currie_category_totals(start_date, end_date)
+        return _sales_cogs(totals, 'trucking')
         
     except Exception as e:
         logger.error(f"Error fetching trucking revenue: {str(e)}")
@@ -1221,20 +991,16 @@ def get_rental_fleet_metrics(start_date, end_date):
         days_in_period = (end - start).days + 1
         
         rental_accounts = currie.get('rental', {}).get('revenue', [])
-        if rental_accounts:
-            rental_placeholders = ','.join(['%s'] * len(rental_accounts))
-        else:
-            rental_placeholders = "'NONE'"
-            rental_accounts = []
+        rental_qb = GLQueryBuilder()
         rental_rev_query = f"""
         SELECT ABS(SUM(Amount)) as rental_revenue
         FROM {schema}.GLDetail
-        WHERE AccountNo IN ({rental_placeholders})
-          AND EffectiveDate >= %s AND EffectiveDate <= %s
+        WHERE {rental_qb.accounts(rental_accounts)}
+          AND {rental_qb.date_range(start_date, end_date)}
           AND Posted = 1
         """
         
-        rental_rev_result = get_sql_service().execute_query(rental_rev_query, rental_accounts + [start_date, end_date])
+        rental_rev_result = rental_qb.execute(get_sql_service(), rental_rev_query)
         period_revenue = float(rental_rev_result[0]['rental_revenue'] or 0) if rental_rev_result else 0
         
         # Annualize the revenue
@@ -1247,15 +1013,16 @@ def get_rental_fleet_metrics(start_date, end_date):
         # Depreciation account - derive LIKE pattern from the accumulated depreciation account prefix
         # Convention: accumulated depreciation prefix (e.g. 193) -> expense prefix (e.g. 593)
         deprec_expense_like = '5' + deprec_acct[1:3] + '%'
+        deprec_qb = GLQueryBuilder()
         deprec_query = f"""
         SELECT ABS(SUM(Amount)) as depreciation_expense
         FROM {schema}.GLDetail
-        WHERE AccountNo LIKE %s
-          AND EffectiveDate >= %s AND EffectiveDate <= %s
+        WHERE AccountNo LIKE {deprec_qb.param(deprec_expense_like, 'varchar(32)')}
+          AND {deprec_qb.date_range(start_date, end_date)}
           AND Posted = 1
         """
         
-        deprec_result = get_sql_service().execute_query(deprec_query, [deprec_expense_like, start_date, end_date])
+        deprec_result = deprec_qb.execute(get_sql_service(), deprec_query)
         period_depreciation = float(deprec_result[0]['depreciation_expense'] or 0) if deprec_result else 0
         annualized_depreciation = (period_depreciation / days_in_period * 365) if days_in_period > 0 else 0
         
@@ -1647,38 +1414,21 @@ def export_currie_excel():
         inventory_accounts = assets['current_assets']['inventory']
         inv_patterns = currie.get('inventory_patterns', {})
         
-        # Helper: check if description matches any pattern in a list
-        def desc_matches(description, patterns):
-            desc_upper = description.upper()
-            return any(p in desc_upper for p in patterns)
-        
-        new_equipment_primary = 0
+        # Classify inventory accounts by description (first matching pattern wins)
+        inventory = rollup_by_description(inventory_accounts, [
+            (category, inv_patterns.get(category, []))
+            for category in ('wip', 'new_equipment_primary', 'new_allied_inventory',
+                             'used_equipment_inventory', 'parts_inventory', 'battery_inventory')
+        ], default='other_inventory')
+        new_equipment_primary = inventory['new_equipment_primary']
         new_equipment_other = 0
-        new_allied_inventory = 0
+        new_allied_inventory = inventory['new_allied_inventory']
         other_new_equipment = 0
-        used_equipment_inventory = 0
-        parts_inventory = 0
-        battery_inventory = 0
-        wip_balance = 0
-        other_inventory = 0
-        
-        for acc in inventory_accounts:
-            desc = acc['description']
-            balance = acc['balance']
-            if desc_matches(desc, inv_patterns.get('wip', [])):
-                wip_balance += balance
-            elif desc_matches(desc, inv_patterns.get('new_equipment_primary', [])):
-                new_equipment_primary += balance
-            elif desc_matches(desc, inv_patterns.get('new_allied_inventory', [])):
-                new_allied_inventory += balance
-            elif desc_matches(desc, inv_patterns.get('used_equipment_inventory', [])):
-                used_equipment_inventory += balance
-            elif desc_matches(desc, inv_patterns.get('parts_inventory', [])):
-                parts_inventory += balance
-            elif desc_matches(desc, inv_patterns.get('battery_inventory', [])):
-                battery_inventory += balance
-            else:
-                other_inventory += balance
+        used_equipment_inventory = inventory['used_equipment_inventory']
+        parts_inventory = inventory['parts_inventory']
+        battery_inventory = inventory['battery_inventory']
+        wip_balance = inventory['wip']
+        other_inventory = inventory['other_inventory']
         
         bs_ws['B11'] = new_equipment_primary  # New Equipment, primary brand
         bs_ws['B12'] = new_equipment_other  # New Equipment, other brand (currently $0)
@@ -1696,16 +1446,9 @@ def export_currie_excel():
         # Fixed Assets - use tenant-specific patterns for rental fleet identification
         fa_patterns = currie.get('fixed_asset_patterns', {})
         rental_fleet_patterns = fa_patterns.get('rental_fleet', [])
-        rental_fleet_net = 0
-        other_fixed = 0
-        
-        for acc in assets['fixed_assets']:
-            desc = acc['description']
-            balance = acc['balance']
-            if desc_matches(desc, rental_fleet_patterns):
-                rental_fleet_net += balance
-            else:
-                other_fixed += balance
+        fixed = rollup_by_description(assets['fixed_assets'], [('rental_fleet', rental_fleet_patterns)], default='other_fixed')
+        rental_fleet_net = fixed['rental_fleet']
+        other_fixed = fixed['other_fixed']
         
         bs_ws['B27'] = rental_fleet_net  # Rental Fleet (net of depreciation)
         bs_ws['B28'] = other_fixed  # Other Long Term or Fixed Assets
@@ -1721,24 +1464,16 @@ def export_currie_excel():
         cl_patterns = liab_patterns.get('current', {})
         lt_patterns = liab_patterns.get('long_term', {})
         
-        ap_primary = 0
+        current_liab = rollup_by_description(liabilities['current_liabilities'], [
+            (category, cl_patterns.get(category, []))
+            for category in ('ap_primary', 'short_term_rental_finance', 'used_equipment_financing')
+        ], default='other_current_liabilities')
+        ap_primary = current_liab['ap_primary']
         ap_other = 0
         notes_payable_current = 0
-        short_term_rental_finance = 0
-        used_equipment_financing = 0
-        other_current_liabilities = 0
-        
-        for acc in liabilities['current_liabilities']:
-            desc = acc['description']
-            balance = acc['balance']
-            if desc_matches(desc, cl_patterns.get('ap_primary', [])):
-                ap_primary += balance
-            elif desc_matches(desc, cl_patterns.get('short_term_rental_finance', [])):
-                short_term_rental_finance += balance
-            elif desc_matches(desc, cl_patterns.get('used_equipment_financing', [])):
-                used_equipment_financing += balance
-            else:
-                other_current_liabilities += balance
+        short_term_rental_finance = current_liab['short_term_rental_finance']
+        used_equipment_financing = current_liab['used_equipment_financing']
+        other_current_liabilities = current_liab['other_current_liabilities']
         
         # Negate liability values for standard BS presentation (credit balances shown as positive)
         bs_ws['E7'] = -ap_primary  # A/P Primary Brand
@@ -1749,24 +1484,16 @@ def export_currie_excel():
         bs_ws['E12'] = -other_current_liabilities  # Other Current Liabilities
         
         # Long-term Liabilities breakdown - use tenant-specific patterns
-        long_term_notes = 0
-        loans_from_stockholders = 0
-        lt_rental_fleet_financing = 0
-        
-        for acc in liabilities['long_term_liabilities']:
-            desc = acc['description']
-            balance = acc['balance']
-            # Check patterns in priority order: floorplan first (most specific),
-            # then stockholders, then general notes payable (least specific)
-            if desc_matches(desc, lt_patterns.get('lt_rental_fleet_financing', [])):
-                lt_rental_fleet_financing += balance
-            elif desc_matches(desc, lt_patterns.get('loans_from_stockholders', [])):
-                loans_from_stockholders += balance
-            elif desc_matches(desc, lt_patterns.get('long_term_notes', [])):
-                long_term_notes += balance
-        
-        total_long_term_liabilities = sum(acc['balance'] for acc in liabilities['long_term_liabilities'])
-        other_long_term_debt = total_long_term_liabilities - (long_term_notes + loans_from_stockholders + lt_rental_fleet_financing)
+        # Check patterns in priority order: floorplan first (most specific),
+        # then stockholders, then general notes payable (least specific)
+        long_term_liab = rollup_by_description(liabilities['long_term_liabilities'], [
+            (category, lt_patterns.get(category, []))
+            for category in ('lt_rental_fleet_financing', 'loans_from_stockholders', 'long_term_notes')
+        ], default='other_long_term_debt')
+        long_term_notes = long_term_liab['long_term_notes']
+        loans_from_stockholders = long_term_liab['loans_from_stockholders']
+        lt_rental_fleet_financing = long_term_liab['lt_rental_fleet_financing']
+        other_long_term_debt = long_term_liab['other_long_term_debt']
         
         # Other Liabilities
         other_liab_remaining = sum_accounts(liabilities['other_liabilities'])
@@ -1879,181 +1606,25 @@ def discover_gl_accounts():
         return jsonify({'error': str(e)}), 500
 
 
-def is_full_calendar_month(start_date, end_date):
-    """
-    Check if the date range represents a full calendar month
-    Excludes the current month to ensure GL.MTD is only used for closed/completed months
-    
-    Args:
-        start_date: Start date string (YYYY-MM-DD)
-        end_date: End date string (YYYY-MM-DD)
-    
-    Returns:
-        Tuple of (is_full_month, year, month) or (False, None, None)
-    """
-    try:
-        start = datetime.strptime(start_date, '%Y-%m-%d')
-        end = datetime.strptime(end_date, '%Y-%m-%d')
-        now = datetime.now()
-        
-        # Check if start is first day of month
-        if start.day != 1:
-            return False, None, None
-        
-        # Check if end is last day of month
-        last_day = calendar.monthrange(start.year, start.month)[1]
-        if end.day != last_day:
-            return False, None, None
-        
-        # Check if both dates are in the same month
-        if start.year != end.year or start.month != end.month:
-            return False, None, None
-        
-        # Exclude current month - always use GLDetail for in-process months
-        if start.year == now.year and start.month == now.month:
-            return False, None, None
-        
-        return True, start.year, start.month
-    except:
-        return False, None, None
-
 def get_gl_expenses(start_date, end_date):
     """
-    Get operating expenses from GL accounts
-    Uses GL.MTD for full calendar months (exact Softbase match)
+    Get operating expenses from GL accounts by Currie expense category
+    Uses GL.MTD for whole closed months (exact Softbase match)
     Uses GLDetail for custom date ranges (flexibility)
     """
-    try:
-        # Check if this is a full calendar month
-        is_full_month, year, month = is_full_calendar_month(start_date, end_date)
-        
-        if is_full_month:
-            # Use GL.MTD for exact Softbase match
-            return get_gl_expenses_from_gl_mtd(year, month)
-        else:
-            # Use GLDetail for custom date ranges
-            return get_gl_expenses_from_gldetail(start_date, end_date)
-    except Exception as e:
-        logger.error(f"Error in get_gl_expenses: {e}")
-        raise
-
-def _build_expense_category_query(schema, table, amount_col, category_config, where_clause, params):
-    """
-    Build a dynamic expense query from currie mappings.
-    category_config: {'accounts': [...], 'detail': {'key': [accts], ...}}
-    Returns: (result_dict, total)
-    """
-    all_accounts = category_config.get('accounts', [])
-    detail = category_config.get('detail', {})
-    
-    if not all_accounts:
-        result = {k: 0 for k in detail.keys()}
-        result['total'] = 0
-        return result
-    
-    # Build CASE WHEN fragments for each detail key
-    case_fragments = []
-    for key, accts in detail.items():
-        if not accts:
-            case_fragments.append(f"0 as {key}")
-        elif len(accts) == 1:
-            case_fragments.append(f"SUM(CASE WHEN AccountNo = '{accts[0]}' THEN {amount_col} ELSE 0 END) as {key}")
-        else:
-            quoted = ','.join([f"'{a}'" for a in accts])
-            case_fragments.append(f"SUM(CASE WHEN AccountNo IN ({quoted}) THEN {amount_col} ELSE 0 END) as {key}")
-    
-    # Add total
-    all_quoted = ','.join([f"'{a}'" for a in all_accounts])
-    case_fragments.insert(0, f"SUM({amount_col}) as category_total")
-    
-    select_clause = ',\n            '.join(case_fragments)
-    
-    query = f"""
-    SELECT 
-        {select_clause}
-    FROM {schema}.{table}
-    WHERE {where_clause}
-      AND AccountNo IN ({all_quoted})
-    """
-    
-    query_result = get_sql_service().execute_query(query, params)
-    row = query_result[0] if query_result else {}
-    
-    result = {}
-    for key in detail.keys():
-        result[key] = float(row.get(key) or 0)
-    result['total'] = float(row.get('category_total') or 0)
-    
-    return result
-
-
-def _build_expenses_response(schema, table, amount_col, where_clause, params):
-    """
-    Build the full expenses response using currie mappings.
-    Shared by both gl_mtd and gldetail expense functions.
-    """
-    currie = get_currie_mappings(schema)
-    expense_config = currie.get('expenses', {})
-    
-    personnel = _build_expense_category_query(
-        schema, table, amount_col,
-        expense_config.get('personnel', {'accounts': [], 'detail': {}}),
-        where_clause, params
-    )
-    occupancy = _build_expense_category_query(
-        schema, table, amount_col,
-        expense_config.get('occupancy', {'accounts': [], 'detail': {}}),
-        where_clause, params
-    )
-    operating = _build_expense_category_query(
-        schema, table, amount_col,
-        expense_config.get('operating', {'accounts': [], 'detail': {}}),
-        where_clause, params
-    )
-    
-    return {
-        'personnel': personnel,
-        'occupancy': occupancy,
-        'operating': operating,
-        'grand_total': personnel['total'] + occupancy['total'] + operating['total']
-    }
-
-
-def get_gl_expenses_from_gl_mtd(year, month):
-    """
-    Get operating expenses from GL.MTD (monthly summary table)
-    This matches Softbase exactly for monthly reports
-    """
-    try:
-        schema = get_tenant_schema()
-        return _build_expenses_response(
-            schema, 'GL', 'MTD',
-            'Year = %s AND Month = %s',
-            [year, month]
-        )
-    except Exception as e:
-        logger.error(f"Error fetching GL expenses from GL.MTD: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return {
-            'personnel': {'total': 0},
-            'occupancy': {'total': 0},
-            'operating': {'total': 0},
-            'grand_total': 0
-        }
-
-def get_gl_expenses_from_gldetail(start_date, end_date):
-    """
-    Get operating expenses from GLDetail (transaction-level detail)
-    Used for custom date ranges that aren't full calendar months
-    """
     try:
         schema = get_tenant_schema()
-        return _build_expenses_response(
-            schema, 'GLDetail', 'Amount',
-            'Posted = 1 AND EffectiveDate >= %s AND EffectiveDate <= %s',
-            [start_date, end_date]
-        )
+        expense_config = get_currie_mappings(schema).get('expenses', {})
+        totals = get_currie_category_totals(start_date, end_date)
+        
+        expenses = {}
+        for category in ['personnel', 'occupancy', 'operating']:
+            detail = expense_config.get(category, {}).get('detail', {})
+            result = {key: totals.get(f"expenses.{category}.detail.{key}", 0.0) for key in detail}
+            result['total'] = totals.get(f"expenses.{category}.accounts", 0.0)
+            expenses[category] = result
+        expenses['grand_total'] = expenses['personnel']['total'] + expenses['occupancy']['total'] + expenses['operating']['total']
+        return expenses
     except Exception as e:
         logger.error(f"Error fetching GL expenses: {str(e)}")
         import traceback
@@ -2095,53 +1666,14 @@ def get_other_income_and_interest(start_date, end_date):
     Account mappings are loaded from tenant-specific currie mappings.
     """
     try:
-        schema = get_tenant_schema()
-        currie = get_currie_mappings(schema)
-        oi_config = currie.get('other_income_interest', {})
-        
-        other_exp_accts = oi_config.get('other_expenses', [])
-        interest_accts = oi_config.get('interest_expense', [])
-        fi_accts = oi_config.get('fi_income', [])
-        
-        all_accounts = other_exp_accts + interest_accts + fi_accts
-        if not all_accounts:
-            return {'other_income': 0, 'interest_expense': 0, 'fi_income': 0}
-        
-        # Build dynamic CASE WHEN
-        other_quoted = ','.join([f"'{a}'" for a in other_exp_accts]) if other_exp_accts else "'NONE'"
-        interest_quoted = ','.join([f"'{a}'" for a in interest_accts]) if interest_accts else "'NONE'"
-        fi_quoted = ','.join([f"'{a}'" for a in fi_accts]) if fi_accts else "'NONE'"
-        all_quoted = ','.join([f"'{a}'" for a in all_accounts])
-
-        query = f"""
-        SELECT 
-            SUM(CASE WHEN AccountNo IN ({other_quoted}) THEN Amount ELSE 0 END) as other_expenses,
-            SUM(CASE WHEN AccountNo IN ({interest_quoted}) THEN Amount ELSE 0 END) as interest_expense,
-            SUM(CASE WHEN AccountNo IN ({fi_quoted}) THEN Amount ELSE 0 END) as fi_income
-        FROM {schema}.GLDetail
-        WHERE EffectiveDate >= %s 
-          AND EffectiveDate <= %s
-          AND Posted = 1
-          AND AccountNo IN ({all_quoted})
-        """
-        
-        result = get_sql_service().execute_query(query, [start_date, end_date])
-        
-        if result and len(result) > 0:
-            row = result[0]
-            # Return as negative because these are expenses that reduce operating profit
-            # Excel formulas use -SUM() to make them negative
-            return {
-                'other_income': -float(row.get('other_expenses') or 0),  # Negative because it's an expense
-                'interest_expense': -float(row.get('interest_expense') or 0),  # Negative because it's an expense
-                'fi_income': float(row.get('fi_income') or 0)  # Positive because it's income
-            }
-        else:
-            return {
-                'other_income': 0,
-                'interest_expense': 0,
-                'fi_income': 0
-            }
+        totals = get_currie_category_totals(start_date, end_date)
+        # Return as negative because these are expenses that reduce operating profit
+        # Excel formulas use -SUM() to make them negative
+        return {
+            'other_income': 0.0 - totals.get('other_income_interest.other_expenses', 0.0),  # Negative because it's an expense
+            'interest_expense': 0.0 - totals.get('other_income_interest.interest_expense', 0.0),  # Negative because it's an expense
+            'fi_income': totals.get('other_income_interest.fi_income', 0.0)  # Positive because it's income
+        }
             
     except Exception as e:
         logger.error(f"Error fetching other income and interest: {str(e)}")
@@ -3,7 +3,8 @@ Customer Churn Analysis API
 Analyzes customer activity patterns to identify churned customers and provide AI-powered insights
 Multi-tenant: uses the current user's organization for data isolation
 
-Now uses pre-computed mart_customer_activity table for fast queries (ETL runs nightly)
+Now uses pre-computed mart_customer_activity table for fast queries (ETL runs nightly).
+Reads the snapshot mart_latest_snapshot points at, so queries don't slow down as history builds up.
 """
 
 from flask import Blueprint, jsonify, request
@@ -88,13 +89,15 @@ def get_churn_analysis():
             COUNT(*) as total_churned,
             COALESCE(SUM(previous_revenue), 0) as total_lost_revenue,
             COALESCE(SUM(lifetime_revenue), 0) as total_lifetime_revenue
-        FROM mart_customer_activity
-        WHERE org_id = %s
+        FROM mart_customer_activity a
+        JOIN mart_latest_snapshot latest ON latest.org_id = a.org_id
+            AND latest.table_name = 'mart_customer_activity'
+            AND latest.snapshot_date = a.snapshot_date
+        WHERE a.org_id = %s
         AND activity_status = 'churned'
-        AND snapshot_date = (SELECT MAX(snapshot_date) FROM mart_customer_activity WHERE org_id = %s)
         """
         
-        summary_result = pg.execute_query(churned_summary_query, (org_id, org_id))
+        summary_result = pg.execute_query(churned_summary_query, (org_id,))
         total_churned = int(summary_result[0]['total_churned']) if summary_result else 0
         total_lost_revenue = float(summary_result[0]['total_lost_revenue'] or 0) if summary_result else 0
         avg_customer_value = total_lost_revenue / total_churned if total_churned > 0 else 0
@@ -122,16 +125,18 @@ def get_churn_analysis():
             revenue_change_percent,
             monthly_revenue_trend,
             work_order_breakdown,
-            snapshot_date
-        FROM mart_customer_activity
-        WHERE org_id = %s
+            a.snapshot_date
+        FROM mart_customer_activity a
+        JOIN mart_latest_snapshot latest ON latest.org_id = a.org_id
+            AND latest.table_name = 'mart_customer_activity'
+            AND latest.snapshot_date = a.snapshot_date
+        WHERE a.org_id = %s
         AND activity_status = 'churned'
-        AND snapshot_date = (SELECT MAX(snapshot_date) FROM mart_customer_activity WHERE org_id = %s)
         ORDER BY previous_revenue DESC
         LIMIT 200
         """
         
-        churned_customers = pg.execute_query(churned_query, (org_id, org_id))
+        churned_customers = pg.execute_query(churned_query, (org_id,))
         
         # Format churned customers for display
         churned_list = []
@@ -154,12 +159,14 @@ def get_churn_analysis():
         # Get current active customer count
         active_query = """
         SELECT COUNT(*) as active_count
-        FROM mart_customer_activity
-        WHERE org_id = %s
+        FROM mart_customer_activity a
+        JOIN mart_latest_snapshot latest ON latest.org_id = a.org_id
+            AND latest.table_name = 'mart_customer_activity'
+            AND latest.snapshot_date = a.snapshot_date
+        WHERE a.org_id = %s
         AND activity_status = 'active'
-        AND snapshot_date = (SELECT MAX(snapshot_date) FROM mart_customer_activity WHERE org_id = %s)
         """
-        active_result = pg.execute_query(active_query, (org_id, org_id))
+        active_result = pg.execute_query(active_query, (org_id,))
         current_active = active_result[0]['active_count'] if active_result else 0
         
         # Calculate churn rate
@@ -168,9 +175,9 @@ def get_churn_analysis():
         
         # Get snapshot date for analysis period info
         snapshot_query = """
-        SELECT MAX(snapshot_date) as snapshot_date
-        FROM mart_customer_activity
-        WHERE org_id = %s
+        SELECT snapshot_date
+        FROM mart_latest_snapshot
+        WHERE org_id = %s AND table_name = 'mart_customer_activity'
         """
         snapshot_result = pg.execute_query(snapshot_query, (org_id,))
         snapshot_date = None
@@ -348,15 +355,17 @@ def get_at_risk_customers():
             previous_rental_revenue,
             days_since_last_invoice,
             revenue_change_percent
-        FROM mart_customer_activity
-        WHERE org_id = %s
+        FROM mart_customer_activity a
+        JOIN mart_latest_snapshot latest ON latest.org_id = a.org_id
+            AND latest.table_name = 'mart_customer_activity'
+            AND latest.snapshot_date = a.snapshot_date
+        WHERE a.org_id = %s
         AND activity_status = 'at_risk'
-        AND snapshot_date = (SELECT MAX(snapshot_date) FROM mart_customer_activity WHERE org_id = %s)
         ORDER BY previous_revenue DESC
         LIMIT 100
         """
         
-        at_risk_customers = pg.execute_query(at_risk_query, (org_id, org_id))
+        at_risk_customers = pg.execute_query(at_risk_query, (org_id,))
         
         at_risk_list = []
         if at_risk_customers:
@@ -377,9 +386,9 @@ def get_at_risk_customers():
         
         # Get snapshot date
         snapshot_query = """
-        SELECT MAX(snapshot_date) as snapshot_date
-        FROM mart_customer_activity
-        WHERE org_id = %s
+        SELECT snapshot_date
+        FROM mart_latest_snapshot
+        WHERE org_id = %s AND table_name = 'mart_customer_activity'
         """
         snapshot_result = pg.execute_query(snapshot_query, (org_id,))
         snapshot_date = None
@@ -454,13 +463,15 @@ def get_churn_summary():
             SUM(previous_revenue) as total_previous_revenue,
             SUM(recent_revenue) as total_recent_revenue,
             AVG(revenue_change_percent) as avg_revenue_change
-        FROM mart_customer_activity
-        WHERE org_id = %s
-        AND snapshot_date = (SELECT MAX(snapshot_date) FROM mart_customer_activity WHERE org_id = %s)
+        FROM mart_customer_activity a
+        JOIN mart_latest_snapshot latest ON latest.org_id = a.org_id
+            AND latest.table_name = 'mart_customer_activity'
+            AND latest.snapshot_date = a.snapshot_date
+        WHERE a.org_id = %s
         GROUP BY activity_status
         """
         
-        results = pg.execute_query(summary_query, (org_id, org_id))
+        results = pg.execute_query(summary_query, (org_id,))
         
         summary = {
             'active': {'count': 0, 'revenue': 0},
@@ -1,11 +1,15 @@
-from flask import Blueprint, jsonify, request, g, copy_current_request_context
+from flask import Blueprint, Response, jsonify, request, g, copy_current_request_context, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
+import json
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
 import time
 from src.services.cache_service import cache_service
 from src.services.postgres_service import get_postgres_db
+from src.services.gl_query_builder import GLQueryBuilder
+from src.services.snapshot_store import get_snapshot_store, month_span
+from src.services.query_executor import get_query_executor, remember_last_known
 from src.models.user import User
 from src.utils.fiscal_year import get_fiscal_year_months
 from src.utils.tenant_utils import get_tenant_db, get_tenant_schema
@@ -19,7 +23,11 @@ dashboard_optimized_bp = Blueprint('dashboard_optimized', __name__)
 # See DashboardQueries.__init__() where self.gl_accounts = get_gl_accounts(schema)
 
 class DashboardQueries:
-    """Encapsulate all dashboard queries for parallel execution"""
+    """
+    Encapsulate all dashboard queries for parallel execution.
+    Widget queries log and re-raise on failure so the executor serves the
+    widget's last known value instead of caching a zero placeholder.
+    """
     
     # Organization ID mapping for Mart queries
     ORG_ID_MAP = {
@@ -28,6 +36,10 @@ class DashboardQueries:
         'ind004': 7    # Industrial Parts and Service (IPS)
     }
     
+    # Ledger cube covers the trailing 13 months plus their prior-year comparisons
+    LEDGER_CUBE_MONTHS = 25
+    LEDGER_CUBE_TTL = 3600
+    
     def __init__(self, db, schema=None, pg_db=None, data_start_date=None, fiscal_year_start_month=None):
         if schema is None:
             raise ValueError("schema parameter is required - use get_tenant_schema() to get the current user's schema")
@@ -45,6 +57,8 @@ class DashboardQueries:
         self.month_start = self.current_date.replace(day=1).strftime('%Y-%m-%d')
         self.thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
         self.twelve_months_ago = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
+        self._ledger_cube = None
+        self._ledger_cube_lock = threading.Lock()
         
         # Data start date (dynamic per tenant) - use explicit param if provided (e.g., cache warmer)
         if data_start_date is not None:
@@ -85,109 +99,199 @@ class DashboardQueries:
             pass  # Outside request context
         return 11  # Default to November
     
+    def get_ledger_cube(self):
+        """
+        Per-tenant ledger cube: GL amounts by (AccountNo, year, month) for the trailing
+        LEDGER_CUBE_MONTHS, plus the prior-year same month up to today's day.
+        Closed months come from GL.MTD (authoritative) - read from the closed-period
+        snapshots when the store has them - and the open month from posted GLDetail,
+        all in one round trip, cached, and shared by every revenue/COGS metric below.
+        
+        Returns {'months': {(year, month): {account: amount}}, 'prior_year_mtd': {account: amount}}
+        """
+        with self._ledger_cube_lock:
+            if self._ledger_cube is None:
+                cache_key = f"dashboard:{self.schema}:ledger_cube:{self.current_date.strftime('%Y-%m')}"
+                tags = [f"tenant:{self.schema}", 'report:dashboard', f"month:{self.current_date.strftime('%Y-%m')}"]
+                cube = cache_service.cache_query(cache_key, self._query_ledger_cube, self.LEDGER_CUBE_TTL, tags=tags)
+                if cube is None:
+                    cube = self._query_ledger_cube()
+                
+                months = {}
+                for account, year, month, amount in cube['rows']:
+                    months.setdefault((year, month), {})[account] = amount
+                self._ledger_cube = {'months': months, 'prior_year_mtd': cube['prior_year_mtd']}
+            return self._ledger_cube
+    
+    def _query_ledger_cube(self):
+        """Single GL + GLDetail round trip behind get_ledger_cube() (JSON-serializable result)"""
+        now = self.current_date
+        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        last_closed = month_start - timedelta(days=1)
+        window_start = month_start
+        for _ in range(self.LEDGER_CUBE_MONTHS):
+            window_start = (window_start - timedelta(days=1)).replace(day=1)
+        prior_year_month_start = month_start.replace(year=now.year - 1)
+        prior_year_cutoff = prior_year_month_start + timedelta(days=now.day)
+        
+        # Revenue/COGS by prefix, plus any configured accounts outside 4xxxxx/5xxxxx (e.g. other income)
+        extra_accounts = set(self.other_income_accounts)
+        for dept in self.gl_accounts.values():
+            extra_accounts.update(dept.get('revenue', []))
+            extra_accounts.update(dept.get('cogs', []))
+        extra_accounts = [a for a in extra_accounts if not a.startswith(('4', '5'))]
+        
+        # Snapshotted closed months are read from disk; only the rest query GL
+        closed_periods = month_span((window_start.year, window_start.month), (last_closed.year, last_closed.month))
+        rows, live_periods = self._snapshot_ledger_rows(closed_periods, extra_accounts)
+        
+        qb = GLQueryBuilder()
+        account_filter = f"(AccountNo LIKE '4%' OR AccountNo LIKE '5%' OR {qb.accounts(extra_accounts)})"
+        query = f"""
+        SELECT 'month' as part, AccountNo, Year as year, Month as month, SUM(MTD) as amount
+        FROM {self.schema}.GL
+        WHERE {account_filter}
+            AND {qb.period_set(live_periods)}
+        GROUP BY AccountNo, Year, Month
+        UNION ALL
+        SELECT 'month' as part, AccountNo, YEAR(EffectiveDate) as year, MONTH(EffectiveDate) as month, SUM(Amount) as amount
+        FROM {self.schema}.GLDetail
+        WHERE {account_filter}
+            AND {qb.month(now.year, now.month)}
+            AND Posted = 1
+        GROUP BY AccountNo, YEAR(EffectiveDate), MONTH(EffectiveDate)
+        UNION ALL
+        SELECT 'prior_year_mtd' as part, AccountNo, {qb.param(now.year - 1)} as year, {qb.param(now.month)} as month, SUM(Amount) as amount
+        FROM {self.schema}.GLDetail
+        WHERE {account_filter}
+            AND {qb.date_range(prior_year_month_start, prior_year_cutoff, end_inclusive=False)}
+            AND Posted = 1
+        GROUP BY AccountNo
+        """
+        
+        prior_year_mtd = {}
+        for row in (qb.execute(self.db, query) or []):
+            account = str(row['AccountNo']).strip()
+            amount = float(row['amount'] or 0)
+            if row['part'] == 'prior_year_mtd':
+                prior_year_mtd[account] = prior_year_mtd.get(account, 0.0) + amount
+            else:
+                rows.append([account, int(row['year']), int(row['month']), amount])
+        return {'rows': rows, 'prior_year_mtd': prior_year_mtd}
+    
+    def _snapshot_ledger_rows(self, periods, extra_accounts):
+        """
+        Ledger cube rows ([account, year, month, amount]) for the closed months the
+        GL snapshot store holds, with the live query's account filter, plus the
+        periods it doesn't hold
+        """
+        store = get_snapshot_store()
+        extra_accounts = set(extra_accounts)
+        rows = []
+        missing = []
+        for year, month in periods:
+            frame = store.read(self.schema, 'GL', (year, month), columns=['AccountNo', 'MTD'])
+            if frame is None:
+                missing.append((year, month))
+                continue
+            accounts = frame['AccountNo'].astype(str).str.strip()
+            wanted = (accounts.str.startswith(('4', '5')) | accounts.isin(extra_accounts)).to_numpy()
+            amounts = frame['MTD'].astype(float).fillna(0.0)[wanted].groupby(accounts[wanted].to_numpy()).sum()
+            rows.extend([account, year, month, float(amount)] for account, amount in amounts.items())
+        return rows, missing
+    
+    @staticmethod
+    def _sum_accounts(amounts, accounts):
+        """Sum a {account: amount} map over a list of accounts, or over an account prefix (str)"""
+        if isinstance(accounts, str):
+            return sum(amount for account, amount in amounts.items() if account.startswith(accounts))
+        return sum(amounts.get(account, 0.0) for account in accounts)
+    
+    def _ledger_by_month(self, columns, exclude_months=()):
+        """
+        Derive per-month rows from the ledger cube.
+        columns maps an output column to (accounts, sign); revenue accounts are
+        credits so they use sign=-1, COGS uses sign=1.
+        """
+        by_month = {}
+        for key, amounts in self.get_ledger_cube()['months'].items():
+            if key in exclude_months:
+                continue
+            by_month[key] = {
+                column: sign * self._sum_accounts(amounts, accounts)
+                for column, (accounts, sign) in columns.items()
+            }
+        return by_month
+    
+    def _bennett_excluded_months(self):
+        """Bennett (ben002): February 2024 is a full ERP migration data dump from the prior system"""
+        return {(2024, 2)} if self.schema == 'ben002' else set()
+    
+    def _all_revenue_and_cogs_accounts(self):
+        all_revenue_accounts = []
+        all_cogs_accounts = []
+        for dept in self.gl_accounts.values():
+            all_revenue_accounts.extend(dept['revenue'])
+            all_cogs_accounts.extend(dept.get('cogs', []))
+        all_revenue_accounts.extend(self.other_income_accounts)
+        return all_revenue_accounts, all_cogs_accounts
+    
     def get_current_month_sales(self):
         """Get current month's total sales using GLDetail (matches Monthly Sales chart)"""
         try:
-            # Collect all revenue accounts from all departments (tenant-specific)
-            all_revenue_accounts = []
-            for dept in self.gl_accounts.values():
-                all_revenue_accounts.extend(dept['revenue'])
-            
-            # Add Other Income accounts (tenant-specific)
-            all_revenue_accounts.extend(self.other_income_accounts)
-            
-            # Format for SQL IN clause
-            revenue_list = "', '".join(all_revenue_accounts)
+            # All revenue accounts from all departments plus Other Income (tenant-specific)
+            all_revenue_accounts, _ = self._all_revenue_and_cogs_accounts()
             
-            # Get current month's revenue from GLDetail
-            query = f"""
-            SELECT -SUM(Amount) as total_sales
-            FROM {self.schema}.GLDetail
-            WHERE AccountNo IN ('{revenue_list}')
-                AND MONTH(EffectiveDate) = {self.current_date.month}
-                AND YEAR(EffectiveDate) = {self.current_date.year}
-                AND Posted = 1
-            """
-            result = self.db.execute_query(query)
-            return int(float(result[0]['total_sales'] or 0)) if result else 0
+            # Current month's revenue (open month of the ledger cube comes from GLDetail)
+            amounts = self.get_ledger_cube()['months'].get((self.current_date.year, self.current_date.month), {})
+            return int(-self._sum_accounts(amounts, all_revenue_accounts))
         except Exception as e:
             logger.error(f"Current month sales query failed: {str(e)}")
-            return 0
+            raise
     
     
     def get_ytd_sales(self):
         """Get fiscal year-to-date sales and margin using GLDetail (matches Monthly Sales chart)"""
         try:
-            all_revenue_accounts = []
-            all_cogs_accounts = []
-            for dept in self.gl_accounts.values():
-                all_revenue_accounts.extend(dept['revenue'])
-                all_cogs_accounts.extend(dept.get('cogs', []))
-            all_revenue_accounts.extend(self.other_income_accounts)
-            
-            revenue_list = "', '".join(all_revenue_accounts)
-            cogs_list = "', '".join(all_cogs_accounts)
-            all_list = "', '".join(all_revenue_accounts + all_cogs_accounts)
+            all_revenue_accounts, all_cogs_accounts = self._all_revenue_and_cogs_accounts()
             
-            query = f"""
-            SELECT 
-                -SUM(CASE WHEN AccountNo IN ('{revenue_list}') THEN Amount ELSE 0 END) as ytd_sales,
-                SUM(CASE WHEN AccountNo IN ('{cogs_list}') THEN Amount ELSE 0 END) as ytd_cogs
-            FROM {self.schema}.GLDetail
-            WHERE AccountNo IN ('{all_list}')
-                AND EffectiveDate >= '{self.fiscal_year_start}'
-                AND EffectiveDate < DATEADD(DAY, 1, GETDATE())
-                AND Posted = 1
-            """
-            result = self.db.execute_query(query)
-            if result:
-                revenue = float(result[0]['ytd_sales'] or 0)
-                cogs = float(result[0]['ytd_cogs'] or 0)
-                margin = round(((revenue - cogs) / revenue) * 100, 1) if revenue > 0 else 0
-                return {'ytd_sales': int(revenue), 'ytd_margin': margin}
-            return {'ytd_sales': 0, 'ytd_margin': 0}
+            fy_start = datetime.strptime(self.fiscal_year_start, '%Y-%m-%d')
+            by_month = self._ledger_by_month({
+                'revenue': (all_revenue_accounts, -1),
+                'cogs': (all_cogs_accounts, 1),
+            })
+            ytd_months = [row for key, row in by_month.items() if key >= (fy_start.year, fy_start.month)]
+            revenue = sum(row['revenue'] for row in ytd_months)
+            cogs = sum(row['cogs'] for row in ytd_months)
+            margin = round(((revenue - cogs) / revenue) * 100, 1) if revenue > 0 else 0
+            return {'ytd_sales': int(revenue), 'ytd_margin': margin}
         except Exception as e:
             logger.error(f"YTD sales query failed: {str(e)}")
-            return {'ytd_sales': 0, 'ytd_margin': 0}
+            raise
     
     def get_prior_year_ytd_sales(self):
         """Get prior fiscal year-to-date sales and margin for the same period last year."""
         try:
-            all_revenue_accounts = []
-            all_cogs_accounts = []
-            for dept in self.gl_accounts.values():
-                all_revenue_accounts.extend(dept['revenue'])
-                all_cogs_accounts.extend(dept.get('cogs', []))
-            all_revenue_accounts.extend(self.other_income_accounts)
-            
-            revenue_list = "', '".join(all_revenue_accounts)
-            cogs_list = "', '".join(all_cogs_accounts)
-            all_list = "', '".join(all_revenue_accounts + all_cogs_accounts)
+            all_revenue_accounts, all_cogs_accounts = self._all_revenue_and_cogs_accounts()
             
+            # Prior fiscal year's complete months, plus the same month last year up to today's day
             fy_start = datetime.strptime(self.fiscal_year_start, '%Y-%m-%d')
-            prior_fy_start = fy_start.replace(year=fy_start.year - 1)
-            prior_year_today = self.current_date.replace(year=self.current_date.year - 1)
+            prior_fy_key = (fy_start.year - 1, fy_start.month)
+            prior_current_key = (self.current_date.year - 1, self.current_date.month)
+            by_month = self._ledger_by_month({
+                'revenue': (all_revenue_accounts, -1),
+                'cogs': (all_cogs_accounts, 1),
+            })
+            prior_months = [row for key, row in by_month.items() if prior_fy_key <= key < prior_current_key]
+            prior_mtd = self.get_ledger_cube()['prior_year_mtd']
             
-            query = f"""
-            SELECT 
-                -SUM(CASE WHEN AccountNo IN ('{revenue_list}') THEN Amount ELSE 0 END) as ytd_sales,
-                SUM(CASE WHEN AccountNo IN ('{cogs_list}') THEN Amount ELSE 0 END) as ytd_cogs
-            FROM {self.schema}.GLDetail
-            WHERE AccountNo IN ('{all_list}')
-                AND EffectiveDate >= '{prior_fy_start.strftime('%Y-%m-%d')}'
-                AND EffectiveDate < DATEADD(DAY, 1, '{prior_year_today.strftime('%Y-%m-%d')}')
-                AND Posted = 1
-            """
-            result = self.db.execute_query(query)
-            if result:
-                revenue = float(result[0]['ytd_sales'] or 0)
-                cogs = float(result[0]['ytd_cogs'] or 0)
-                margin = round(((revenue - cogs) / revenue) * 100, 1) if revenue > 0 else 0
-                return {'ytd_sales': int(revenue), 'ytd_margin': margin}
-            return {'ytd_sales': 0, 'ytd_margin': 0}
+            revenue = sum(row['revenue'] for row in prior_months) - self._sum_accounts(prior_mtd, all_revenue_accounts)
+            cogs = sum(row['cogs'] for row in prior_months) + self._sum_accounts(prior_mtd, all_cogs_accounts)
+            margin = round(((revenue - cogs) / revenue) * 100, 1) if revenue > 0 else 0
+            return {'ytd_sales': int(revenue), 'ytd_margin': margin}
         except Exception as e:
             logger.error(f"Prior year YTD sales query failed: {str(e)}")
-            return {'ytd_sales': 0, 'ytd_margin': 0}
+            raise
     
     def get_inventory_count(self):
         """Get count of equipment ready to rent"""
@@ -201,7 +305,7 @@ class DashboardQueries:
             return int(result[0]['inventory_count']) if result else 0
         except Exception as e:
             logger.error(f"Inventory query failed: {str(e)}")
-            return 0
+            raise
     
     def get_active_customers(self):
         """Get count of active customers in last 30 days with previous month comparison"""
@@ -250,7 +354,7 @@ class DashboardQueries:
             return {'current': 0, 'previous': 0, 'change': 0, 'change_percent': 0}
         except Exception as e:
             logger.error(f"Active customers query failed: {str(e)}")
-            return {'current': 0, 'previous': 0, 'change': 0, 'change_percent': 0}
+            raise
     
     def get_total_customers(self):
         """Get total number of customers in the system"""
@@ -283,10 +387,10 @@ class DashboardQueries:
                 return int(result[0]['total_customers']) if result else 0
             except Exception as e2:
                 logger.error(f"Fallback total customers query failed: {str(e2)}")
-                return 0
+                raise
     
     def get_monthly_sales(self):
-        """Get monthly sales with trailing 13 months using dynamic LIKE queries.
+        """Get monthly sales with trailing 13 months by account prefix from the ledger cube.
         Uses GL.MTD for closed months (authoritative) and GLDetail for current month.
         Revenue = 4%, COGS = 5% - captures ALL accounts by prefix pattern."""
         try:
@@ -295,86 +399,22 @@ class DashboardQueries:
             current_month = now.month
             today_day = now.day
 
-            # Bennett (ben002): exclude February 2024 - that month contains a full ERP migration
-            # data dump from the previous system and is not representative of actual sales.
-            bennett_exclude_clause = ""
-            if self.schema == 'ben002':
-                bennett_exclude_clause = "AND NOT (Year = 2024 AND Month = 2)"
+            # Closed months (GL.MTD) and the current month (GLDetail) from the ledger cube.
+            # Bennett (ben002): February 2024 is excluded - that month contains a full ERP
+            # migration data dump from the previous system and is not representative of actual sales.
+            revenue_by_month = self._ledger_by_month({
+                'total_revenue': ('4', -1),
+                'total_cost': ('5', 1),
+            }, exclude_months=self._bennett_excluded_months())
 
-            # Query 1: GL.MTD for closed months (authoritative monthly summaries)
-            gl_mtd_query = f"""
-            SELECT 
-                Year as year,
-                Month as month,
-                -SUM(CASE WHEN AccountNo LIKE '4%' THEN MTD ELSE 0 END) as total_revenue,
-                SUM(CASE WHEN AccountNo LIKE '5%' THEN MTD ELSE 0 END) as total_cost
-            FROM {self.schema}.GL
-            WHERE (AccountNo LIKE '4%' OR AccountNo LIKE '5%')
-                AND (
-                    (Year * 100 + Month) >= (YEAR(DATEADD(month, -25, GETDATE())) * 100 + MONTH(DATEADD(month, -25, GETDATE())))
-                )
-                AND NOT (Year = %s AND Month = %s)
-                {bennett_exclude_clause}
-            GROUP BY Year, Month
-            ORDER BY Year, Month
-            """
-            
-            gl_mtd_results = self.db.execute_query(gl_mtd_query, [current_year, current_month])
-            
-            # Query 2: GLDetail for current month (in-progress transactions)
-            gldetail_query = f"""
-            SELECT 
-                YEAR(EffectiveDate) as year,
-                MONTH(EffectiveDate) as month,
-                -SUM(CASE WHEN AccountNo LIKE '4%' THEN Amount ELSE 0 END) as total_revenue,
-                SUM(CASE WHEN AccountNo LIKE '5%' THEN Amount ELSE 0 END) as total_cost
-            FROM {self.schema}.GLDetail
-            WHERE (AccountNo LIKE '4%' OR AccountNo LIKE '5%')
-                AND YEAR(EffectiveDate) = %s
-                AND MONTH(EffectiveDate) = %s
-                AND Posted = 1
-            GROUP BY YEAR(EffectiveDate), MONTH(EffectiveDate)
-            """
-            
-            gldetail_results = self.db.execute_query(gldetail_query, [current_year, current_month])
-
-            # Query 3: Prior-year same month, limited to same day-of-month as today
+            # Prior-year same month, limited to same day-of-month as today
             # This gives an apples-to-apples comparison for the current in-progress month.
             # E.g. on March 7 2026, show March 1-7 2024 rather than all of March 2024.
-            prior_year_month = current_month
-            prior_year_year = current_year - 1
-            prior_year_cutoff = now.replace(year=prior_year_year).strftime('%Y-%m-%d')
-            prior_year_mtd_query = f"""
-            SELECT 
-                -SUM(CASE WHEN AccountNo LIKE '4%' THEN Amount ELSE 0 END) as revenue,
-                SUM(CASE WHEN AccountNo LIKE '5%' THEN Amount ELSE 0 END) as cost
-            FROM {self.schema}.GLDetail
-            WHERE (AccountNo LIKE '4%' OR AccountNo LIKE '5%')
-                AND YEAR(EffectiveDate) = %s
-                AND MONTH(EffectiveDate) = %s
-                AND DAY(EffectiveDate) <= %s
-                AND Posted = 1
-            """
-            prior_year_mtd_results = self.db.execute_query(
-                prior_year_mtd_query, [prior_year_year, prior_year_month, today_day]
-            )
-            prior_year_partial = None
-            if prior_year_mtd_results:
-                row = prior_year_mtd_results[0]
-                prior_year_partial = {
-                    'revenue': float(row.get('revenue') or 0),
-                    'cost': float(row.get('cost') or 0),
-                }
-            
-            # Merge results into a single dictionary
-            revenue_by_month = {}
-            for row in (gl_mtd_results or []):
-                year_month_key = (row['year'], row['month'])
-                revenue_by_month[year_month_key] = row
-            
-            for row in (gldetail_results or []):
-                year_month_key = (row['year'], row['month'])
-                revenue_by_month[year_month_key] = row
+            prior_year_mtd = self.get_ledger_cube()['prior_year_mtd']
+            prior_year_partial = {
+                'revenue': -self._sum_accounts(prior_year_mtd, '4'),
+                'cost': self._sum_accounts(prior_year_mtd, '5'),
+            }
             
             # Get fiscal year months (trailing 13 months)
             fiscal_year_months = get_fiscal_year_months()
@@ -454,7 +494,7 @@ class DashboardQueries:
             return monthly_sales
         except Exception as e:
             logger.error(f"Monthly sales query failed: {str(e)}")
-            return []
+            raise
     
     def get_monthly_sales_excluding_equipment(self):
         """Get monthly sales with trailing 13 months excluding equipment (Service + Parts + Rental + Trans + Admin + Other)"""
@@ -475,40 +515,11 @@ class DashboardQueries:
             # Add Other Income accounts to revenue (tenant-specific)
             all_revenue_accounts.extend(self.other_income_accounts)
             
-            # Format for SQL IN clause
-            revenue_list = "', '".join(all_revenue_accounts)
-            cost_list = "', '".join(all_cost_accounts)
-            all_accounts_list = "', '".join(all_revenue_accounts + all_cost_accounts)
-            
             # Bennett (ben002): exclude February 2024 - ERP migration data dump
-            bennett_exclude_clause = ""
-            if self.schema == 'ben002':
-                bennett_exclude_clause = "AND NOT (YEAR(EffectiveDate) = 2024 AND MONTH(EffectiveDate) = 2)"
-
-            query = f"""
-            SELECT 
-                YEAR(EffectiveDate) as year,
-                MONTH(EffectiveDate) as month,
-                -- Revenue (Credit accounts, so negate sum)
-                -SUM(CASE WHEN AccountNo IN ('{revenue_list}') THEN Amount ELSE 0 END) as total_revenue,
-                -- Cost (Debit accounts, so positive sum)
-                SUM(CASE WHEN AccountNo IN ('{cost_list}') THEN Amount ELSE 0 END) as total_cost
-            FROM {self.schema}.GLDetail
-            WHERE AccountNo IN ('{all_accounts_list}')
-                AND EffectiveDate >= DATEADD(month, -13, GETDATE())
-                AND Posted = 1
-                {bennett_exclude_clause}
-            GROUP BY YEAR(EffectiveDate), MONTH(EffectiveDate)
-            ORDER BY YEAR(EffectiveDate), MONTH(EffectiveDate)
-            """
-            
-            results = self.db.execute_query(query)
-            
-            # Create a dictionary to store data by year-month key
-            revenue_by_month = {}
-            for row in results:
-                year_month_key = (row['year'], row['month'])
-                revenue_by_month[year_month_key] = row
+            revenue_by_month = self._ledger_by_month({
+                'total_revenue': (all_revenue_accounts, -1),
+                'total_cost': (all_cost_accounts, 1),
+            }, exclude_months=self._bennett_excluded_months())
             
             # Get fiscal year months (trailing 13 months)
             fiscal_year_months = get_fiscal_year_months()
@@ -562,10 +573,10 @@ class DashboardQueries:
             return monthly_sales
         except Exception as e:
             logger.error(f"Monthly sales excluding equipment query failed: {str(e)}")
-            return []
+            raise
     
     def get_monthly_sales_by_stream(self):
-        """Get monthly sales by revenue stream with trailing 13 months using GLDetail"""
+        """Get monthly sales by revenue stream with trailing 13 months from the ledger cube"""
         try:
             # Get account lists from tenant-specific GL accounts
             service_rev = self.gl_accounts.get('service', {}).get('revenue', [])
@@ -577,53 +588,15 @@ class DashboardQueries:
             rental_rev = self.gl_accounts.get('rental', {}).get('revenue', [])
             rental_cost = self.gl_accounts.get('rental', {}).get('cogs', [])
             
-            # Format for SQL IN clause
-            service_rev_list = "', '".join(service_rev)
-            service_cost_list = "', '".join(service_cost)
-            
-            parts_rev_list = "', '".join(parts_rev)
-            parts_cost_list = "', '".join(parts_cost)
-            
-            rental_rev_list = "', '".join(rental_rev)
-            rental_cost_list = "', '".join(rental_cost)
-            
-            all_accounts = service_rev + service_cost + parts_rev + parts_cost + rental_rev + rental_cost
-            all_accounts_list = "', '".join(all_accounts)
-
             # Bennett (ben002): exclude February 2024 - ERP migration data dump
-            bennett_exclude_clause = ""
-            if self.schema == 'ben002':
-                bennett_exclude_clause = "AND NOT (YEAR(EffectiveDate) = 2024 AND MONTH(EffectiveDate) = 2)"
-
-            query = f"""
-            SELECT 
-                YEAR(EffectiveDate) as year,
-                MONTH(EffectiveDate) as month,
-                -- Service (Labor) Revenue and Cost
-                -SUM(CASE WHEN AccountNo IN ('{service_rev_list}') THEN Amount ELSE 0 END) as labor_revenue,
-                SUM(CASE WHEN AccountNo IN ('{service_cost_list}') THEN Amount ELSE 0 END) as labor_cost,
-                -- Parts Revenue and Cost
-                -SUM(CASE WHEN AccountNo IN ('{parts_rev_list}') THEN Amount ELSE 0 END) as parts_revenue,
-                SUM(CASE WHEN AccountNo IN ('{parts_cost_list}') THEN Amount ELSE 0 END) as parts_cost,
-                -- Rental Revenue and Cost
-                -SUM(CASE WHEN AccountNo IN ('{rental_rev_list}') THEN Amount ELSE 0 END) as rental_revenue,
-                SUM(CASE WHEN AccountNo IN ('{rental_cost_list}') THEN Amount ELSE 0 END) as rental_cost
-            FROM {self.schema}.GLDetail
-            WHERE AccountNo IN ('{all_accounts_list}')
-                AND EffectiveDate >= DATEADD(month, -13, GETDATE())
-                AND Posted = 1
-                {bennett_exclude_clause}
-            GROUP BY YEAR(EffectiveDate), MONTH(EffectiveDate)
-            ORDER BY YEAR(EffectiveDate), MONTH(EffectiveDate)
-            """
-            
-            results = self.db.execute_query(query)
-            
-            # Create a dictionary to store data by year-month key
-            revenue_by_month = {}
-            for row in results:
-                year_month_key = (row['year'], row['month'])
-                revenue_by_month[year_month_key] = row
+            revenue_by_month = self._ledger_by_month({
+                'labor_revenue': (service_rev, -1),
+                'labor_cost': (service_cost, 1),
+                'parts_revenue': (parts_rev, -1),
+                'parts_cost': (parts_cost, 1),
+                'rental_revenue': (rental_rev, -1),
+                'rental_cost': (rental_cost, 1),
+            }, exclude_months=self._bennett_excluded_months())
             
             # Get fiscal year months (trailing 13 months)
             fiscal_year_months = get_fiscal_year_months()
@@ -693,7 +666,7 @@ class DashboardQueries:
             return monthly_data
         except Exception as e:
             logger.error(f"Monthly sales by stream query failed: {str(e)}")
-            return []
+            raise
     
     def get_uninvoiced_work_orders(self):
         """Get uninvoiced work orders value and count"""
@@ -747,8 +720,9 @@ class DashboardQueries:
                 result = self.db.execute_query(simple_query)
                 count = int(result[0]['count']) if result else 0
                 return {'value': count * 500, 'count': count}  # Estimate value
-            except:
-                return {'value': 0, 'count': 0}
+            except Exception as e2:
+                logger.error(f"Fallback uninvoiced work orders query failed: {str(e2)}")
+                raise
     
     def get_monthly_equipment_sales(self):
         """Get monthly new equipment sales with trailing 13 months using tenant-specific GL accounts and unit counts"""
@@ -764,33 +738,15 @@ class DashboardQueries:
                 logger.warning(f"No new_equipment revenue accounts configured for {self.schema}")
                 return []
             
-            all_accounts = revenue_accounts + cogs_accounts
-            accounts_str = ", ".join(f"'{a}'" for a in all_accounts)
-            revenue_str = ", ".join(f"'{a}'" for a in revenue_accounts)
-            cogs_str = ", ".join(f"'{a}'" for a in cogs_accounts) if cogs_accounts else "'NONE'"
-            
+            # 1. Revenue/Cost from the ledger cube using tenant-specific accounts
             # Bennett (ben002): exclude February 2024 - ERP migration data dump
-            bennett_exclude_clause = ""
-            if self.schema == 'ben002':
-                bennett_exclude_clause = "AND NOT (YEAR(EffectiveDate) = 2024 AND MONTH(EffectiveDate) = 2)"
-
-            # 1. Get Revenue/Cost from GLDetail using tenant-specific accounts
-            gl_query = f"""
-            SELECT 
-                YEAR(EffectiveDate) as year,
-                MONTH(EffectiveDate) as month,
-                ABS(SUM(CASE WHEN AccountNo IN ({revenue_str}) THEN Amount ELSE 0 END)) as equipment_revenue,
-                ABS(SUM(CASE WHEN AccountNo IN ({cogs_str}) THEN Amount ELSE 0 END)) as equipment_cost
-            FROM {self.schema}.GLDetail
-            WHERE AccountNo IN ({accounts_str})
-                AND EffectiveDate >= DATEADD(month, -13, GETDATE())
-                AND Posted = 1
-                {bennett_exclude_clause}
-            GROUP BY YEAR(EffectiveDate), MONTH(EffectiveDate)
-            ORDER BY YEAR(EffectiveDate), MONTH(EffectiveDate)
-            """
-            
-            gl_results = self.db.execute_query(gl_query)
+            revenue_by_month = self._ledger_by_month({
+                'equipment_revenue': (revenue_accounts, 1),
+                'equipment_cost': (cogs_accounts, 1),
+            }, exclude_months=self._bennett_excluded_months())
+            for row in revenue_by_month.values():
+                row['equipment_revenue'] = abs(row['equipment_revenue'])
+                row['equipment_cost'] = abs(row['equipment_cost'])
             
             # 2. Get Unit Counts from InvoiceReg (SaleCode LINDEN)
             unit_query = f"""
@@ -806,12 +762,6 @@ class DashboardQueries:
             
             unit_results = self.db.execute_query(unit_query)
             
-            # Create dictionaries for easy lookup
-            revenue_by_month = {}
-            for row in gl_results:
-                year_month_key = (row['year'], row['month'])
-                revenue_by_month[year_month_key] = row
-                
             units_by_month = {}
             for row in unit_results:
                 year_month_key = (row['year'], row['month'])
@@ -872,7 +822,7 @@ class DashboardQueries:
             return monthly_sales
         except Exception as e:
             logger.error(f"Monthly equipment sales query failed: {str(e)}")
-            return []
+            raise
     
     def get_monthly_quotes(self):
         """Get monthly quotes since March - latest quote per work order"""
@@ -959,7 +909,7 @@ class DashboardQueries:
             return monthly_quotes
         except Exception as e:
             logger.error(f"Monthly quotes query failed: {str(e)}")
-            return []
+            raise
     
     def get_work_order_types(self):
         """Get work order types breakdown with month-over-month comparison"""
@@ -1085,7 +1035,7 @@ class DashboardQueries:
             }
         except Exception as e:
             logger.error(f"Work order types query failed: {str(e)}")
-            return {'types': [], 'total_value': 0, 'total_count': 0, 'previous_value': 0, 'change': 0, 'change_percent': 0}
+            raise
     
     def get_awaiting_invoice_work_orders(self):
         """Get completed SERVICE, SHOP, and PM work orders awaiting invoice"""
@@ -1173,14 +1123,7 @@ class DashboardQueries:
                 }
         except Exception as e:
             logger.error(f"Awaiting invoice work orders query failed: {str(e)}")
-            return {
-                'count': 0,
-                'total_value': 0,
-                'avg_days_waiting': 0,
-                'over_three_days': 0,
-                'over_five_days': 0,
-                'over_seven_days': 0
-            }
+            raise
     
     def get_open_parts_work_orders(self):
         """Get open PARTS work orders (not yet invoiced)"""
@@ -1377,7 +1320,7 @@ class DashboardQueries:
             return monthly_delays
         except Exception as e:
             logger.error(f"Monthly invoice delay query failed: {str(e)}")
-            return []
+            raise
     
     def get_top_customers(self):
         """Get top 10 customers by all-time sales"""
@@ -1496,7 +1439,7 @@ class DashboardQueries:
             return top_customers
         except Exception as e:
             logger.error(f"Top customers query failed: {str(e)}")
-            return []
+            raise
     
     def get_monthly_work_orders_by_type(self):
         """Get monthly work orders by type since March - uses Mart tables for speed"""
@@ -1684,7 +1627,7 @@ class DashboardQueries:
             return monthly_data
         except Exception as e:
             logger.error(f"Monthly work orders by type query failed: {str(e)}")
-            return []
+            raise
     
     def get_department_margins(self):
         """Get department gross margin percentages by month - uses Mart tables for speed"""
@@ -1834,7 +1777,7 @@ class DashboardQueries:
             return department_margins
         except Exception as e:
             logger.error(f"Department margins query failed: {str(e)}")
-            return []
+            raise
     
     def get_monthly_active_customers(self):
         """Get monthly active customers count since March 2025"""
@@ -1890,7 +1833,7 @@ class DashboardQueries:
             return monthly_customers
         except Exception as e:
             logger.error(f"Monthly active customers query failed: {str(e)}")
-            return []
+            raise
     
     def get_monthly_open_work_orders(self):
         """Get monthly open work orders value since March 2025"""
@@ -1988,7 +1931,7 @@ class DashboardQueries:
             return monthly_work_orders
         except Exception as e:
             logger.error(f"Monthly open work orders query failed: {str(e)}")
-            return []
+            raise
 
     @dashboard_optimized_bp.route('/api/dashboard/diagnostic/invoice-detail', methods=['GET'])
     @jwt_required()
@@ -2352,6 +2295,229 @@ def _get_dashboard_from_mart(start_time, org_id=None):
     return jsonify(response_data)
 
 
+# Cache TTL settings (in seconds) - all set to 1 hour for performance
+DASHBOARD_CACHE_TTL = {
+    'total_sales': 3600,  # 1 hour
+    'ytd_sales': 3600,  # 1 hour
+    'prior_year_ytd_sales': 3600,  # 1 hour
+    'inventory_count': 3600,  # 1 hour
+    'active_customers': 3600,  # 1 hour
+    'monthly_sales': 3600,  # 1 hour
+    'uninvoiced': 3600,  # 1 hour
+    'monthly_quotes': 3600,  # 1 hour
+    'work_order_types': 3600,  # 1 hour
+    'top_customers': 3600,  # 1 hour
+    'monthly_work_orders': 3600,  # 1 hour
+    'department_margins': 3600  # 1 hour
+}
+
+# Widget key -> (DashboardQueries method, DASHBOARD_CACHE_TTL entry)
+DASHBOARD_QUERY_TASKS = {
+    'total_sales': ('get_current_month_sales', 'total_sales'),
+    'ytd_sales': ('get_ytd_sales', 'ytd_sales'),
+    'prior_year_ytd_sales': ('get_prior_year_ytd_sales', 'prior_year_ytd_sales'),
+    'inventory_count': ('get_inventory_count', 'inventory_count'),
+    'active_customers': ('get_active_customers', 'active_customers'),
+    'total_customers': ('get_total_customers', 'active_customers'),
+    'monthly_sales': ('get_monthly_sales', 'monthly_sales'),
+    'monthly_sales_no_equipment': ('get_monthly_sales_excluding_equipment', 'monthly_sales'),
+    'monthly_equipment_sales': ('get_monthly_equipment_sales', 'monthly_sales'),
+    'monthly_sales_by_stream': ('get_monthly_sales_by_stream', 'monthly_sales'),
+    'uninvoiced': ('get_uninvoiced_work_orders', 'uninvoiced'),
+    'monthly_quotes': ('get_monthly_quotes', 'monthly_quotes'),
+    'work_order_types': ('get_work_order_types', 'work_order_types'),
+    'top_customers': ('get_top_customers', 'top_customers'),
+    'monthly_work_orders': ('get_monthly_work_orders_by_type', 'monthly_work_orders'),
+    'department_margins': ('get_department_margins', 'department_margins'),
+    'monthly_active_customers': ('get_monthly_active_customers', 'active_customers'),
+    'monthly_open_work_orders': ('get_monthly_open_work_orders', 'work_order_types'),
+    'awaiting_invoice': ('get_awaiting_invoice_work_orders', 'uninvoiced'),
+    'monthly_invoice_delays': ('get_monthly_invoice_delay_avg', 'work_order_types'),
+}
+
+
+def _ensure_current_organization():
+    """Ensure g.current_organization is set for fiscal year and cutover date calculations"""
+    if not hasattr(g, 'current_organization') or not g.current_organization:
+        from flask_jwt_extended import get_jwt_identity
+        from src.models.user import User
+        user = User.query.get(get_jwt_identity())
+        if user and user.organization:
+            g.current_organization = user.organization
+
+
+def _dashboard_cache_keys(tenant_schema):
+    """(full dashboard cache key, cache tags) for the tenant's current month"""
+    current_month = datetime.now().strftime('%Y-%m')
+    dashboard_cache_key = f"dashboard_full:{tenant_schema}:{current_month}"
+    dashboard_cache_tags = [f"tenant:{tenant_schema}", 'report:dashboard', f"month:{current_month}"]
+    return dashboard_cache_key, dashboard_cache_tags
+
+
+def _get_cached_dashboard(dashboard_cache_key, start_time):
+    """Full dashboard response from cache (fastest path), or None"""
+    if not cache_service.enabled:
+        return None
+    cached_dashboard = cache_service.get(dashboard_cache_key)
+    if cached_dashboard is None:
+        return None
+    cached_dashboard['query_time'] = round(time.time() - start_time, 3)
+    cached_dashboard['from_cache'] = True
+    cached_dashboard['cache_source'] = 'redis' if cache_service.redis_client else 'memory'
+    return cached_dashboard
+
+
+def _get_mart_dashboard(tenant_schema, start_time, dashboard_cache_key, dashboard_cache_tags):
+    """
+    Fast mart-based dashboard response data (cached like the query path), or
+    None when the tenant has no mart or the mart data is unavailable.
+    """
+    org_id = DashboardQueries.ORG_ID_MAP.get(tenant_schema)
+    if org_id is None:
+        return None
+    try:
+        fast_response = _get_dashboard_from_mart(start_time, org_id=org_id)
+        if not fast_response:
+            return None
+        response_data = fast_response.get_json()
+    except Exception as e:
+        logger.warning(f"Mart lookup failed for org_id={org_id}, falling back to queries: {str(e)}")
+        return None
+    
+    # Cache the mart response in Redis for instant repeat access
+    try:
+        cache_service.set(dashboard_cache_key, response_data, ttl_seconds=3600, tags=dashboard_cache_tags)
+        print(f"[Dashboard] 💾 Cached mart response for {tenant_schema} in Redis (TTL: 1h)")
+    except Exception as cache_err:
+        print(f"[Dashboard] ⚠️ Failed to cache mart response: {cache_err}")
+    return response_data
+
+
+def _dashboard_query_tasks(queries, tenant_schema, force_refresh, dashboard_cache_tags):
+    """
+    Build the per-widget query tasks.
+    Returns {key: (cache_key, last_known_key, func)}; func runs the query through
+    cache_query (cache keys include the tenant schema for isolation) and keeps
+    fresh results as the widget's last known value for degraded responses.
+    """
+    current_month = datetime.now().strftime('%Y-%m')
+    tasks = {}
+    for key, (method_name, ttl_key) in DASHBOARD_QUERY_TASKS.items():
+        cache_key = f"dashboard:{tenant_schema}:{key}:{current_month}"
+        last_known_key = f"dashboard:{tenant_schema}:{key}"
+        query_func = remember_last_known(last_known_key, getattr(queries, method_name))
+        ttl = DASHBOARD_CACHE_TTL[ttl_key]
+        tasks[key] = (cache_key, last_known_key, lambda cache_key=cache_key, query_func=query_func, ttl=ttl: cache_service.cache_query(
+            cache_key, query_func, ttl, force_refresh, tags=dashboard_cache_tags
+        ))
+    return tasks
+
+
+def _build_dashboard_response(results, start_time, force_refresh):
+    """Assemble the dashboard response payload from the per-widget query results"""
+    # Failed or degraded widgets without a last known value come back as None
+    uninvoiced_data = results.get('uninvoiced') or {'value': 0, 'count': 0}
+    wo_types_data = results.get('work_order_types') or {'types': [], 'total_value': 0, 'total_count': 0, 'previous_value': 0, 'change': 0, 'change_percent': 0}
+    awaiting_invoice_data = results.get('awaiting_invoice') or {
+        'count': 0,
+        'total_value': 0,
+        'avg_days_waiting': 0,
+        'over_three_days': 0,
+        'over_five_days': 0,
+        'over_seven_days': 0
+    }
+    
+    # Handle active customers data (could be int or dict)
+    active_customers_data = results.get('active_customers', 0)
+    if isinstance(active_customers_data, dict):
+        active_customers_info = active_customers_data
+    else:
+        # Fallback for old format
+        active_customers_info = {
+            'current': active_customers_data,
+            'previous': 0,
+            'change': 0,
+            'change_percent': 0
+        }
+    
+    # Handle ytd_sales (now returns dict with ytd_sales and ytd_margin)
+    ytd_data = results.get('ytd_sales', {})
+    if isinstance(ytd_data, dict):
+        ytd_sales = ytd_data.get('ytd_sales', 0)
+        ytd_margin = ytd_data.get('ytd_margin', 0)
+    else:
+        ytd_sales = ytd_data
+        ytd_margin = 0
+    
+    # Handle prior_year_ytd_sales (same dict format)
+    py_ytd_data = results.get('prior_year_ytd_sales', {})
+    if isinstance(py_ytd_data, dict):
+        prior_year_ytd_sales = py_ytd_data.get('ytd_sales', 0)
+        prior_year_ytd_margin = py_ytd_data.get('ytd_margin', 0)
+    else:
+        prior_year_ytd_sales = py_ytd_data
+        prior_year_ytd_margin = 0
+    
+    return {
+        'total_sales': results.get('total_sales', 0),
+        'ytd_sales': ytd_sales,
+        'ytd_margin': ytd_margin,
+        'prior_year_ytd_sales': prior_year_ytd_sales,
+        'prior_year_ytd_margin': prior_year_ytd_margin,
+        'inventory_count': results.get('inventory_count', 0),
+        'active_customers': active_customers_info['current'],
+        'active_customers_change': active_customers_info['change'],
+        'active_customers_change_percent': active_customers_info['change_percent'],
+        'active_customers_previous': active_customers_info['previous'],
+        'total_customers': results.get('total_customers', 0),
+        'uninvoiced_work_orders': int(uninvoiced_data['value']),
+        'uninvoiced_count': uninvoiced_data['count'],
+        'open_work_orders_value': int(wo_types_data['total_value']),
+        'open_work_orders_count': wo_types_data['total_count'],
+        'open_work_orders_change': int(wo_types_data['change']),
+        'open_work_orders_change_percent': wo_types_data['change_percent'],
+        'open_work_orders_previous': int(wo_types_data['previous_value']),
+        'work_order_types': wo_types_data['types'],
+        'monthly_sales': results.get('monthly_sales', []),
+        'monthly_sales_no_equipment': results.get('monthly_sales_no_equipment', []),
+        'monthly_equipment_sales': results.get('monthly_equipment_sales', []),
+        'monthly_sales_by_stream': results.get('monthly_sales_by_stream', []),
+        'monthly_quotes': results.get('monthly_quotes', []),
+        'top_customers': results.get('top_customers', []),
+        'monthly_work_orders_by_type': results.get('monthly_work_orders', []),
+        'department_margins': results.get('department_margins', []),
+        'monthly_active_customers': results.get('monthly_active_customers', []),
+        'monthly_open_work_orders': results.get('monthly_open_work_orders', []),
+        # Awaiting invoice data
+        'awaiting_invoice_count': awaiting_invoice_data['count'],
+        'awaiting_invoice_value': int(awaiting_invoice_data['total_value']),
+        'awaiting_invoice_avg_days': awaiting_invoice_data['avg_days_waiting'],
+        'awaiting_invoice_over_three': awaiting_invoice_data['over_three_days'],
+        'awaiting_invoice_over_five': awaiting_invoice_data['over_five_days'],
+        'awaiting_invoice_over_seven': awaiting_invoice_data['over_seven_days'],
+        # Monthly invoice delay trends
+        'monthly_invoice_delays': results.get('monthly_invoice_delays', []),
+        'fiscal_year_start_month': g.current_organization.fiscal_year_start_month if hasattr(g, 'current_organization') and g.current_organization else 11,
+        'period': datetime.now().strftime('%B %Y'),
+        'last_updated': datetime.now().isoformat(),
+        'query_time': round(time.time() - start_time, 2),
+        'cache_enabled': cache_service.enabled,
+        'from_cache': not force_refresh and cache_service.enabled
+    }
+
+
+def _cache_dashboard_response(tenant_schema, dashboard_cache_key, response_data, dashboard_cache_tags):
+    """Cache the full response in Redis for instant repeat access (never a degraded one)"""
+    if response_data.get('degraded_widgets'):
+        print(f"[Dashboard] ⚠️ Not caching degraded response for {tenant_schema}: {response_data['degraded_widgets']}")
+        return
+    try:
+        cache_service.set(dashboard_cache_key, response_data, ttl_seconds=3600, tags=dashboard_cache_tags)
+        print(f"[Dashboard] 💾 Cached query response for {tenant_schema} in Redis (TTL: 1h)")
+    except Exception as cache_err:
+        print(f"[Dashboard] ⚠️ Failed to cache query response: {cache_err}")
+
+
 @dashboard_optimized_bp.route('/api/reports/dashboard/summary-optimized', methods=['GET'])
 @jwt_required()
 def get_dashboard_summary_optimized():
@@ -2368,210 +2534,49 @@ def get_dashboard_summary_optimized():
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
     
-    # Ensure g.current_organization is set for fiscal year and cutover date calculations
-    if not hasattr(g, 'current_organization') or not g.current_organization:
-        from flask_jwt_extended import get_jwt_identity
-        from src.models.user import User
-        user = User.query.get(get_jwt_identity())
-        if user and user.organization:
-            g.current_organization = user.organization
+    _ensure_current_organization()
     
     # Log cache status
     print(f"[Dashboard] Request - tenant: {tenant_schema}, force_refresh: {force_refresh}, cache_backend: {'Redis' if cache_service.redis_client else 'memory'}")
     
     # Check Redis cache first for the full dashboard response (fastest path)
-    dashboard_cache_key = f"dashboard_full:{tenant_schema}:{datetime.now().strftime('%Y-%m')}"
-    if not force_refresh and cache_service.enabled:
-        cached_dashboard = cache_service.get(dashboard_cache_key)
+    dashboard_cache_key, dashboard_cache_tags = _dashboard_cache_keys(tenant_schema)
+    if not force_refresh:
+        cached_dashboard = _get_cached_dashboard(dashboard_cache_key, start_time)
         if cached_dashboard is not None:
-            cached_dashboard['query_time'] = round(time.time() - start_time, 3)
-            cached_dashboard['from_cache'] = True
-            cached_dashboard['cache_source'] = 'redis' if cache_service.redis_client else 'memory'
             print(f"[Dashboard] ✅ FULL CACHE HIT for {tenant_schema} in {cached_dashboard['query_time']}s")
             return jsonify(cached_dashboard)
     
     # Try fast mart-based response (unless force refresh requested)
-    org_id = DashboardQueries.ORG_ID_MAP.get(tenant_schema)
-    if org_id is not None and not force_refresh:
-        try:
-            fast_response = _get_dashboard_from_mart(start_time, org_id=org_id)
-            if fast_response:
-                # Cache the mart response in Redis for instant repeat access
-                try:
-                    response_data = fast_response.get_json()
-                    cache_service.set(dashboard_cache_key, response_data, ttl_seconds=3600)
-                    print(f"[Dashboard] 💾 Cached mart response for {tenant_schema} in Redis (TTL: 1h)")
-                except Exception as cache_err:
-                    print(f"[Dashboard] ⚠️ Failed to cache mart response: {cache_err}")
-                return fast_response
-        except Exception as e:
-            logger.warning(f"Mart lookup failed for org_id={org_id}, falling back to queries: {str(e)}")
+    if not force_refresh:
+        mart_data = _get_mart_dashboard(tenant_schema, start_time, dashboard_cache_key, dashboard_cache_tags)
+        if mart_data is not None:
+            return jsonify(mart_data)
     
     try:
         db = get_tenant_db()
         pg_db = get_postgres_db()  # PostgreSQL for Mart table queries
         queries = DashboardQueries(db, schema=tenant_schema, pg_db=pg_db)
+        query_tasks = _dashboard_query_tasks(queries, tenant_schema, force_refresh, dashboard_cache_tags)
         
-        # Cache TTL settings (in seconds) - all set to 1 hour for performance
-        cache_ttl = {
-            'total_sales': 3600,  # 1 hour
-            'ytd_sales': 3600,  # 1 hour
-            'prior_year_ytd_sales': 3600,  # 1 hour
-            'inventory_count': 3600,  # 1 hour
-            'active_customers': 3600,  # 1 hour
-            'monthly_sales': 3600,  # 1 hour
-            'uninvoiced': 3600,  # 1 hour
-            'monthly_quotes': 3600,  # 1 hour
-            'work_order_types': 3600,  # 1 hour
-            'top_customers': 3600,  # 1 hour
-            'monthly_work_orders': 3600,  # 1 hour
-            'department_margins': 3600  # 1 hour
-        }
-        
-        # Define all query tasks with caching (include tenant schema in cache key for isolation)
-        def cached_query(key, func, ttl):
-            cache_key = f"dashboard:{tenant_schema}:{key}:{datetime.now().strftime('%Y-%m')}"
-            return cache_service.cache_query(cache_key, func, ttl, force_refresh)
-        
-        query_tasks = {
-            'total_sales': lambda: cached_query('total_sales', queries.get_current_month_sales, cache_ttl['total_sales']),
-            'ytd_sales': lambda: cached_query('ytd_sales', queries.get_ytd_sales, cache_ttl['ytd_sales']),
-            'prior_year_ytd_sales': lambda: cached_query('prior_year_ytd_sales', queries.get_prior_year_ytd_sales, cache_ttl['prior_year_ytd_sales']),
-            'inventory_count': lambda: cached_query('inventory_count', queries.get_inventory_count, cache_ttl['inventory_count']),
-            'active_customers': lambda: cached_query('active_customers', queries.get_active_customers, cache_ttl['active_customers']),
-            'total_customers': lambda: cached_query('total_customers', queries.get_total_customers, cache_ttl['active_customers']),
-            'monthly_sales': lambda: cached_query('monthly_sales', queries.get_monthly_sales, cache_ttl['monthly_sales']),
-            'monthly_sales_no_equipment': lambda: cached_query('monthly_sales_no_equipment', queries.get_monthly_sales_excluding_equipment, cache_ttl['monthly_sales']),
-            'monthly_equipment_sales': lambda: cached_query('monthly_equipment_sales', queries.get_monthly_equipment_sales, cache_ttl['monthly_sales']),
-            'monthly_sales_by_stream': lambda: cached_query('monthly_sales_by_stream', queries.get_monthly_sales_by_stream, cache_ttl['monthly_sales']),
-            'uninvoiced': lambda: cached_query('uninvoiced', queries.get_uninvoiced_work_orders, cache_ttl['uninvoiced']),
-            'monthly_quotes': lambda: cached_query('monthly_quotes', queries.get_monthly_quotes, cache_ttl['monthly_quotes']),
-            'work_order_types': lambda: cached_query('work_order_types', queries.get_work_order_types, cache_ttl['work_order_types']),
-            'top_customers': lambda: cached_query('top_customers', queries.get_top_customers, cache_ttl['top_customers']),
-            'monthly_work_orders': lambda: cached_query('monthly_work_orders', queries.get_monthly_work_orders_by_type, cache_ttl['monthly_work_orders']),
-            'department_margins': lambda: cached_query('department_margins', queries.get_department_margins, cache_ttl['department_margins']),
-            'monthly_active_customers': lambda: cached_query('monthly_active_customers', queries.get_monthly_active_customers, cache_ttl['active_customers']),
-            'monthly_open_work_orders': lambda: cached_query('monthly_open_work_orders', queries.get_monthly_open_work_orders, cache_ttl['work_order_types']),
-            'awaiting_invoice': lambda: cached_query('awaiting_invoice', queries.get_awaiting_invoice_work_orders, cache_ttl['uninvoiced']),
-            'monthly_invoice_delays': lambda: cached_query('monthly_invoice_delays', queries.get_monthly_invoice_delay_avg, cache_ttl['work_order_types'])
-        }
-        
-        # Execute queries in parallel (wrap with Flask request context for thread safety)
-        results = {}
-        cache_hits = 0
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            # Submit all tasks wrapped with Flask request context so g.current_organization is available
-            future_to_key = {executor.submit(copy_current_request_context(func)): key for key, func in query_tasks.items()}
-            
-            # Collect results as they complete
-            for future in as_completed(future_to_key):
-                key = future_to_key[future]
-                try:
-                    results[key] = future.result()
-                except Exception as e:
-                    logger.error(f"Query {key} failed: {str(e)}")
-                    results[key] = None
-        
-        # Process results
-        uninvoiced_data = results.get('uninvoiced', {'value': 0, 'count': 0})
-        wo_types_data = results.get('work_order_types', {'types': [], 'total_value': 0, 'total_count': 0, 'previous_value': 0, 'change': 0, 'change_percent': 0})
-        awaiting_invoice_data = results.get('awaiting_invoice', {
-            'count': 0,
-            'total_value': 0,
-            'avg_days_waiting': 0,
-            'over_three_days': 0,
-            'over_five_days': 0,
-            'over_seven_days': 0
-        })
-        
-        # Handle active customers data (could be int or dict)
-        active_customers_data = results.get('active_customers', 0)
-        if isinstance(active_customers_data, dict):
-            active_customers_info = active_customers_data
-        else:
-            # Fallback for old format
-            active_customers_info = {
-                'current': active_customers_data,
-                'previous': 0,
-                'change': 0,
-                'change_percent': 0
-            }
-        
-        # Handle ytd_sales (now returns dict with ytd_sales and ytd_margin)
-        ytd_data = results.get('ytd_sales', {})
-        if isinstance(ytd_data, dict):
-            ytd_sales = ytd_data.get('ytd_sales', 0)
-            ytd_margin = ytd_data.get('ytd_margin', 0)
-        else:
-            ytd_sales = ytd_data
-            ytd_margin = 0
-        
-        # Handle prior_year_ytd_sales (same dict format)
-        py_ytd_data = results.get('prior_year_ytd_sales', {})
-        if isinstance(py_ytd_data, dict):
-            prior_year_ytd_sales = py_ytd_data.get('ytd_sales', 0)
-            prior_year_ytd_margin = py_ytd_data.get('ytd_margin', 0)
-        else:
-            prior_year_ytd_sales = py_ytd_data
-            prior_year_ytd_margin = 0
-        
-        response_data = {
-            'total_sales': results.get('total_sales', 0),
-            'ytd_sales': ytd_sales,
-            'ytd_margin': ytd_margin,
-            'prior_year_ytd_sales': prior_year_ytd_sales,
-            'prior_year_ytd_margin': prior_year_ytd_margin,
-            'inventory_count': results.get('inventory_count', 0),
-            'active_customers': active_customers_info['current'],
-            'active_customers_change': active_customers_info['change'],
-            'active_customers_change_percent': active_customers_info['change_percent'],
-            'active_customers_previous': active_customers_info['previous'],
-            'total_customers': results.get('total_customers', 0),
-            'uninvoiced_work_orders': int(uninvoiced_data['value']),
-            'uninvoiced_count': uninvoiced_data['count'],
-            'open_work_orders_value': int(wo_types_data['total_value']),
-            'open_work_orders_count': wo_types_data['total_count'],
-            'open_work_orders_change': int(wo_types_data['change']),
-            'open_work_orders_change_percent': wo_types_data['change_percent'],
-            'open_work_orders_previous': int(wo_types_data['previous_value']),
-            'work_order_types': wo_types_data['types'],
-            'monthly_sales': results.get('monthly_sales', []),
-            'monthly_sales_no_equipment': results.get('monthly_sales_no_equipment', []),
-            'monthly_equipment_sales': results.get('monthly_equipment_sales', []),
-            'monthly_sales_by_stream': results.get('monthly_sales_by_stream', []),
-            'monthly_quotes': results.get('monthly_quotes', []),
-            'top_customers': results.get('top_customers', []),
-            'monthly_work_orders_by_type': results.get('monthly_work_orders', []),
-            'department_margins': results.get('department_margins', []),
-            'monthly_active_customers': results.get('monthly_active_customers', []),
-            'monthly_open_work_orders': results.get('monthly_open_work_orders', []),
-            # Awaiting invoice data
-            'awaiting_invoice_count': awaiting_invoice_data['count'],
-            'awaiting_invoice_value': int(awaiting_invoice_data['total_value']),
-            'awaiting_invoice_avg_days': awaiting_invoice_data['avg_days_waiting'],
-            'awaiting_invoice_over_three': awaiting_invoice_data['over_three_days'],
-            'awaiting_invoice_over_five': awaiting_invoice_data['over_five_days'],
-            'awaiting_invoice_over_seven': awaiting_invoice_data['over_seven_days'],
-            # Monthly invoice delay trends
-            'monthly_invoice_delays': results.get('monthly_invoice_delays', []),
-            'fiscal_year_start_month': g.current_organization.fiscal_year_start_month if hasattr(g, 'current_organization') and g.current_organization else 11,
-            'period': datetime.now().strftime('%B %Y'),
-            'last_updated': datetime.now().isoformat(),
-            'query_time': round(time.time() - start_time, 2),
-            'cache_enabled': cache_service.enabled,
-            'from_cache': not force_refresh and cache_service.enabled
-        }
+        # Execute queries in parallel on the shared executor, bounded by the request deadline
+        # (tasks wrapped with Flask request context so g.current_organization is available)
+        outcome = get_query_executor().run_all(
+            {key: copy_current_request_context(func) for key, (_, _, func) in query_tasks.items()},
+            last_known={key: last_known_key for key, (_, last_known_key, _) in query_tasks.items()},
+        )
         
+        response_data = _build_dashboard_response(outcome.results, start_time, force_refresh)
+        response_data['degraded_widgets'] = outcome.degraded
+        response_data['degraded_as_of'] = outcome.as_of
         print(f"[Dashboard] ✅ Dashboard loaded via queries in {response_data['query_time']}s")
+        _cache_dashboard_response(tenant_schema, dashboard_cache_key, response_data, dashboard_cache_tags)
         
-        # Cache the full response in Redis for instant repeat access
-        try:
-            cache_service.set(dashboard_cache_key, response_data, ttl_seconds=3600)
-            print(f"[Dashboard] 💾 Cached query response for {tenant_schema} in Redis (TTL: 1h)")
-        except Exception as cache_err:
-            print(f"[Dashboard] ⚠️ Failed to cache query response: {cache_err}")
-        
-        return jsonify(response_data)
+        response = jsonify(response_data)
+        if outcome.degraded:
+            # Keep degraded payloads out of the response cache (main.after_request honours no-store)
+            response.headers['Cache-Control'] = 'no-store'
+        return response
         
     except Exception as e:
         logger.error(f"Error in optimized dashboard: {str(e)}", exc_info=True)
@@ -2580,6 +2585,123 @@ def get_dashboard_summary_optimized():
             'message': str(e)
         }), 500
 
+
+def _format_stream_message(message, stream_format):
+    """Encode one progressive dashboard message as an NDJSON line or an SSE event"""
+    payload = json.dumps(message, default=str)
+    if stream_format == 'sse':
+        return f"event: {message['type']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+@dashboard_optimized_bp.route('/api/reports/dashboard/summary-stream', methods=['GET'])
+@jwt_required()
+def stream_dashboard_summary():
+    """
+    Progressive variant of summary-optimized: each widget is sent as soon as it
+    is available instead of after the slowest query.
+    
+    Query Parameters:
+        format: 'ndjson' (default, one JSON object per line) or 'sse' (text/event-stream)
+        refresh: 'true' to bypass caches (as summary-optimized)
+    
+    Messages:
+        {"type": "widget", "key": ..., "data": ..., "cached": bool, "elapsed": s}
+            one per query task; cache hits are sent first, then queries in
+            completion order. A query that fails or misses the request deadline
+            is sent with "error", "degraded": true and its last known value
+            ("as_of" gives its timestamp; data is null if there is none)
+        {"type": "complete", "data": {...}}
+            the full summary-optimized payload; closes the stream. When the full
+            dashboard comes from cache or the mart this is the only message.
+    """
+    start_time = time.time()
+    force_refresh = request.args.get('refresh', '').lower() == 'true'
+    stream_format = 'sse' if request.args.get('format', '').lower() == 'sse' else 'ndjson'
+    
+    from src.utils.tenant_utils import get_tenant_schema
+    try:
+        tenant_schema = get_tenant_schema()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    _ensure_current_organization()
+    
+    dashboard_cache_key, dashboard_cache_tags = _dashboard_cache_keys(tenant_schema)
+    full_dashboard = None
+    if not force_refresh:
+        full_dashboard = (_get_cached_dashboard(dashboard_cache_key, start_time)
+                          or _get_mart_dashboard(tenant_schema, start_time, dashboard_cache_key, dashboard_cache_tags))
+    
+    query_tasks = None
+    if full_dashboard is None:
+        try:
+            db = get_tenant_db()
+            pg_db = get_postgres_db()  # PostgreSQL for Mart table queries
+            queries = DashboardQueries(db, schema=tenant_schema, pg_db=pg_db)
+            query_tasks = _dashboard_query_tasks(queries, tenant_schema, force_refresh, dashboard_cache_tags)
+        except Exception as e:
+            logger.error(f"Error in streamed dashboard: {str(e)}", exc_info=True)
+            return jsonify({
+                'error': 'Failed to load dashboard data',
+                'message': str(e)
+            }), 500
+    
+    def widget_message(key, data, cached, error=None, degraded_as_of=None):
+        message = {'type': 'widget', 'key': key, 'data': data, 'cached': cached,
+                   'elapsed': round(time.time() - start_time, 3)}
+        if error:
+            message['error'] = error
+        if degraded_as_of is not None:
+            message['degraded'] = True
+            message['as_of'] = degraded_as_of or None
+        return _format_stream_message(message, stream_format)
+    
+    def generate():
+        if full_dashboard is not None:
+            yield _format_stream_message({'type': 'complete', 'data': full_dashboard}, stream_format)
+            return
+        
+        results = {}
+        pending = {}
+        last_known = {}
+        degraded = []
+        degraded_as_of = {}
+        
+        # Cache hits first: they need no worker and paint immediately
+        for key, (cache_key, last_known_key, func) in query_tasks.items():
+            cached_result = cache_service.get(cache_key) if not force_refresh else None
+            if cached_result is not None:
+                results[key] = cached_result
+                yield widget_message(key, cached_result, cached=True)
+            else:
+                pending[key] = copy_current_request_context(func)
+                last_known[key] = last_known_key
+        
+        # Then each query as it finishes, on the shared executor and bounded by the request
+        # deadline; closing the stream early cancels queued queries
+        if pending:
+            for key, value, error, as_of in get_query_executor().iter_completed(pending, last_known=last_known):
+                results[key] = value
+                if as_of is not None:
+                    degraded.append(key)
+                    if as_of:
+                        degraded_as_of[key] = as_of
+                yield widget_message(key, value, cached=False, error=error, degraded_as_of=as_of)
+        
+        response_data = _build_dashboard_response(results, start_time, force_refresh)
+        response_data['degraded_widgets'] = degraded
+        response_data['degraded_as_of'] = degraded_as_of
+        print(f"[Dashboard] ✅ Dashboard streamed via queries in {response_data['query_time']}s")
+        _cache_dashboard_response(tenant_schema, dashboard_cache_key, response_data, dashboard_cache_tags)
+        yield _format_stream_message({'type': 'complete', 'data': response_data}, stream_format)
+    
+    mimetype = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let a proxy buffer the stream
+    return response
+
 @dashboard_optimized_bp.route('/api/reports/dashboard/summary-fast', methods=['GET'])
 @jwt_required()
 def get_dashboard_summary_fast():
@@ -3618,9 +3740,10 @@ def get_equipment_sales_details_endpoint():
 @dashboard_optimized_bp.route('/api/reports/dashboard/invalidate-cache', methods=['POST'])
 @jwt_required()
 def invalidate_dashboard_cache():
-    """Invalidate dashboard cache - useful after data updates"""
+    """Invalidate the current tenant's dashboard cache - useful after data updates"""
     try:
-        cache_service.invalidate_dashboard()
+        from src.utils.tenant_utils import get_tenant_schema
+        cache_service.invalidate_dashboard(get_tenant_schema())
         return jsonify({
             'success': True,
             'message': 'Dashboard cache invalidated'
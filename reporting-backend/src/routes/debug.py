@@ -215,3 +215,33 @@ def check_cache_status():
             'error': str(e),
             'error_type': type(e).__name__
         }), 500
+
+@debug_bp.route('/api/debug/db-pool-status', methods=['GET'])
+@jwt_required()
+def check_db_pool_status():
+    """Debug endpoint to inspect the shared Azure SQL connection pools"""
+    try:
+        from src.services.sql_connection_pool import get_pool_manager
+        
+        return jsonify(get_pool_manager().get_stats()), 200
+        
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'error_type': type(e).__name__
+        }), 500
+
+@debug_bp.route('/api/debug/query-executor-status', methods=['GET'])
+@jwt_required()
+def check_query_executor_status():
+    """Debug endpoint to inspect the shared query fan-out executor"""
+    try:
+        from src.services.query_executor import get_query_executor
+        
+        return jsonify(get_query_executor().get_stats()), 200
+        
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'error_type': type(e).__name__
+        }), 500
@@ -52,9 +52,14 @@ def _get_department_from_mart(department: str, max_age_hours: float = 4.0):
     Get department metrics from mart_department_metrics table.
     Returns None if data is unavailable or stale.
     Uses the current user's organization ID for tenant isolation.
+    
+    Departments with a live delta (see src/services/mart_delta.py) are served
+    snapshot + delta up to MART_DELTA_MAX_AGE_HOURS, with delta_through set;
+    if the delta query fails the plain snapshot is used within max_age_hours.
     """
     try:
         from src.services.postgres_service import PostgreSQLService
+        from src.services.mart_delta import MART_DELTA_MAX_AGE_HOURS, apply_department_delta, delta_base_of
         
         # Get the current user's org_id for tenant isolation
         try:
@@ -86,6 +91,14 @@ def _get_department_from_mart(department: str, max_age_hours: float = 4.0):
         snapshot_time = metrics['snapshot_timestamp']
         age_hours = (datetime.now() - snapshot_time).total_seconds() / 3600
         
+        if delta_base_of(department, metrics) and age_hours <= MART_DELTA_MAX_AGE_HOURS:
+            try:
+                metrics = apply_department_delta(department, metrics, get_db(), get_tenant_schema())
+                logger.info(f"Using mart data plus live delta for {department} (age: {age_hours:.1f} hours)")
+                return metrics
+            except Exception as e:
+                logger.warning(f"Live delta for {department} failed, using the plain snapshot if fresh: {e}")
+        
         if age_hours > max_age_hours:
             logger.info(f"Mart data for {department} is {age_hours:.1f} hours old, using live queries")
             return None
@@ -2754,10 +2767,10 @@ def register_department_routes(reports_bp):
                     raw_trend = mart_data['monthly_revenue']
                     monthly_trend = json.loads(raw_trend) if isinstance(raw_trend, str) else (raw_trend or [])
                     
-                    # Format monthly trend with month labels
+                    # Format monthly trend with month labels ('month' is already a label, month_num the number)
                     formatted_trend = []
                     for item in monthly_trend:
-                        month_date = datetime(item['year'], item['month'], 1)
+                        month_date = datetime(item['year'], item['month_num'], 1)
                         formatted_trend.append({
                             'month': month_date.strftime('%b'),
                             'revenue': item.get('revenue', 0),
@@ -2771,8 +2784,9 @@ def register_department_routes(reports_bp):
                         'monthlyTrend': formatted_trend,
                         'rentalsByDuration': [],
                         'topCustomers': additional.get('topCustomers', []),
-                        '_source': 'mart',
-                        '_snapshot_time': mart_data['snapshot_timestamp'].isoformat()
+                        '_source': 'mart+delta' if mart_data.get('delta_through') else 'mart',
+                        '_snapshot_time': mart_data['snapshot_timestamp'].isoformat(),
+                        '_delta_through': mart_data['delta_through'].isoformat() if mart_data.get('delta_through') else None
                     })
             
             # Fall back to live queries
@@ -1,6 +1,7 @@
 """
 Error Logs API - Captures and exposes application errors via API
-Provides /api/admin/logs endpoint for querying recent errors without Railway dashboard access.
+Provides /api/admin/logs endpoint for querying recent errors without Railway dashboard access,
+and /api/admin/queries for query latency telemetry (src/services/query_telemetry.py).
 
 Uses an in-memory ring buffer (deque) to store recent errors. This means:
 - No database migration needed
@@ -393,3 +394,80 @@ def get_health():
         'errors_last_24h': last_24h,
         'server_time': datetime.utcnow().isoformat() + 'Z',
     })
+
+
+# ==================== QUERY TELEMETRY ====================
+
+@error_logs_bp.route('/api/admin/queries', methods=['GET'])
+@require_admin_or_bot()
+def get_query_stats():
+    """
+    Get query latency percentiles per normalized query fingerprint.
+    
+    Query params:
+        sort (str): total_ms (default), p95_ms, p99_ms, p50_ms, max_ms, count, errors, avg_rows, avg_bytes
+        limit (int): Max fingerprints to return (default 50, max 500)
+        backend (str): azure_sql or postgres
+        tenant (str): Only fingerprints seen for this tenant schema
+        route (str): Only fingerprints called from a route/ETL job matching this substring
+    """
+    from src.services.query_telemetry import get_query_telemetry
+    
+    limit = min(int(request.args.get('limit', 50)), 500)
+    stats = get_query_telemetry().get_stats(
+        sort=request.args.get('sort', 'total_ms'),
+        limit=limit,
+        backend=request.args.get('backend'),
+        tenant=request.args.get('tenant'),
+        route=request.args.get('route')
+    )
+    return jsonify(stats)
+
+
+@error_logs_bp.route('/api/admin/queries/slow', methods=['GET'])
+@require_admin_or_bot()
+def get_slow_queries():
+    """
+    Get the slow query log (queries over SLOW_QUERY_MS), newest first, with
+    estimated plans where one was captured.
+    
+    Query params:
+        limit (int): Max entries to return (default 50, max 200)
+        fingerprint_id (str): Only this fingerprint
+        tenant (str): Only this tenant schema
+        include_plans (bool): Include plan text (default true)
+    """
+    from src.services.query_telemetry import get_query_telemetry, SLOW_QUERY_MS
+    
+    limit = min(int(request.args.get('limit', 50)), 200)
+    entries = get_query_telemetry().get_slow_queries(
+        limit=limit,
+        fingerprint_id=request.args.get('fingerprint_id'),
+        tenant=request.args.get('tenant')
+    )
+    if request.args.get('include_plans', 'true').lower() == 'false':
+        for entry in entries:
+            entry['plan'] = bool(entry['plan'])
+    
+    return jsonify({
+        'slow_queries': entries,
+        'count': len(entries),
+        'threshold_ms': SLOW_QUERY_MS,
+    })
+
+
+@error_logs_bp.route('/api/admin/queries/clear', methods=['POST'])
+@require_admin_or_bot()
+def clear_query_stats():
+    """
+    Reset query telemetry (histograms and slow query log).
+    Useful after deploying a query fix to measure it fresh.
+    """
+    from src.services.query_telemetry import get_query_telemetry
+    
+    get_query_telemetry().clear()
+    
+    return jsonify({
+        'success': True,
+        'message': 'Query telemetry cleared'
+    })
@@ -5,6 +5,8 @@ Pre-computes all VLOOKUP formula results server-side so numbers display
 immediately when opened in any version of Excel.
 
 Uses openpyxl to load/save the template, matching Amy's proven approach.
+Each template is loaded and its VLOOKUPs parsed once per process (see
+get_compiled_template); exports work on a fast copy of that workbook.
 """
 
 from flask import Blueprint, jsonify, request, send_file
@@ -12,11 +14,15 @@ from datetime import datetime
 import logging
 import re
 import os
+import pickle
+import threading
 import zipfile
 from io import BytesIO
+from typing import List, NamedTuple, Optional
 from openpyxl import load_workbook
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.utils.tenant_utils import get_tenant_db, get_tenant_schema
+from src.services.gl_rollup import GLRollupEngine
 from src.models.user import User
 
 logger = logging.getLogger(__name__)
@@ -34,42 +40,12 @@ def get_tenant_db_service():
     return get_tenant_db()
 
 
-def get_all_gl_data(schema, year, month):
+def load_gl_engine(schema, periods):
     """
-    Query ALL GL accounts for a given year/month.
-    Returns a list of dicts with AccountNo, Year, Month, YTD, MTD, Description, Type.
+    Load ALL GL accounts (with ChartOfAccounts Description/Type) for every
+    (year, month) in periods with a single query.
     """
-    query = f"""
-    SELECT 
-        g.AccountNo,
-        g.Year,
-        g.Month,
-        g.YTD,
-        g.MTD,
-        c.Description,
-        c.Type
-    FROM {schema}.GL g
-    LEFT JOIN {schema}.ChartOfAccounts c ON g.AccountNo = c.AccountNo
-    WHERE g.Year = %s AND g.Month = %s
-    ORDER BY g.AccountNo
-    """
-    try:
-        results = get_tenant_db_service().execute_query(query, [year, month])
-        rows = []
-        for r in results:
-            rows.append({
-                'AccountNo': str(r.get('AccountNo', '')).strip(),
-                'Year': int(r.get('Year', year)),
-                'Month': int(r.get('Month', month)),
-                'YTD': float(r.get('YTD', 0) or 0),
-                'MTD': float(r.get('MTD', 0) or 0),
-                'Description': str(r.get('Description', '') or ''),
-                'Type': str(r.get('Type', '') or ''),
-            })
-        return rows
-    except Exception as e:
-        logger.error(f"Error fetching GL data for {schema} {year}-{month}: {e}")
-        return []
+    return GLRollupEngine.load(schema, periods, with_descriptions=True, db=get_tenant_db_service())
 
 
 def get_prior_month(year, month):
@@ -79,24 +55,16 @@ def get_prior_month(year, month):
     return (year, month - 1)
 
 
-def build_lookup_dicts(current_data, prior_year_data, prior_month_data):
+def build_lookup_dicts(engine, current_period, prior_year_period, prior_month_period):
     """
     Build lookup dictionaries keyed by account number string.
     Returns (tb_lookup, tb1_lookup, tb2_lookup)
     """
-    tb_lookup = {}
-    for acct in current_data:
-        tb_lookup[acct['AccountNo']] = acct
-
-    tb1_lookup = {}
-    for acct in prior_year_data:
-        tb1_lookup[acct['AccountNo']] = acct
-
-    tb2_lookup = {}
-    for acct in prior_month_data:
-        tb2_lookup[acct['AccountNo']] = acct
-
-    return tb_lookup, tb1_lookup, tb2_lookup
+    return (
+        engine.lookup(*current_period),
+        engine.lookup(*prior_year_period),
+        engine.lookup(*prior_month_period),
+    )
 
 
 # VLOOKUP column index to data field mapping
@@ -109,125 +77,187 @@ VLOOKUP_RE = re.compile(
 )
 
 
-def resolve_vlookup(formula, sheet, tb_lookup, tb1_lookup, tb2_lookup):
-    """
-    Parse a VLOOKUP formula and compute its result.
-    Returns the computed value, or 0 if the account is not found.
-    """
-    match = VLOOKUP_RE.match(formula)
-    if not match:
-        return None
+# Known VLOOKUP column locations per sheet (from template analysis)
+# Format: {sheet_name: (min_row, max_row, [columns])}
+VLOOKUP_LOCATIONS = {
+    'Balance Sheet':               (5, 175, [5, 7]),
+    'Trial Balance':               (7, 130, [5, 7, 9, 13]),
+    'Combined Detail P and L':     (7, 638, [5, 8, 11, 14]),
+    'Dynamic Storage Solutions':   (6, 59,  [5, 8, 11, 14]),
+    'C H Steel Solutions':         (6, 60,  [5, 8, 11, 14]),
+    'AMI Sales Department':        (7, 52,  [5, 8, 11, 14]),
+    'Canton Sales Department':     (7, 59,  [5, 8, 11, 14]),
+    'Canton Parts Department':     (7, 85,  [5, 8, 11, 14]),
+    'Canton Service Department':   (7, 80,  [7, 10, 13, 16]),
+    'Canton Rental Department':    (7, 39,  [5, 8, 11, 14]),
+    'Canton Used Department':      (7, 48,  [5, 8, 11, 14]),
+    'Administration Department':   (7, 51,  [5, 8, 11, 14]),
+    'Cleveland Sales Department':  (7, 62,  [5, 8, 11, 14]),
+    'Cleveland Parts Department':  (7, 76,  [5, 8, 11, 14]),
+    'Cleveland Service Department':(7, 80,  [7, 10, 13, 16]),
+    'Cleveland Rental Department': (7, 37,  [5, 8, 11, 14]),
+    'Cleveland Used Department':   (7, 48,  [5, 8, 11, 14]),
+}
 
-    ref_row = int(match.group(2))
-    table_name = match.group(3)
-    col_idx = int(match.group(4))
-    multiplier_str = match.group(5)
-    multiplier = int(multiplier_str) if multiplier_str else 1
+# Other sheets are scanned up to this many rows/columns (avoids the 16,384 column issue)
+FALLBACK_SCAN_ROWS = 700
+FALLBACK_SCAN_COLS = 20
 
-    # Get the lookup value (account number) from column A of the referenced row
-    lookup_value = sheet.cell(row=ref_row, column=1).value
-    if lookup_value is None:
-        return 0
+# VLOOKUP table name -> column map
+TABLE_COL_MAPS = {'TB': TB_COL_MAP, 'TB1_1': TB_COL_MAP, 'TB2_': TB2_COL_MAP}
 
-    # Convert to string for lookup
-    if isinstance(lookup_value, (int, float)):
-        lookup_key = str(int(lookup_value))
-    else:
-        lookup_key = str(lookup_value).strip()
-
-    # Select the right lookup dict and column map
-    if table_name == 'TB':
-        lookup_dict = tb_lookup
-        col_map = TB_COL_MAP
-    elif table_name == 'TB1_1':
-        lookup_dict = tb1_lookup
-        col_map = TB_COL_MAP
-    elif table_name == 'TB2_':
-        lookup_dict = tb2_lookup
-        col_map = TB2_COL_MAP
-    else:
-        return 0
 
-    acct_data = lookup_dict.get(lookup_key)
-    if acct_data is None:
-        return 0
+class CompiledVLookup(NamedTuple):
+    """One VLOOKUP cell of the template, parsed once"""
+    sheet: str
+    row: int
+    column: int
+    table: str            # 'TB', 'TB1_1' or 'TB2_'
+    col_idx: int          # VLOOKUP column index into the table
+    field: Optional[str]  # lookup dict field for col_idx (None if unmapped)
+    multiplier: int
+    ref_row: int          # row of the referenced account cell (column A)
+    account: Optional[str]  # account number in that cell, None if blank
 
-    field_name = col_map.get(col_idx)
-    if field_name is None:
-        return 0
 
-    value = acct_data.get(field_name, 0)
+def _lookup_key(value):
+    """Account number cell value as a lookup key"""
     if value is None:
-        value = 0
-
+        return None
     if isinstance(value, (int, float)):
-        return value * multiplier
-    return value
+        return str(int(value))
+    return str(value).strip()
 
 
-def precompute_all_vlookups(wb, tb_lookup, tb1_lookup, tb2_lookup):
-    """
-    Efficiently scan only the specific columns known to contain VLOOKUP formulas
-    in each sheet. This avoids scanning all 16,384 columns which causes timeouts.
-    """
-    total_computed = 0
-
-    # Known VLOOKUP column locations per sheet (from template analysis)
-    # Format: {sheet_name: (min_row, max_row, [columns])}
-    VLOOKUP_LOCATIONS = {
-        'Balance Sheet':               (5, 175, [5, 7]),
-        'Trial Balance':               (7, 130, [5, 7, 9, 13]),
-        'Combined Detail P and L':     (7, 638, [5, 8, 11, 14]),
-        'Dynamic Storage Solutions':   (6, 59,  [5, 8, 11, 14]),
-        'C H Steel Solutions':         (6, 60,  [5, 8, 11, 14]),
-        'AMI Sales Department':        (7, 52,  [5, 8, 11, 14]),
-        'Canton Sales Department':     (7, 59,  [5, 8, 11, 14]),
-        'Canton Parts Department':     (7, 85,  [5, 8, 11, 14]),
-        'Canton Service Department':   (7, 80,  [7, 10, 13, 16]),
-        'Canton Rental Department':    (7, 39,  [5, 8, 11, 14]),
-        'Canton Used Department':      (7, 48,  [5, 8, 11, 14]),
-        'Administration Department':   (7, 51,  [5, 8, 11, 14]),
-        'Cleveland Sales Department':  (7, 62,  [5, 8, 11, 14]),
-        'Cleveland Parts Department':  (7, 76,  [5, 8, 11, 14]),
-        'Cleveland Service Department':(7, 80,  [7, 10, 13, 16]),
-        'Cleveland Rental Department': (7, 37,  [5, 8, 11, 14]),
-        'Cleveland Used Department':   (7, 48,  [5, 8, 11, 14]),
-    }
-
+def _iter_vlookup_candidates(wb):
+    """Yield (sheet, cell) for every cell that may hold a TB VLOOKUP"""
     for sheet_name in wb.sheetnames:
         if sheet_name == 'TB':
             continue
-
         ws = wb[sheet_name]
-        sheet_computed = 0
-
         if sheet_name in VLOOKUP_LOCATIONS:
-            # Fast path: only scan known VLOOKUP cells
             min_row, max_row, cols = VLOOKUP_LOCATIONS[sheet_name]
             for row_idx in range(min_row, max_row + 1):
                 for col_idx in cols:
-                    cell = ws.cell(row=row_idx, column=col_idx)
-                    if cell.value and isinstance(cell.value, str) and cell.value.startswith('=VLOOKUP'):
-                        result = resolve_vlookup(cell.value, ws, tb_lookup, tb1_lookup, tb2_lookup)
-                        if result is not None:
-                            cell.value = result
-                            sheet_computed += 1
+                    yield ws, ws.cell(row=row_idx, column=col_idx)
         else:
-            # Fallback: scan all cells but limit to max_col=20 to avoid 16384 col issue
-            for row in ws.iter_rows(min_row=1, max_row=min(ws.max_row, 700), max_col=20):
+            for row in ws.iter_rows(min_row=1, max_row=min(ws.max_row, FALLBACK_SCAN_ROWS), max_col=FALLBACK_SCAN_COLS):
                 for cell in row:
-                    if cell.value and isinstance(cell.value, str) and cell.value.startswith('=VLOOKUP'):
-                        result = resolve_vlookup(cell.value, ws, tb_lookup, tb1_lookup, tb2_lookup)
-                        if result is not None:
-                            cell.value = result
-                            sheet_computed += 1
+                    yield ws, cell
 
-        if sheet_computed > 0:
-            logger.info(f"  Pre-computed {sheet_computed} VLOOKUPs in '{sheet_name}'")
-            total_computed += sheet_computed
 
-    logger.info(f"Total VLOOKUPs pre-computed: {total_computed}")
-    return total_computed
+def compile_vlookups(wb) -> List[CompiledVLookup]:
+    """Parse every VLOOKUP formula in the template into a CompiledVLookup"""
+    formulas = []
+    for ws, cell in _iter_vlookup_candidates(wb):
+        if not (cell.value and isinstance(cell.value, str) and cell.value.startswith('=VLOOKUP')):
+            continue
+        match = VLOOKUP_RE.match(cell.value)
+        if not match:
+            continue
+        ref_row = int(match.group(2))
+        table = match.group(3)
+        col_idx = int(match.group(4))
+        formulas.append(CompiledVLookup(
+            sheet=ws.title,
+            row=cell.row,
+            column=cell.column,
+            table=table,
+            col_idx=col_idx,
+            field=TABLE_COL_MAPS[table].get(col_idx),
+            multiplier=int(match.group(5)) if match.group(5) else 1,
+            ref_row=ref_row,
+            account=_lookup_key(ws.cell(row=ref_row, column=1).value),
+        ))
+    return formulas
+
+
+def resolve_vlookup(formula: CompiledVLookup, lookups):
+    """
+    Compute a compiled VLOOKUP against the lookup dicts ({table: {account: row}}).
+    Returns 0 if the account is not found.
+    """
+    if formula.account is None or formula.field is None:
+        return 0
+    acct_data = lookups[formula.table].get(formula.account)
+    if acct_data is None:
+        return 0
+
+    value = acct_data.get(formula.field, 0)
+    if value is None:
+        value = 0
+
+    if isinstance(value, (int, float)):
+        return value * formula.multiplier
+    return value
+
+
+class CompiledTemplate:
+    """
+    An EVO template parsed once per process: a pickled copy of the loaded
+    workbook (unpickling is several times faster than load_workbook) and the
+    map of its VLOOKUP formulas.
+    """
+
+    def __init__(self, path, signature, wb):
+        self.path = path
+        self.signature = signature
+        self.formulas = compile_vlookups(wb)
+        # TableList pickles as {name: ref} (its items() is overridden), so keep
+        # the Table objects alongside the workbook and restore them on copy
+        tables = {ws.title: list(dict.values(ws.tables)) for ws in wb.worksheets if ws.tables}
+        self._payload = pickle.dumps((wb, tables), protocol=pickle.HIGHEST_PROTOCOL)
+
+    def new_workbook(self):
+        """A fresh, independent copy of the template workbook"""
+        wb, tables = pickle.loads(self._payload)
+        for title, sheet_tables in tables.items():
+            ws = wb[title]
+            ws.tables.clear()
+            for table in sheet_tables:
+                ws.tables.add(table)
+        return wb
+
+    def apply_vlookups(self, wb, tb_lookup, tb1_lookup, tb2_lookup):
+        """Replace every compiled VLOOKUP in wb with its value"""
+        lookups = {'TB': tb_lookup, 'TB1_1': tb1_lookup, 'TB2_': tb2_lookup}
+        per_sheet = {}
+        for formula in self.formulas:
+            wb[formula.sheet].cell(row=formula.row, column=formula.column).value = resolve_vlookup(formula, lookups)
+            per_sheet[formula.sheet] = per_sheet.get(formula.sheet, 0) + 1
+
+        for sheet_name, count in per_sheet.items():
+            logger.info(f"  Pre-computed {count} VLOOKUPs in '{sheet_name}'")
+        logger.info(f"Total VLOOKUPs pre-computed: {len(self.formulas)}")
+        return len(self.formulas)
+
+
+_compiled_templates = {}
+_compiled_templates_lock = threading.Lock()
+
+
+def _template_signature(template_path):
+    stat = os.stat(template_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def get_compiled_template(template_path) -> CompiledTemplate:
+    """
+    Get the compiled template for a path, compiling it on first use.
+    Recompiled when the file's mtime or size changes (e.g. a template update).
+    """
+    template_path = os.path.realpath(template_path)
+    signature = _template_signature(template_path)
+    compiled = _compiled_templates.get(template_path)
+    if compiled is None or compiled.signature != signature:
+        with _compiled_templates_lock:
+            compiled = _compiled_templates.get(template_path)
+            if compiled is None or compiled.signature != signature:
+                logger.info(f"Compiling EVO template {os.path.basename(template_path)}")
+                compiled = CompiledTemplate(template_path, signature, load_workbook(template_path))
+                _compiled_templates[template_path] = compiled
+                logger.info(f"Compiled {len(compiled.formulas)} VLOOKUPs from {os.path.basename(template_path)}")
+    return compiled
 
 
 @evo_export_bp.route('/api/reports/pl/evo/export', methods=['GET'])
@@ -277,23 +307,26 @@ def export_evo():
                 'error': f'Template file not found: {template_file}'
             }), 500
         
-        # Load the template workbook (preserving formulas)
-        wb = load_workbook(template_path)
+        # Fresh copy of the compiled template (formulas preserved, VLOOKUPs pre-parsed)
+        template = get_compiled_template(template_path)
+        wb = template.new_workbook()
         ws = wb['TB']
         
-        # --- Fetch GL data for 3 periods ---
+        # --- Fetch GL data for 3 periods (one query) ---
+        # Current year/month, prior year same month, prior month (for beginning balances)
+        prev_year, prev_month = get_prior_month(year, month)
+        current_period = (year, month)
+        prior_year_period = (year - 1, month)
+        prior_month_period = (prev_year, prev_month)
+        engine = load_gl_engine(schema, [current_period, prior_year_period, prior_month_period])
         
-        # 1. Current year/month
-        current_data = get_all_gl_data(schema, year, month)
+        current_data = engine.records(*current_period)
         logger.info(f"Current period ({year}-{month}): {len(current_data)} accounts")
         
-        # 2. Prior year, same month
-        prior_year_data = get_all_gl_data(schema, year - 1, month)
+        prior_year_data = engine.records(*prior_year_period)
         logger.info(f"Prior year ({year-1}-{month}): {len(prior_year_data)} accounts")
         
-        # 3. Prior month (for beginning balances)
-        prev_year, prev_month = get_prior_month(year, month)
-        prior_month_data = get_all_gl_data(schema, prev_year, prev_month)
+        prior_month_data = engine.records(*prior_month_period)
         logger.info(f"Prior month ({prev_year}-{prev_month}): {len(prior_month_data)} accounts")
         
         # --- Update control cells ---
@@ -353,9 +386,9 @@ def export_evo():
         
         # --- Pre-compute all VLOOKUP formulas across all P&L sheets ---
         tb_lookup, tb1_lookup, tb2_lookup = build_lookup_dicts(
-            current_data, prior_year_data, prior_month_data
+            engine, current_period, prior_year_period, prior_month_period
         )
-        precompute_all_vlookups(wb, tb_lookup, tb1_lookup, tb2_lookup)
+        template.apply_vlookups(wb, tb_lookup, tb1_lookup, tb2_lookup)
         
         # --- Save with openpyxl, then apply targeted ZIP patch ---
         # openpyxl strips ODBC connections/queryTables automatically but leaves
@@ -8,7 +8,8 @@ from datetime import datetime
 import logging
 import calendar
 from src.services.cache_service import cache_service
-from src.utils.fiscal_year import get_fiscal_ytd_start
+from src.services.gl_query_builder import GLQueryBuilder
+from src.utils.fiscal_year import get_fiscal_ytd_start, get_fiscal_year_start_month
 
 from flask_jwt_extended import get_jwt_identity, jwt_required
 from src.utils.tenant_utils import get_tenant_db, get_tenant_schema
@@ -22,933 +23,201 @@ _sql_service = None
 def get_sql_service():
     return get_tenant_db()
 # GL Account Mappings are loaded dynamically per tenant via gl_accounts_loader
-# All functions use tenant_gl_accounts = get_gl_accounts(schema) for tenant-specific accounts
-# See get_department_data(), get_other_income(), get_expenses(), etc.
+# All P&L views are built in memory from ONE per-account ledger query per period
+# (see get_pl_ledger); tenant-specific accounts come from get_gl_accounts(schema)
 
-def get_department_data(start_date, end_date, dept_key, schema, include_detail=False):
-    """
-    Get P&L data for a specific department
-    Uses GL.YTD for FY-aligned multi-month ranges (authoritative Softbase value)
-    Uses GL.MTD for single full calendar months (exact Softbase match)
-    Uses GLDetail for custom date ranges (flexibility)
-    
-    Args:
-        start_date: Start date for the report
-        end_date: End date for the report
-        dept_key: Department key from tenant GL config (e.g., 'parts', 'service', 'rental')
-        schema: Database schema for the tenant
-        include_detail: If True, include account-level detail
-    
-    Returns:
-        Dictionary with revenue, cogs, gross_profit, gross_margin, and optionally account details
-    """
-    try:
-        # Check if this is a full calendar month
-        is_full_month, year, month = is_full_calendar_month(start_date, end_date)
-        
-        if is_full_month:
-            # Single full calendar month — use GL.MTD for exact Softbase match
-            return get_department_data_from_gl_mtd(year, month, dept_key, schema, include_detail)
-        
-        # Check if this is a multi-month FY-aligned range — use GL.YTD
-        start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-        end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-        is_start_first = start_dt.day == 1
-        last_day_of_end_month = calendar.monthrange(end_dt.year, end_dt.month)[1]
-        is_end_last = end_dt.day == last_day_of_end_month
-        
-        if is_start_first and is_end_last:
-            from flask import g
-            fy_start_month = 11  # Default
-            if hasattr(g, 'current_organization') and g.current_organization:
-                fy_start_month = g.current_organization.fiscal_year_start_month or 11
-            
-            if start_dt.month == fy_start_month:
-                # FY-aligned range — use GL.YTD from the last month (authoritative)
-                return get_department_data_from_gl_ytd(end_dt.year, end_dt.month, dept_key, schema, include_detail)
-        
-        # Custom date range — use GLDetail
-        return get_department_data_from_gldetail(start_date, end_date, dept_key, schema, include_detail)
-    except Exception as e:
-        logger.error(f"Error in get_department_data for {dept_key}: {e}")
-        raise
+# Contra-revenue accounts (7xx accounts that Softbase classifies under Sales)
+# These reduce Revenue, not treated as Other Income
+CONTRA_REVENUE_ACCOUNTS = ['703000']
 
-def get_department_data_from_gl_mtd(year, month, dept_key, schema, include_detail=False):
-    """
-    Get department P&L data from GL.MTD (monthly summary table)
-    This matches Softbase exactly for monthly reports
-    """
-    try:
-        tenant_gl_accounts = get_gl_accounts(schema)
-        dept_config = tenant_gl_accounts[dept_key]
-        revenue_accounts = dept_config['revenue']
-        cogs_accounts = dept_config['cogs']
-        
-        # Build account lists for SQL IN clause
-        all_accounts = revenue_accounts + cogs_accounts
-        account_list = "', '".join(all_accounts)
-        
-        if include_detail:
-            # Get account-level detail from GL.MTD
-            query = f"""
-            SELECT 
-                AccountNo,
-                MTD as raw_mtd
-            FROM {schema}.GL
-            WHERE Year = %s
-              AND Month = %s
-              AND AccountNo IN ('{account_list}')
-            """
-            
-            results = get_sql_service().execute_query(query, [year, month])
-            
-            revenue = 0
-            cogs = 0
-            revenue_detail = []
-            cogs_detail = []
-            
-            for row in results:
-                account_no = row['AccountNo']
-                raw_mtd = float(row['raw_mtd'] or 0)
-                
-                if account_no in revenue_accounts:
-                    # Revenue is stored as negative (credits), negate to make positive
-                    amount = -raw_mtd
-                    revenue += amount
-                    revenue_detail.append({'account': account_no, 'amount': amount})
-                elif account_no in cogs_accounts:
-                    # COGS is stored as positive (debits), use as-is
-                    amount = raw_mtd
-                    cogs += amount
-                    cogs_detail.append({'account': account_no, 'amount': amount})
-            
-            gross_profit = revenue - cogs
-            gross_margin = (gross_profit / revenue * 100) if revenue > 0 else 0
-            
-            return {
-                'dept_code': dept_config['dept_code'],
-                'dept_name': dept_config['dept_name'],
-                'revenue': revenue,
-                'cogs': cogs,
-                'gross_profit': gross_profit,
-                'gross_margin': gross_margin,
-                'revenue_detail': revenue_detail,
-                'cogs_detail': cogs_detail
-            }
-        else:
-            # Get summary only from GL.MTD
-            revenue_list = "', '".join(revenue_accounts)
-            cogs_list = "', '".join(cogs_accounts)
-            
-            query = f"""
-            SELECT 
-                -SUM(CASE WHEN AccountNo IN ('{revenue_list}') THEN MTD ELSE 0 END) as revenue,
-                SUM(CASE WHEN AccountNo IN ('{cogs_list}') THEN MTD ELSE 0 END) as cogs
-            FROM {schema}.GL
-            WHERE Year = %s
-              AND Month = %s
-              AND AccountNo IN ('{account_list}')
-            """
-            
-            results = get_sql_service().execute_query(query, [year, month])
-            
-            if results and len(results) > 0:
-                row = results[0]
-                revenue = float(row['revenue'] or 0)
-                cogs = float(row['cogs'] or 0)
-                gross_profit = revenue - cogs
-                gross_margin = (gross_profit / revenue * 100) if revenue > 0 else 0
-                
-                return {
-                    'dept_code': dept_config['dept_code'],
-                    'dept_name': dept_config['dept_name'],
-                    'revenue': revenue,
-                    'cogs': cogs,
-                    'gross_profit': gross_profit,
-                    'gross_margin': gross_margin
-                }
-        
-        return {
-            'dept_code': dept_config['dept_code'],
-            'dept_name': dept_config['dept_name'],
-            'revenue': 0,
-            'cogs': 0,
-            'gross_profit': 0,
-            'gross_margin': 0
-        }
-        
-    except Exception as e:
-        logger.error(f"Error fetching P&L from GL.MTD for {dept_key}: {str(e)}")
-        raise
+# Expense accounts that are 7xx or 9xx but Softbase classifies under Expenses
+# 706000 = Administrative Fund Expense, 999999 = Error Account
+NON_STANDARD_EXPENSE_ACCOUNTS = ['706000', '999999']
 
-def get_department_data_from_gl_ytd(year, month, dept_key, schema, include_detail=False):
-    """
-    Get department P&L data from GL.YTD (fiscal year-to-date column)
-    Uses the authoritative YTD value from Softbase for FY-aligned ranges.
-    """
-    try:
-        tenant_gl_accounts = get_gl_accounts(schema)
-        dept_config = tenant_gl_accounts[dept_key]
-        revenue_accounts = dept_config['revenue']
-        cogs_accounts = dept_config['cogs']
-        
-        # Build account lists for SQL IN clause
-        all_accounts = revenue_accounts + cogs_accounts
-        account_list = "', '".join(all_accounts)
-        
-        if include_detail:
-            # Get account-level detail from GL.YTD
-            query = f"""
-            SELECT 
-                AccountNo,
-                YTD as raw_ytd
-            FROM {schema}.GL
-            WHERE Year = %s
-              AND Month = %s
-              AND AccountNo IN ('{account_list}')
-            """
-            
-            results = get_sql_service().execute_query(query, [year, month])
-            
-            revenue = 0
-            cogs = 0
-            revenue_detail = []
-            cogs_detail = []
-            
-            for row in results:
-                account_no = row['AccountNo']
-                raw_ytd = float(row['raw_ytd'] or 0)
-                
-                if account_no in revenue_accounts:
-                    amount = -raw_ytd
-                    revenue += amount
-                    revenue_detail.append({'account': account_no, 'amount': amount})
-                elif account_no in cogs_accounts:
-                    amount = raw_ytd
-                    cogs += amount
-                    cogs_detail.append({'account': account_no, 'amount': amount})
-            
-            gross_profit = revenue - cogs
-            gross_margin = (gross_profit / revenue * 100) if revenue > 0 else 0
-            
-            return {
-                'dept_code': dept_config['dept_code'],
-                'dept_name': dept_config['dept_name'],
-                'revenue': revenue,
-                'cogs': cogs,
-                'gross_profit': gross_profit,
-                'gross_margin': gross_margin,
-                'revenue_detail': revenue_detail,
-                'cogs_detail': cogs_detail
-            }
-        else:
-            # Get summary only from GL.YTD
-            revenue_list = "', '".join(revenue_accounts)
-            cogs_list = "', '".join(cogs_accounts)
-            
-            query = f"""
-            SELECT 
-                -SUM(CASE WHEN AccountNo IN ('{revenue_list}') THEN YTD ELSE 0 END) as revenue,
-                SUM(CASE WHEN AccountNo IN ('{cogs_list}') THEN YTD ELSE 0 END) as cogs
-            FROM {schema}.GL
-            WHERE Year = %s
-              AND Month = %s
-              AND AccountNo IN ('{account_list}')
-            """
-            
-            results = get_sql_service().execute_query(query, [year, month])
-            
-            if results and len(results) > 0:
-                row = results[0]
-                revenue = float(row['revenue'] or 0)
-                cogs = float(row['cogs'] or 0)
-                gross_profit = revenue - cogs
-                gross_margin = (gross_profit / revenue * 100) if revenue > 0 else 0
-                
-                return {
-                    'dept_code': dept_config['dept_code'],
-                    'dept_name': dept_config['dept_name'],
-                    'revenue': revenue,
-                    'cogs': cogs,
-                    'gross_profit': gross_profit,
-                    'gross_margin': gross_margin
-                }
-        
-        return {
-            'dept_code': dept_config['dept_code'],
-            'dept_name': dept_config['dept_name'],
-            'revenue': 0,
-            'cogs': 0,
-            'gross_profit': 0,
-            'gross_margin': 0
-        }
-        
-    except Exception as e:
-        logger.error(f"Error fetching P&L from GL.YTD for {dept_key}: {str(e)}")
-        raise
+# Account prefixes that make up the P&L (revenue, COGS, expenses, other income, 9xx)
+PL_ACCOUNT_PREFIXES = ('4', '5', '6', '7', '9')
 
-def get_department_data_from_gldetail(start_date, end_date, dept_key, schema, include_detail=False):
-    """
-    Get department P&L data from GLDetail (transaction-level detail)
-    Used for custom date ranges that aren't full calendar months
-    """
-    try:
-        tenant_gl_accounts = get_gl_accounts(schema)
-        dept_config = tenant_gl_accounts[dept_key]
-        revenue_accounts = dept_config['revenue']
-        cogs_accounts = dept_config['cogs']
-        
-        # Build account lists for SQL IN clause
-        all_accounts = revenue_accounts + cogs_accounts
-        account_list = "', '".join(all_accounts)
-        
-        if include_detail:
-            # Get account-level detail from GLDetail
-            query = f"""
-            SELECT 
-                AccountNo,
-                SUM(Amount) as raw_amount
-            FROM {schema}.GLDetail
-            WHERE EffectiveDate >= %s 
-              AND EffectiveDate <= %s
-              AND Posted = 1
-              AND AccountNo IN ('{account_list}')
-            GROUP BY AccountNo
-            """
-            
-            results = get_sql_service().execute_query(query, [start_date, end_date])
-            
-            revenue = 0
-            cogs = 0
-            revenue_detail = []
-            cogs_detail = []
-            
-            for row in results:
-                account_no = str(row['AccountNo']).strip()
-                raw_amount = float(row['raw_amount'] or 0)
-                
-                if account_no in revenue_accounts:
-                    # Revenue is stored as negative (credits), negate to make positive
-                    amount = -raw_amount
-                    revenue += amount
-                    revenue_detail.append({'account': account_no, 'amount': amount})
-                elif account_no in cogs_accounts:
-                    # COGS is stored as positive (debits), use as-is
-                    amount = raw_amount
-                    cogs += amount
-                    cogs_detail.append({'account': account_no, 'amount': amount})
-            
-            gross_profit = revenue - cogs
-            gross_margin = (gross_profit / revenue * 100) if revenue > 0 else 0
-            
-            return {
-                'dept_code': dept_config['dept_code'],
-                'dept_name': dept_config['dept_name'],
-                'revenue': revenue,
-                'cogs': cogs,
-                'gross_profit': gross_profit,
-                'gross_margin': gross_margin,
-                'revenue_detail': revenue_detail,
-                'cogs_detail': cogs_detail
-            }
-        else:
-            # Get summary only
-            revenue_list = "', '".join(revenue_accounts)
-            cogs_list = "', '".join(cogs_accounts)
-            
-            query = f"""
-            SELECT 
-                -SUM(CASE WHEN AccountNo IN ('{revenue_list}') THEN Amount ELSE 0 END) as revenue,
-                SUM(CASE WHEN AccountNo IN ('{cogs_list}') THEN Amount ELSE 0 END) as cogs
-            FROM {schema}.GLDetail
-            WHERE EffectiveDate >= %s 
-              AND EffectiveDate <= %s
-              AND Posted = 1
-              AND AccountNo IN ('{account_list}')
-            """
-            
-            results = get_sql_service().execute_query(query, [start_date, end_date])
-            
-            if results and len(results) > 0:
-                row = results[0]
-                revenue = float(row['revenue'] or 0)
-                cogs = float(row['cogs'] or 0)
-                gross_profit = revenue - cogs
-                gross_margin = (gross_profit / revenue * 100) if revenue > 0 else 0
-                
-                return {
-                    'dept_code': dept_config['dept_code'],
-                    'dept_name': dept_config['dept_name'],
-                    'revenue': revenue,
-                    'cogs': cogs,
-                    'gross_profit': gross_profit,
-                    'gross_margin': gross_margin
-                }
-        
-        return {
-            'dept_code': dept_config['dept_code'],
-            'dept_name': dept_config['dept_name'],
-            'revenue': 0,
-            'cogs': 0,
-            'gross_profit': 0,
-            'gross_margin': 0
-        }
-        
-    except Exception as e:
-        logger.error(f"Error fetching P&L for {dept_key}: {str(e)}")
-        return None
 
+def _configured_pl_accounts(schema):
+    """Every account referenced by the tenant's department, expense and other income config"""
+    accounts = set(CONTRA_REVENUE_ACCOUNTS) | set(NON_STANDARD_EXPENSE_ACCOUNTS)
+    for dept_config in get_gl_accounts(schema).values():
+        accounts.update(dept_config['revenue'])
+        accounts.update(dept_config['cogs'])
+    for category_accounts in get_expense_accounts(schema).values():
+        accounts.update(category_accounts)
+    accounts.update(get_other_income_accounts(schema))
+    return {str(a).strip() for a in accounts if a}
 
-def get_other_income(start_date, end_date, schema):
-    """
-    Get other income/contra-revenue from 7xxxxx accounts
 
-    These accounts include:
-    - 701000: Gain/Loss on Sale of Asset
-    - 702000: Miscellaneous Income
-    - 703000: A/R Discounts Allowed (contra-revenue, reduces sales)
-    - 704000: A/P Discounts Taken
-    - 705000: Parts Discounts (contra-revenue, reduces sales)
+def get_pl_ledger(start_date, end_date, schema):
+    """
+    Get raw per-account P&L amounts for a period with a single query.
+    Every P&L view (departments, consolidated, expense categories, other income,
+    overhead) is derived from this ledger in memory instead of issuing one
+    query per department or section.
 
-    In the GL, these are stored as credits (negative) for income items and
-    debits (positive) for contra-revenue items. Softbase displays the net
-    effect on Total Sales directly, so we use SUM(Amount) to match.
+    Source selection:
+    - Full months starting at the fiscal year start (<= 12 months): GL.YTD of
+      the last month (authoritative Softbase value)
+    - Full months ending before the current month: SUM(GL.MTD) over the months
+      (exact Softbase match for closed months)
+    - Anything else (custom ranges, the open month): posted GLDetail
 
     Args:
-        start_date: Start date for the report
-        end_date: End date for the report
+        start_date: Start date (YYYY-MM-DD)
+        end_date: End date (YYYY-MM-DD)
         schema: Database schema for the tenant
 
     Returns:
-        Total other income (negative value reduces revenue, positive increases)
+        Dictionary with 'source' and 'amounts' ({AccountNo: raw GL amount})
     """
-    try:
-        tenant_other_income = get_other_income_accounts(schema)
-        account_list = "', '".join(tenant_other_income)
+    start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+    end_dt = datetime.strptime(end_date, '%Y-%m-%d')
+    now = datetime.now()
 
-        # Use -SUM(Amount) to flip the sign for proper revenue calculation
-        # GL stores 7xxxxx accounts as debits (positive), but they should reduce revenue
+    is_start_first = start_dt.day == 1
+    is_end_last = end_dt.day == calendar.monthrange(end_dt.year, end_dt.month)[1]
+    month_count = (end_dt.year - start_dt.year) * 12 + end_dt.month - start_dt.month + 1
+    is_closed = (end_dt.year, end_dt.month) < (now.year, now.month)
+
+    qb = GLQueryBuilder()
+    prefix_filter = ' OR '.join(f"AccountNo LIKE '{prefix}%'" for prefix in PL_ACCOUNT_PREFIXES)
+    account_filter = f"({prefix_filter} OR {qb.accounts(_configured_pl_accounts(schema))})"
+
+    if is_start_first and is_end_last and 1 < month_count <= 12 and start_dt.month == get_fiscal_year_start_month():
+        source = 'gl_ytd'
         query = f"""
-        SELECT
-            -SUM(Amount) as total
+        SELECT AccountNo, SUM(YTD) as amount
+        FROM {schema}.GL
+        WHERE Year = {qb.param(end_dt.year)} AND Month = {qb.param(end_dt.month)}
+          AND {account_filter}
+        GROUP BY AccountNo
+        """
+    elif is_start_first and is_end_last and month_count >= 1 and is_closed:
+        source = 'gl_mtd'
+        query = f"""
+        SELECT AccountNo, SUM(MTD) as amount
+        FROM {schema}.GL
+        WHERE {qb.periods(start_dt.year, start_dt.month, end_dt.year, end_dt.month)}
+          AND {account_filter}
+        GROUP BY AccountNo
+        """
+    else:
+        source = 'gldetail'
+        query = f"""
+        SELECT AccountNo, SUM(Amount) as amount
         FROM {schema}.GLDetail
-        WHERE EffectiveDate >= %s
-          AND EffectiveDate <= %s
+        WHERE {qb.date_range(start_date, end_date)}
           AND Posted = 1
-          AND AccountNo IN ('{account_list}')
+          AND {account_filter}
+        GROUP BY AccountNo
         """
-        
-        results = get_sql_service().execute_query(query, [start_date, end_date])
-        
-        if results and len(results) > 0:
-            return float(results[0]['total'] or 0)
-        return 0
-        
-    except Exception as e:
-        logger.error(f"Error fetching other income: {str(e)}")
-        return 0
 
+    results = qb.execute(get_sql_service(), query)
 
-def is_full_calendar_month(start_date, end_date):
-    """
-    Check if the date range represents a full calendar month
-    Excludes the current month to ensure GL.MTD is only used for closed/completed months
-    
-    Args:
-        start_date: Start date string (YYYY-MM-DD)
-        end_date: End date string (YYYY-MM-DD)
-    
-    Returns:
-        Tuple of (is_full_month, year, month) or (False, None, None)
-    """
-    try:
-        start = datetime.strptime(start_date, '%Y-%m-%d')
-        end = datetime.strptime(end_date, '%Y-%m-%d')
-        now = datetime.now()
-        
-        # Check if start is first day of month
-        if start.day != 1:
-            return False, None, None
-        
-        # Check if end is last day of month
-        last_day = calendar.monthrange(start.year, start.month)[1]
-        if end.day != last_day:
-            return False, None, None
-        
-        # Check if both dates are in the same month
-        if start.year != end.year or start.month != end.month:
-            return False, None, None
-        
-        # Exclude current month - always use GLDetail for in-process months
-        if start.year == now.year and start.month == now.month:
-            return False, None, None
-        
-        return True, start.year, start.month
-    except:
-        return False, None, None
+    amounts = {}
+    for row in results or []:
+        account_no = str(row['AccountNo']).strip()
+        amounts[account_no] = amounts.get(account_no, 0.0) + float(row['amount'] or 0)
 
-# Contra-revenue accounts (7xx accounts that Softbase classifies under Sales)
-# These reduce Revenue, not treated as Other Income
-CONTRA_REVENUE_ACCOUNTS = ['703000']
+    logger.info(f"P&L ledger for {schema} {start_date} to {end_date}: {len(amounts)} accounts from {source}")
+    return {'source': source, 'amounts': amounts}
 
-# Expense accounts that are 7xx or 9xx but Softbase classifies under Expenses
-# 706000 = Administrative Fund Expense, 999999 = Error Account
-NON_STANDARD_EXPENSE_ACCOUNTS = ['706000', '999999']
 
-def get_dynamic_consolidated_pl_from_gl_ytd(year, month, schema):
-    """
-    Get consolidated P&L using GL.YTD from a specific month.
-    Uses the authoritative YTD column which matches Softbase exactly.
-    Should be used when the date range starts at the fiscal year start.
-    
-    Returns:
-        Dictionary with revenue, cogs, expenses totals
-    """
-    try:
-        contra_rev_list = "', '".join(CONTRA_REVENUE_ACCOUNTS)
-        non_std_exp_list = "', '".join(NON_STANDARD_EXPENSE_ACCOUNTS)
-        query = f"""
-        SELECT 
-            -SUM(CASE WHEN AccountNo LIKE '4%' THEN YTD ELSE 0 END)
-            - SUM(CASE WHEN AccountNo IN ('{contra_rev_list}') THEN YTD ELSE 0 END) as revenue,
-            SUM(CASE WHEN AccountNo LIKE '5%' THEN YTD ELSE 0 END) as cogs,
-            SUM(CASE WHEN AccountNo LIKE '6%' THEN YTD ELSE 0 END)
-            + SUM(CASE WHEN AccountNo IN ('{non_std_exp_list}') THEN YTD ELSE 0 END) as expenses
-        FROM {schema}.GL
-        WHERE Year = %s AND Month = %s
-          AND (AccountNo LIKE '4%' OR AccountNo LIKE '5%' OR AccountNo LIKE '6%' OR AccountNo LIKE '7%' OR AccountNo LIKE '9%')
-        """
-        
-        results = get_sql_service().execute_query(query, [year, month])
-        
-        if results and results[0]:
-            revenue = float(results[0].get('revenue') or 0)
-            cogs = float(results[0].get('cogs') or 0)
-            expenses = float(results[0].get('expenses') or 0)
-        else:
-            revenue = 0.0
-            cogs = 0.0
-            expenses = 0.0
-        
-        logger.info(f"Dynamic GL.YTD P&L for {schema} {year}-{month:02d}: Rev=${revenue:,.2f}, COGS=${cogs:,.2f}, Exp=${expenses:,.2f}")
-        
-        return {
-            'revenue': revenue,
-            'cogs': cogs,
-            'expenses': expenses
-        }
-        
-    except Exception as e:
-        logger.error(f"Error in dynamic consolidated P&L from GL.YTD: {e}")
-        raise
+def _sum_prefix(amounts, prefix):
+    return sum(amount for account_no, amount in amounts.items() if account_no.startswith(prefix))
+
 
+def _sum_accounts(amounts, accounts):
+    return sum(amounts.get(str(a).strip(), 0.0) for a in set(accounts))
 
-def get_dynamic_consolidated_pl_from_gl_mtd(year, month, schema):
+
+def get_departments_pl(ledger, schema, include_detail=False):
     """
-    Get consolidated P&L using dynamic LIKE queries on GL.MTD.
-    Matches Softbase P&L classification exactly:
-      Revenue = 4xx + contra-revenue 7xx accounts (e.g., 703000 A/R Discounts)
-      COGS = 5xx
-      Expenses = 6xx + non-standard expense accounts (706000, 999999)
-    Net Income = Revenue - COGS - Expenses (matches Softbase bottom line)
-    
-    Returns:
-        Dictionary with revenue, cogs, expenses totals
+    Department revenue/COGS from a ledger
+    Revenue is stored as negative (credits) and is negated; COGS (debits) is used as-is
     """
-    try:
-        contra_rev_list = "', '".join(CONTRA_REVENUE_ACCOUNTS)
-        non_std_exp_list = "', '".join(NON_STANDARD_EXPENSE_ACCOUNTS)
-        query = f"""
-        SELECT 
-            -SUM(CASE WHEN AccountNo LIKE '4%' THEN MTD ELSE 0 END)
-            - SUM(CASE WHEN AccountNo IN ('{contra_rev_list}') THEN MTD ELSE 0 END) as revenue,
-            SUM(CASE WHEN AccountNo LIKE '5%' THEN MTD ELSE 0 END) as cogs,
-            SUM(CASE WHEN AccountNo LIKE '6%' THEN MTD ELSE 0 END)
-            + SUM(CASE WHEN AccountNo IN ('{non_std_exp_list}') THEN MTD ELSE 0 END) as expenses
-        FROM {schema}.GL
-        WHERE Year = %s AND Month = %s
-          AND (AccountNo LIKE '4%' OR AccountNo LIKE '5%' OR AccountNo LIKE '6%' OR AccountNo LIKE '7%' OR AccountNo LIKE '9%')
-        """
-        
-        results = get_sql_service().execute_query(query, [year, month])
-        
-        if results and results[0]:
-            revenue = float(results[0].get('revenue') or 0)
-            cogs = float(results[0].get('cogs') or 0)
-            expenses = float(results[0].get('expenses') or 0)
-        else:
-            revenue = 0.0
-            cogs = 0.0
-            expenses = 0.0
-        
-        logger.info(f"Dynamic GL.MTD P&L for {schema} {year}-{month:02d}: Rev=${revenue:,.2f}, COGS=${cogs:,.2f}, Exp=${expenses:,.2f}")
-        
-        return {
+    amounts = ledger['amounts']
+    departments = {}
+    for dept_key, dept_config in get_gl_accounts(schema).items():
+        revenue_accounts = set(dept_config['revenue'])
+        cogs_accounts = set(dept_config['cogs'])
+
+        revenue = 0
+        cogs = 0
+        revenue_detail = []
+        cogs_detail = []
+        for account_no in sorted(revenue_accounts | cogs_accounts):
+            if account_no not in amounts:
+                continue
+            if account_no in revenue_accounts:
+                amount = -amounts[account_no]
+                revenue += amount
+                revenue_detail.append({'account': account_no, 'amount': amount})
+            else:
+                amount = amounts[account_no]
+                cogs += amount
+                cogs_detail.append({'account': account_no, 'amount': amount})
+
+        gross_profit = revenue - cogs
+        dept_data = {
+            'dept_code': dept_config['dept_code'],
+            'dept_name': dept_config['dept_name'],
             'revenue': revenue,
             'cogs': cogs,
-            'expenses': expenses
+            'gross_profit': gross_profit,
+            'gross_margin': (gross_profit / revenue * 100) if revenue > 0 else 0
         }
-        
-    except Exception as e:
-        logger.error(f"Error in dynamic consolidated P&L from GL.MTD: {e}")
-        raise
+        if include_detail:
+            dept_data['revenue_detail'] = revenue_detail
+            dept_data['cogs_detail'] = cogs_detail
+        departments[dept_key] = dept_data
+    return departments
 
 
-def get_dynamic_consolidated_pl_from_gldetail(start_date, end_date, schema):
+def get_consolidated_pl(ledger):
     """
-    Get consolidated P&L using dynamic LIKE queries on GLDetail.
-    Used for custom date ranges or current (unclosed) months.
-    Matches Softbase P&L classification exactly:
+    Consolidated totals from a ledger, matching Softbase P&L classification:
       Revenue = 4xx + contra-revenue 7xx accounts (e.g., 703000 A/R Discounts)
       COGS = 5xx
       Expenses = 6xx + non-standard expense accounts (706000, 999999)
     Net Income = Revenue - COGS - Expenses (matches Softbase bottom line)
-    
-    Returns:
-        Dictionary with revenue, cogs, expenses totals
     """
-    try:
-        contra_rev_list = "', '".join(CONTRA_REVENUE_ACCOUNTS)
-        non_std_exp_list = "', '".join(NON_STANDARD_EXPENSE_ACCOUNTS)
-        query = f"""
-        SELECT 
-            -SUM(CASE WHEN AccountNo LIKE '4%' THEN Amount ELSE 0 END)
-            - SUM(CASE WHEN AccountNo IN ('{contra_rev_list}') THEN Amount ELSE 0 END) as revenue,
-            SUM(CASE WHEN AccountNo LIKE '5%' THEN Amount ELSE 0 END) as cogs,
-            SUM(CASE WHEN AccountNo LIKE '6%' THEN Amount ELSE 0 END)
-            + SUM(CASE WHEN AccountNo IN ('{non_std_exp_list}') THEN Amount ELSE 0 END) as expenses
-        FROM {schema}.GLDetail
-        WHERE EffectiveDate >= %s 
-          AND EffectiveDate <= %s
-          AND Posted = 1
-          AND (AccountNo LIKE '4%' OR AccountNo LIKE '5%' OR AccountNo LIKE '6%' OR AccountNo LIKE '7%' OR AccountNo LIKE '9%')
-        """
-        
-        results = get_sql_service().execute_query(query, [start_date, end_date])
-        
-        if results and results[0]:
-            revenue = float(results[0].get('revenue') or 0)
-            cogs = float(results[0].get('cogs') or 0)
-            expenses = float(results[0].get('expenses') or 0)
-        else:
-            revenue = 0.0
-            cogs = 0.0
-            expenses = 0.0
-        
-        logger.info(f"Dynamic GLDetail P&L for {schema} {start_date} to {end_date}: Rev=${revenue:,.2f}, COGS=${cogs:,.2f}, Exp=${expenses:,.2f}")
-        
-        return {
-            'revenue': revenue,
-            'cogs': cogs,
-            'expenses': expenses
-        }
-        
-    except Exception as e:
-        logger.error(f"Error in dynamic consolidated P&L from GLDetail: {e}")
-        raise
+    amounts = ledger['amounts']
+    return {
+        'revenue': -_sum_prefix(amounts, '4') - _sum_accounts(amounts, CONTRA_REVENUE_ACCOUNTS),
+        'cogs': _sum_prefix(amounts, '5'),
+        'expenses': _sum_prefix(amounts, '6') + _sum_accounts(amounts, NON_STANDARD_EXPENSE_ACCOUNTS)
+    }
 
 
-def get_dynamic_consolidated_pl(start_date, end_date, schema):
-    """
-    Get consolidated P&L using dynamic LIKE queries.
-    For full calendar month(s), sums GL.MTD for each month (exact Softbase match).
-    For partial months or custom ranges, falls back to GLDetail.
-    
-    Returns:
-        Dictionary with revenue, cogs, expenses totals
-    """
-    from datetime import datetime
-    from dateutil.relativedelta import relativedelta
-    
-    start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-    end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-    
-    # Check if the range spans full calendar months
-    # Start must be 1st of month, end must be last day of month
-    import calendar
-    is_start_first = start_dt.day == 1
-    last_day_of_end_month = calendar.monthrange(end_dt.year, end_dt.month)[1]
-    is_end_last = end_dt.day == last_day_of_end_month
-    
-    if is_start_first and is_end_last:
-        # Check if range starts at fiscal year start — if so, use GL.YTD from last month
-        # This is the authoritative Softbase value and avoids MTD summing drift
-        from flask import g
-        fy_start_month = 11  # Default
-        if hasattr(g, 'current_organization') and g.current_organization:
-            fy_start_month = g.current_organization.fiscal_year_start_month or 11
-        
-        if start_dt.month == fy_start_month:
-            # Range starts at fiscal year start — use YTD from the last month
-            ytd_data = get_dynamic_consolidated_pl_from_gl_ytd(end_dt.year, end_dt.month, schema)
-            logger.info(f"Using GL.YTD for {schema} {start_date} to {end_date} (FY-aligned): Rev=${ytd_data['revenue']:,.2f}, COGS=${ytd_data['cogs']:,.2f}, Exp=${ytd_data['expenses']:,.2f}")
-            return ytd_data
-        
-        # Non-FY-aligned range: sum GL.MTD for each month
-        total_revenue = 0.0
-        total_cogs = 0.0
-        total_expenses = 0.0
-        
-        current = start_dt
-        while current <= end_dt:
-            month_data = get_dynamic_consolidated_pl_from_gl_mtd(current.year, current.month, schema)
-            total_revenue += month_data['revenue']
-            total_cogs += month_data['cogs']
-            total_expenses += month_data['expenses']
-            current += relativedelta(months=1)
-        
-        logger.info(f"Multi-month GL.MTD P&L for {schema} {start_date} to {end_date}: Rev=${total_revenue:,.2f}, COGS=${total_cogs:,.2f}, Exp=${total_expenses:,.2f}")
-        
-        return {
-            'revenue': total_revenue,
-            'cogs': total_cogs,
-            'expenses': total_expenses
-        }
-    else:
-        # Partial month — use GLDetail
-        return get_dynamic_consolidated_pl_from_gldetail(start_date, end_date, schema)
+def get_expense_categories(ledger, schema):
+    """Expense totals by the tenant's mapped categories, plus total_expenses"""
+    amounts = ledger['amounts']
+    expense_data = {}
+    total_expenses = 0
+    for category, accounts in get_expense_accounts(schema).items():
+        category_total = _sum_accounts(amounts, accounts)
+        expense_data[category] = category_total
+        total_expenses += category_total
+    expense_data['total_expenses'] = total_expenses
+    return expense_data
 
 
-def get_expense_data(start_date, end_date, schema):
+def get_other_income(ledger, schema):
     """
-    Get expense data organized by category.
-    Uses dynamic LIKE '6%' query for total, with optional category breakdown from mapped accounts.
-    Uses GL.MTD for full calendar months (exact Softbase match)
-    Uses GLDetail for custom date ranges (flexibility)
-    
-    Args:
-        start_date: Start date for the report
-        end_date: End date for the report
-        schema: Database schema for the tenant
-    
-    Returns:
-        Dictionary with expense categories and totals
+    Other income/contra-revenue from the tenant's 7xxxxx accounts
+    (701000 Gain/Loss on Sale of Asset, 702000 Misc Income, 704000 A/P Discounts, ...)
+    GL stores income as credits, so the sum is negated
     """
-    try:
-        # Check if this is a full calendar month
-        is_full_month, year, month = is_full_calendar_month(start_date, end_date)
-        
-        if is_full_month:
-            # Single full calendar month — use GL.MTD for exact Softbase match
-            return get_expense_data_from_gl_mtd(year, month, schema)
-        
-        # Check if this is a multi-month FY-aligned range — use GL.YTD
-        start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-        end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-        is_start_first = start_dt.day == 1
-        last_day_of_end_month = calendar.monthrange(end_dt.year, end_dt.month)[1]
-        is_end_last = end_dt.day == last_day_of_end_month
-        
-        if is_start_first and is_end_last:
-            from flask import g
-            fy_start_month = 11  # Default
-            if hasattr(g, 'current_organization') and g.current_organization:
-                fy_start_month = g.current_organization.fiscal_year_start_month or 11
-            
-            if start_dt.month == fy_start_month:
-                # FY-aligned range — use GL.YTD from the last month (authoritative)
-                return get_expense_data_from_gl_ytd(end_dt.year, end_dt.month, schema)
-        
-        # Custom date range — use GLDetail
-        return get_expense_data_from_gldetail(start_date, end_date, schema)
-    except Exception as e:
-        logger.error(f"Error in get_expense_data: {e}")
-        raise
+    return -_sum_accounts(ledger['amounts'], get_other_income_accounts(schema))
 
-def get_expense_data_from_gl_ytd(year, month, schema):
-    """
-    Get expense data from GL.YTD (fiscal year-to-date column)
-    Uses the authoritative YTD value from Softbase for FY-aligned ranges.
-    """
-    try:
-        tenant_expense_accounts = get_expense_accounts(schema)
-        all_expense_accounts = []
-        for category_accounts in tenant_expense_accounts.values():
-            all_expense_accounts.extend(category_accounts)
-        
-        expense_list = "', '".join(all_expense_accounts)
-        
-        query = f"""
-        SELECT 
-            AccountNo,
-            YTD as total
-        FROM {schema}.GL
-        WHERE Year = %s
-          AND Month = %s
-          AND AccountNo IN ('{expense_list}')
-        """
-        
-        results = get_sql_service().execute_query(query, [year, month])
-        
-        expense_data = {}
-        total_expenses = 0
-        
-        for category, accounts in tenant_expense_accounts.items():
-            category_total = 0
-            for row in results:
-                account_no = str(row['AccountNo']).strip()
-                if account_no in accounts:
-                    amount = float(row['total'] or 0)
-                    category_total += amount
-            
-            expense_data[category] = category_total
-            total_expenses += category_total
-        
-        logger.info(f"Expense data from GL.YTD for {year}-{month:02d}: Total=${total_expenses:,.2f}")
-        
-        expense_data['total_expenses'] = total_expenses
-        return expense_data
-        
-    except Exception as e:
-        logger.error(f"Error getting expense data from GL.YTD: {e}")
-        raise
 
-def get_expense_data_from_gl_mtd(year, month, schema):
-    """
-    Get expense data from GL.MTD (monthly summary table)
-    This matches Softbase P&L exactly for monthly reports
-    """
-    try:
-        tenant_expense_accounts = get_expense_accounts(schema)
-        # Flatten all expense accounts
-        all_expense_accounts = []  
-        for category_accounts in tenant_expense_accounts.values():
-            all_expense_accounts.extend(category_accounts)
-        
-        expense_list = "', '".join(all_expense_accounts)
-        
-        query = f"""
-        SELECT 
-            AccountNo,
-            MTD as total
-        FROM {schema}.GL
-        WHERE Year = %s
-          AND Month = %s
-          AND AccountNo IN ('{expense_list}')
-        """
-        
-        results = get_sql_service().execute_query(query, [year, month])
-        
-        # Debug logging
-        print("="*80)
-        print(f"EXPENSE QUERY (GL.MTD) for {year}-{month:02d}")
-        print(f"Query returned {len(results if results else [])} accounts from GL.MTD")
-        
-        # Organize by category
-        expense_data = {}
-        total_expenses = 0
-        
-        for category, accounts in tenant_expense_accounts.items():
-            category_total = 0
-            for row in results:
-                account_no = str(row['AccountNo']).strip()
-                if account_no in accounts:
-                    amount = float(row['total'] or 0)
-                    category_total += amount
-            
-            expense_data[category] = category_total
-            total_expenses += category_total
-        
-        print(f"Total expenses from GL.MTD: ${total_expenses:,.2f}")
-        print("="*80)
-        
-        expense_data['total_expenses'] = total_expenses
-        return expense_data
-        
-    except Exception as e:
-        logger.error(f"Error getting expense data from GL.MTD: {e}")
-        raise
+def get_overhead_expenses(ledger):
+    """Total overhead expenses (all 6xxxxx accounts)"""
+    return _sum_prefix(ledger['amounts'], '6')
 
-def get_expense_data_from_gldetail(start_date, end_date, schema):
-    """
-    Get expense data from GLDetail (transaction-level detail)
-    Used for custom date ranges that aren't full calendar months
-    """
-    try:
-        tenant_expense_accounts = get_expense_accounts(schema)
-        # Flatten all expense accounts
-        all_expense_accounts = []
-        for category_accounts in tenant_expense_accounts.values():
-            all_expense_accounts.extend(category_accounts)
-        
-        expense_list = "', '".join(all_expense_accounts)
-        
-        # Use EffectiveDate and Posted = 1 to match revenue/COGS query logic
-        query = f"""
-        SELECT 
-            AccountNo,
-            SUM(Amount) as total
-        FROM {schema}.GLDetail
-        WHERE EffectiveDate >= %s 
-          AND EffectiveDate <= %s
-          AND Posted = 1
-          AND AccountNo IN ('{expense_list}')
-        GROUP BY AccountNo
-        """
-        
-        results = get_sql_service().execute_query(query, [start_date, end_date])
-        
-        # Debug: Print all accounts returned from query (using print to ensure it appears in logs)
-        print("="*80)
-        print(f"EXPENSE QUERY DEBUG for {start_date} to {end_date}")
-        print(f"Query returned {len(results if results else [])} accounts with Posted=1 filter")
-        
-        # Print each account and amount
-        query_total = 0
-        if results:
-            for row in results:
-                acct = str(row['AccountNo']).strip()
-                amt = float(row['total'] or 0)
-                query_total += amt
-                print(f"  Account {acct}: ${amt:,.2f}")
-        
-        print(f"Query Total (before category aggregation): ${query_total:,.2f}")
-        print(f"Target from Softbase: $338,909.32")
-        print(f"Difference: ${query_total - 338909.32:,.2f}")
-        
-        # Organize by category
-        expense_data = {}
-        total_expenses = 0
-        matched_accounts = set()
-        
-        for category, accounts in tenant_expense_accounts.items():
-            category_total = 0
-            for row in results:
-                # Convert AccountNo to string for consistent comparison
-                account_no = str(row['AccountNo']).strip()
-                if account_no in accounts:
-                    # Use total (posted + unposted) to match Softbase
-                    amount = float(row['total'] or 0)
-                    category_total += amount
-                    matched_accounts.add(account_no)
-            
-            expense_data[category] = category_total
-            total_expenses += category_total
-        
-        # Debug: Check for unmatched accounts
-        all_result_accounts = {str(row['AccountNo']).strip() for row in results}
-        unmatched = all_result_accounts - matched_accounts
-        if unmatched:
-            logger.warning(f"Unmatched expense accounts: {unmatched}")
-            # Add unmatched amounts to total
-            for row in results:
-                account_no = str(row['AccountNo']).strip()
-                if account_no in unmatched:
-                    amount = float(row['total'] or 0)
-                    total_expenses += amount
-                    logger.warning(f"  Adding unmatched {account_no}: ${amount:,.2f}")
-        
-        expense_data['total_expenses'] = total_expenses
-        
-        print(f"After category aggregation: ${total_expenses:,.2f}")
-        print("Note: Using GLDetail for custom date range (not full month)")
-        print("="*80)
-        
-        return expense_data
-        
-    except Exception as e:
-        logger.error(f"Error fetching expense data: {str(e)}")
-        return {'total_expenses': 0}
 
 
 @pl_report_bp.route('/api/reports/pl', methods=['GET'])
@@ -1013,30 +282,30 @@ def get_pl_report():
 def _fetch_pl_report_data(start_date, end_date, view, include_detail, schema):
     """Internal function to fetch P&L report data"""
     try:
-        tenant_gl_accounts = get_gl_accounts(schema)
-        
-        # Get department-level breakdown (for departmental view)
-        departments = {}
-        for dept_key in tenant_gl_accounts.keys():
-            dept_data = get_department_data(start_date, end_date, dept_key, schema, include_detail)
-            if dept_data:
-                # Exclude administrative from the department breakdown display
-                if dept_key != 'administrative':
-                    departments[dept_key] = dept_data
+        # One ledger query for the period; every section below is derived from it
+        ledger = get_pl_ledger(start_date, end_date, schema)
+        
+        # Department-level breakdown (for departmental view)
+        # Exclude administrative from the department breakdown display
+        departments = {
+            dept_key: dept_data
+            for dept_key, dept_data in get_departments_pl(ledger, schema, include_detail).items()
+            if dept_key != 'administrative'
+        }
         
-        # Use DYNAMIC consolidated totals for accuracy
+        # Consolidated totals use the dynamic prefix classification for accuracy
         # Matches Softbase P&L classification exactly:
         #   Revenue = 4xx + contra-revenue (703000)
         #   COGS = 5xx
         #   Expenses = 6xx + 706000 + 999999
         #   Net Income = Revenue - COGS - Expenses
-        dynamic_totals = get_dynamic_consolidated_pl(start_date, end_date, schema)
-        total_revenue = dynamic_totals['revenue']
-        total_cogs = dynamic_totals['cogs']
-        total_expenses = dynamic_totals['expenses']
+        consolidated = get_consolidated_pl(ledger)
+        total_revenue = consolidated['revenue']
+        total_cogs = consolidated['cogs']
+        total_expenses = consolidated['expenses']
         
         # Also get category breakdown from mapped accounts (for display)
-        expenses = get_expense_data(start_date, end_date, schema)
+        expenses = get_expense_categories(ledger, schema)
         # Override total_expenses with the dynamic total (which is authoritative)
         expenses['total_expenses'] = total_expenses
         
@@ -1191,11 +460,8 @@ def export_pl_excel():
         Excel file with Profit & Loss Consolidated sheet (and more sheets in future phases)
     """
     try:
-        import openpyxl
-        from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
         from openpyxl.utils import get_column_letter
-        from flask import send_file
-        import io
+        from src.services.excel_export import StreamingWorkbook, xlsx_response
         from datetime import datetime
         import calendar
         
@@ -1216,10 +482,7 @@ def export_pl_excel():
         last_day = f"{year}-{month:02d}-{last_day_num:02d}"
         
         # Calculate fiscal YTD date range (dynamic per tenant)
-        from flask import g
-        fy_start_month = 11  # Default
-        if hasattr(g, 'current_organization') and g.current_organization:
-            fy_start_month = g.current_organization.fiscal_year_start_month or 11
+        fy_start_month = get_fiscal_year_start_month()
         if month >= fy_start_month:
             ytd_start = f"{year}-{fy_start_month:02d}-01"
         else:
@@ -1233,9 +496,11 @@ def export_pl_excel():
         # Get tenant-specific GL accounts
         tenant_gl_accounts = get_gl_accounts(schema)
         
-        # Get MTD and YTD data for all departments
-        mtd_data = get_all_departments_data(first_day, last_day, schema)
-        ytd_data = get_all_departments_data(ytd_start, ytd_end, schema)
+        # Get MTD and YTD ledgers (one query each); all sheet sections are derived from them
+        mtd_ledger = get_pl_ledger(first_day, last_day, schema)
+        ytd_ledger = get_pl_ledger(ytd_start, ytd_end, schema)
+        mtd_data = get_departments_pl(mtd_ledger, schema)
+        ytd_data = get_departments_pl(ytd_ledger, schema)
         
         # Get company name from user's organization
         try:
@@ -1245,343 +510,112 @@ def export_pl_excel():
         except:
             company_name = "Company"
         
-        # Create workbook
-        wb = openpyxl.Workbook()
-        wb.remove(wb.active)  # Remove default sheet
-        
-        # Create Profit & Loss Consolidated sheet
-        ws = wb.create_sheet("Profit & Loss Consolidated")
+        # Create write-only workbook; rows are written top to bottom, formatting via named styles
+        book = StreamingWorkbook()
         
-        # Define styles
-        header_font = Font(bold=True, size=11)
-        bold_font = Font(bold=True)
-        currency_format = '$#,##0.00'
-        percent_format = '0.0%'
+        # Create Profit & Loss Consolidated sheet (column widths must be set before any rows)
+        column_widths = {'B': 30}
+        for col_idx in range(3, 11):
+            column_widths[get_column_letter(col_idx)] = 18
+        ws = book.create_sheet("Profit & Loss Consolidated", column_widths=column_widths)
+        
+        # Department columns C.. from tenant GL accounts, then the Total column
+        dept_columns = [
+            (get_column_letter(idx), dept_key, dept_config)
+            for idx, (dept_key, dept_config) in enumerate(tenant_gl_accounts.items(), start=3)
+        ]
+        total_col = get_column_letter(len(dept_columns) + 3)
+        
+        def write_dept_headers(row_num, include_codes):
+            ws.set(f'B{row_num}', company_name, 'section_header')
+            for col, _, dept_config in dept_columns:
+                ws.set(f'{col}{row_num}', dept_config['dept_name'], 'section_header')
+            ws.set(f'{total_col}{row_num}', "Total", 'section_header')
+            if include_codes:
+                for col, _, dept_config in dept_columns:
+                    if dept_config['dept_code']:
+                        ws.set(f'{col}{row_num + 1}', dept_config['dept_code'], 'section_header')
+        
+        def write_section(first_row, dept_data, ledger):
+            """Income through Net Margin (10 rows) for one period"""
+            income, cogs_row, gross, margin, overhead_row, operating, op_margin, other, net, net_margin = range(first_row, first_row + 10)
+            
+            ws.set(f'B{income}', "Income")
+            for col, dept_key, _ in dept_columns:
+                ws.set(f'{col}{income}', dept_data[dept_key]['revenue'], 'currency')
+            ws.set(f'J{income}', f'=SUM(C{income}:I{income})', 'currency')
+            
+            ws.set(f'B{cogs_row}', "Cost of Goods Sold")
+            for col, dept_key, _ in dept_columns:
+                ws.set(f'{col}{cogs_row}', dept_data[dept_key]['cogs'], 'currency')
+            ws.set(f'J{cogs_row}', f'=SUM(C{cogs_row}:I{cogs_row})', 'currency')
+            
+            ws.set(f'B{gross}', "Gross Profit")
+            for col_idx in range(3, 11):  # C to J
+                col = get_column_letter(col_idx)
+                ws.set(f'{col}{gross}', f'={col}{income}-{col}{cogs_row}', 'currency')
+            
+            # Gross Margin (BOLD)
+            ws.set(f'B{margin}', "Gross Margin", 'bold')
+            for col_idx in range(3, 11):
+                col = get_column_letter(col_idx)
+                ws.set(f'{col}{margin}', f'=IF({col}{income}<>0,{col}{gross}/{col}{income},0)', 'percent_bold')
+            
+            # Overhead Expenses (simplified - all in Admin column I)
+            ws.set(f'B{overhead_row}', "Overhead Expenses")
+            ws.set(f'I{overhead_row}', get_overhead_expenses(ledger), 'currency')
+            ws.set(f'J{overhead_row}', f'=SUM(C{overhead_row}:I{overhead_row})', 'currency')
+            
+            ws.set(f'B{operating}', "Operating Profit")
+            for col_idx in range(3, 11):
+                col = get_column_letter(col_idx)
+                ws.set(f'{col}{operating}', f'={col}{gross}-{col}{overhead_row}', 'currency')
+            
+            # Operating Margin (BOLD)
+            ws.set(f'B{op_margin}', "Operating  Margin", 'bold')
+            ws.set(f'J{op_margin}', f'=IF(J{income}<>0,J{operating}/J{income},0)', 'percent_bold')
+            
+            ws.set(f'B{other}', "Other Income & Expense")
+            ws.set(f'I{other}', get_other_income(ledger, schema), 'currency')
+            ws.set(f'J{other}', f'=SUM(C{other}:I{other})', 'currency')
+            
+            # Net Profit (BOLD)
+            ws.set(f'B{net}', "Net Profit", 'bold')
+            for col_idx in range(3, 11):
+                col = get_column_letter(col_idx)
+                ws.set(f'{col}{net}', f'={col}{operating}-{col}{other}', 'currency_bold')
+            
+            # Net Margin (BOLD)
+            ws.set(f'B{net_margin}', "Net  Margin", 'bold')
+            ws.set(f'J{net_margin}', f'=IF(J{income}<>0,J{net}/J{income},0)', 'percent_bold')
         
         # Row 1: Title
-        ws['B1'] = f"Profit & Loss Statement - {calendar.month_name[month]} {year}"
-        ws['B1'].font = Font(bold=True, size=14)
+        ws.set('B1', f"Profit & Loss Statement - {calendar.month_name[month]} {year}", 'report_title')
         
         # Row 2: Company Name
-        ws['B2'] = company_name
-        ws['B2'].font = Font(bold=True, size=12)
-        
-        # Row 3: Department Headers
-        ws['B3'] = company_name
-        ws['B3'].font = header_font
-        
-        # Build department headers dynamically from tenant GL accounts
-        dept_headers = []
-        col_idx = 3  # Start at column C
-        for dept_key, dept_config in tenant_gl_accounts.items():
-            col_letter = get_column_letter(col_idx)
-            dept_headers.append((f"{col_letter}3", dept_config['dept_name'], dept_config['dept_code']))
-            col_idx += 1
-        # Add Total column
-        dept_headers.append((f"{get_column_letter(col_idx)}3", "Total", None))
-        
-        for cell, header, dept_code in dept_headers:
-            ws[cell] = header
-            ws[cell].font = header_font
-        
-        # Row 4: Department codes
-        for cell, _, dept_code in dept_headers:
-            if dept_code:
-                row = int(cell[1:])
-                ws[cell.replace('3', '4')] = dept_code
-                ws[cell.replace('3', '4')].font = header_font
-        
-        # MTD Section (Rows 6-15)
-        ws['B5'] = "MTD (Month-to-Date)"
-        ws['B5'].font = Font(bold=True, size=11)
-        
-        # Row 6: Income
-        ws['B6'] = "Income"
-        row_num = 6
-        for idx, (dept_key, dept_config) in enumerate(tenant_gl_accounts.items(), start=3):
-            col = get_column_letter(idx)
-            revenue = mtd_data[dept_key]['revenue']
-            ws[f'{col}{row_num}'] = revenue
-            ws[f'{col}{row_num}'].number_format = currency_format
-        
-        # Total column
-        ws[f'J{row_num}'] = f'=SUM(C{row_num}:I{row_num})'
-        ws[f'J{row_num}'].number_format = currency_format
-        
-        # Row 7: Cost of Goods Sold
-        ws['B7'] = "Cost of Goods Sold"
-        row_num = 7
-        for idx, (dept_key, dept_config) in enumerate(tenant_gl_accounts.items(), start=3):
-            col = get_column_letter(idx)
-            cogs = mtd_data[dept_key]['cogs']
-            ws[f'{col}{row_num}'] = cogs
-            ws[f'{col}{row_num}'].number_format = currency_format
+        ws.set('B2', company_name, 'report_subtitle')
         
-        ws[f'J{row_num}'] = f'=SUM(C{row_num}:I{row_num})'
-        ws[f'J{row_num}'].number_format = currency_format
+        # Rows 3-4: Department headers and codes
+        write_dept_headers(3, include_codes=True)
         
-        # Row 8: Gross Profit
-        ws['B8'] = "Gross Profit"
-        row_num = 8
-        for col_idx in range(3, 11):  # C to J
-            col = get_column_letter(col_idx)
-            ws[f'{col}{row_num}'] = f'={col}6-{col}7'
-            ws[f'{col}{row_num}'].number_format = currency_format
-        
-        # Row 9: Gross Margin (BOLD)
-        ws['B9'] = "Gross Margin"
-        ws['B9'].font = bold_font
-        row_num = 9
-        for col_idx in range(3, 11):
-            col = get_column_letter(col_idx)
-            ws[f'{col}{row_num}'] = f'=IF({col}6<>0,{col}8/{col}6,0)'
-            ws[f'{col}{row_num}'].number_format = percent_format
-            ws[f'{col}{row_num}'].font = bold_font
-        
-        # Row 10: Overhead Expenses
-        ws['B10'] = "Overhead Expenses"
-        row_num = 10
-        overhead = get_overhead_expenses(first_day, last_day, schema)
-        # Distribute overhead across departments (simplified - all in Admin column I)
-        ws['I10'] = overhead
-        ws['I10'].number_format = currency_format
-        ws['J10'] = f'=SUM(C10:I10)'
-        ws['J10'].number_format = currency_format
-        
-        # Row 11: Operating Profit
-        ws['B11'] = "Operating Profit"
-        row_num = 11
-        for col_idx in range(3, 11):
-            col = get_column_letter(col_idx)
-            ws[f'{col}{row_num}'] = f'={col}8-{col}10'
-            ws[f'{col}{row_num}'].number_format = currency_format
-        
-        # Row 12: Operating Margin (BOLD)
-        ws['B12'] = "Operating  Margin"
-        ws['B12'].font = bold_font
-        ws['J12'] = '=IF(J6<>0,J11/J6,0)'
-        ws['J12'].number_format = percent_format
-        ws['J12'].font = bold_font
-        
-        # Row 13: Other Income & Expense
-        ws['B13'] = "Other Income & Expense"
-        row_num = 13
-        other_income = get_other_income(first_day, last_day, schema)
-        ws['I13'] = other_income
-        ws['I13'].number_format = currency_format
-        ws['J13'] = f'=SUM(C13:I13)'
-        ws['J13'].number_format = currency_format
-        
-        # Row 14: Net Profit (BOLD)
-        ws['B14'] = "Net Profit"
-        ws['B14'].font = bold_font
-        row_num = 14
-        for col_idx in range(3, 11):
-            col = get_column_letter(col_idx)
-            ws[f'{col}{row_num}'] = f'={col}11-{col}13'
-            ws[f'{col}{row_num}'].number_format = currency_format
-            ws[f'{col}{row_num}'].font = bold_font
-        
-        # Row 15: Net Margin (BOLD)
-        ws['B15'] = "Net  Margin"
-        ws['B15'].font = bold_font
-        ws['J15'] = '=IF(J6<>0,J14/J6,0)'
-        ws['J15'].number_format = percent_format
-        ws['J15'].font = bold_font
+        # MTD Section (Rows 5-15)
+        ws.set('B5', "MTD (Month-to-Date)", 'section_header')
+        write_section(6, mtd_data, mtd_ledger)
         
         # YTD Section (Rows 18-29) - Same structure as MTD
-        ws['B18'] = "YTD Summary"
-        ws['B18'].font = Font(bold=True, size=11)
-        
-        # Row 19: Department Headers (repeat)
-        ws['B19'] = company_name
-        ws['B19'].font = header_font
-        for cell, header, dept_code in dept_headers:
-            row = int(cell[1:])
-            new_cell = cell.replace('3', '19')
-            ws[new_cell] = header
-            ws[new_cell].font = header_font
-        
-        # Row 20: Income (YTD)
-        ws['B20'] = "Income"
-        row_num = 20
-        for idx, (dept_key, dept_config) in enumerate(tenant_gl_accounts.items(), start=3):
-            col = get_column_letter(idx)
-            revenue = ytd_data[dept_key]['revenue']
-            ws[f'{col}{row_num}'] = revenue
-            ws[f'{col}{row_num}'].number_format = currency_format
-        
-        ws[f'J{row_num}'] = f'=SUM(C{row_num}:I{row_num})'
-        ws[f'J{row_num}'].number_format = currency_format
-        
-        # Row 21: COGS (YTD)
-        ws['B21'] = "Cost of Goods Sold"
-        row_num = 21
-        for idx, (dept_key, dept_config) in enumerate(tenant_gl_accounts.items(), start=3):
-            col = get_column_letter(idx)
-            cogs = ytd_data[dept_key]['cogs']
-            ws[f'{col}{row_num}'] = cogs
-            ws[f'{col}{row_num}'].number_format = currency_format
-        
-        ws[f'J{row_num}'] = f'=SUM(C{row_num}:I{row_num})'
-        ws[f'J{row_num}'].number_format = currency_format
-        
-        # Row 22: Gross Profit (YTD)
-        ws['B22'] = "Gross Profit"
-        row_num = 22
-        for col_idx in range(3, 11):
-            col = get_column_letter(col_idx)
-            ws[f'{col}{row_num}'] = f'={col}20-{col}21'
-            ws[f'{col}{row_num}'].number_format = currency_format
-        
-        # Row 23: Gross Margin (YTD, BOLD)
-        ws['B23'] = "Gross Margin"
-        ws['B23'].font = bold_font
-        row_num = 23
-        for col_idx in range(3, 11):
-            col = get_column_letter(col_idx)
-            ws[f'{col}{row_num}'] = f'=IF({col}20<>0,{col}22/{col}20,0)'
-            ws[f'{col}{row_num}'].number_format = percent_format
-            ws[f'{col}{row_num}'].font = bold_font
-        
-        # Row 24: Overhead (YTD)
-        ws['B24'] = "Overhead Expenses"
-        row_num = 24
-        overhead_ytd = get_overhead_expenses(ytd_start, ytd_end, schema)
-        ws['I24'] = overhead_ytd
-        ws['I24'].number_format = currency_format
-        ws['J24'] = f'=SUM(C24:I24)'
-        ws['J24'].number_format = currency_format
-        
-        # Row 25: Operating Profit (YTD)
-        ws['B25'] = "Operating Profit"
-        row_num = 25
-        for col_idx in range(3, 11):
-            col = get_column_letter(col_idx)
-            ws[f'{col}{row_num}'] = f'={col}22-{col}24'
-            ws[f'{col}{row_num}'].number_format = currency_format
-        
-        # Row 26: Operating Margin (YTD, BOLD)
-        ws['B26'] = "Operating  Margin"
-        ws['B26'].font = bold_font
-        ws['J26'] = '=IF(J20<>0,J25/J20,0)'
-        ws['J26'].number_format = percent_format
-        ws['J26'].font = bold_font
-        
-        # Row 27: Other Income (YTD)
-        ws['B27'] = "Other Income & Expense"
-        row_num = 27
-        other_income_ytd = get_other_income(ytd_start, ytd_end, schema)
-        ws['I27'] = other_income_ytd
-        ws['I27'].number_format = currency_format
-        ws['J27'] = f'=SUM(C27:I27)'
-        ws['J27'].number_format = currency_format
-        
-        # Row 28: Net Profit (YTD, BOLD)
-        ws['B28'] = "Net Profit"
-        ws['B28'].font = bold_font
-        row_num = 28
-        for col_idx in range(3, 11):
-            col = get_column_letter(col_idx)
-            ws[f'{col}{row_num}'] = f'={col}25-{col}27'
-            ws[f'{col}{row_num}'].number_format = currency_format
-            ws[f'{col}{row_num}'].font = bold_font
-        
-        # Row 29: Net Margin (YTD, BOLD)
-        ws['B29'] = "Net  Margin"
-        ws['B29'].font = bold_font
-        ws['J29'] = '=IF(J20<>0,J28/J20,0)'
-        ws['J29'].number_format = percent_format
-        ws['J29'].font = bold_font
-        
-        # Set column widths
-        ws.column_dimensions['B'].width = 30
-        for col_idx in range(3, 11):
-            ws.column_dimensions[get_column_letter(col_idx)].width = 18
-        
-        # Save to BytesIO
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
+        ws.set('B18', "YTD Summary", 'section_header')
+        write_dept_headers(19, include_codes=False)
+        write_section(20, ytd_data, ytd_ledger)
         
         # Generate filename
         filename = f"ProfitLossReport_{year}_{month:02d}.xlsx"
         
         logger.info(f"P&L Excel export generated: {filename}")
         
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=filename
-        )
+        return xlsx_response(book.spool(), filename)
         
     except Exception as e:
         logger.error(f"Error exporting P&L Excel: {str(e)}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': 'Failed to export P&L to Excel', 'message': str(e)}), 500
-
-
-def get_all_departments_data(start_date, end_date, schema):
-    """Get revenue and COGS for all departments"""
-    tenant_gl_accounts = get_gl_accounts(schema)
-    dept_data = {}
-    
-    for dept_key, dept_config in tenant_gl_accounts.items():
-        revenue_accounts = dept_config['revenue']
-        cogs_accounts = dept_config['cogs']
-        
-        # Get revenue (negative because credits)
-        revenue_query = f"""
-        SELECT -SUM(Amount) as total
-        FROM {schema}.GLDetail
-        WHERE AccountNo IN ('{"', '".join(revenue_accounts)}')
-          AND EffectiveDate >= %s
-          AND EffectiveDate <= %s
-          AND Posted = 1
-        """
-        
-        revenue_result = get_sql_service().execute_query(revenue_query, [start_date, end_date])
-        revenue = float(revenue_result[0]['total'] or 0) if revenue_result else 0
-        
-        # Get COGS (positive because debits)
-        cogs_query = f"""
-        SELECT SUM(Amount) as total
-        FROM {schema}.GLDetail
-        WHERE AccountNo IN ('{"', '".join(cogs_accounts)}')
-          AND EffectiveDate >= %s
-          AND EffectiveDate <= %s
-          AND Posted = 1
-        """
-        
-        cogs_result = get_sql_service().execute_query(cogs_query, [start_date, end_date])
-        cogs = float(cogs_result[0]['total'] or 0) if cogs_result else 0
-        
-        dept_data[dept_key] = {
-            'revenue': revenue,
-            'cogs': cogs,
-            'gross_profit': revenue - cogs
-        }
-    
-    return dept_data
-
-
-def get_overhead_expenses(start_date, end_date, schema):
-    """Get total overhead expenses using dynamic LIKE '6%' query"""
-    query = f"""
-    SELECT SUM(Amount) as total
-    FROM {schema}.GLDetail
-    WHERE AccountNo LIKE '6%'
-      AND EffectiveDate >= %s
-      AND EffectiveDate <= %s
-      AND Posted = 1
-    """
-    
-    result = get_sql_service().execute_query(query, [start_date, end_date])
-    return float(result[0]['total'] or 0) if result else 0
-
-
-# Note: get_other_income is defined earlier in this file (line ~327)
-# The function was previously duplicated here - removed to avoid confusion
-
@@ -3,7 +3,7 @@ Detailed P&L Report Route - Matches Accounting Firm Excel Format
 Generates multi-tab Excel workbook with department-level GL account detail
 """
 
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, jsonify, request
 from datetime import datetime
 import logging
 import calendar
@@ -20,68 +20,55 @@ from src.config.gl_accounts_detailed_loader import (
     get_inhouse_config,
 )
 from src.routes.currie_report import get_balance_sheet_data
+from src.services.gl_rollup import GLRollupEngine, get_account_map, gl_watermark
+from src.services.cache_service import cache_service
+from src.services.excel_export import xlsx_response
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.utils.tenant_utils import get_tenant_db, get_tenant_schema
 from src.models.user import User
 
 logger = logging.getLogger(__name__)
+
+# Cached workbooks are keyed by GL watermark, so the TTL only bounds memory use
+DETAILED_EXPORT_CACHE_TTL = 12 * 3600
+
 pl_detailed_bp = Blueprint('pl_detailed', __name__)
 # sql_service is now obtained via get_tenant_db() for multi-tenant support
 _sql_service = None
 def get_sql_service():
     return get_tenant_db()
-def get_gl_account_data(schema, account_numbers, year, month):
+def load_gl_engine(schema, periods):
     """
-    Get MTD and YTD data for specified GL accounts
-    
-    Args:
-        schema: Database schema name
-        account_numbers: List of GL account numbers to query
-        year: Year for the report
-        month: Month for the report (1-12)
-    
-    Returns:
-        Dictionary mapping account numbers to {mtd, ytd} values
-    """
-    if not account_numbers:
-        return {}
-    
-    account_list = "', '".join(account_numbers)
-    
-    # Query GL table for MTD and YTD values
-    query = f"""
-    SELECT 
-        AccountNo,
-        MTD,
-        YTD
-    FROM {schema}.GL
-    WHERE Year = %s
-      AND Month = %s
-      AND AccountNo IN ('{account_list}')
+    Load one GLRollupEngine with every account the detailed P&L needs
+    (department sales/COS, overhead, other income/expense) for all periods
     """
-    
-    try:
-        results = get_sql_service().execute_query(query, [year, month])
-        
-        data = {}
-        for row in results:
-            account_no = str(row['AccountNo']).strip()
-            # Revenue accounts are stored as negative (credits), so negate them
-            # Expense/COS accounts are stored as positive (debits)
-            mtd = float(row['MTD'] or 0)
-            ytd = float(row['YTD'] or 0)
-            data[account_no] = {'mtd': mtd, 'ytd': ytd}
-        
-        return data
-    except Exception as e:
-        logger.error(f"Error fetching GL account data: {e}")
-        return {}
+    accounts = set()
+    for map_name in ('detailed_sales', 'detailed_cos', 'detailed_overhead', 'detailed_other'):
+        accounts.update(get_account_map(schema, map_name).accounts)
+    return GLRollupEngine.load(schema, periods, accounts=accounts, db=get_sql_service())
+
+
+def _detail_rows(accounts, gl_data, sign=1):
+    """Account-level detail rows for (account_no, description) config tuples"""
+    detail = []
+    for account_no, description in accounts:
+        data = gl_data.get(account_no, {'mtd': 0, 'ytd': 0})
+        detail.append({
+            'account_no': account_no,
+            'description': description,
+            'mtd': sign * data['mtd'],
+            'ytd': sign * data['ytd']
+        })
+    return detail
 
 
-def get_department_detail(schema, dept_key, year, month):
+def get_department_detail(schema, dept_key, year, month, engine=None, periods=None):
     """
     Get detailed P&L data for a specific department.
     Uses tenant-aware config based on schema.
+    Pass a shared GLRollupEngine to avoid re-querying GL per department.
+    With periods (a multi-month range ending at year/month), the 'mtd' values
+    are summed over the range and 'ytd' values are as of year/month.
     
     Returns:
         Dictionary with sales_detail, cos_detail, totals
@@ -91,51 +78,20 @@ def get_department_detail(schema, dept_key, year, month):
     if not dept_config:
         return None
     
-    # Get all account numbers for this department
-    sales_account_nums = [acct[0] for acct in dept_config['sales_accounts']]
-    cos_account_nums = [acct[0] for acct in dept_config['cos_accounts']]
+    engine = engine or load_gl_engine(schema, periods or [(year, month)])
+    gl_data = engine.account_values(year, month, periods)
     
-    # Fetch data from GL table
-    all_accounts = sales_account_nums + cos_account_nums
-    gl_data = get_gl_account_data(schema, all_accounts, year, month)
+    # Revenue is stored as negative (credit), negate to show as positive
+    # COS is stored as positive (debit)
+    sales_detail = _detail_rows(dept_config['sales_accounts'], gl_data, sign=-1)
+    cos_detail = _detail_rows(dept_config['cos_accounts'], gl_data)
     
-    # Build sales detail
-    sales_detail = []
-    total_sales_mtd = 0
-    total_sales_ytd = 0
-    
-    for account_no, description in dept_config['sales_accounts']:
-        data = gl_data.get(account_no, {'mtd': 0, 'ytd': 0})
-        # Revenue is stored as negative (credit), negate to show as positive
-        mtd = -data['mtd']
-        ytd = -data['ytd']
-        sales_detail.append({
-            'account_no': account_no,
-            'description': description,
-            'mtd': mtd,
-            'ytd': ytd
-        })
-        total_sales_mtd += mtd
-        total_sales_ytd += ytd
-    
-    # Build COS detail
-    cos_detail = []
-    total_cos_mtd = 0
-    total_cos_ytd = 0
-    
-    for account_no, description in dept_config['cos_accounts']:
-        data = gl_data.get(account_no, {'mtd': 0, 'ytd': 0})
-        # COS is stored as positive (debit)
-        mtd = data['mtd']
-        ytd = data['ytd']
-        cos_detail.append({
-            'account_no': account_no,
-            'description': description,
-            'mtd': mtd,
-            'ytd': ytd
-        })
-        total_cos_mtd += mtd
-        total_cos_ytd += ytd
+    sales_map = get_account_map(schema, 'detailed_sales')
+    cos_map = get_account_map(schema, 'detailed_cos')
+    total_sales_mtd = engine.rollup(sales_map, 'MTD', year, month, sign=-1, periods=periods)[dept_key]
+    total_sales_ytd = engine.rollup(sales_map, 'YTD', year, month, sign=-1)[dept_key]
+    total_cos_mtd = engine.rollup(cos_map, 'MTD', year, month, periods=periods)[dept_key]
+    total_cos_ytd = engine.rollup(cos_map, 'YTD', year, month)[dept_key]
     
     # Calculate gross profit
     gross_profit_mtd = total_sales_mtd - total_cos_mtd
@@ -158,85 +114,41 @@ def get_department_detail(schema, dept_key, year, month):
     }
 
 
-def get_overhead_expenses(schema, year, month):
-    """Get overhead expense data organized by category. Uses tenant-aware config."""
-    overhead_expense_accounts = get_overhead_expense_config(schema)
-    all_expense_accounts = []
-    for category_accounts in overhead_expense_accounts.values():
-        all_expense_accounts.extend([acct[0] for acct in category_accounts])
-    
-    gl_data = get_gl_account_data(schema, all_expense_accounts, year, month)
-    
-    expense_data = {}
-    total_mtd = 0
-    total_ytd = 0
-    
-    for category, accounts in overhead_expense_accounts.items():
-        category_detail = []
-        category_mtd = 0
-        category_ytd = 0
-        
-        for account_no, description in accounts:
-            data = gl_data.get(account_no, {'mtd': 0, 'ytd': 0})
-            mtd = data['mtd']
-            ytd = data['ytd']
-            category_detail.append({
-                'account_no': account_no,
-                'description': description,
-                'mtd': mtd,
-                'ytd': ytd
-            })
-            category_mtd += mtd
-            category_ytd += ytd
-        
-        expense_data[category] = {
-            'detail': category_detail,
-            'total_mtd': category_mtd,
-            'total_ytd': category_ytd
+def _category_detail(schema, map_name, config, year, month, engine, periods=None):
+    """{category: {'detail', 'total_mtd', 'total_ytd'}} for a detailed category config"""
+    gl_data = engine.account_values(year, month, periods)
+    account_map = get_account_map(schema, map_name)
+    totals_mtd = engine.rollup(account_map, 'MTD', year, month, periods=periods)
+    totals_ytd = engine.rollup(account_map, 'YTD', year, month)
+    return {
+        category: {
+            'detail': _detail_rows(accounts, gl_data),
+            'total_mtd': totals_mtd[category],
+            'total_ytd': totals_ytd[category]
         }
-        total_mtd += category_mtd
-        total_ytd += category_ytd
+        for category, accounts in config.items()
+    }
+
+
+def get_overhead_expenses(schema, year, month, engine=None, periods=None):
+    """Get overhead expense data organized by category. Uses tenant-aware config."""
+    engine = engine or load_gl_engine(schema, periods or [(year, month)])
+    expense_data = _category_detail(schema, 'detailed_overhead', get_overhead_expense_config(schema),
+                                    year, month, engine, periods)
     
+    total_mtd = sum(cat['total_mtd'] for cat in expense_data.values())
+    total_ytd = sum(cat['total_ytd'] for cat in expense_data.values())
     expense_data['total_overhead_mtd'] = total_mtd
     expense_data['total_overhead_ytd'] = total_ytd
     
     return expense_data
 
 
-def get_other_income_expense(schema, year, month):
+def get_other_income_expense(schema, year, month, engine=None, periods=None):
     """Get other income and expense data. Uses tenant-aware config."""
-    other_income_expense_accounts = get_other_income_expense_config(schema)
-    all_accounts = []
-    for category_accounts in other_income_expense_accounts.values():
-        all_accounts.extend([acct[0] for acct in category_accounts])
-    
-    gl_data = get_gl_account_data(schema, all_accounts, year, month)
-    
-    result = {}
-    
-    for category, accounts in other_income_expense_accounts.items():
-        category_detail = []
-        category_mtd = 0
-        category_ytd = 0
-        
-        for account_no, description in accounts:
-            data = gl_data.get(account_no, {'mtd': 0, 'ytd': 0})
-            mtd = data['mtd']
-            ytd = data['ytd']
-            category_detail.append({
-                'account_no': account_no,
-                'description': description,
-                'mtd': mtd,
-                'ytd': ytd
-            })
-            category_mtd += mtd
-            category_ytd += ytd
-        
-        result[category] = {
-            'detail': category_detail,
-            'total_mtd': category_mtd,
-            'total_ytd': category_ytd
-        }
+    engine = engine or load_gl_engine(schema, periods or [(year, month)])
+    result = _category_detail(schema, 'detailed_other', get_other_income_expense_config(schema),
+                              year, month, engine, periods)
     
     # Calculate total other income & expense
     result['total_mtd'] = (result.get('other_income', {}).get('total_mtd', 0) + 
@@ -1355,161 +1267,62 @@ def _get_months_in_range(start_date_str, end_date_str):
     return months
 
 
-def _sum_dept_data(dept_data_list):
-    """Sum department data across multiple months. Uses 'mtd' fields as the period total."""
-    if not dept_data_list:
-        return None
-    
-    # Start with a copy of the first month's structure
-    combined = {
-        'dept_code': dept_data_list[0]['dept_code'],
-        'dept_name': dept_data_list[0]['dept_name'],
-        'tab_name': dept_data_list[0]['tab_name'],
-        'sales_detail': [],
-        'cos_detail': [],
-        'total_sales_mtd': 0,
-        'total_sales_ytd': dept_data_list[-1]['total_sales_ytd'],  # YTD from last month
-        'total_cos_mtd': 0,
-        'total_cos_ytd': dept_data_list[-1]['total_cos_ytd'],
-        'gross_profit_mtd': 0,
-        'gross_profit_ytd': dept_data_list[-1]['gross_profit_ytd'],
-        'gross_margin_mtd': 0,
-        'gross_margin_ytd': dept_data_list[-1].get('gross_margin_ytd', 0),
+def build_detailed_pl_workbook(schema, months_in_range, engine=None):
+    """
+    Build the detailed P&L workbook for one or more months and return the xlsx bytes.
+    Every GL figure comes from a single GLRollupEngine load covering the range;
+    for multi-month ranges the department, overhead and other income 'mtd'
+    values are summed over the range and 'ytd' values are as of the last month.
+    """
+    # Use last month in range for YTD and balance sheet
+    last_year, last_month = months_in_range[-1]
+    periods = months_in_range if len(months_in_range) > 1 else None
+    
+    # Create workbook
+    wb = Workbook()
+    wb.remove(wb.active)
+    
+    # Get tenant-aware department order and inhouse config
+    dept_order = get_dept_order(schema)
+    ih_config = get_inhouse_config(schema)
+    inhouse_dept_key = ih_config['dept_key']
+    
+    # One GL query for every month in the range, shared by all departments and sheets
+    engine = engine or load_gl_engine(schema, months_in_range)
+    
+    all_dept_data = {}
+    total_gross_profit_mtd = 0
+    total_gross_profit_ytd = 0
+    
+    for dept_key in dept_order:
+        dept_data = get_department_detail(schema, dept_key, last_year, last_month, engine, periods)
+        if dept_data:
+            all_dept_data[dept_key] = dept_data
+            if dept_key != inhouse_dept_key:
+                create_department_worksheet(wb, dept_data, last_year, last_month)
+            total_gross_profit_mtd += dept_data['gross_profit_mtd']
+            total_gross_profit_ytd += dept_data['gross_profit_ytd']
+    
+    expense_data = get_overhead_expenses(schema, last_year, last_month, engine, periods)
+    other_data = get_other_income_expense(schema, last_year, last_month, engine, periods)
+    
+    # Create In House / Admin worksheet with expenses
+    inhouse_summary = {
+        'total_gross_profit_mtd': total_gross_profit_mtd,
+        'total_gross_profit_ytd': total_gross_profit_ytd
     }
+    inhouse_dept_data = all_dept_data.get(inhouse_dept_key, None)
+    create_inhouse_worksheet(wb, inhouse_summary, expense_data, other_data, last_year, last_month, inhouse_dept_data, ih_config)
     
-    # Build account-level detail by summing MTD across months
-    sales_by_account = {}
-    cos_by_account = {}
-    
-    for dd in dept_data_list:
-        for item in dd['sales_detail']:
-            key = item['account_no']
-            if key not in sales_by_account:
-                sales_by_account[key] = {'account_no': key, 'description': item['description'], 'mtd': 0, 'ytd': 0}
-            sales_by_account[key]['mtd'] += item['mtd']
-            sales_by_account[key]['ytd'] = item['ytd']  # YTD from last month
-        
-        for item in dd['cos_detail']:
-            key = item['account_no']
-            if key not in cos_by_account:
-                cos_by_account[key] = {'account_no': key, 'description': item['description'], 'mtd': 0, 'ytd': 0}
-            cos_by_account[key]['mtd'] += item['mtd']
-            cos_by_account[key]['ytd'] = item['ytd']
-    
-    combined['sales_detail'] = list(sales_by_account.values())
-    combined['cos_detail'] = list(cos_by_account.values())
-    combined['total_sales_mtd'] = sum(item['mtd'] for item in combined['sales_detail'])
-    combined['total_cos_mtd'] = sum(item['mtd'] for item in combined['cos_detail'])
-    combined['gross_profit_mtd'] = combined['total_sales_mtd'] - combined['total_cos_mtd']
-    combined['gross_margin_mtd'] = (combined['gross_profit_mtd'] / combined['total_sales_mtd'] * 100) if combined['total_sales_mtd'] else 0
-    
-    return combined
-
-
-def _sum_expense_data(expense_data_list):
-    """Sum overhead expense data across multiple months"""
-    if not expense_data_list:
-        return {}
-    
-    combined = {}
-    total_mtd = 0
-    
-    for ed in expense_data_list:
-        for key, val in ed.items():
-            if key in ('total_overhead_mtd', 'total_overhead_ytd'):
-                continue
-            if isinstance(val, dict) and 'detail' in val:
-                if key not in combined:
-                    combined[key] = {'detail': [], 'total_mtd': 0, 'total_ytd': val.get('total_ytd', 0)}
-                    # Initialize detail from first month
-                    detail_by_account = {}
-                    for item in val['detail']:
-                        detail_by_account[item['account_no']] = {
-                            'account_no': item['account_no'],
-                            'description': item['description'],
-                            'mtd': item['mtd'],
-                            'ytd': item['ytd']
-                        }
-                    combined[key]['_detail_map'] = detail_by_account
-                else:
-                    for item in val['detail']:
-                        akey = item['account_no']
-                        if akey in combined[key]['_detail_map']:
-                            combined[key]['_detail_map'][akey]['mtd'] += item['mtd']
-                            combined[key]['_detail_map'][akey]['ytd'] = item['ytd']
-                        else:
-                            combined[key]['_detail_map'][akey] = {
-                                'account_no': akey,
-                                'description': item['description'],
-                                'mtd': item['mtd'],
-                                'ytd': item['ytd']
-                            }
-                    combined[key]['total_ytd'] = val.get('total_ytd', 0)
-    
-    # Finalize
-    for key in combined:
-        if '_detail_map' in combined[key]:
-            combined[key]['detail'] = list(combined[key]['_detail_map'].values())
-            combined[key]['total_mtd'] = sum(item['mtd'] for item in combined[key]['detail'])
-            del combined[key]['_detail_map']
-            total_mtd += combined[key]['total_mtd']
-    
-    combined['total_overhead_mtd'] = total_mtd
-    combined['total_overhead_ytd'] = expense_data_list[-1].get('total_overhead_ytd', 0)
-    
-    return combined
-
-
-def _sum_other_data(other_data_list):
-    """Sum other income & expense data across multiple months"""
-    if not other_data_list:
-        return {}
-    
-    combined = {}
-    
-    for od in other_data_list:
-        for key, val in od.items():
-            if key in ('total_mtd', 'total_ytd'):
-                continue
-            if isinstance(val, dict) and 'detail' in val:
-                if key not in combined:
-                    combined[key] = {'detail': [], 'total_mtd': 0, 'total_ytd': val.get('total_ytd', 0)}
-                    detail_map = {}
-                    for item in val['detail']:
-                        detail_map[item['account_no']] = {
-                            'account_no': item['account_no'],
-                            'description': item['description'],
-                            'mtd': item['mtd'],
-                            'ytd': item['ytd']
-                        }
-                    combined[key]['_detail_map'] = detail_map
-                else:
-                    for item in val['detail']:
-                        akey = item['account_no']
-                        if akey in combined[key]['_detail_map']:
-                            combined[key]['_detail_map'][akey]['mtd'] += item['mtd']
-                            combined[key]['_detail_map'][akey]['ytd'] = item['ytd']
-                        else:
-                            combined[key]['_detail_map'][akey] = {
-                                'account_no': akey,
-                                'description': item['description'],
-                                'mtd': item['mtd'],
-                                'ytd': item['ytd']
-                            }
-                    combined[key]['total_ytd'] = val.get('total_ytd', 0)
-    
-    for key in combined:
-        if '_detail_map' in combined[key]:
-            combined[key]['detail'] = list(combined[key]['_detail_map'].values())
-            combined[key]['total_mtd'] = sum(item['mtd'] for item in combined[key]['detail'])
-            del combined[key]['_detail_map']
-    
-    combined['total_mtd'] = sum(
-        combined[k].get('total_mtd', 0) for k in combined if isinstance(combined.get(k), dict) and 'total_mtd' in combined[k]
-    )
-    combined['total_ytd'] = other_data_list[-1].get('total_ytd', 0)
+    # Create consolidated summary worksheet
+    create_consolidated_worksheet(wb, all_dept_data, expense_data, other_data, last_year, last_month, schema)
+    
+    # Create Balance Sheet worksheet (as of end of range)
+    create_balance_sheet_worksheet(wb, last_year, last_month)
     
-    return combined
+    output = BytesIO()
+    wb.save(output)
+    return output.getvalue()
 
 
 @pl_detailed_bp.route('/api/reports/pl/detailed/export', methods=['GET'])
@@ -1544,89 +1357,26 @@ def export_detailed_pl():
             months_in_range = [(year, month)]
         
         is_multi_month = len(months_in_range) > 1
-        # Use last month in range for YTD and balance sheet
         last_year, last_month = months_in_range[-1]
         first_year, first_month = months_in_range[0]
+        force_refresh = request.args.get('refresh', 'false').lower() == 'true'
         
         logger.info(f"Generating detailed P&L export for {len(months_in_range)} month(s): {months_in_range}, schema: {schema}")
         
-        # Create workbook
-        wb = Workbook()
-        wb.remove(wb.active)
-        
-        # Get tenant-aware department order and inhouse config
-        dept_order = get_dept_order(schema)
-        ih_config = get_inhouse_config(schema)
-        inhouse_dept_key = ih_config['dept_key']
+        # The workbook is cached per (schema, range, GL watermark): any GL posting
+        # in the range changes the watermark, so a cached workbook is never stale
+        watermark = gl_watermark(schema, months_in_range, db=get_sql_service())
+        cache_key = (f"pl_detailed_export:{schema}:{first_year}-{first_month:02d}:"
+                     f"{last_year}-{last_month:02d}:{watermark}")
         
-        if is_multi_month:
-            # Multi-month: collect data for each month, then sum
-            all_months_dept_data = {dk: [] for dk in dept_order}
-            all_months_expense_data = []
-            all_months_other_data = []
-            
-            for yr, mo in months_in_range:
-                for dept_key in dept_order:
-                    dept_data = get_department_detail(schema, dept_key, yr, mo)
-                    if dept_data:
-                        all_months_dept_data[dept_key].append(dept_data)
-                all_months_expense_data.append(get_overhead_expenses(schema, yr, mo))
-                all_months_other_data.append(get_other_income_expense(schema, yr, mo))
-            
-            # Sum across months
-            all_dept_data = {}
-            total_gross_profit_mtd = 0
-            total_gross_profit_ytd = 0
-            
-            for dept_key in dept_order:
-                if all_months_dept_data[dept_key]:
-                    combined = _sum_dept_data(all_months_dept_data[dept_key])
-                    if combined:
-                        all_dept_data[dept_key] = combined
-                        if dept_key != inhouse_dept_key:
-                            create_department_worksheet(wb, combined, last_year, last_month)
-                        total_gross_profit_mtd += combined['gross_profit_mtd']
-                        total_gross_profit_ytd += combined['gross_profit_ytd']
-            
-            expense_data = _sum_expense_data(all_months_expense_data)
-            other_data = _sum_other_data(all_months_other_data)
+        # .xlsx is already a zip archive, so the bytes are cached as-is
+        workbook_bytes = cache_service.get_bytes(cache_key) if not force_refresh else None
+        if workbook_bytes is not None:
+            logger.info(f"Detailed P&L export served from cache ({cache_key})")
         else:
-            # Single month: original behavior
-            year, month = months_in_range[0]
-            all_dept_data = {}
-            total_gross_profit_mtd = 0
-            total_gross_profit_ytd = 0
-            
-            for dept_key in dept_order:
-                dept_data = get_department_detail(schema, dept_key, year, month)
-                if dept_data:
-                    all_dept_data[dept_key] = dept_data
-                    if dept_key != inhouse_dept_key:
-                        create_department_worksheet(wb, dept_data, year, month)
-                    total_gross_profit_mtd += dept_data['gross_profit_mtd']
-                    total_gross_profit_ytd += dept_data['gross_profit_ytd']
-            
-            expense_data = get_overhead_expenses(schema, year, month)
-            other_data = get_other_income_expense(schema, year, month)
-        
-        # Create In House / Admin worksheet with expenses
-        inhouse_summary = {
-            'total_gross_profit_mtd': total_gross_profit_mtd,
-            'total_gross_profit_ytd': total_gross_profit_ytd
-        }
-        inhouse_dept_data = all_dept_data.get(inhouse_dept_key, None)
-        create_inhouse_worksheet(wb, inhouse_summary, expense_data, other_data, last_year, last_month, inhouse_dept_data, ih_config)
-        
-        # Create consolidated summary worksheet
-        create_consolidated_worksheet(wb, all_dept_data, expense_data, other_data, last_year, last_month, schema)
-        
-        # Create Balance Sheet worksheet (as of end of range)
-        create_balance_sheet_worksheet(wb, last_year, last_month)
-        
-        # Save to BytesIO
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
+            workbook_bytes = build_detailed_pl_workbook(schema, months_in_range)
+            cache_service.set_bytes(cache_key, workbook_bytes, ttl_seconds=DETAILED_EXPORT_CACHE_TTL,
+                                    tags=[f"tenant:{schema}"])
         
         # Generate filename
         if is_multi_month:
@@ -1639,12 +1389,10 @@ def export_detailed_pl():
         
         logger.info(f"Detailed P&L Excel export generated: {filename}")
         
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=filename
-        )
+        # The detailed layout relies on merged cells, so it is built as a regular
+        # workbook (its size is bounded by the chart of accounts); the download
+        # still goes out in chunks like the write-only exports
+        return xlsx_response(workbook_bytes, filename)
         
     except Exception as e:
         logger.error(f"Error exporting detailed P&L Excel: {str(e)}")
@@ -1684,15 +1432,16 @@ def get_detailed_pl():
         # Return all departments (tenant-aware order)
         all_dept_data = {}
         dept_order = get_dept_order(schema)
+        engine = load_gl_engine(schema, [(year, month)])
         
         for dept_key in dept_order:
-            dept_data = get_department_detail(schema, dept_key, year, month)
+            dept_data = get_department_detail(schema, dept_key, year, month, engine)
             if dept_data:
                 all_dept_data[dept_key] = dept_data
         
         # Get expense and other income data
-        expense_data = get_overhead_expenses(schema, year, month)
-        other_data = get_other_income_expense(schema, year, month)
+        expense_data = get_overhead_expenses(schema, year, month, engine)
+        other_data = get_other_income_expense(schema, year, month, engine)
         
         return jsonify({
             'year': year,
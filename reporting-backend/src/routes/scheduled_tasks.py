@@ -86,12 +86,14 @@ def get_scheduler_status():
     """
     try:
         from src.services.forecast_scheduler import get_scheduler_status as get_status
+        from src.services.cache_warmer import get_cache_warmer_status
         
         status = get_status()
         
         return jsonify({
             'success': True,
-            'scheduler': status
+            'scheduler': status,
+            'cache_warmer': get_cache_warmer_status()
         }), 200
         
     except Exception as e:
@@ -23,6 +23,10 @@ CACHE_TTL_SHORT = 60       # 1 minute
 CACHE_TTL_MEDIUM = 300     # 5 minutes
 CACHE_TTL_LONG = 900       # 15 minutes
 
+# Invalidation tags for every CEO dashboard cache entry
+CACHE_REPORT_TAG = 'report:vital_ceo'
+CACHE_TAGS = ('tenant:vital', CACHE_REPORT_TAG)
+
 
 def get_db():
     """Get PostgreSQL database connection"""
@@ -64,7 +68,7 @@ def get_ceo_dashboard():
         }
         
         # Cache the result
-        cache_service.set(cache_key, result, CACHE_TTL_MEDIUM)
+        cache_service.set(cache_key, result, CACHE_TTL_MEDIUM, tags=CACHE_TAGS)
         
         return jsonify(result)
         
@@ -91,7 +95,7 @@ def get_mobile_app_optimized():
         db = get_db()
         data = get_mobile_app_data(db, days)
         
-        cache_service.set(cache_key, data, CACHE_TTL_MEDIUM)
+        cache_service.set(cache_key, data, CACHE_TTL_MEDIUM, tags=CACHE_TAGS)
         return jsonify({'success': True, 'data': data, 'from_cache': False})
         
     except Exception as e:
@@ -114,7 +118,7 @@ def get_call_center_optimized():
         db = get_db()
         data = get_call_center_data(db, days)
         
-        cache_service.set(cache_key, data, CACHE_TTL_MEDIUM)
+        cache_service.set(cache_key, data, CACHE_TTL_MEDIUM, tags=CACHE_TAGS)
         return jsonify({'success': True, 'data': data, 'from_cache': False})
         
     except Exception as e:
@@ -137,7 +141,7 @@ def get_cms_optimized():
         db = get_db()
         data = get_cms_data(db, days)
         
-        cache_service.set(cache_key, data, CACHE_TTL_MEDIUM)
+        cache_service.set(cache_key, data, CACHE_TTL_MEDIUM, tags=CACHE_TAGS)
         return jsonify({'success': True, 'data': data, 'from_cache': False})
         
     except Exception as e:
@@ -150,8 +154,9 @@ def get_cms_optimized():
 def refresh_ceo_dashboard():
     """Force refresh all CEO Dashboard data by clearing cache"""
     try:
-        # Clear all CEO dashboard cache entries
-        cache_service.delete("vital_ceo_")
+        # Clear the CEO dashboard entries only - 'tenant:vital' also tags the
+        # rest of Vital's cached responses
+        cache_service.invalidate_tags(CACHE_REPORT_TAG)
         
         return jsonify({
             'success': True,
@@ -1,8 +1,13 @@
 import pandas as pd
-from typing import List, Dict, Any, Optional
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterator, Optional
 from ..config.database_config import DatabaseConfig
+from .sql_connection_pool import get_pool_manager, POOL_ENABLED
+from .query_executor import remaining_seconds, check_deadline, DeadlineExceeded
+from .query_telemetry import get_query_telemetry
 from datetime import datetime as _datetime
 import logging
+import math
 import re
 
 # Try to import SQL drivers
@@ -25,6 +30,14 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# pymssql-style placeholders: %s for a parameter, %% for a literal percent
+_PYFORMAT_RE = re.compile(r"%s|%%")
+
+
+def _to_qmark(query: str) -> str:
+    """Rewrite a pymssql (%s) query for pyodbc (?), the way pymssql reads it"""
+    return _PYFORMAT_RE.sub(lambda match: '?' if match.group(0) == '%s' else '%', query)
+
 class AzureSQLService:
     """Service for connecting to and querying Azure SQL Database"""
     
@@ -89,69 +102,82 @@ class AzureSQLService:
                     raise Exception(f"Azure SQL firewall blocks Railway IP {ip_address}. Please add this IP to your Azure SQL firewall rules.")
             raise
     
+    @contextmanager
+    def pooled_connection(self):
+        """
+        Borrow a connection from the shared pool for this server/database/user.
+        The connection is returned to the pool on exit, or discarded if the
+        block raised. Set AZURE_SQL_POOL_ENABLED=false to connect per call.
+        """
+        if not POOL_ENABLED:
+            conn = self.get_connection()
+            try:
+                yield conn
+            finally:
+                conn.close()
+            return
+
+        pool = get_pool_manager().get_pool(
+            self.server, self.database, self.username, self.get_connection
+        )
+        pooled = pool.acquire()
+        discard = False
+        try:
+            yield pooled.conn
+        except BaseException:
+            # Includes GeneratorExit from an abandoned iter_query, which leaves
+            # unread rows on the connection
+            discard = True
+            raise
+        finally:
+            pool.release(pooled, discard=discard)
+    
     def execute_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Execute a SQL query and return results as a list of dictionaries"""
-        conn = None
+        check_deadline()  # don't borrow a connection for a request that is already out of time
+        with get_query_telemetry().track('azure_sql', query, params, self.database, self.explain) as tracked:
+            with self.pooled_connection() as conn:
+                tracked.rows = self._execute_on_connection(conn, query, params)
+                return tracked.rows
+    
+    def iter_query(self, query: str, params: Optional[Dict[str, Any]] = None,
+                   batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Execute a SQL query and yield rows one at a time, fetching batch_size
+        rows per round trip instead of materializing the whole result set.
+        The pooled connection is held until the generator is exhausted or closed,
+        so consume it promptly (e.g. while writing an export).
+        """
+        check_deadline()
+        with get_query_telemetry().track('azure_sql', query, params, self.database, self.explain) as tracked, \
+                self.pooled_connection() as conn, self._deadline_timeout(conn):
+            cursor = conn.cursor()
+            tracked.rows = 0
+            try:
+                self._execute_cursor(cursor, query, params)
+                columns = self._cursor_columns(cursor)
+                while True:
+                    batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    tracked.rows += len(batch)
+                    for row in batch:
+                        yield self._clean_row(row, columns)
+            except Exception as e:
+                logger.error(f"Query execution failed: {str(e)}")
+                raise
+            finally:
+                cursor.close()
+    
+    def _execute_on_connection(self, conn, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Run a query on an open connection and convert rows to dictionaries"""
         cursor = None
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            if params:
-                if self.driver == 'pymssql':
-                    # pymssql uses %s placeholders.
-                    # Convert YYYY-MM-DD date strings to datetime objects so pymssql
-                    # sends them as SQL datetime types rather than nvarchar, preventing
-                    # SQL Server error 242 (implicit nvarchar-to-datetime conversion failure).
-                    converted_params = []
-                    for p in params:
-                        if isinstance(p, str) and len(p) == 10:
-                            try:
-                                converted_params.append(_datetime.strptime(p, '%Y-%m-%d'))
-                            except ValueError:
-                                converted_params.append(p)
-                        else:
-                            converted_params.append(p)
-                    cursor.execute(query, converted_params)
-                else:  # pyodbc
-                    # Convert dict params to positional params for pyodbc
-                    cursor.execute(query, list(params.values()))
-            else:
-                cursor.execute(query)
-            
-            if self.driver == 'pymssql':
-                # pymssql with as_dict=True returns dicts directly
-                raw_results = cursor.fetchall()
-                # Convert any bytes to strings
-                results = []
-                for row in raw_results:
-                    clean_row = {}
-                    for key, value in row.items():
-                        if isinstance(value, bytes):
-                            try:
-                                clean_row[key] = value.decode('utf-8')
-                            except:
-                                clean_row[key] = str(value)
-                        else:
-                            clean_row[key] = value
-                    results.append(clean_row)
-            else:  # pyodbc
-                # Get column names and convert to dicts
-                columns = [column[0] for column in cursor.description] if cursor.description else []
-                results = []
-                for row in cursor.fetchall():
-                    clean_row = {}
-                    for i, value in enumerate(row):
-                        if isinstance(value, bytes):
-                            try:
-                                clean_row[columns[i]] = value.decode('utf-8')
-                            except:
-                                clean_row[columns[i]] = str(value)
-                        else:
-                            clean_row[columns[i]] = value
-                    results.append(clean_row)
-            
-            return results
+            with self._deadline_timeout(conn):
+                cursor = conn.cursor()
+                self._execute_cursor(cursor, query, params)
+                columns = self._cursor_columns(cursor)
+                return [self._clean_row(row, columns) for row in cursor.fetchall()]
             
         except Exception as e:
             logger.error(f"Query execution failed: {str(e)}")
@@ -159,8 +185,113 @@ class AzureSQLService:
         finally:
             if cursor:
                 cursor.close()
-            if conn:
-                conn.close()
+    
+    def explain(self, query: str, params: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Estimated execution plan (showplan XML) for a query, without running it.
+        Used by query telemetry for slow queries.
+        """
+        with self.pooled_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                # SHOWPLAN_XML must be the only statement in its batch. If anything
+                # fails, pooled_connection discards the connection so it never
+                # goes back to the pool with showplan still on.
+                cursor.execute("SET SHOWPLAN_XML ON")
+                self._execute_cursor(cursor, query, params)
+                rows = cursor.fetchall()
+                cursor.execute("SET SHOWPLAN_XML OFF")
+            finally:
+                cursor.close()
+        if not rows:
+            return None
+        first = rows[0]
+        plan = next(iter(first.values())) if isinstance(first, dict) else first[0]
+        return plan.decode('utf-8') if isinstance(plan, bytes) else plan
+    
+    @contextmanager
+    def _deadline_timeout(self, conn):
+        """
+        Apply the request deadline (see query_executor.deadline_scope) as the
+        driver's query timeout, so the database cancels a statement that runs
+        past it. Restores the connection's own timeout afterwards. No-op when
+        there is no deadline or the driver does not expose a timeout.
+        """
+        remaining = remaining_seconds()
+        if remaining is None:
+            yield
+            return
+        if remaining <= 0:
+            raise DeadlineExceeded("Request deadline passed before the query was issued")
+        
+        seconds = max(1, int(math.ceil(remaining)))
+        if self.driver == 'pymssql':
+            target, attr = getattr(conn, '_conn', None), 'query_timeout'
+        else:  # pyodbc
+            target, attr = conn, 'timeout'
+        try:
+            previous = getattr(target, attr)
+            if previous and previous <= seconds:
+                target = None  # the connection's own timeout is already tighter
+            else:
+                setattr(target, attr, seconds)
+        except Exception:
+            target = None
+        try:
+            yield
+        finally:
+            if target is not None:
+                try:
+                    setattr(target, attr, previous)
+                except Exception:
+                    pass
+    
+    def _execute_cursor(self, cursor, query: str, params: Optional[Dict[str, Any]] = None):
+        """Execute a query on a cursor, adapting params to the active driver"""
+        if params:
+            if self.driver == 'pymssql':
+                # pymssql uses %s placeholders.
+                # Convert YYYY-MM-DD date strings to datetime objects so pymssql
+                # sends them as SQL datetime types rather than nvarchar, preventing
+                # SQL Server error 242 (implicit nvarchar-to-datetime conversion failure).
+                converted_params = []
+                for p in params:
+                    if isinstance(p, str) and len(p) == 10:
+                        try:
+                            converted_params.append(_datetime.strptime(p, '%Y-%m-%d'))
+                        except ValueError:
+                            converted_params.append(p)
+                    else:
+                        converted_params.append(p)
+                cursor.execute(query, converted_params)
+            else:  # pyodbc
+                # pyodbc takes positional ? params; queries are written for
+                # pymssql's %s (e.g. GLQueryBuilder.build), and older callers pass dicts
+                values = list(params.values()) if isinstance(params, dict) else list(params)
+                cursor.execute(_to_qmark(query), values)
+        else:
+            cursor.execute(query)
+    
+    def _cursor_columns(self, cursor) -> Optional[List[str]]:
+        """Column names for pyodbc tuples (pymssql with as_dict=True returns dicts directly)"""
+        if self.driver == 'pymssql':
+            return None
+        return [column[0] for column in cursor.description] if cursor.description else []
+    
+    @staticmethod
+    def _clean_row(row, columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Convert a driver row to a dict, decoding any bytes to strings"""
+        items = row.items() if columns is None else zip(columns, row)
+        clean_row = {}
+        for key, value in items:
+            if isinstance(value, bytes):
+                try:
+                    clean_row[key] = value.decode('utf-8')
+                except:
+                    clean_row[key] = str(value)
+            else:
+                clean_row[key] = value
+        return clean_row
     
     def get_dataframe(self, query: str, params: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
         """Execute a SQL query and return results as a pandas DataFrame"""
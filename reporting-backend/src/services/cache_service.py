@@ -1,23 +1,101 @@
 import redis
 from redis.backoff import ExponentialBackoff
 from redis.retry import Retry
+import copy
 import json
 import os
 import logging
 from datetime import timedelta
-from typing import Optional, Any, Callable
+from typing import Optional, Any, Callable, Tuple, Iterable, List
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import gzip
 import hashlib
+import threading
+import time
+import uuid
+from .lru_cache import ByteBudgetLRUCache
 
 logger = logging.getLogger(__name__)
 
+# Brotli is optional - without it cached responses are served gzip-only
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+# Single-flight settings: how long followers wait for the leader's result,
+# and how long a cross-process Redis lease is held before it auto-expires.
+SINGLE_FLIGHT_WAIT_SECONDS = int(os.environ.get('CACHE_SINGLE_FLIGHT_WAIT', '60'))
+SINGLE_FLIGHT_LEASE_SECONDS = int(os.environ.get('CACHE_SINGLE_FLIGHT_LEASE', '120'))
+SINGLE_FLIGHT_POLL_SECONDS = 0.25
+SINGLE_FLIGHT_LOCK_PREFIX = "sf_lock:"
+
+# Stale-while-revalidate: entries written with a stale window are wrapped in an
+# envelope recording when they stop being fresh. get() unwraps it transparently.
+SWR_FRESH_UNTIL_FIELD = '__swr_fresh_until__'
+SWR_REFRESH_WORKERS = int(os.environ.get('CACHE_SWR_REFRESH_WORKERS', '4'))
+
+# Pre-encoded HTTP responses are stored compressed; gzip level 6 is the usual
+# size/CPU trade-off and is only paid once per cache write.
+RESPONSE_GZIP_LEVEL = 6
+RESPONSE_BROTLI_QUALITY = 5
+
+# Tag-based invalidation: each tag is a Redis set of the keys written with it.
+# Tag sets outlive their longest member; stale members are harmless on delete.
+TAG_KEY_PREFIX = "tag:"
+TAG_SET_MIN_TTL_SECONDS = 86400
+TAG_DELETE_BATCH_SIZE = 500
+
+# L1 (in-process) tier. With Redis up it fronts Redis for at most L1_TTL_SECONDS
+# and copies are dropped via pub/sub when another worker writes or deletes the key.
+# Without Redis it is the whole cache and entries live for their full TTL.
+L1_MAX_BYTES = int(os.environ.get('CACHE_L1_MAX_BYTES', str(64 * 1024 * 1024)))
+L1_MAX_ENTRY_BYTES = int(os.environ.get('CACHE_L1_MAX_ENTRY_BYTES', str(8 * 1024 * 1024)))
+L1_TTL_SECONDS = int(os.environ.get('CACHE_L1_TTL', '300'))
+L1_SWEEP_INTERVAL_SECONDS = 30
+L1_INVALIDATION_CHANNEL = 'cache_l1_invalidate'
+L1_FLUSH_ALL = '*'
+
+# Only delete the lease if we still own it (it may have expired and been taken over)
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
 class CacheService:
     """Redis caching service for dashboard and report data with in-memory fallback"""
     
     def __init__(self):
         self.redis_client = None
-        self.memory_cache = {}  # Fallback in-memory cache
+        self.redis_binary_client = None  # Same server, no decoding - for pre-encoded response bodies and raw bytes
+        # L1 in-process tier (and the whole cache when Redis is unavailable)
+        self.memory_cache = ByteBudgetLRUCache(L1_MAX_BYTES, L1_MAX_ENTRY_BYTES, L1_SWEEP_INTERVAL_SECONDS)
+        self._instance_id = uuid.uuid4().hex  # Lets us ignore our own pub/sub invalidations
         self.enabled = False
+        # Single-flight bookkeeping: cache_key -> Future of the in-progress query
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        # Keys with a background stale-while-revalidate refresh scheduled in this process
+        self._refreshing = set()
+        self._refresh_executor = ThreadPoolExecutor(max_workers=SWR_REFRESH_WORKERS, thread_name_prefix='cache-swr')
+        self.stats = {
+            'coalesced_waits': 0,         # Followers served by an in-process leader
+            'coalesced_remote_waits': 0,  # Followers served by a leader in another process
+            'coalesce_timeouts': 0,       # Followers that gave up waiting and ran the query
+            'stale_hits': 0,              # Stale values served while a refresh runs
+            'background_refreshes': 0,    # Stale-while-revalidate refreshes started
+            'l1_hits': 0,                 # Served from process memory
+            'l1_misses': 0,
+            'l2_hits': 0,                 # Served from Redis
+            'l2_misses': 0,
+            'l1_remote_invalidations': 0, # L1 copies dropped because another worker changed them
+        }
         self._connect()
+        if self.redis_client:
+            self._start_invalidation_listener()
     
     def _connect(self):
         """Connect to Redis if available"""
@@ -33,15 +111,15 @@ class CacheService:
                     backoff=ExponentialBackoff(cap=10, base=0.1),
                     retries=3
                 )
-                self.redis_client = redis.from_url(
-                    redis_url,
-                    decode_responses=True,
+                client_options = dict(
                     socket_connect_timeout=5,
                     socket_timeout=5,
                     retry_on_timeout=True,
                     retry_on_error=[redis.ConnectionError, redis.TimeoutError],
                     retry=retry_strategy
                 )
+                self.redis_client = redis.from_url(redis_url, decode_responses=True, **client_options)
+                self.redis_binary_client = redis.from_url(redis_url, decode_responses=False, **client_options)
                 # Test connection
                 self.redis_client.ping()
                 self.enabled = True
@@ -54,6 +132,7 @@ class CacheService:
             print("⚠️ [CacheService] Falling back to in-memory cache")
             self.enabled = True  # Enable caching with in-memory fallback
             self.redis_client = None
+            self.redis_binary_client = None
     
     def _make_key(self, prefix: str, params: dict = None) -> str:
         """Create a cache key from prefix and parameters"""
@@ -66,50 +145,260 @@ class CacheService:
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache (Redis or in-memory fallback)"""
+        value, _ = self.get_entry(key)
+        return value
+    
+    def get_entry(self, key: str) -> Tuple[Optional[Any], bool]:
+        """
+        Get value from cache along with its freshness.
+        
+        Returns:
+            (value, is_stale) - is_stale is True when the entry is past its soft
+            TTL but still inside its stale-while-revalidate window.
+        """
         if not self.enabled:
-            return None
+            return None, False
         
         try:
+            # L1: process memory. It holds the JSON text, not the object: callers
+            # mutate what they get back (top-level fields like 'from_cache', nested
+            # lists and dicts), so every hit decodes its own copy.
+            raw, is_stale = self.memory_cache.get(key)
+            if raw is not None:
+                self._incr_stat('l1_hits')
+                value, _ = self._unwrap(json.loads(raw))
+                return value, is_stale
+            self._incr_stat('l1_misses')
+            
             if self.redis_client:
-                # Use Redis if available
-                value = self.redis_client.get(key)
-                if value:
-                    return json.loads(value)
-            else:
-                # Use in-memory cache as fallback
-                import time
-                cache_item = self.memory_cache.get(key)
-                if cache_item:
-                    if time.time() < cache_item['expires']:
-                        return cache_item['value']
-                    else:
-                        # Expired, remove from cache
-                        del self.memory_cache[key]
+                # L2: Redis
+                raw = self.redis_client.get(key)
+                if raw:
+                    self._incr_stat('l2_hits')
+                    payload = json.loads(raw)
+                    value, is_stale = self._unwrap(payload)
+                    fresh_until = payload.get(SWR_FRESH_UNTIL_FIELD) if isinstance(payload, dict) else None
+                    self._store_l1(key, raw, len(raw), L1_TTL_SECONDS, fresh_until)
+                    return value, is_stale
+                self._incr_stat('l2_misses')
         except Exception as e:
             logger.error(f"Cache get error for key {key}: {str(e)}")
         
-        return None
+        return None, False
+    
+    def _store_l1(self, key: str, value: Any, size: int, ttl_seconds: int, fresh_until: Optional[float] = None,
+                  tags: Optional[Iterable[str]] = None):
+        """
+        Keep a copy in process memory (get/set entries as their JSON text, so
+        readers never share a mutable object). When fronting Redis the copy lives at most
+        L1_TTL_SECONDS. Tags are only indexed here for the in-memory fallback
+        (with Redis they live in Redis tag sets).
+        """
+        now = time.time()
+        if self.redis_client:
+            ttl_seconds = min(ttl_seconds, L1_TTL_SECONDS)
+        expires = now + ttl_seconds
+        if fresh_until is not None:
+            fresh_until = min(fresh_until, expires)
+        self.memory_cache.set(key, value, size, expires, fresh_until, tags)
     
-    def set(self, key: str, value: Any, ttl_seconds: int = 300):
-        """Set value in cache with TTL (Redis or in-memory fallback)"""
+    def get_remaining_ttl(self, key: str) -> Optional[float]:
+        """Seconds until a key expires (hard TTL), or None if it isn't cached"""
+        if not self.enabled:
+            return None
+        try:
+            if self.redis_client:
+                ttl_ms = self.redis_client.pttl(key)
+                return ttl_ms / 1000.0 if ttl_ms and ttl_ms > 0 else None
+            return self.memory_cache.remaining_ttl(key)
+        except Exception as e:
+            logger.error(f"Cache TTL lookup error for key {key}: {str(e)}")
+            return None
+    
+    @staticmethod
+    def _unwrap(payload: Any) -> Tuple[Any, bool]:
+        """Split a stored payload into (value, is_stale)"""
+        if isinstance(payload, dict) and SWR_FRESH_UNTIL_FIELD in payload and len(payload) == 2:
+            return payload.get('value'), time.time() >= payload[SWR_FRESH_UNTIL_FIELD]
+        return payload, False
+    
+    def set(self, key: str, value: Any, ttl_seconds: int = 300, stale_ttl_seconds: int = 0,
+            tags: Optional[Iterable[str]] = None):
+        """
+        Set value in cache with TTL (Redis or in-memory fallback).
+        
+        With stale_ttl_seconds > 0 the entry stays readable for that long after
+        ttl_seconds, flagged as stale so callers can serve it while refreshing.
+        Tags (e.g. 'tenant:ben002', 'report:dashboard', 'month:2025-10') let
+        invalidate_tags() remove the entry without scanning the keyspace.
+        """
         if not self.enabled:
             return
         
+        hard_ttl = ttl_seconds + max(stale_ttl_seconds, 0)
         try:
             if self.redis_client:
                 # Use Redis if available
-                json_value = json.dumps(value)
-                self.redis_client.setex(key, ttl_seconds, json_value)
+                if stale_ttl_seconds > 0:
+                    payload = {SWR_FRESH_UNTIL_FIELD: time.time() + ttl_seconds, 'value': value}
+                else:
+                    payload = value
+                json_value = json.dumps(payload)
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.setex(key, hard_ttl, json_value)
+                self._tag_key(key, tags, hard_ttl, pipe)
+                self._publish_invalidation([key], pipe)
+                pipe.execute()
+                self._store_l1(key, json_value, len(json_value), hard_ttl, time.time() + ttl_seconds)
             else:
                 # Use in-memory cache as fallback
-                import time
-                self.memory_cache[key] = {
-                    'value': value,
-                    'expires': time.time() + ttl_seconds
-                }
+                json_value = json.dumps(value, default=str)
+                self._store_l1(key, json_value, len(json_value), hard_ttl, time.time() + ttl_seconds, tags)
         except Exception as e:
             logger.error(f"Cache set error for key {key}: {str(e)}")
     
+    @staticmethod
+    def encode_response(body: bytes) -> dict:
+        """
+        Pre-encode an HTTP response body for caching.
+        
+        Returns a dict with a strong ETag (content hash of the uncompressed
+        body), the gzip-compressed body and, when available, a brotli body.
+        """
+        entry = {
+            'etag': hashlib.sha256(body).hexdigest()[:32],
+            'size': len(body),
+            'gzip': gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL),
+        }
+        if HAS_BROTLI:
+            entry['br'] = brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY)
+        return entry
+    
+    def set_response(self, key: str, body: bytes, ttl_seconds: int = 300, stale_ttl_seconds: int = 0,
+                     tags: Optional[Iterable[str]] = None) -> Optional[dict]:
+        """
+        Cache a pre-encoded response body (see encode_response) so hits can be
+        served without JSON decoding or re-serialization.
+        
+        Returns:
+            The encoded entry, or None if caching is disabled
+        """
+        if not self.enabled:
+            return None
+        
+        entry = self.encode_response(body)
+        hard_ttl = ttl_seconds + max(stale_ttl_seconds, 0)
+        fresh_until = time.time() + ttl_seconds
+        try:
+            if self.redis_binary_client:
+                mapping = {
+                    'etag': entry['etag'],
+                    'size': entry['size'],
+                    'gzip': entry['gzip'],
+                    'fresh_until': fresh_until,
+                }
+                if 'br' in entry:
+                    mapping['br'] = entry['br']
+                pipe = self.redis_binary_client.pipeline(transaction=True)
+                pipe.delete(key)
+                pipe.hset(key, mapping=mapping)
+                pipe.expire(key, hard_ttl)
+                self._tag_key(key, tags, hard_ttl, pipe)
+                self._publish_invalidation([key], pipe)
+                pipe.execute()
+                self._store_l1(key, entry, self._response_size(entry), hard_ttl, fresh_until)
+            else:
+                self._store_l1(key, entry, self._response_size(entry), hard_ttl, fresh_until, tags)
+        except Exception as e:
+            logger.error(f"Cache set_response error for key {key}: {str(e)}")
+        return entry
+    
+    def get_response(self, key: str) -> Tuple[Optional[dict], bool]:
+        """
+        Get a pre-encoded response stored by set_response.
+        
+        Returns:
+            (entry, is_stale) - entry has 'etag', 'size', 'gzip' and optionally 'br'
+        """
+        if not self.enabled:
+            return None, False
+        
+        try:
+            entry, is_stale = self.memory_cache.get(key)
+            if entry is not None:
+                self._incr_stat('l1_hits')
+                return dict(entry), is_stale   # values are immutable bytes/str/int
+            self._incr_stat('l1_misses')
+            
+            if self.redis_binary_client:
+                raw = self.redis_binary_client.hgetall(key)
+                if raw and b'gzip' in raw:
+                    self._incr_stat('l2_hits')
+                    entry = {
+                        'etag': raw[b'etag'].decode(),
+                        'size': int(raw[b'size']),
+                        'gzip': raw[b'gzip'],
+                    }
+                    if b'br' in raw:
+                        entry['br'] = raw[b'br']
+                    fresh_until = float(raw[b'fresh_until'])
+                    self._store_l1(key, entry, self._response_size(entry), L1_TTL_SECONDS, fresh_until)
+                    return entry, time.time() >= fresh_until
+                self._incr_stat('l2_misses')
+        except Exception as e:
+            logger.error(f"Cache get_response error for key {key}: {str(e)}")
+        
+        return None, False
+    
+    @staticmethod
+    def _response_size(entry: dict) -> int:
+        return len(entry['gzip']) + len(entry.get('br', b''))
+    
+    def set_bytes(self, key: str, data: bytes, ttl_seconds: int = 300, tags: Optional[Iterable[str]] = None):
+        """
+        Cache raw bytes as-is, e.g. a generated file that is already compressed
+        (.xlsx is a zip) and would gain nothing from set_response's encodings.
+        """
+        if not self.enabled:
+            return
+        
+        try:
+            if self.redis_binary_client:
+                pipe = self.redis_binary_client.pipeline(transaction=False)
+                pipe.setex(key, ttl_seconds, data)
+                self._tag_key(key, tags, ttl_seconds, pipe)
+                self._publish_invalidation([key], pipe)
+                pipe.execute()
+                self._store_l1(key, data, len(data), ttl_seconds)
+            else:
+                self._store_l1(key, data, len(data), ttl_seconds, tags=tags)
+        except Exception as e:
+            logger.error(f"Cache set_bytes error for key {key}: {str(e)}")
+    
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """Get bytes stored by set_bytes"""
+        if not self.enabled:
+            return None
+        
+        try:
+            data, _ = self.memory_cache.get(key)
+            if data is not None:
+                self._incr_stat('l1_hits')
+                return data
+            self._incr_stat('l1_misses')
+        
+            if self.redis_binary_client:
+                data = self.redis_binary_client.get(key)
+                if data is not None:
+                    self._incr_stat('l2_hits')
+                    self._store_l1(key, data, len(data), L1_TTL_SECONDS)
+                    return data
+                self._incr_stat('l2_misses')
+        except Exception as e:
+            logger.error(f"Cache get_bytes error for key {key}: {str(e)}")
+        
+        return None
+        
     def delete(self, pattern: str):
         """Delete cache entries matching pattern (Redis or in-memory fallback)"""
         if not self.enabled:
@@ -117,59 +406,342 @@ class CacheService:
         
         try:
             if self.redis_client:
-                # Use Redis if available
-                keys = self.redis_client.keys(f"{pattern}*")
-                if keys:
-                    self.redis_client.delete(*keys)
-                    logger.info(f"Deleted {len(keys)} cache entries matching {pattern}")
+                # Use Redis if available. SCAN instead of KEYS so Redis isn't blocked;
+                # prefer invalidate_tags() for anything on a hot path.
+                deleted = self._delete_in_batches(
+                    self.redis_client.scan_iter(match=f"{pattern}*", count=TAG_DELETE_BATCH_SIZE)
+                )
+                if deleted:
+                    logger.info(f"Deleted {deleted} cache entries matching {pattern}")
             else:
                 # Use in-memory cache as fallback
                 keys_to_delete = [key for key in self.memory_cache.keys() if key.startswith(pattern)]
                 for key in keys_to_delete:
-                    del self.memory_cache[key]
+                    self.memory_cache.pop(key)
                 if keys_to_delete:
                     logger.info(f"Deleted {len(keys_to_delete)} cache entries matching {pattern}")
         except Exception as e:
             logger.error(f"Cache delete error for pattern {pattern}: {str(e)}")
     
-    def cache_query(self, cache_key: str, query_func: Callable, ttl_seconds: int = 300, force_refresh: bool = False) -> Any:
+    def invalidate_tags(self, *tags: str, match_all: bool = False) -> int:
+        """
+        Delete every cache entry written with the given tags.
+        
+        Args:
+            *tags: Tags to invalidate (e.g. 'tenant:ben002', 'report:dashboard')
+            match_all: Only delete entries carrying ALL of the tags (intersection)
+                       instead of ANY of them (union)
+        
+        Returns:
+            Number of keys deleted
+        """
+        if not self.enabled or not tags:
+            return 0
+        
+        deleted = 0
+        try:
+            if self.redis_client:
+                tag_keys = [f"{TAG_KEY_PREFIX}{tag}" for tag in tags]
+                if match_all:
+                    deleted = self._delete_in_batches(self.redis_client.sinter(tag_keys))
+                else:
+                    for tag_key in tag_keys:
+                        deleted += self._delete_in_batches(
+                            self.redis_client.sscan_iter(tag_key, count=TAG_DELETE_BATCH_SIZE)
+                        )
+                    self.redis_client.delete(*tag_keys)
+            else:
+                # Popping an entry also drops it from the L1 tag index
+                for key in self.memory_cache.keys_for_tags(tags, match_all):
+                    if self.memory_cache.pop(key):
+                        deleted += 1
+            logger.info(f"Invalidated {deleted} cache entries for tags {list(tags)}{' (all)' if match_all else ''}")
+        except Exception as e:
+            logger.error(f"Cache invalidate_tags error for {list(tags)}: {str(e)}")
+        return deleted
+    
+    def _tag_key(self, key: str, tags: Optional[Iterable[str]], ttl_seconds: int, pipe):
+        """Queue adding key to each Redis tag set (the in-memory fallback indexes tags in the L1 entry)"""
+        if not tags:
+            return
+        tag_ttl = max(ttl_seconds, TAG_SET_MIN_TTL_SECONDS)
+        for tag in tags:
+            pipe.sadd(f"{TAG_KEY_PREFIX}{tag}", key)
+            pipe.expire(f"{TAG_KEY_PREFIX}{tag}", tag_ttl)
+    
+    def _delete_in_batches(self, keys: Iterable[str]) -> int:
+        """Delete keys from Redis in pipelined batches; returns how many existed"""
+        deleted = 0
+        batch: List[str] = []
+        for key in keys:
+            batch.append(key)
+            if len(batch) >= TAG_DELETE_BATCH_SIZE:
+                deleted += self._delete_batch(batch)
+                batch = []
+        if batch:
+            deleted += self._delete_batch(batch)
+        return deleted
+    
+    def _delete_batch(self, batch: List[str]) -> int:
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.unlink(*batch)
+        self._publish_invalidation(batch, pipe)
+        deleted = pipe.execute()[0]
+        for key in batch:
+            self.memory_cache.pop(key)
+        return deleted
+    
+    # ==================== L1 invalidation over pub/sub ====================
+    
+    def _publish_invalidation(self, keys: List[str], pipe=None):
+        """Tell other workers to drop their L1 copies of these keys (queued on pipe if given)"""
+        if not self.redis_client:
+            return
+        message = json.dumps({'source': self._instance_id, 'keys': keys})
+        if pipe is not None:
+            pipe.publish(L1_INVALIDATION_CHANNEL, message)
+            return
+        try:
+            self.redis_client.publish(L1_INVALIDATION_CHANNEL, message)
+        except Exception as e:
+            logger.error(f"L1 invalidation publish error: {str(e)}")
+    
+    def _start_invalidation_listener(self):
+        listener = threading.Thread(target=self._invalidation_loop, name='cache-l1-invalidation', daemon=True)
+        listener.start()
+    
+    def _invalidation_loop(self):
+        """Drop L1 entries changed by other workers; resubscribes after Redis errors"""
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(L1_INVALIDATION_CHANNEL)
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if not message or message.get('type') != 'message':
+                        continue
+                    payload = json.loads(message['data'])
+                    if payload.get('source') == self._instance_id:
+                        continue
+                    keys = payload.get('keys') or []
+                    if keys == [L1_FLUSH_ALL]:
+                        self.memory_cache.clear()
+                    else:
+                        for key in keys:
+                            if self.memory_cache.pop(key):
+                                self._incr_stat('l1_remote_invalidations')
+            except Exception as e:
+                logger.error(f"L1 invalidation listener error, resubscribing: {str(e)}")
+                # Anything could have changed while we were disconnected
+                self.memory_cache.clear()
+                time.sleep(5)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+    
+    def cache_query(self, cache_key: str, query_func: Callable, ttl_seconds: int = 300, force_refresh: bool = False,
+                    stale_ttl_seconds: int = 0, tags: Optional[Iterable[str]] = None) -> Any:
         """
         Cache the result of a query function
         
+        Concurrent misses for the same key are coalesced (single-flight): the
+        first caller in this process runs the query while the others wait on
+        its result, and a Redis SET NX lease does the same across gunicorn
+        workers. Followers that wait longer than SINGLE_FLIGHT_WAIT_SECONDS
+        fall back to running the query themselves.
+        
+        When stale_ttl_seconds is set, a value past its TTL but inside the stale
+        window is returned immediately and a single background refresh is
+        scheduled (stale-while-revalidate).
+        
         Args:
             cache_key: Unique key for this query
             query_func: Function that executes the query
             ttl_seconds: Time to live in seconds (default 5 minutes)
             force_refresh: Force refresh the cache
+            stale_ttl_seconds: How long past the TTL a stale value may be served
+            tags: Invalidation tags for the stored entry (see set())
         
         Returns:
             Query result (from cache or fresh)
         """
         # Check cache first unless force refresh
         if not force_refresh:
-            cached_result = self.get(cache_key)
+            cached_result, is_stale = self.get_entry(cache_key)
             if cached_result is not None:
-                logger.info(f"✅ CACHE HIT for {cache_key} (using {'Redis' if self.redis_client else 'memory'})")
+                if is_stale:
+                    self._incr_stat('stale_hits')
+                    logger.info(f"♻️ STALE HIT for {cache_key}, serving stale value while refreshing")
+                    self.schedule_refresh(
+                        cache_key,
+                        lambda: self._execute_and_store(cache_key, query_func, ttl_seconds, stale_ttl_seconds, tags)
+                    )
+                else:
+                    logger.info(f"✅ CACHE HIT for {cache_key} (using {'Redis' if self.redis_client else 'memory'})")
                 return cached_result
         
-        # Execute query
-        if force_refresh:
-            logger.info(f"🔄 FORCE REFRESH for {cache_key}, bypassing cache")
-        else:
-            logger.info(f"❌ CACHE MISS for {cache_key}, executing query")
+        # Join an in-flight query for this key if one is already running here
+        with self._inflight_lock:
+            future = self._inflight.get(cache_key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._inflight[cache_key] = future
+        
+        if not is_leader:
+            return self._wait_for_leader(cache_key, future, query_func, ttl_seconds, stale_ttl_seconds, tags)
+        
+        try:
+            result = self._lead_query(cache_key, query_func, ttl_seconds, force_refresh, stale_ttl_seconds, tags)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(cache_key, None)
+    
+    def _wait_for_leader(self, cache_key: str, future: Future, query_func: Callable, ttl_seconds: int,
+                         stale_ttl_seconds: int = 0, tags: Optional[Iterable[str]] = None) -> Any:
+        """Wait for the in-process leader's result, falling back to our own query on timeout"""
+        try:
+            result = future.result(timeout=SINGLE_FLIGHT_WAIT_SECONDS)
+            self._incr_stat('coalesced_waits')
+            logger.info(f"🔗 COALESCED {cache_key} (waited on in-flight query)")
+            # The leader hands the same object to its own caller
+            return copy.deepcopy(result)
+        except FutureTimeoutError:
+            self._incr_stat('coalesce_timeouts')
+            logger.warning(f"⏱️ Single-flight wait timed out for {cache_key}, executing query directly")
+            return self._execute_and_store(cache_key, query_func, ttl_seconds, stale_ttl_seconds, tags)
+    
+    def _lead_query(self, cache_key: str, query_func: Callable, ttl_seconds: int, force_refresh: bool,
+                    stale_ttl_seconds: int = 0, tags: Optional[Iterable[str]] = None) -> Any:
+        """Run the query as the in-process leader, coordinating with other processes via Redis"""
+        lease_token = None
+        if self.redis_client and not force_refresh:
+            lease_token = self._acquire_lease(cache_key)
+            if lease_token is None:
+                # Another worker is already running this query - wait for it to populate the cache
+                result = self._wait_for_remote_leader(cache_key)
+                if result is not None:
+                    self._incr_stat('coalesced_remote_waits')
+                    logger.info(f"🔗 COALESCED {cache_key} (served by another worker)")
+                    return result
+                self._incr_stat('coalesce_timeouts')
+                logger.warning(f"⏱️ Remote single-flight wait timed out for {cache_key}, executing query directly")
         
+        try:
+            if force_refresh:
+                logger.info(f"🔄 FORCE REFRESH for {cache_key}, bypassing cache")
+            else:
+                logger.info(f"❌ CACHE MISS for {cache_key}, executing query")
+            return self._execute_and_store(cache_key, query_func, ttl_seconds, stale_ttl_seconds, tags)
+        finally:
+            if lease_token:
+                self._release_lease(cache_key, lease_token)
+    
+    def _execute_and_store(self, cache_key: str, query_func: Callable, ttl_seconds: int,
+                           stale_ttl_seconds: int = 0, tags: Optional[Iterable[str]] = None) -> Any:
+        """Execute the query and store the result"""
         result = query_func()
         
         # Store in cache
-        self.set(cache_key, result, ttl_seconds)
+        self.set(cache_key, result, ttl_seconds, stale_ttl_seconds, tags)
         logger.info(f"💾 Cached result for {cache_key} (TTL: {ttl_seconds}s, backend: {'Redis' if self.redis_client else 'memory'})")
         
         return result
     
-    def invalidate_dashboard(self):
-        """Invalidate all dashboard cache entries"""
-        self.delete("dashboard:")
-        logger.info("Dashboard cache invalidated")
+    def _acquire_lease(self, cache_key: str) -> Optional[str]:
+        """Try to take the cross-process lease for a key. Returns the lease token, or None if held elsewhere"""
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.redis_client.set(
+                f"{SINGLE_FLIGHT_LOCK_PREFIX}{cache_key}", token,
+                nx=True, ex=SINGLE_FLIGHT_LEASE_SECONDS
+            )
+            return token if acquired else None
+        except Exception as e:
+            # If Redis is misbehaving, don't block the query on coordination
+            logger.error(f"Single-flight lease error for key {cache_key}: {str(e)}")
+            return token
+    
+    def _release_lease(self, cache_key: str, token: str):
+        try:
+            self.redis_client.eval(_RELEASE_LEASE_SCRIPT, 1, f"{SINGLE_FLIGHT_LOCK_PREFIX}{cache_key}", token)
+        except Exception as e:
+            logger.error(f"Single-flight lease release error for key {cache_key}: {str(e)}")
+    
+    def _wait_for_remote_leader(self, cache_key: str) -> Optional[Any]:
+        """Poll the cache until another process fills it, its lease disappears, or we time out"""
+        lock_key = f"{SINGLE_FLIGHT_LOCK_PREFIX}{cache_key}"
+        deadline = time.monotonic() + SINGLE_FLIGHT_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(SINGLE_FLIGHT_POLL_SECONDS)
+            result = self.get(cache_key)
+            if result is not None:
+                return result
+            try:
+                if not self.redis_client.exists(lock_key):
+                    # Leader finished (or failed) without caching anything
+                    return self.get(cache_key)
+            except Exception:
+                return None
+        return None
+    
+    def schedule_refresh(self, cache_key: str, refresh_func: Callable) -> bool:
+        """
+        Run refresh_func in the background unless a refresh for this key is
+        already scheduled in this process or leased by another worker.
+        
+        Returns:
+            True if a refresh was scheduled by this call
+        """
+        with self._inflight_lock:
+            if cache_key in self._refreshing:
+                return False
+            self._refreshing.add(cache_key)
+        
+        lease_token = None
+        if self.redis_client:
+            lease_token = self._acquire_lease(cache_key)
+            if lease_token is None:
+                with self._inflight_lock:
+                    self._refreshing.discard(cache_key)
+                return False
+        
+        def run_refresh():
+            try:
+                refresh_func()
+                logger.info(f"♻️ Background refresh complete for {cache_key}")
+            except Exception as e:
+                logger.error(f"Background refresh failed for {cache_key}: {str(e)}")
+            finally:
+                if lease_token:
+                    self._release_lease(cache_key, lease_token)
+                with self._inflight_lock:
+                    self._refreshing.discard(cache_key)
+        
+        self._incr_stat('background_refreshes')
+        self._refresh_executor.submit(run_refresh)
+        return True
+    
+    def _incr_stat(self, name: str):
+        with self._inflight_lock:
+            self.stats[name] += 1
+    
+    def invalidate_dashboard(self, schema: Optional[str] = None):
+        """Invalidate dashboard cache entries, for one tenant schema or all tenants"""
+        if schema:
+            self.invalidate_tags('report:dashboard', f"tenant:{schema}", match_all=True)
+        else:
+            self.invalidate_tags('report:dashboard')
+        logger.info(f"Dashboard cache invalidated{f' for {schema}' if schema else ''}")
 
     def flush_all(self):
         """Flush ALL cache entries (Redis flushdb or clear in-memory dict)"""
@@ -177,11 +749,12 @@ class CacheService:
             if self.redis_client:
                 count = self.redis_client.dbsize()
                 self.redis_client.flushdb()
+                self.memory_cache.clear()
+                self._publish_invalidation([L1_FLUSH_ALL])
                 logger.info(f"Flushed entire Redis cache ({count} keys)")
                 return count
             else:
-                count = len(self.memory_cache)
-                self.memory_cache.clear()
+                count = self.memory_cache.clear()
                 logger.info(f"Flushed in-memory cache ({count} keys)")
                 return count
         except Exception as e:
@@ -195,6 +768,9 @@ class CacheService:
             'enabled': self.enabled,
             'backend': 'redis' if self.redis_client else 'memory',
             'redis_url_set': bool(os.environ.get('REDIS_URL')),
+            'counters': dict(self.stats),
+            'in_flight': len(self._inflight),
+            'refreshing': len(self._refreshing),
         }
         if self.redis_client:
             try:
@@ -207,6 +783,7 @@ class CacheService:
                 status['redis_error'] = str(e)
         else:
             status['memory_cache_keys'] = len(self.memory_cache)
+        status['l1'] = self.memory_cache.get_stats()
         return status
 
 
@@ -3,17 +3,39 @@ Dashboard Cache Warmer Service
 Pre-warms the dashboard cache on server startup and maintains it with periodic refreshes.
 This eliminates the ~30 second cold-start delay for dashboard loading.
 """
+import os
+import time
 import logging
 import atexit
 import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 from apscheduler.schedulers.background import BackgroundScheduler
+from src.services.scheduler_coordinator import leader_only, check_leadership, LeadershipLost
+from src.services.query_executor import deadline_scope, DeadlineExceeded
 logger = logging.getLogger(__name__)
 # Global scheduler instance
 _cache_warmer_scheduler = None
 _warming_in_progress = False
 _flask_app = None  # Store reference to Flask app for app context
 
+# Warm-up concurrency: total worker threads, concurrent queries per Azure SQL server,
+# and how long any one query may run before the driver cancels it (timed out).
+WARM_MAX_WORKERS = int(os.environ.get('CACHE_WARM_MAX_WORKERS', '8'))
+WARM_MAX_PER_SERVER = int(os.environ.get('CACHE_WARM_MAX_PER_SERVER', '4'))
+WARM_JOB_BUDGET_SECONDS = int(os.environ.get('CACHE_WARM_JOB_BUDGET', '300'))
+# Extra time a job gets after its budget for the cancelled query to return
+WARM_CANCEL_GRACE_SECONDS = 30
+# Periodic refresh interval (kept under the 1-hour cache TTL)
+WARM_INTERVAL_MINUTES = int(os.environ.get('CACHE_WARM_INTERVAL_MINUTES', '55'))
+# An entry is only skipped if it will outlive the next run: more TTL left than the
+# interval plus a margin for that run to reach it. Anything shorter would expire
+# before it is warmed again.
+WARM_SKIP_FRESH_MARGIN_SECONDS = int(os.environ.get('CACHE_WARM_SKIP_FRESH_MARGIN', '300'))
+WARM_SKIP_FRESH_SECONDS = WARM_INTERVAL_MINUTES * 60 + WARM_SKIP_FRESH_MARGIN_SECONDS
+WARM_REPORT_CACHE_KEY = 'cache_warmer:last_report'
+
 def _get_softbase_schemas():
     """Dynamically discover Softbase tenant schemas from the database.
     Falls back to a known set if discovery fails."""
@@ -38,10 +60,13 @@ def _get_softbase_schemas():
     return {'ben002', 'ind004', 'bmh'}
 
 
-def warm_dashboard_cache():
+def warm_dashboard_cache(force=False):
     """
     Pre-warm all dashboard cache entries by executing all queries and caching results.
     This runs in the background so it doesn't block server startup.
+    
+    Args:
+        force: Re-run every query even if its cache entry is still fresh
     """
     global _warming_in_progress
     
@@ -59,21 +84,57 @@ def warm_dashboard_cache():
             return
         
         with _flask_app.app_context():
-            _do_warm_cache(start_time)
+            _do_warm_cache(start_time, force=force)
         
+    except LeadershipLost:
+        raise
     except Exception as e:
         logger.error(f"❌ Dashboard cache warm-up failed: {str(e)}")
     finally:
         _warming_in_progress = False
 
 
-def _do_warm_cache(start_time):
-    """Inner function that runs inside app context."""
+def _get_query_configs(queries):
+    """All DashboardQueries methods the warmer keeps cached, keyed by cache name"""
+    return [
+        ('total_sales', queries.get_current_month_sales),
+        ('ytd_sales', queries.get_ytd_sales),
+        ('inventory_count', queries.get_inventory_count),
+        ('active_customers', queries.get_active_customers),
+        ('total_customers', queries.get_total_customers),
+        ('monthly_sales', queries.get_monthly_sales),
+        ('monthly_sales_no_equipment', queries.get_monthly_sales_excluding_equipment),
+        ('monthly_equipment_sales', queries.get_monthly_equipment_sales),
+        ('monthly_sales_by_stream', queries.get_monthly_sales_by_stream),
+        ('uninvoiced', queries.get_uninvoiced_work_orders),
+        ('monthly_quotes', queries.get_monthly_quotes),
+        ('work_order_types', queries.get_work_order_types),
+        ('top_customers', queries.get_top_customers),
+        ('monthly_work_orders', queries.get_monthly_work_orders_by_type),
+        ('department_margins', queries.get_department_margins),
+        ('monthly_active_customers', queries.get_monthly_active_customers),
+        ('monthly_open_work_orders', queries.get_monthly_open_work_orders),
+        ('awaiting_invoice', queries.get_awaiting_invoice_work_orders),
+        ('monthly_invoice_delays', queries.get_monthly_invoice_delay_avg),
+    ]
+
+
+def _do_warm_cache(start_time, force=False):
+    """
+    Inner function that runs inside app context.
+    
+    Fans out (tenant, query) jobs over a bounded thread pool. A per-database-server
+    semaphore keeps any one Azure SQL server from taking more than
+    WARM_MAX_PER_SERVER queries at once. Each job runs under a
+    WARM_JOB_BUDGET_SECONDS deadline, counted from when it gets its server slot,
+    which the driver enforces as a query timeout.
+    """
     # Import here to avoid circular imports
     from src.services.cache_service import cache_service
     from src.routes.dashboard_optimized import DashboardQueries
     from src.models.user import Organization
     from src.etl.tenant_discovery import TenantInfo
+    from src.config.database_config import DatabaseConfig
     
     logger.info("🔥 Starting dashboard cache warm-up...")
     
@@ -90,23 +151,21 @@ def _do_warm_cache(start_time):
     # Cache TTL settings (in seconds) - all set to 1 hour
     cache_ttl = 3600
     current_month = datetime.now().strftime('%Y-%m')
+    softbase_schemas = _get_softbase_schemas()
     
-    total_success = 0
-    total_error = 0
-    
+    # Build every (tenant, query) job up front
+    jobs = []
+    report = {}
     for org in orgs:
         schema = org.database_schema
         if not schema:
             continue
         
         # Skip non-Softbase schemas (e.g., vital001 doesn't have Softbase tables)
-        softbase_schemas = _get_softbase_schemas()
         if schema not in softbase_schemas:
             logger.info(f"  Skipping non-Softbase org: {org.name} (schema={schema})")
             continue
         
-        logger.info(f"  Warming cache for {org.name} (schema={schema})...")
-        
         # Get org-specific settings to avoid needing Flask g context
         data_start_date = org.data_start_date.strftime('%Y-%m-%d') if org.data_start_date else '2000-01-01'
         fiscal_year_start_month = org.fiscal_year_start_month or 11
@@ -135,41 +194,124 @@ def _do_warm_cache(start_time):
             logger.error(f"  ✗ Failed to init DashboardQueries for {org.name}: {str(e)}")
             continue
         
-        # Define all queries to warm
-        query_configs = [
-            ('total_sales', queries.get_current_month_sales),
-            ('ytd_sales', queries.get_ytd_sales),
-            ('inventory_count', queries.get_inventory_count),
-            ('active_customers', queries.get_active_customers),
-            ('total_customers', queries.get_total_customers),
-            ('monthly_sales', queries.get_monthly_sales),
-            ('monthly_sales_no_equipment', queries.get_monthly_sales_excluding_equipment),
-            ('monthly_equipment_sales', queries.get_monthly_equipment_sales),
-            ('monthly_sales_by_stream', queries.get_monthly_sales_by_stream),
-            ('uninvoiced', queries.get_uninvoiced_work_orders),
-            ('monthly_quotes', queries.get_monthly_quotes),
-            ('work_order_types', queries.get_work_order_types),
-            ('top_customers', queries.get_top_customers),
-            ('monthly_work_orders', queries.get_monthly_work_orders_by_type),
-            ('department_margins', queries.get_department_margins),
-            ('monthly_active_customers', queries.get_monthly_active_customers),
-            ('monthly_open_work_orders', queries.get_monthly_open_work_orders),
-            ('awaiting_invoice', queries.get_awaiting_invoice_work_orders),
-            ('monthly_invoice_delays', queries.get_monthly_invoice_delay_avg),
-        ]
-        
-        for key, query_func in query_configs:
-            try:
-                cache_key = f"dashboard:{schema}:{key}:{current_month}"
-                result = cache_service.cache_query(cache_key, query_func, cache_ttl, force_refresh=True)
-                total_success += 1
-                logger.debug(f"    ✓ Warmed cache for {key}")
-            except Exception as e:
-                total_error += 1
-                logger.error(f"    ✗ Failed to warm cache for {key}: {str(e)}")
+        server = db.server or DatabaseConfig.SERVER
+        tags = [f"tenant:{schema}", 'report:dashboard', f"month:{current_month}"]
+        report[schema] = {
+            'org': org.name, 'server': server,
+            'succeeded': 0, 'failed': 0, 'skipped_fresh': 0, 'timed_out': 0,
+            'query_seconds': 0.0, 'slowest_query': None, 'slowest_seconds': 0.0,
+        }
+        for key, query_func in _get_query_configs(queries):
+            cache_key = f"dashboard:{schema}:{key}:{current_month}"
+            if not force:
+                remaining = cache_service.get_remaining_ttl(cache_key)
+                if remaining is not None and remaining > WARM_SKIP_FRESH_SECONDS:
+                    report[schema]['skipped_fresh'] += 1
+                    continue
+            jobs.append((schema, server, key, cache_key, query_func, tags))
+    
+    logger.info(f"  Warming {len(jobs)} queries across {len(report)} tenants "
+                f"(workers={WARM_MAX_WORKERS}, per-server={WARM_MAX_PER_SERVER})")
+    
+    server_limits = {}
+    for _, server, _, _, _, _ in jobs:
+        server_limits.setdefault(server, threading.BoundedSemaphore(WARM_MAX_PER_SERVER))
+    
+    started = {}  # job index -> monotonic time the job got its server slot
+    
+    def run_job(index, schema, server, key, cache_key, query_func, tags):
+        with server_limits[server]:
+            # Don't overwrite entries once a newer scheduler leader has taken over
+            check_leadership()
+            started[index] = time.monotonic()
+            # The budget becomes the driver's query timeout (AzureSQLService._deadline_timeout),
+            # so the database cancels a query that overruns it
+            with deadline_scope(WARM_JOB_BUDGET_SECONDS), _flask_app.app_context():
+                cache_service.cache_query(cache_key, query_func, cache_ttl, force_refresh=True, tags=tags)
+            return time.monotonic() - started[index]
+    
+    def record_timeout(schema, key):
+        report[schema]['timed_out'] += 1
+        logger.error(f"    ✗ Warming {schema}:{key} exceeded {WARM_JOB_BUDGET_SECONDS}s budget")
+    
+    executor = ThreadPoolExecutor(max_workers=WARM_MAX_WORKERS, thread_name_prefix='cache-warm')
+    try:
+        futures = {
+            executor.submit(contextvars.copy_context().run, run_job, index, *job): (index, job)
+            for index, job in enumerate(jobs)
+        }
+        pending = set(futures)
+        while pending:
+            # A job's budget runs from when it got its server slot, not from submission,
+            # so jobs queued behind the per-server semaphore are never reported as timed out
+            now = time.monotonic()
+            for future in [f for f in pending if futures[f][0] in started]:
+                index, job = futures[future]
+                if now - started[index] > WARM_JOB_BUDGET_SECONDS + WARM_CANCEL_GRACE_SECONDS:
+                    # Still running well past the driver timeout; stop waiting for it here
+                    pending.discard(future)
+                    record_timeout(job[0], job[2])
+            deadlines = [started[futures[f][0]] + WARM_JOB_BUDGET_SECONDS + WARM_CANCEL_GRACE_SECONDS
+                         for f in pending if futures[f][0] in started]
+            timeout = max(min(deadlines) - now, 0.05) if deadlines else 1.0
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                index, job = futures[future]
+                schema, key = job[0], job[2]
+                tenant_report = report[schema]
+                try:
+                    elapsed = future.result()
+                    tenant_report['succeeded'] += 1
+                    tenant_report['query_seconds'] += elapsed
+                    if elapsed > tenant_report['slowest_seconds']:
+                        tenant_report['slowest_query'] = key
+                        tenant_report['slowest_seconds'] = elapsed
+                    logger.debug(f"    ✓ Warmed cache for {schema}:{key} in {elapsed:.1f}s")
+                except Exception as e:
+                    # The driver reports its own timeout error when it cancels the query
+                    ran_for = time.monotonic() - started.get(index, time.monotonic())
+                    if isinstance(e, DeadlineExceeded) or ran_for >= WARM_JOB_BUDGET_SECONDS:
+                        record_timeout(schema, key)
+                    else:
+                        tenant_report['failed'] += 1
+                        logger.error(f"    ✗ Failed to warm cache for {schema}:{key}: {str(e)}")
+    finally:
+        # Every running query is bounded by the driver timeout, so wait for them:
+        # the next warm-up must not start while this one still has queries on the servers
+        executor.shutdown(wait=True, cancel_futures=True)
     
     elapsed = (datetime.now() - start_time).total_seconds()
-    logger.info(f"✅ Dashboard cache warm-up complete in {elapsed:.1f}s ({total_success} succeeded, {total_error} failed)")
+    total_success = sum(r['succeeded'] for r in report.values())
+    total_error = sum(r['failed'] + r['timed_out'] for r in report.values())
+    total_skipped = sum(r['skipped_fresh'] for r in report.values())
+    for schema, r in report.items():
+        r['query_seconds'] = round(r['query_seconds'], 1)
+        r['slowest_seconds'] = round(r['slowest_seconds'], 1)
+        logger.info(f"  {r['org']} ({schema}): {r['succeeded']} ok, {r['failed']} failed, "
+                    f"{r['timed_out']} timed out, {r['skipped_fresh']} fresh; "
+                    f"{r['query_seconds']}s query time, slowest {r['slowest_query']} ({r['slowest_seconds']}s)")
+    logger.info(f"✅ Dashboard cache warm-up complete in {elapsed:.1f}s "
+                f"({total_success} succeeded, {total_error} failed, {total_skipped} skipped as fresh)")
+    
+    check_leadership()
+    cache_service.set(WARM_REPORT_CACHE_KEY, {
+        'started_at': start_time.isoformat(),
+        'elapsed_seconds': round(elapsed, 1),
+        'succeeded': total_success,
+        'failed': total_error,
+        'skipped_fresh': total_skipped,
+        'tenants': report,
+    }, ttl_seconds=7 * 86400)
+
+
+def get_cache_warmer_status():
+    """Return the per-tenant report from the most recent warm-up (from any worker)"""
+    from src.services.cache_service import cache_service
+    return {
+        'warming_in_progress': _warming_in_progress,
+        'last_run': cache_service.get(WARM_REPORT_CACHE_KEY),
+    }
 
 
 def warm_cache_async():
@@ -201,9 +343,12 @@ def init_cache_warmer(app):
     try:
         _cache_warmer_scheduler = BackgroundScheduler()
         
+        # Every worker schedules the jobs, but only the elected leader runs them
+        warm_job = leader_only('cache_warmup', warm_dashboard_cache)
+        
         # Schedule initial warm-up after 10 seconds (let server fully start)
         _cache_warmer_scheduler.add_job(
-            func=warm_dashboard_cache,
+            func=warm_job,
             trigger='date',
             run_date=datetime.now().replace(microsecond=0),
             id='initial_cache_warmup',
@@ -212,19 +357,20 @@ def init_cache_warmer(app):
             misfire_grace_time=60
         )
         
-        # Schedule periodic refresh every 55 minutes (before 1-hour TTL expires)
+        # Schedule periodic refresh every WARM_INTERVAL_MINUTES (before 1-hour TTL expires)
         _cache_warmer_scheduler.add_job(
-            func=warm_dashboard_cache,
+            func=warm_job,
             trigger='interval',
-            minutes=55,
+            minutes=WARM_INTERVAL_MINUTES,
             id='periodic_cache_refresh',
-            name='Periodic Dashboard Cache Refresh (every 55 min)',
+            name=f'Periodic Dashboard Cache Refresh (every {WARM_INTERVAL_MINUTES} min)',
             replace_existing=True
         )
         
         # Schedule daily refresh at 5 AM to ensure fresh data for the day
         _cache_warmer_scheduler.add_job(
-            func=warm_dashboard_cache,
+            func=warm_job,
+            kwargs={'force': True},
             trigger='cron',
             hour=5,
             minute=0,
@@ -237,7 +383,7 @@ def init_cache_warmer(app):
         _cache_warmer_scheduler.start()
         logger.info("✅ Cache warmer scheduler started:")
         logger.info("   - Initial warm-up: On startup")
-        logger.info("   - Periodic refresh: Every 55 minutes")
+        logger.info(f"   - Periodic refresh: Every {WARM_INTERVAL_MINUTES} minutes")
         logger.info("   - Daily refresh: 5:00 AM")
         
         # Shut down the scheduler when the app exits
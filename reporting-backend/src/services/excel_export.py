@@ -0,0 +1,230 @@
+"""
+Streaming Excel Export
+Write-only openpyxl workbooks for large report downloads.
+
+A regular openpyxl Workbook keeps every cell (value, style, coordinates) in
+memory until save(), and the exports then copied the whole file into a
+BytesIO before send_file. For inventory exports with thousands of rows that
+was a lot of memory per worker.
+
+StreamingWorkbook instead:
+- uses write-only worksheets, so rows are serialized as they are appended
+  (openpyxl buffers each sheet in its own temp file)
+- styles cells through named styles registered once per workbook, rather
+  than a Font/Border/number_format object per cell
+- spools the finished .xlsx to a temp file, which xlsx_response sends in
+  fixed-size chunks (chunked transfer, no Content-Length)
+
+Write-only sheets are append-only: column widths must be set before the
+first row, rows can only move forward and merged cells are not supported.
+StreamingSheet.set() buffers one row at a time so report-style code can
+still address cells as 'B6' as long as it fills the sheet top to bottom.
+
+Usage:
+    book = StreamingWorkbook()
+    sheet = book.create_sheet("Inventory", column_widths={'A': 20, 'B': 40})
+    sheet.append(["Serial", "Value"], style='table_header')
+    for row in db.iter_query(query):
+        sheet.append([row['SerialNo'], row['Cost']], style=[None, 'currency'])
+    return xlsx_response(book.spool(), "Inventory.xlsx")
+"""
+
+import logging
+import re
+import tempfile
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence, Union
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+logger = logging.getLogger(__name__)
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+STREAM_CHUNK_SIZE = 64 * 1024
+
+CURRENCY_FORMAT = '$#,##0.00'
+PERCENT_FORMAT = '0.0%'
+HEADER_FILL_COLOR = '366092'
+
+_THIN = Side(style='thin')
+_CELL_RE = re.compile(r'^([A-Z]{1,3})(\d+)$')
+
+StyleSpec = Union[None, str, Sequence[Optional[str]]]
+
+
+def _style(name: str, number_format: str = None, **attrs) -> Callable[[], NamedStyle]:
+    def factory():
+        style = NamedStyle(name=name, **attrs)
+        if number_format:
+            style.number_format = number_format
+        return style
+    return factory
+
+
+def _table_header(name: str, number_format: str = None) -> Callable[[], NamedStyle]:
+    return _style(
+        name, number_format,
+        font=Font(bold=True, color='FFFFFF'),
+        fill=PatternFill(start_color=HEADER_FILL_COLOR, end_color=HEADER_FILL_COLOR, fill_type='solid'),
+        border=Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN),
+    )
+
+
+# Named styles available to every export. Each workbook registers a style the
+# first time a cell uses it (a NamedStyle object can only belong to one workbook).
+EXPORT_STYLES: Dict[str, Callable[[], NamedStyle]] = {
+    'report_title': _style('report_title', font=Font(bold=True, size=14)),
+    'report_subtitle': _style('report_subtitle', font=Font(bold=True, size=12)),
+    'section_header': _style('section_header', font=Font(bold=True, size=11)),
+    'bold': _style('bold', font=Font(bold=True)),
+    'currency': _style('currency', CURRENCY_FORMAT),
+    'currency_bold': _style('currency_bold', CURRENCY_FORMAT, font=Font(bold=True)),
+    'percent': _style('percent', PERCENT_FORMAT),
+    'percent_bold': _style('percent_bold', PERCENT_FORMAT, font=Font(bold=True)),
+    'table_header': _table_header('table_header'),
+    'table_header_currency': _table_header('table_header_currency', CURRENCY_FORMAT),
+}
+
+
+class StreamingSheet:
+    """Append-only worksheet wrapper with named styles and a one-row cell buffer"""
+
+    def __init__(self, book: 'StreamingWorkbook', ws, column_widths: Optional[Dict[str, float]] = None):
+        self._book = book
+        self.ws = ws
+        self.title = ws.title
+        self.rows_written = 0
+        self._pending_row: Optional[int] = None
+        self._pending: Dict[int, WriteOnlyCell] = {}
+        for column, width in (column_widths or {}).items():
+            letter = get_column_letter(column) if isinstance(column, int) else column
+            ws.column_dimensions[letter].width = width
+
+    def _cell(self, value: Any, style: Optional[str]) -> Any:
+        if style is None:
+            return value
+        cell = WriteOnlyCell(self.ws, value=value)
+        cell.style = self._book.style(style)
+        return cell
+
+    def append(self, values: Iterable[Any], style: StyleSpec = None):
+        """
+        Write the next row. style is one named style for every cell, or a
+        per-column sequence (None leaves a cell unstyled).
+        """
+        self.flush()
+        values = list(values)
+        if style is None or isinstance(style, str):
+            styles = [style] * len(values)
+        else:
+            styles = list(style) + [None] * (len(values) - len(style))
+        self.ws.append([self._cell(value, cell_style) for value, cell_style in zip(values, styles)])
+        self.rows_written += 1
+
+    def set(self, ref: str, value: Any, style: Optional[str] = None):
+        """
+        Set a cell by reference ('B6'). Cells in the same row may be set in any
+        order; the row is written once a later row is addressed (or on flush).
+        Rows already written cannot be revisited.
+        """
+        match = _CELL_RE.match(ref)
+        if not match:
+            raise ValueError(f"Invalid cell reference: {ref}")
+        row = int(match.group(2))
+        column = column_index_from_string(match.group(1))
+
+        if row != self._pending_row:
+            if row <= self.rows_written or (self._pending_row is not None and row < self._pending_row):
+                raise ValueError(
+                    f"Row {row} of sheet '{self.title}' is above a row already set; "
+                    f"write-only sheets must be filled top to bottom"
+                )
+            self.flush()
+            self._pending_row = row
+
+        cell = WriteOnlyCell(self.ws, value=value)
+        if style:
+            cell.style = self._book.style(style)
+        self._pending[column] = cell
+
+    def flush(self):
+        """Write the buffered row (and any blank rows before it)"""
+        if self._pending_row is None:
+            return
+        while self.rows_written < self._pending_row - 1:
+            self.ws.append([])
+            self.rows_written += 1
+        width = max(self._pending) if self._pending else 0
+        self.ws.append([self._pending.get(column) for column in range(1, width + 1)])
+        self.rows_written += 1
+        self._pending_row = None
+        self._pending = {}
+
+
+class StreamingWorkbook:
+    """Write-only workbook that registers named styles on demand and spools to disk"""
+
+    def __init__(self):
+        self.wb = Workbook(write_only=True)
+        self._sheets = []
+        self._registered = set()
+
+    def style(self, name: str) -> str:
+        """Register a predefined named style with this workbook (once) and return its name"""
+        if name not in self._registered:
+            factory = EXPORT_STYLES.get(name)
+            if factory is None:
+                raise KeyError(f"Unknown export style: {name}")
+            self.wb.add_named_style(factory())
+            self._registered.add(name)
+        return name
+
+    def create_sheet(self, title: str, column_widths: Optional[Dict[str, float]] = None) -> StreamingSheet:
+        """Add a sheet; column widths have to be known up front in write-only mode"""
+        sheet = StreamingSheet(self, self.wb.create_sheet(title=title), column_widths)
+        self._sheets.append(sheet)
+        return sheet
+
+    def spool(self):
+        """Save the workbook to an anonymous temp file, rewound and ready to stream"""
+        for sheet in self._sheets:
+            sheet.flush()
+        spooled = tempfile.TemporaryFile(suffix='.xlsx')
+        try:
+            self.wb.save(spooled)
+            spooled.seek(0)
+        except Exception:
+            spooled.close()
+            raise
+        return spooled
+
+
+def _iter_chunks(source) -> Iterator[bytes]:
+    if isinstance(source, (bytes, bytearray)):
+        view = memoryview(source)
+        for offset in range(0, len(view), STREAM_CHUNK_SIZE):
+            yield bytes(view[offset:offset + STREAM_CHUNK_SIZE])
+        return
+    try:
+        while True:
+            chunk = source.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        source.close()
+
+
+def xlsx_response(source, filename: str):
+    """
+    Flask response that streams a workbook as a download in fixed-size chunks.
+    source is a spooled file (closed once sent) or already-built xlsx bytes.
+    """
+    from flask import Response
+
+    response = Response(_iter_chunks(source), mimetype=XLSX_MIMETYPE, direct_passthrough=True)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
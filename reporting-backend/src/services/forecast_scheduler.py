@@ -11,6 +11,7 @@ import calendar
 from datetime import datetime
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from src.services.scheduler_coordinator import leader_only, check_leadership, LeadershipLost
 
 logger = logging.getLogger(__name__)
 
@@ -38,10 +39,13 @@ def capture_mid_month_snapshot():
         forecast_result = _fetch_sales_forecast_data(current_year, current_month, current_day)
         
         # Save to history with snapshot flag
+        check_leadership()
         save_forecast_to_history(forecast_result, is_scheduled_snapshot=True)
         
         logger.info(f"✅ Mid-month snapshot captured successfully: ${forecast_result['forecast']['projected_total']:,.2f}")
         
+    except LeadershipLost:
+        raise
     except Exception as e:
         logger.error(f"❌ Failed to capture mid-month snapshot: {str(e)}")
 
@@ -115,7 +119,6 @@ def capture_end_of_month_actual():
             AND actual_total IS NULL
         """
         
-        postgres_db.execute_query(update_query, (actual_total, invoice_count, current_year, current_month))
         
         # Also insert a separate end-of-month record for reference
         insert_query = """
@@ -145,23 +148,34 @@ def capture_end_of_month_actual():
         
         days_in_month = calendar.monthrange(current_year, current_month)[1]
         
-        postgres_db.execute_query(insert_query, (
-            current_year,
-            current_month,
-            days_in_month,  # days_into_month (last day)
-            actual_total,   # projected_total = actual at end of month
-            actual_total,   # forecast_low = actual
-            actual_total,   # forecast_high = actual
-            100,            # confidence_level = 100% (it's actual)
-            actual_total,   # mtd_sales = actual
-            invoice_count,  # mtd_invoices
-            100.0,          # month_progress_pct = 100%
-            0,              # days_remaining = 0
-            actual_total    # actual_total
-        ))
+        # Both writes go in one transaction, committed only if this worker is still
+        # the scheduler leader; a fenced-off leader's writes roll back
+        with postgres_db.get_connection() as conn:
+            if not conn:
+                logger.error("PostgreSQL connection pool not initialized - cannot save end-of-month actual")
+                return
+            with conn.cursor() as cursor:
+                cursor.execute(update_query, (actual_total, invoice_count, current_year, current_month))
+                cursor.execute(insert_query, (
+                    current_year,
+                    current_month,
+                    days_in_month,  # days_into_month (last day)
+                    actual_total,   # projected_total = actual at end of month
+                    actual_total,   # forecast_low = actual
+                    actual_total,   # forecast_high = actual
+                    100,            # confidence_level = 100% (it's actual)
+                    actual_total,   # mtd_sales = actual
+                    invoice_count,  # mtd_invoices
+                    100.0,          # month_progress_pct = 100%
+                    0,              # days_remaining = 0
+                    actual_total    # actual_total
+                ))
+                check_leadership()
         
         logger.info(f"✅ End-of-month actual captured and linked to mid-month snapshot")
         
+    except LeadershipLost:
+        raise
     except Exception as e:
         logger.error(f"❌ Failed to capture end-of-month actual: {str(e)}")
 
@@ -186,7 +200,7 @@ def init_forecast_scheduler(app):
         
         # Schedule mid-month snapshot on the 15th at 8:00 AM
         _scheduler.add_job(
-            func=capture_mid_month_snapshot,
+            func=leader_only('mid_month_forecast_snapshot', capture_mid_month_snapshot),
             trigger=CronTrigger(day=15, hour=8, minute=0),
             id='mid_month_forecast_snapshot',
             name='Mid-Month Forecast Snapshot (15th at 8 AM)',
@@ -196,7 +210,7 @@ def init_forecast_scheduler(app):
         # Schedule end-of-month actual capture on the last day at 7:00 PM
         # Using day='last' to run on the last day of each month
         _scheduler.add_job(
-            func=capture_end_of_month_actual,
+            func=leader_only('end_of_month_actual_capture', capture_end_of_month_actual),
             trigger=CronTrigger(day='last', hour=19, minute=0),
             id='end_of_month_actual_capture',
             name='End-of-Month Actual Revenue (Last day at 7 PM)',
@@ -0,0 +1,194 @@
+"""
+GL Query Builder
+Sargable, parameterized predicates for the GL / GLDetail tables.
+
+Hot GL queries used to filter with MONTH(EffectiveDate) = ... / YEAR(...) = ...
+(which prevents an index seek on EffectiveDate) and to inline hundreds of
+account numbers as IN ('...') literals (which makes every tenant/department
+combination a new query text and bloats the plan cache).
+
+GLQueryBuilder emits instead:
+- half-open date ranges: EffectiveDate >= @start AND EffectiveDate < @end
+- Year/Month period ranges with a leading Year predicate the optimizer can seek on
+- account sets passed as ONE delimited parameter and expanded server-side with
+  STRING_SPLIT, either as an IN filter or as a bucketed derived table to join on
+
+build() wraps the statement in sp_executesql so the statement text stays
+constant and its plan is reused no matter which accounts or dates are passed
+(plans are still per schema, since table names are schema-qualified).
+
+Usage:
+    qb = GLQueryBuilder()
+    query = f'''
+        SELECT -SUM(CASE WHEN acct.bucket = 'revenue' THEN gl.Amount ELSE 0 END) as revenue
+        FROM {schema}.GLDetail gl
+        JOIN {qb.account_buckets({'revenue': revenue_accounts})} ON acct.AccountNo = gl.AccountNo
+        WHERE {qb.date_range(start_date, end_date, column='gl.EffectiveDate')}
+          AND gl.Posted = 1
+    '''
+    results = qb.execute(db, query)
+
+Placeholders are named (@p0, @p1, ...), so a fragment can be reused several
+times in one statement. STRING_SPLIT needs database compatibility level 130+
+(the Azure SQL default).
+"""
+
+import calendar
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+DateLike = Union[date, datetime, str]
+
+# Account numbers are short codes; compare as varchar so the AccountNo column is never converted
+ACCOUNT_SQL_TYPE = 'varchar(32)'
+ACCOUNT_DELIMITER = ','
+
+
+def _to_date(value: DateLike) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def month_bounds(year: int, month: int) -> Tuple[date, date]:
+    """First day of the month and first day of the following month (half-open)"""
+    start = date(year, month, 1)
+    end = start + timedelta(days=calendar.monthrange(year, month)[1])
+    return start, end
+
+
+class GLQueryBuilder:
+    """Collects sp_executesql parameters while building GL predicates"""
+
+    def __init__(self):
+        self._params: List[Tuple[str, str, Any]] = []
+
+    @property
+    def params(self) -> List[Any]:
+        return [value for _, _, value in self._params]
+
+    def param(self, value: Any, sql_type: str = None) -> str:
+        """Register a parameter and return its @name placeholder"""
+        if sql_type is None:
+            if isinstance(value, (date, datetime)):
+                sql_type = 'datetime'
+            elif isinstance(value, bool) or isinstance(value, int):
+                sql_type = 'int'
+            elif isinstance(value, float):
+                sql_type = 'float'
+            else:
+                sql_type = 'nvarchar(max)'
+        if isinstance(value, date) and not isinstance(value, datetime):
+            value = datetime(value.year, value.month, value.day)
+        name = f"@p{len(self._params)}"
+        self._params.append((name, sql_type, value))
+        return name
+
+    # ==================== Dates ====================
+
+    def date_range(self, start: DateLike, end: DateLike, column: str = 'EffectiveDate',
+                   end_inclusive: bool = True) -> str:
+        """
+        Half-open range on a date/datetime column.
+        With end_inclusive (the default, matching report date pickers) the whole
+        end day is included: column >= start AND column < end + 1 day.
+        """
+        end_date = _to_date(end)
+        if end_inclusive:
+            end_date += timedelta(days=1)
+        return f"{column} >= {self.param(_to_date(start))} AND {column} < {self.param(end_date)}"
+
+    def month(self, year: int, month: int, column: str = 'EffectiveDate') -> str:
+        """Whole calendar month on a date column (replaces YEAR(col) = y AND MONTH(col) = m)"""
+        start, end = month_bounds(year, month)
+        return self.date_range(start, end, column=column, end_inclusive=False)
+
+    def periods(self, start_year: int, start_month: int, end_year: int, end_month: int,
+                year_column: str = 'Year', month_column: str = 'Month') -> str:
+        """
+        Inclusive (Year, Month) range on the GL summary table.
+        The leading Year BETWEEN gives the optimizer a seekable predicate; the
+        Year * 100 + Month residual trims the partial first and last years.
+        """
+        return (
+            f"{year_column} BETWEEN {self.param(start_year)} AND {self.param(end_year)} "
+            f"AND ({year_column} * 100 + {month_column}) BETWEEN "
+            f"{self.param(start_year * 100 + start_month)} AND {self.param(end_year * 100 + end_month)}"
+        )
+
+    def period_set(self, periods: Iterable[Tuple[int, int]],
+                   year_column: str = 'Year', month_column: str = 'Month') -> str:
+        """
+        Arbitrary set of (Year, Month) periods on the GL summary table, e.g. a
+        month plus the same month last year. The set is passed as one
+        delimited parameter; the leading Year BETWEEN keeps the predicate seekable.
+        """
+        keys = sorted({int(year) * 100 + int(month) for year, month in periods})
+        if not keys:
+            return '1 = 0'
+        key_list = self.param(ACCOUNT_DELIMITER.join(str(key) for key in keys))
+        return (
+            f"{year_column} BETWEEN {self.param(keys[0] // 100)} AND {self.param(keys[-1] // 100)} "
+            f"AND ({year_column} * 100 + {month_column}) IN "
+            f"(SELECT CAST(value AS int) FROM STRING_SPLIT({key_list}, '{ACCOUNT_DELIMITER}'))"
+        )
+
+    # ==================== Accounts ====================
+
+    def _account_list(self, accounts: Iterable[str]) -> str:
+        cleaned = sorted({str(a).strip() for a in accounts if a and str(a).strip()})
+        return self.param(ACCOUNT_DELIMITER.join(cleaned))
+
+    def accounts(self, accounts: Iterable[str], column: str = 'AccountNo') -> str:
+        """column IN <account set>, with the set passed as a single parameter"""
+        accounts = list(accounts or [])
+        if not accounts:
+            return '1 = 0'
+        return (
+            f"{column} IN (SELECT CAST(value AS {ACCOUNT_SQL_TYPE}) "
+            f"FROM STRING_SPLIT({self._account_list(accounts)}, '{ACCOUNT_DELIMITER}'))"
+        )
+
+    def account_buckets(self, buckets: Dict[str, Iterable[str]], alias: str = 'acct') -> str:
+        """
+        Derived table (AccountNo, bucket) to JOIN against, one row per account
+        per bucket. Use it instead of SUM(CASE WHEN AccountNo IN (...)) since
+        SQL Server does not allow subqueries inside aggregates.
+        Bucket names are code constants, not user input.
+        """
+        parts = []
+        for bucket, accounts in buckets.items():
+            accounts = list(accounts or [])
+            if not accounts:
+                continue
+            parts.append(
+                f"SELECT CAST(value AS {ACCOUNT_SQL_TYPE}) AS AccountNo, '{bucket}' AS bucket "
+                f"FROM STRING_SPLIT({self._account_list(accounts)}, '{ACCOUNT_DELIMITER}')"
+            )
+        if not parts:
+            parts.append(f"SELECT CAST(NULL AS {ACCOUNT_SQL_TYPE}) AS AccountNo, CAST(NULL AS varchar(32)) AS bucket WHERE 1 = 0")
+        return f"({' UNION ALL '.join(parts)}) {alias}"
+
+    # ==================== Execution ====================
+
+    def build(self, query: str) -> Tuple[str, List[Any]]:
+        """
+        Wrap the query in sp_executesql so the statement text is constant.
+        Returns (sql, params) for AzureSQLService.execute_query.
+        """
+        if not self._params:
+            return query, []
+        declarations = ', '.join(f"{name} {sql_type}" for name, sql_type, _ in self._params)
+        assignments = ', '.join(f"{name} = %s" for name, _, _ in self._params)
+        sql = f"EXEC sp_executesql %s, %s, {assignments}"
+        return sql, [query, declarations] + self.params
+
+    def execute(self, db, query: str) -> List[Dict[str, Any]]:
+        """Build and run the query on an AzureSQLService (or anything with execute_query)"""
+        sql, params = self.build(query)
+        return db.execute_query(sql, params) if params else db.execute_query(sql)
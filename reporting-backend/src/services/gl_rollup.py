@@ -0,0 +1,372 @@
+"""
+GL Rollup Engine
+Shared classification and rollup of GL summary rows for the P&L, Currie and
+EVO exports.
+
+The exports used to fetch GL rows as dicts and then classify and sum them
+with their own nested Python loops (account in list, description contains
+pattern, ...), often re-querying the same period once per department.
+
+GLRollupEngine instead loads a tenant's GL slice - every (AccountNo, Year,
+Month, MTD, YTD) row for one or more periods - into pandas columns with ONE
+query, and answers every rollup with grouped reductions:
+
+- per-account totals are a groupby over the slice
+- account -> label classifications (Currie category, detailed P&L line) are
+  compiled once per tenant from the GL account loaders into AccountMap lookup
+  arrays, and reduced with np.bincount
+- description-pattern classifications (Currie balance sheet) use vectorized
+  str.contains + np.select
+
+One engine instance should be shared by everything an export computes, so a
+multi-month or multi-sheet export costs a single GL round trip.
+
+Usage:
+    engine = GLRollupEngine.load(schema, [(2025, 9), (2025, 10)])
+    sales = engine.rollup(get_account_map(schema, 'detailed_sales'), 'MTD', 2025, 10)
+    values = engine.account_values(2025, 10)   # {AccountNo: {'mtd': ..., 'ytd': ...}}
+"""
+
+import re
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.services.gl_query_builder import GLQueryBuilder
+from src.services.snapshot_store import get_snapshot_store
+
+logger = logging.getLogger(__name__)
+
+GL_SLICE_COLUMNS = ['AccountNo', 'Year', 'Month', 'MTD', 'YTD', 'Description', 'Type']
+
+# Currie mapping keys that hold prefixes, patterns, settings or customer codes rather than account lists
+CURRIE_NON_ACCOUNT_KEYS = {
+    'balance_sheet_categories', 'inventory_patterns', 'liability_patterns',
+    'fixed_asset_patterns', 'service_dept_codes', 'dept_allocations', 'rental_fleet_bs',
+    'internal_labor_bill_to_customers',
+}
+
+
+def _clean_account(account: Any) -> str:
+    return str(account).strip()
+
+
+class AccountMap:
+    """
+    Compiled many-to-many account -> label lookup.
+    An account may belong to several labels (e.g. a Currie category total and
+    one of its detail lines); each (account, label) pair is counted once.
+    """
+
+    def __init__(self, mapping: Dict[str, Iterable[str]]):
+        self.labels: List[str] = list(mapping.keys())
+        pairs = sorted({
+            (_clean_account(account), label_pos)
+            for label_pos, label in enumerate(self.labels)
+            for account in (mapping[label] or [])
+            if account and _clean_account(account)
+        })
+        self.accounts = pd.Index(sorted({account for account, _ in pairs}), dtype=object)
+        self._pair_account = self.accounts.get_indexer([account for account, _ in pairs]).astype(np.intp)
+        self._pair_label = np.array([label_pos for _, label_pos in pairs], dtype=np.intp)
+
+    def reduce(self, account_totals: pd.Series) -> Dict[str, float]:
+        """Sum a per-account Series (indexed by AccountNo) into {label: total}"""
+        per_account = account_totals.reindex(self.accounts, fill_value=0.0).to_numpy(dtype=float)
+        sums = np.bincount(self._pair_label, weights=per_account[self._pair_account], minlength=len(self.labels))
+        return dict(zip(self.labels, sums.tolist()))
+
+
+# ==================== Per-tenant compiled maps ====================
+
+def _flatten_currie(mapping: Dict[str, Any], prefix: str = '') -> Dict[str, List[str]]:
+    """
+    Currie mappings as {'dotted.path': [accounts]} for every account list leaf,
+    e.g. 'service.customer_labor.revenue' or 'expenses.personnel.detail.payroll'
+    """
+    flat = {}
+    for key, value in mapping.items():
+        if key in CURRIE_NON_ACCOUNT_KEYS:
+            continue
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten_currie(value, f"{path}."))
+        elif isinstance(value, (list, tuple)):
+            flat[path] = [_clean_account(account) for account in value]
+    return flat
+
+
+def _detailed_accounts(config: Dict[str, Sequence[Tuple[str, str]]]) -> Dict[str, List[str]]:
+    return {label: [account for account, _ in accounts] for label, accounts in config.items()}
+
+
+def _build_currie_category(schema):
+    from src.config.gl_accounts_loader import get_currie_mappings
+    return _flatten_currie(get_currie_mappings(schema))
+
+
+def _build_detailed_sales(schema):
+    from src.config.gl_accounts_detailed_loader import get_department_config
+    return {dept_key: [a for a, _ in dept['sales_accounts']] for dept_key, dept in get_department_config(schema).items()}
+
+
+def _build_detailed_cos(schema):
+    from src.config.gl_accounts_detailed_loader import get_department_config
+    return {dept_key: [a for a, _ in dept['cos_accounts']] for dept_key, dept in get_department_config(schema).items()}
+
+
+def _build_detailed_overhead(schema):
+    from src.config.gl_accounts_detailed_loader import get_overhead_expense_config
+    return _detailed_accounts(get_overhead_expense_config(schema))
+
+
+def _build_detailed_other(schema):
+    from src.config.gl_accounts_detailed_loader import get_other_income_expense_config
+    return _detailed_accounts(get_other_income_expense_config(schema))
+
+
+ACCOUNT_MAP_BUILDERS: Dict[str, Callable[[str], Dict[str, Iterable[str]]]] = {
+    'currie_category': _build_currie_category,
+    'detailed_sales': _build_detailed_sales,
+    'detailed_cos': _build_detailed_cos,
+    'detailed_overhead': _build_detailed_overhead,
+    'detailed_other': _build_detailed_other,
+}
+
+_account_maps: Dict[Tuple[str, str], AccountMap] = {}
+_account_maps_lock = threading.Lock()
+
+
+def get_account_map(schema: str, name: str) -> AccountMap:
+    """
+    Get the compiled AccountMap `name` for a tenant (see ACCOUNT_MAP_BUILDERS).
+    GL account configs are code constants, so maps are compiled once per process.
+    """
+    key = (schema, name)
+    account_map = _account_maps.get(key)
+    if account_map is None:
+        with _account_maps_lock:
+            account_map = _account_maps.get(key)
+            if account_map is None:
+                account_map = AccountMap(ACCOUNT_MAP_BUILDERS[name](schema))
+                _account_maps[key] = account_map
+    return account_map
+
+
+# ==================== Description patterns ====================
+
+def rollup_by_description(rows: List[Dict[str, Any]], patterns: Sequence[Tuple[str, Sequence[str]]],
+                          default: Optional[str] = 'other', value_key: str = 'balance',
+                          description_key: str = 'description') -> Dict[str, float]:
+    """
+    Classify rows by the first label whose patterns appear (case-insensitive
+    substring) in the description, and sum value_key per label.
+    Rows matching no pattern go to `default` (or are dropped when default is None).
+    Every label is present in the result, even when zero.
+    """
+    labels = [label for label, _ in patterns]
+    result = {label: 0.0 for label in labels}
+    if default is not None:
+        result.setdefault(default, 0.0)
+    if not rows:
+        return result
+
+    frame = pd.DataFrame(rows, columns=[description_key, value_key])
+    descriptions = frame[description_key].fillna('').astype(str).str.upper()
+    conditions = [
+        descriptions.str.contains('|'.join(map(_escape_pattern, label_patterns)), regex=True).to_numpy()
+        if label_patterns else np.zeros(len(frame), dtype=bool)
+        for _, label_patterns in patterns
+    ]
+    classified = pd.Series(np.select(conditions, labels, default='') if conditions else [''] * len(frame))
+    values = pd.to_numeric(frame[value_key], errors='coerce').fillna(0.0)
+    if default is not None:
+        classified = classified.replace('', default)
+    for label, total in values.groupby(classified.to_numpy()).sum().items():
+        if label in result:
+            result[label] = float(total)
+    return result
+
+
+def _escape_pattern(pattern: str) -> str:
+    return re.escape(str(pattern).upper())
+
+
+# ==================== Watermark ====================
+
+def gl_watermark(schema: str, periods: Iterable[Tuple[int, int]], db=None) -> str:
+    """
+    Cheap fingerprint of the GL rows for a set of periods (row count plus an
+    aggregate checksum of AccountNo/MTD/YTD). Any posting that changes those
+    periods changes the watermark, so it can key caches of derived exports.
+    """
+    qb = GLQueryBuilder()
+    query = f"""
+    SELECT COUNT_BIG(*) AS row_count, CHECKSUM_AGG(CHECKSUM(AccountNo, MTD, YTD)) AS checksum
+    FROM {schema}.GL
+    WHERE {qb.period_set(periods)}
+    """
+    if db is None:
+        from src.utils.tenant_utils import get_tenant_db
+        db = get_tenant_db()
+    results = qb.execute(db, query)
+    row = results[0] if results else {}
+    return f"{row.get('row_count') or 0}-{row.get('checksum') or 0}"
+
+
+# ==================== Engine ====================
+
+class GLRollupEngine:
+    """A tenant's GL summary rows for a set of periods, held as pandas columns"""
+
+    def __init__(self, schema: str, frame: pd.DataFrame):
+        self.schema = schema
+        self.frame = frame
+        self._period_keys = (frame['Year'].to_numpy(dtype=np.int64) * 100 + frame['Month'].to_numpy(dtype=np.int64))
+        self._account_totals: Dict[Tuple[str, int], pd.Series] = {}
+
+    @classmethod
+    def load(cls, schema: str, periods: Iterable[Tuple[int, int]], accounts: Optional[Iterable[str]] = None,
+             with_descriptions: bool = False, db=None) -> 'GLRollupEngine':
+        """
+        Load GL rows for every period: closed months held by the snapshot
+        store are read from disk, the rest with a single query.
+
+        Args:
+            schema: Tenant schema
+            periods: (year, month) pairs - need not be contiguous
+            accounts: Restrict to these accounts (default: every account)
+            with_descriptions: Also join ChartOfAccounts Description/Type (EVO trial balance)
+            db: AzureSQLService to use (default: get_tenant_db())
+        """
+        periods = sorted({(int(year), int(month)) for year, month in periods})
+        if accounts is not None:
+            accounts = list(accounts)
+
+        # Closed months come from the snapshot store when it has them; the
+        # trial balance needs ChartOfAccounts descriptions, so it stays live
+        snapshot_frames = []
+        if not with_descriptions:
+            store = get_snapshot_store()
+            wanted = {_clean_account(account) for account in accounts} if accounts is not None else None
+            live_periods = []
+            for period in periods:
+                snapshot = store.read(schema, 'GL', period, columns=GL_SLICE_COLUMNS[:5])
+                if snapshot is None:
+                    live_periods.append(period)
+                    continue
+                if wanted is not None:
+                    snapshot = snapshot[snapshot['AccountNo'].astype(str).str.strip().isin(wanted)]
+                snapshot_frames.append(snapshot)
+            periods = live_periods
+
+        qb = GLQueryBuilder()
+        account_filter = f"AND {qb.accounts(accounts, column='g.AccountNo')}" if accounts is not None else ''
+        if with_descriptions:
+            select = "c.Description, c.Type"
+            join = f"LEFT JOIN {schema}.ChartOfAccounts c ON g.AccountNo = c.AccountNo"
+        else:
+            select = "CAST(NULL AS varchar(1)) AS Description, CAST(NULL AS varchar(1)) AS Type"
+            join = ''
+        query = f"""
+        SELECT g.AccountNo, g.Year, g.Month, g.MTD, g.YTD, {select}
+        FROM {schema}.GL g
+        {join}
+        WHERE {qb.period_set(periods, year_column='g.Year', month_column='g.Month')}
+          {account_filter}
+        ORDER BY g.AccountNo
+        """
+
+        if periods:
+            if db is None:
+                from src.utils.tenant_utils import get_tenant_db
+                db = get_tenant_db()
+            results = qb.execute(db, query)
+        else:
+            results = []
+
+        frame = cls._to_frame(results)
+        if snapshot_frames:
+            frame = pd.concat([cls._to_frame(snapshot) for snapshot in snapshot_frames] + [frame], ignore_index=True)
+            frame = frame.sort_values('AccountNo', kind='stable', ignore_index=True)
+        engine = cls(schema, frame)
+        logger.info(f"GL rollup engine loaded {len(engine.frame)} rows for {schema} "
+                    f"({len(snapshot_frames)} periods from snapshots, {len(periods)} live)")
+        return engine
+
+    @staticmethod
+    def _to_frame(results: Union[List[Dict[str, Any]], pd.DataFrame]) -> pd.DataFrame:
+        if not isinstance(results, pd.DataFrame):
+            results = results or []
+        frame = pd.DataFrame(results, columns=GL_SLICE_COLUMNS)
+        frame['AccountNo'] = frame['AccountNo'].astype(str).str.strip()
+        frame['Year'] = pd.to_numeric(frame['Year'], errors='coerce').fillna(0).astype(np.int64)
+        frame['Month'] = pd.to_numeric(frame['Month'], errors='coerce').fillna(0).astype(np.int64)
+        frame['MTD'] = pd.to_numeric(frame['MTD'], errors='coerce').fillna(0.0).astype(float)
+        frame['YTD'] = pd.to_numeric(frame['YTD'], errors='coerce').fillna(0.0).astype(float)
+        frame['Description'] = frame['Description'].fillna('').astype(str)
+        frame['Type'] = frame['Type'].fillna('').astype(str)
+        return frame
+
+    # ==================== Slices ====================
+
+    def period(self, year: int, month: int) -> pd.DataFrame:
+        """Rows for one period"""
+        return self.frame[self._period_keys == int(year) * 100 + int(month)]
+
+    def account_totals(self, field: str, year: int, month: int,
+                       periods: Optional[Iterable[Tuple[int, int]]] = None) -> pd.Series:
+        """
+        Per-account totals of MTD or YTD, indexed by AccountNo.
+        With periods, field is summed across all of them (e.g. MTD over a
+        multi-month range); otherwise it is the (year, month) value.
+        """
+        keys = tuple(sorted({int(y) * 100 + int(m) for y, m in (periods or [(year, month)])}))
+        cache_key = (field, keys)
+        totals = self._account_totals.get(cache_key)
+        if totals is None:
+            rows = self.frame[np.isin(self._period_keys, keys)]
+            totals = rows.groupby('AccountNo', sort=False)[field].sum()
+            self._account_totals[cache_key] = totals
+        return totals
+
+    def account_values(self, year: int, month: int,
+                       periods: Optional[Iterable[Tuple[int, int]]] = None) -> Dict[str, Dict[str, float]]:
+        """
+        {AccountNo: {'mtd': ..., 'ytd': ...}} as of (year, month).
+        With periods, 'mtd' is summed over the range; 'ytd' is always the (year, month) value.
+        """
+        mtd = self.account_totals('MTD', year, month, periods)
+        ytd = self.account_totals('YTD', year, month)
+        accounts = mtd.index.union(ytd.index)
+        return {
+            account: {'mtd': m, 'ytd': y}
+            for account, m, y in zip(
+                accounts,
+                mtd.reindex(accounts, fill_value=0.0).to_numpy().tolist(),
+                ytd.reindex(accounts, fill_value=0.0).to_numpy().tolist()
+            )
+        }
+
+    def records(self, year: int, month: int) -> List[Dict[str, Any]]:
+        """Rows for a period as dicts, ordered by AccountNo"""
+        rows = self.period(year, month).sort_values('AccountNo', kind='stable')
+        return rows[GL_SLICE_COLUMNS].to_dict('records')
+
+    def lookup(self, year: int, month: int) -> Dict[str, Dict[str, Any]]:
+        """Rows for a period keyed by AccountNo (last row wins, like a dict build)"""
+        return {row['AccountNo']: row for row in self.records(year, month)}
+
+    # ==================== Rollups ====================
+
+    def rollup(self, account_map: AccountMap, field: str, year: int, month: int, sign: float = 1.0,
+               periods: Optional[Iterable[Tuple[int, int]]] = None) -> Dict[str, float]:
+        """{label: sign * SUM(field)} for every label of an AccountMap (see account_totals for periods)"""
+        totals = account_map.reduce(self.account_totals(field, year, month, periods))
+        if sign != 1.0:
+            totals = {label: sign * total for label, total in totals.items()}
+        return totals
+
@@ -0,0 +1,178 @@
+"""
+Byte-budgeted LRU cache
+In-process cache tier used by CacheService, both as the L1 in front of Redis
+and as the whole cache when Redis is unavailable.
+
+Entries carry a hard expiry and a soft "fresh until" time (for
+stale-while-revalidate). The cache never holds more than max_bytes of
+entries; least recently used entries are evicted first, and a background
+sweeper drops expired entries even if nobody reads them.
+
+Entries can carry tags. The tag index only ever holds live keys: a key
+leaves its tag sets whenever its entry is removed (eviction, expiry, pop,
+replacement), and empty tag sets are dropped.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ('value', 'size', 'expires', 'fresh_until', 'tags')
+
+    def __init__(self, value, size, expires, fresh_until, tags=()):
+        self.value = value
+        self.size = size
+        self.expires = expires
+        self.fresh_until = fresh_until
+        self.tags = tags
+
+
+class ByteBudgetLRUCache:
+    """Thread-safe LRU/TTL cache bounded by total (approximate) bytes"""
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int, sweep_interval_seconds: int = 30):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}   # tag -> keys of live entries
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected_oversize = 0
+
+        self._stop = threading.Event()
+        if sweep_interval_seconds > 0:
+            sweeper = threading.Thread(
+                target=self._sweep_loop, args=(sweep_interval_seconds,),
+                name='cache-l1-sweeper', daemon=True
+            )
+            sweeper.start()
+
+    def get(self, key: str) -> Tuple[Optional[Any], bool]:
+        """Return (value, is_stale), or (None, False) if missing or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, False
+            if now >= entry.expires:
+                self._remove(key)
+                self.expirations += 1
+                return None, False
+            self._entries.move_to_end(key)
+            return entry.value, now >= entry.fresh_until
+
+    def set(self, key: str, value: Any, size: int, expires: float, fresh_until: Optional[float] = None,
+            tags: Optional[Iterable[str]] = None) -> bool:
+        """
+        Store a value, optionally under tags (see keys_for_tags). Returns False
+        (and drops any previous copy) when the entry is larger than max_entry_bytes.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_entry_bytes:
+                self.rejected_oversize += 1
+                return False
+            tags = tuple(tags) if tags else ()
+            self._entries[key] = _Entry(value, size, expires, fresh_until if fresh_until is not None else expires, tags)
+            self._bytes += size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self._bytes > self.max_bytes and self._entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+            return True
+
+    def remaining_ttl(self, key: str) -> Optional[float]:
+        """Seconds until the entry expires, or None if missing/expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            remaining = entry.expires - time.time()
+            return remaining if remaining > 0 else None
+
+    def pop(self, key: str) -> bool:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                return True
+            return False
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._entries.keys())
+
+    def keys_for_tags(self, tags: Iterable[str], match_all: bool = False) -> Set[str]:
+        """Keys of live entries with any (or, with match_all, every) of the tags"""
+        with self._lock:
+            tag_sets = [self._tags.get(tag, set()) for tag in tags]
+            if not tag_sets:
+                return set()
+            return set.intersection(*tag_sets) if match_all else set().union(*tag_sets)
+
+    def clear(self) -> int:
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+            return count
+
+    def evict_expired(self) -> int:
+        """Drop every expired entry; returns how many were removed"""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if now >= entry.expires]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+        return len(expired)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'tags': len(self._tags),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'max_entry_bytes': self.max_entry_bytes,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'rejected_oversize': self.rejected_oversize,
+            }
+
+    def stop(self):
+        self._stop.set()
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _sweep_loop(self, interval: int):
+        while not self._stop.wait(interval):
+            try:
+                removed = self.evict_expired()
+                if removed:
+                    logger.debug(f"L1 cache sweeper removed {removed} expired entries")
+            except Exception as e:
+                logger.error(f"L1 cache sweeper error: {str(e)}")
@@ -0,0 +1,169 @@
+"""
+Mart Live Delta
+Brings a mart_department_metrics snapshot up to the minute with one small
+live query, instead of either serving the snapshot as-is or re-running every
+live query once it is a few hours old.
+
+InvoiceReg.InvoiceDate has no time of day, so "rows after the snapshot" can't
+be selected directly. Instead the ETL records a delta base with each snapshot:
+the same small aggregate the page runs later, over invoices dated on or after
+the snapshot's day. Serving a page then costs one query over the last day or
+two of invoices:
+
+    served = snapshot - base + live
+
+which is exact for the additive aggregates (revenue and invoice counts by
+month and customer). Point-in-time values such as fleet size and units on
+rent come from the snapshot unchanged.
+
+Usage:
+    # ETL, at snapshot time
+    additional_data['delta_base'] = build_delta_base(azure_sql, schema, snapshot_date)
+    # Page
+    metrics = apply_department_delta('rental', metrics, db, schema)
+"""
+
+import os
+import json
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.services.gl_query_builder import GLQueryBuilder
+
+logger = logging.getLogger(__name__)
+
+# A snapshot with a delta base is served (plus delta) up to this age; beyond it pages query live
+MART_DELTA_MAX_AGE_HOURS = float(os.environ.get('MART_DELTA_MAX_AGE_HOURS', '26'))
+TOP_CUSTOMERS_LIMIT = 10
+
+
+def invoice_delta_rows(db, schema: str, since: date) -> List[Dict[str, Any]]:
+    """Invoice count and GrandTotal per (year, month, customer) for invoices dated on/after since"""
+    qb = GLQueryBuilder()
+    query = f"""
+    SELECT
+        YEAR(InvoiceDate) as year,
+        MONTH(InvoiceDate) as month,
+        BillToName as customer,
+        COUNT(*) as invoices,
+        SUM(GrandTotal) as revenue
+    FROM {schema}.InvoiceReg
+    WHERE InvoiceDate >= {qb.param(since)}
+    GROUP BY YEAR(InvoiceDate), MONTH(InvoiceDate), BillToName
+    """
+    return [{
+        'year': int(row['year']),
+        'month': int(row['month']),
+        'customer': row['customer'],
+        'invoices': int(row['invoices'] or 0),
+        'revenue': float(row['revenue'] or 0),
+    } for row in (qb.execute(db, query) or [])]
+
+
+def build_delta_base(db, schema: str, since: date) -> Dict[str, Any]:
+    """The delta base to store with a snapshot taken on `since`"""
+    return {'since': since.isoformat(), 'rows': invoice_delta_rows(db, schema, since)}
+
+
+def _diff(base_rows: List[Dict[str, Any]], live_rows: List[Dict[str, Any]]) -> Tuple[Dict, Dict]:
+    """(by_month, by_customer) of live minus base, each {key: {'invoices', 'revenue'}}"""
+    by_month = defaultdict(lambda: {'invoices': 0, 'revenue': 0.0})
+    by_customer = defaultdict(lambda: {'invoices': 0, 'revenue': 0.0})
+    for rows, sign in ((live_rows, 1), (base_rows, -1)):
+        for row in rows:
+            for bucket in (by_month[(row['year'], row['month'])], by_customer[row['customer']]):
+                bucket['invoices'] += sign * row['invoices']
+                bucket['revenue'] += sign * row['revenue']
+    return by_month, by_customer
+
+
+def _apply_rental_delta(metrics: Dict[str, Any], base_rows: List[Dict[str, Any]],
+                        live_rows: List[Dict[str, Any]], since: date, now: datetime) -> Dict[str, Any]:
+    by_month, by_customer = _diff(base_rows, live_rows)
+    additional = dict(metrics.get('additional_data') or {})
+
+    # Monthly trend: adjust the snapshot's months, add a month that started since
+    trend = [dict(item) for item in (metrics.get('monthly_revenue') or [])]
+    seen = set()
+    for item in trend:
+        key = (item['year'], item.get('month_num', item['month']))
+        seen.add(key)
+        if key in by_month:
+            item['revenue'] = item.get('revenue', 0) + by_month[key]['revenue']
+            item['rentals'] = item.get('rentals', 0) + by_month[key]['invoices']
+    for (year, month), delta in sorted(by_month.items()):
+        if (year, month) not in seen and delta['invoices'] > 0:
+            trend.append({'month': datetime(year, month, 1).strftime("%b '%y"), 'year': year, 'month_num': month,
+                          'revenue': delta['revenue'], 'rentals': delta['invoices']})
+
+    # Current month revenue: the snapshot's figure only counts if it was for this month
+    current = (now.year, now.month)
+    month_revenue = float(metrics.get('metric_4') or 0) if (since.year, since.month) == current else 0.0
+    month_revenue += by_month[current]['revenue'] if current in by_month else 0.0
+    summary = dict(additional.get('summary') or {})
+    summary['monthlyRevenue'] = month_revenue
+
+    # Top customers: adjust the ranked customers (a customer outside the snapshot's
+    # top list has no base total to add to, so it can't enter until the next ETL run)
+    top_customers = []
+    for customer in additional.get('topCustomers') or []:
+        customer = dict(customer)
+        delta = by_customer.get(customer['customer'])
+        if delta:
+            customer['total_revenue'] = customer.get('total_revenue', 0) + delta['revenue']
+            customer['rental_count'] = customer.get('rental_count', 0) + delta['invoices']
+        top_customers.append(customer)
+    top_customers.sort(key=lambda customer: customer.get('total_revenue', 0), reverse=True)
+
+    additional.update({'summary': summary, 'topCustomers': top_customers[:TOP_CUSTOMERS_LIMIT]})
+    return dict(metrics, monthly_revenue=trend, metric_4=month_revenue, additional_data=additional)
+
+
+# department -> merge function(metrics, base_rows, live_rows, since, now)
+DEPARTMENT_DELTAS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    'rental': _apply_rental_delta,
+}
+
+
+JSON_COLUMNS = ('monthly_revenue', 'sub_category_1', 'sub_category_2', 'additional_data')
+
+
+def parse_json_columns(metrics: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a mart_department_metrics row with JSON columns that came back as text parsed"""
+    metrics = dict(metrics)
+    for column in JSON_COLUMNS:
+        if isinstance(metrics.get(column), str):
+            metrics[column] = json.loads(metrics[column])
+    return metrics
+
+
+def delta_base_of(department: str, metrics: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The snapshot's delta base, if the department supports deltas and the ETL recorded one"""
+    if department not in DEPARTMENT_DELTAS:
+        return None
+    additional = metrics.get('additional_data')
+    if isinstance(additional, str):
+        additional = json.loads(additional)
+    base = additional.get('delta_base') if isinstance(additional, dict) else None
+    return base if base and base.get('since') else None
+
+
+def apply_department_delta(department: str, metrics: Dict[str, Any], db, schema: str,
+                           now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Snapshot metrics merged with the live delta since the snapshot's day, with
+    JSON columns parsed and delta_through set. Raises if the live query fails.
+    """
+    base = delta_base_of(department, metrics)
+    if base is None:
+        return metrics
+    now = now or datetime.now()
+    since = datetime.strptime(base['since'], '%Y-%m-%d').date()
+    live_rows = invoice_delta_rows(db, schema, since)
+    logger.debug(f"{department} mart delta since {since}: {len(base.get('rows') or [])} base rows, {len(live_rows)} live")
+    merged = DEPARTMENT_DELTAS[department](parse_json_columns(metrics), base.get('rows') or [], live_rows,
+                                           since, now)
+    merged['delta_through'] = now
+    return merged
@@ -1,12 +1,35 @@
 import os
+import json
 import logging
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from psycopg2 import pool
 from contextlib import contextmanager
+from src.services.query_telemetry import get_query_telemetry
 
 logger = logging.getLogger(__name__)
 
+
+def get_postgres_url():
+    """
+    Resolve the PostgreSQL connection string from the environment.
+    Railway uses various names; returns None if none are set.
+    """
+    database_url = (
+        os.environ.get('POSTGRES_URL') or 
+        os.environ.get('DATABASE_URL') or
+        os.environ.get('DATABASE_PRIVATE_URL') or
+        os.environ.get('POSTGRES_PRIVATE_URL')
+    )
+    if not database_url:
+        return None
+    
+    # Railway provides postgresql:// but psycopg2 prefers postgres://
+    if database_url.startswith('postgresql://'):
+        database_url = database_url.replace('postgresql://', 'postgres://', 1)
+    return database_url
+
+
 class PostgreSQLService:
     """Service for managing PostgreSQL connections for user-generated content"""
     
@@ -23,22 +46,12 @@ class PostgreSQLService:
         """Initialize the connection pool"""
         try:
             # Get PostgreSQL connection string from environment - Railway uses various names
-            database_url = (
-                os.environ.get('POSTGRES_URL') or 
-                os.environ.get('DATABASE_URL') or
-                os.environ.get('DATABASE_PRIVATE_URL') or
-                os.environ.get('POSTGRES_PRIVATE_URL')
-            )
+            database_url = get_postgres_url()
             
             if not database_url:
                 logger.warning("PostgreSQL URL not found in environment variables (checked POSTGRES_URL, DATABASE_URL, DATABASE_PRIVATE_URL, POSTGRES_PRIVATE_URL)")
                 return
             
-            # Parse the connection string for psycopg2
-            # Railway provides postgresql:// but psycopg2 prefers postgres://
-            if database_url.startswith('postgresql://'):
-                database_url = database_url.replace('postgresql://', 'postgres://', 1)
-            
             self._connection_pool = psycopg2.pool.ThreadedConnectionPool(
                 1,  # Min connections
                 20,  # Max connections
@@ -80,13 +93,28 @@ class PostgreSQLService:
                 return []
             
             try:
-                with conn.cursor() as cursor:
-                    cursor.execute(query, params or ())
-                    return cursor.fetchall()
+                with get_query_telemetry().track('postgres', query, params, 'postgres', self.explain) as tracked:
+                    with conn.cursor() as cursor:
+                        cursor.execute(query, params or ())
+                        tracked.rows = cursor.fetchall()
+                        return tracked.rows
             except Exception as e:
                 logger.error(f"Query execution failed: {str(e)}")
                 raise
     
+    def explain(self, query, params=None):
+        """Estimated plan (EXPLAIN, not ANALYZE) as JSON text. Used by query telemetry for slow queries."""
+        with self.get_connection() as conn:
+            if not conn:
+                return None
+            with conn.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {query}", params or ())
+                row = cursor.fetchone()
+        if not row:
+            return None
+        plan = next(iter(row.values())) if isinstance(row, dict) else row[0]
+        return plan if isinstance(plan, str) else json.dumps(plan, indent=1)
+    
     def execute_update(self, query, params=None):
         """Execute an INSERT/UPDATE/DELETE query"""
         with self.get_connection() as conn:
@@ -287,6 +315,10 @@ class PostgreSQLService:
                     cursor.execute(self._get_parts_associations_sql())
                     logger.info("Parts associations table created/verified successfully")
 
+                    # Create incremental ETL watermark table
+                    cursor.execute(self._get_etl_watermark_sql())
+                    logger.info("ETL watermark table created/verified successfully")
+
                     conn.commit()
                     return True
         except Exception as e:
@@ -488,6 +520,20 @@ class PostgreSQLService:
         CREATE INDEX IF NOT EXISTS idx_tech_wage_active ON tech_wage_rates(is_active);
         """
 
+    def _get_etl_watermark_sql(self):
+        """SQL to create the incremental ETL watermark table"""
+        return """
+        CREATE TABLE IF NOT EXISTS mart_etl_watermark (
+            org_id INTEGER NOT NULL,
+            job_name VARCHAR(100) NOT NULL,
+            metric VARCHAR(100) NOT NULL,
+            closed_through DATE NOT NULL,
+            frozen_rows JSONB,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (org_id, job_name, metric)
+        );
+        """
+
 # Singleton instance
 def get_postgres_db():
     """Get the PostgreSQL service instance"""
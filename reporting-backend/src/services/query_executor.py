@@ -0,0 +1,285 @@
+"""
+Shared Query Executor
+Process-wide, bounded thread pool for request fan-out (dashboard widgets,
+report sections) with per-request deadlines.
+
+Each dashboard request used to create its own 10-thread ThreadPoolExecutor
+and wait for every query without a deadline, so one slow GLDetail query could
+hold a gunicorn worker until the 120s request timeout and a burst of requests
+multiplied the thread count.
+
+QueryExecutor instead:
+- runs every fan-out on one pool of QUERY_EXECUTOR_WORKERS threads per process
+- carries the request's deadline into the worker threads (contextvars), where
+  AzureSQLService turns the time left into a driver query timeout so the
+  database cancels the statement instead of the thread just being abandoned
+- stops waiting at the deadline: queued tasks are cancelled, and late or
+  failed tasks degrade to their last known value (see remember_last_known)
+  and are reported as degraded
+
+Tasks must not fan out onto the same executor and wait on it (with a bounded
+pool that can deadlock); nest plain function calls instead.
+
+Usage:
+    executor = get_query_executor()
+    outcome = executor.run_all(
+        {'sales': remember_last_known('dashboard:ben002:sales', queries.get_sales)},
+        timeout=20,
+        last_known={'sales': 'dashboard:ben002:sales'},
+    )
+    outcome.results['sales'], outcome.degraded
+"""
+
+import os
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+QUERY_EXECUTOR_WORKERS = int(os.environ.get('QUERY_EXECUTOR_WORKERS', '16'))
+# Default budget for a request's fan-out, well inside the gunicorn worker timeout
+QUERY_DEADLINE_SECONDS = float(os.environ.get('QUERY_DEADLINE_SECONDS', '25'))
+# How long a last known value stays available for degraded responses
+LAST_KNOWN_TTL_SECONDS = int(os.environ.get('QUERY_LAST_KNOWN_TTL', str(7 * 86400)))
+LAST_KNOWN_PREFIX = 'last_known'
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar('query_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when work starts (or a query is issued) after the request deadline"""
+    pass
+
+
+# ==================== Deadlines ====================
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """
+    Set the deadline for the enclosed work to `seconds` from now. A nested
+    scope can only shorten an outer deadline, never extend it.
+    """
+    if seconds is None:
+        yield _deadline.get()
+        return
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        deadline = min(deadline, outer)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_seconds() -> Optional[float]:
+    """Seconds left before the current deadline, or None when there is no deadline"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline():
+    """Raise DeadlineExceeded if the current deadline has passed"""
+    remaining = remaining_seconds()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded(f"Deadline exceeded by {-remaining:.1f}s")
+
+
+# ==================== Last known values ====================
+
+def _last_known_key(key: str) -> str:
+    return f"{LAST_KNOWN_PREFIX}:{key}"
+
+
+def remember_last_known(key: str, func: Callable[[], Any]) -> Callable[[], Any]:
+    """
+    Wrap a query function so each successful result is also kept as the last
+    known value for `key` (outliving the normal cache TTL).
+    Wrap the function that actually queries - e.g. the one passed to
+    cache_query - so cache hits don't rewrite it. func must raise on failure
+    rather than return a placeholder, or the placeholder becomes the last known value.
+    """
+    def wrapper():
+        result = func()
+        if result is not None:
+            from src.services.cache_service import cache_service
+            cache_service.set(_last_known_key(key), {'value': result, 'as_of': datetime.now().isoformat()},
+                              ttl_seconds=LAST_KNOWN_TTL_SECONDS)
+        return result
+    return wrapper
+
+
+def get_last_known(key: str) -> Optional[Tuple[Any, str]]:
+    """(value, as_of ISO timestamp) last remembered for key, or None"""
+    from src.services.cache_service import cache_service
+    entry = cache_service.get(_last_known_key(key))
+    if not entry:
+        return None
+    return entry.get('value'), entry.get('as_of')
+
+
+# ==================== Executor ====================
+
+class FanOutResult(NamedTuple):
+    results: Dict[str, Any]
+    degraded: List[str]          # keys that missed the deadline or failed
+    as_of: Dict[str, str]        # degraded key -> timestamp of the last known value served
+    errors: Dict[str, str]       # key -> error message (failures and deadline misses)
+
+
+class QueryExecutor:
+    """Bounded, shared thread pool that runs keyed tasks against a deadline"""
+
+    def __init__(self, max_workers: int = QUERY_EXECUTOR_WORKERS):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='query-fanout')
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.deadline_misses = 0
+        self.cancelled = 0
+
+    def submit(self, func: Callable, *args, deadline: Optional[float] = None, **kwargs) -> Future:
+        """
+        Run func on the shared pool in a copy of the caller's context, so the
+        caller's deadline (and any other contextvars) follow it; `deadline`
+        (a time.monotonic() value) can only shorten it. Work that only starts
+        after the deadline fails fast with DeadlineExceeded.
+        """
+        ctx = contextvars.copy_context()
+
+        def run():
+            if deadline is not None:
+                outer = _deadline.get()
+                _deadline.set(deadline if outer is None else min(deadline, outer))
+            check_deadline()
+            return func(*args, **kwargs)
+
+        with self._lock:
+            self._pending += 1
+            self.submitted += 1
+        future = self._executor.submit(ctx.run, run)
+        future.add_done_callback(self._task_done)
+        return future
+
+    def _task_done(self, future: Future):
+        with self._lock:
+            self._pending -= 1
+
+    def iter_completed(self, tasks: Dict[str, Callable[[], Any]], timeout: Optional[float] = None,
+                       last_known: Optional[Dict[str, str]] = None) -> Iterator[Tuple[str, Any, Optional[str], Optional[str]]]:
+        """
+        Run keyed tasks concurrently and yield (key, value, error, degraded_as_of)
+        as each one finishes. At the deadline (timeout, or the caller's deadline
+        if shorter) queued tasks are cancelled and every unfinished task is
+        yielded with its last known value. degraded_as_of is None for a fresh
+        result, otherwise the timestamp of the last known value ('' if none).
+        """
+        last_known = last_known or {}
+        outer_remaining = remaining_seconds()
+        if timeout is None:
+            timeout = outer_remaining if outer_remaining is not None else QUERY_DEADLINE_SECONDS
+        elif outer_remaining is not None:
+            timeout = min(timeout, outer_remaining)
+        deadline = time.monotonic() + timeout
+
+        future_to_key = {self.submit(func, deadline=deadline): key for key, func in tasks.items()}
+        pending = set(future_to_key)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0),
+                                     return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    key = future_to_key[future]
+                    try:
+                        value = future.result()
+                    except Exception as e:
+                        with self._lock:
+                            self.failed += 1
+                        logger.error(f"Query {key} failed: {str(e)}")
+                        yield (key,) + self._degrade(key, last_known, str(e))
+                        continue
+                    with self._lock:
+                        self.completed += 1
+                    yield key, value, None, None
+        finally:
+            # Deadline reached (or the consumer stopped early): cancel what hasn't started;
+            # running queries end at their database-side timeout
+            for future in pending:
+                if future.cancel():
+                    with self._lock:
+                        self.cancelled += 1
+
+        for future in pending:
+            key = future_to_key[future]
+            with self._lock:
+                self.deadline_misses += 1
+            logger.warning(f"Query {key} missed its deadline, serving last known value")
+            yield (key,) + self._degrade(key, last_known, 'deadline exceeded')
+
+    def run_all(self, tasks: Dict[str, Callable[[], Any]], timeout: Optional[float] = None,
+                last_known: Optional[Dict[str, str]] = None) -> FanOutResult:
+        """Run keyed tasks concurrently and wait for all of them, up to the deadline"""
+        outcome = FanOutResult({}, [], {}, {})
+        for key, value, error, as_of in self.iter_completed(tasks, timeout, last_known):
+            outcome.results[key] = value
+            if error:
+                outcome.errors[key] = error
+            if as_of is not None:
+                outcome.degraded.append(key)
+                if as_of:
+                    outcome.as_of[key] = as_of
+        return outcome
+
+    @staticmethod
+    def _degrade(key: str, last_known: Dict[str, str], error: str) -> Tuple[Any, str, str]:
+        """(value, error, as_of) for a task that did not produce a result"""
+        remembered = get_last_known(last_known[key]) if key in last_known else None
+        if remembered is None:
+            return None, error, ''
+        value, as_of = remembered
+        return value, error, as_of or ''
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'default_deadline_seconds': QUERY_DEADLINE_SECONDS,
+                'pending': self._pending,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'deadline_misses': self.deadline_misses,
+                'cancelled': self.cancelled,
+            }
+
+
+_query_executor = None
+_query_executor_lock = threading.Lock()
+
+
+def get_query_executor() -> QueryExecutor:
+    """
+    Get the singleton QueryExecutor for this process.
+    Creates it if it doesn't exist.
+    """
+    global _query_executor
+    if _query_executor is None:
+        with _query_executor_lock:
+            if _query_executor is None:
+                _query_executor = QueryExecutor()
+    return _query_executor
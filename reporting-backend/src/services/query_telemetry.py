@@ -0,0 +1,413 @@
+"""
+Query Telemetry
+Per-query timing for AzureSQLService and PostgreSQLService, so slow report
+queries can be found from /api/admin/queries instead of grepping logger.info
+lines.
+
+Every execute_query is recorded under a fingerprint: the SQL with literals,
+parameter placeholders, IN lists and the tenant schema replaced, so the same
+f-string query from any tenant or date range lands in one bucket. Queries
+wrapped in sp_executesql (GLQueryBuilder.build) are fingerprinted by the
+statement they pass, not by the wrapper. For each
+fingerprint a bounded, log-bucketed histogram of wall time gives p50/p95/p99,
+along with rows, approximate result bytes, errors, and counts per tenant and
+per calling route.
+
+Queries slower than SLOW_QUERY_MS also go to a ring buffer with their SQL and
+(at most once per fingerprint per QUERY_PLAN_INTERVAL_SECONDS) an estimated
+plan, captured on a background thread so the request never waits for it.
+
+Everything is in memory and per process, like the error log in
+src/routes/error_logs.py: it is lost on restart and each worker has its own.
+
+Usage:
+    with query_source('etl_department_metrics'):
+        ...                           # queries are attributed to the ETL job
+    get_query_telemetry().get_stats(sort='p95')
+"""
+
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+import contextvars
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+QUERY_TELEMETRY_ENABLED = os.environ.get('QUERY_TELEMETRY_ENABLED', 'true').lower() == 'true'
+QUERY_TELEMETRY_MAX_FINGERPRINTS = int(os.environ.get('QUERY_TELEMETRY_MAX_FINGERPRINTS', '1000'))
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '1000'))
+SLOW_QUERY_LOG_SIZE = int(os.environ.get('SLOW_QUERY_LOG_SIZE', '200'))
+QUERY_CAPTURE_PLANS = os.environ.get('QUERY_CAPTURE_PLANS', 'true').lower() == 'true'
+QUERY_PLAN_INTERVAL_SECONDS = int(os.environ.get('QUERY_PLAN_INTERVAL_SECONDS', '3600'))
+QUERY_PLAN_MAX_CHARS = int(os.environ.get('QUERY_PLAN_MAX_CHARS', '20000'))
+SQL_TEXT_MAX_CHARS = 4000
+TOP_BREAKDOWN = 10   # tenants/routes kept per fingerprint
+BYTES_SAMPLE_ROWS = 50
+
+# Histogram bucket upper bounds in ms: 1ms doubling in quarter steps (~19% wide) to ~18 minutes
+HISTOGRAM_BOUNDS_MS = [2 ** (i / 4) for i in range(81)]
+
+_source: contextvars.ContextVar = contextvars.ContextVar('query_source', default=None)
+
+# Schemas that are never a tenant's
+_SHARED_SCHEMAS = {'dbo', 'sys', 'information_schema', 'public', 'pg_catalog'}
+
+
+# ==================== Fingerprints ====================
+
+_COMMENT_RE = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_STRING_RE = re.compile(r"N?'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'(?<![\w@$.])-?\d+(?:\.\d+)?\b')
+_PARAM_RE = re.compile(r'@\w+|%s|%\(\w+\)s|\?')
+_IN_LIST_RE = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.I)
+_WHITESPACE_RE = re.compile(r'\s+')
+_SCHEMA_RE = re.compile(r'\b(?:FROM|JOIN|INTO|UPDATE)\s+\[?(\w+)\]?\s*\.\s*\[?\w', re.I)
+_EXECUTESQL_RE = re.compile(r'^\s*EXEC(?:UTE)?\s+(?:sys\s*\.\s*)?sp_executesql\b', re.I)
+
+
+def statement_of(sql: str, params: Any = None) -> str:
+    """
+    The statement a query actually runs. For EXEC sp_executesql %s, %s, ... the
+    statement is the first parameter; otherwise it is the SQL itself.
+    """
+    if params and isinstance(params, (list, tuple)) and isinstance(params[0], str) and _EXECUTESQL_RE.match(sql):
+        return params[0]
+    return sql
+
+
+def tenant_schema_of(sql: str) -> Optional[str]:
+    """The first tenant schema a query reads from ({schema}.Table), if any"""
+    for schema in _SCHEMA_RE.findall(sql):
+        if schema.lower() not in _SHARED_SCHEMAS:
+            return schema
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _normalize(sql: str) -> tuple:
+    """(fingerprint id, normalized text, tenant schema) - cached, report queries repeat"""
+    schema = tenant_schema_of(sql)
+    text = _COMMENT_RE.sub(' ', sql)
+    text = _STRING_RE.sub('?', text)
+    text = _PARAM_RE.sub('?', text)
+    text = _NUMBER_RE.sub('?', text)
+    if schema:
+        text = re.sub(rf'\b{re.escape(schema)}\s*\.', '{schema}.', text)
+    text = _IN_LIST_RE.sub('IN (?)', text)
+    text = _WHITESPACE_RE.sub(' ', text).strip()
+    fingerprint_id = hashlib.md5(text.encode('utf-8')).hexdigest()[:12]
+    return fingerprint_id, text, schema
+
+
+def fingerprint(sql: str) -> str:
+    """Normalized SQL with literals, placeholders and the tenant schema stripped"""
+    return _normalize(sql)[1]
+
+
+# ==================== Context ====================
+
+@contextmanager
+def query_source(name: str):
+    """Attribute the enclosed queries to `name` (an ETL job, a script) instead of a route"""
+    token = _source.set(name)
+    try:
+        yield
+    finally:
+        _source.reset(token)
+
+
+def _current_route() -> str:
+    source = _source.get()
+    if source:
+        return source
+    try:
+        from flask import has_request_context, request
+        if has_request_context():
+            return request.endpoint or request.path
+    except Exception:
+        pass
+    return threading.current_thread().name
+
+
+def approximate_bytes(rows: List[Any]) -> int:
+    """Rough result size: the first BYTES_SAMPLE_ROWS rows measured, scaled to the row count"""
+    if not rows:
+        return 0
+    sample = rows[:BYTES_SAMPLE_ROWS]
+    size = 0
+    for row in sample:
+        values = row.values() if isinstance(row, dict) else row
+        for value in values:
+            size += len(value) if isinstance(value, (str, bytes)) else 8
+    return int(size * len(rows) / len(sample))
+
+
+# ==================== Histograms ====================
+
+class _FingerprintStats:
+    """Counters and latency histogram for one fingerprint"""
+
+    __slots__ = ('fingerprint_id', 'text', 'backend', 'buckets', 'count', 'errors', 'total_ms', 'max_ms',
+                 'rows', 'bytes', 'tenants', 'routes', 'first_seen', 'last_seen', 'last_plan_at')
+
+    def __init__(self, fingerprint_id: str, text: str, backend: str):
+        self.fingerprint_id = fingerprint_id
+        self.text = text
+        self.backend = backend
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.tenants: Dict[str, int] = {}
+        self.routes: Dict[str, int] = {}
+        self.first_seen = datetime.now()
+        self.last_seen = self.first_seen
+        self.last_plan_at = 0.0
+
+    def add(self, duration_ms: float, rows: int, size: int, tenant: str, route: str, error: bool):
+        self.buckets[bisect_left(HISTOGRAM_BOUNDS_MS, duration_ms)] += 1
+        self.count += 1
+        self.errors += int(error)
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.rows += rows
+        self.bytes += size
+        self.last_seen = datetime.now()
+        for counts, key in ((self.tenants, tenant), (self.routes, route)):
+            if key in counts or len(counts) < TOP_BREAKDOWN:
+                counts[key] = counts.get(key, 0) + 1
+            else:
+                counts['(other)'] = counts.get('(other)', 0) + 1
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of calls (max_ms for the last bucket)"""
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                bound = HISTOGRAM_BOUNDS_MS[index] if index < len(HISTOGRAM_BOUNDS_MS) else self.max_ms
+                return round(min(bound, self.max_ms), 1)
+        return round(self.max_ms, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'fingerprint_id': self.fingerprint_id,
+            'fingerprint': self.text,
+            'backend': self.backend,
+            'count': self.count,
+            'errors': self.errors,
+            'p50_ms': self.percentile(0.50),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': round(self.max_ms, 1),
+            'mean_ms': round(self.total_ms / self.count, 1) if self.count else 0,
+            'total_ms': round(self.total_ms, 1),
+            'avg_rows': round(self.rows / self.count, 1) if self.count else 0,
+            'avg_bytes': int(self.bytes / self.count) if self.count else 0,
+            'tenants': dict(sorted(self.tenants.items(), key=lambda x: x[1], reverse=True)),
+            'routes': dict(sorted(self.routes.items(), key=lambda x: x[1], reverse=True)),
+            'first_seen': self.first_seen.isoformat(),
+            'last_seen': self.last_seen.isoformat(),
+        }
+
+
+# ==================== Store ====================
+
+class QueryTelemetry:
+    """Bounded per-fingerprint latency histograms plus a ring buffer of slow queries"""
+
+    SORT_KEYS = ('total_ms', 'p95_ms', 'p99_ms', 'p50_ms', 'max_ms', 'count', 'errors', 'avg_rows', 'avg_bytes')
+
+    def __init__(self, max_fingerprints: int = QUERY_TELEMETRY_MAX_FINGERPRINTS):
+        self.enabled = QUERY_TELEMETRY_ENABLED
+        self.max_fingerprints = max_fingerprints
+        self._stats: 'OrderedDict[tuple, _FingerprintStats]' = OrderedDict()
+        self._slow = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+        self._lock = threading.Lock()
+        self._slow_id = 0
+        self._plan_executor = None
+        self.recorded = 0
+        self.evicted = 0
+        self.started_at = datetime.now()
+
+    @contextmanager
+    def track(self, backend: str, sql: str, params: Any = None, default_tenant: Optional[str] = None,
+              explain: Optional[Callable[[str, Any], Optional[str]]] = None):
+        """
+        Time the enclosed query. The block sets `.rows` on the yielded tracker
+        to the fetched rows (a list) or a row count. `explain(sql, params)`
+        returns an estimated plan for slow queries; it runs on a background thread.
+        """
+        tracker = _Tracker()
+        if not self.enabled:
+            yield tracker
+            return
+        start = time.perf_counter()
+        error = False
+        try:
+            yield tracker
+        except GeneratorExit:
+            raise   # a streaming caller stopped reading early - not a failed query
+        except BaseException:
+            error = True
+            raise
+        finally:
+            try:
+                self.record(backend, sql, params, (time.perf_counter() - start) * 1000, tracker.rows,
+                            error, default_tenant, explain)
+            except Exception as e:
+                logger.debug(f"Query telemetry failed: {e}")
+
+    def record(self, backend: str, sql: str, params: Any, duration_ms: float, rows: Any = None,
+               error: bool = False, default_tenant: Optional[str] = None,
+               explain: Optional[Callable[[str, Any], Optional[str]]] = None):
+        """Record one finished query (rows: the fetched rows, or a count)"""
+        statement = statement_of(sql, params)
+        fingerprint_id, text, schema = _normalize(statement)
+        tenant = schema or default_tenant or 'unknown'
+        route = _current_route()
+        if isinstance(rows, list):
+            row_count, size = len(rows), approximate_bytes(rows)
+        else:
+            row_count, size = int(rows or 0), 0
+
+        key = (backend, fingerprint_id)
+        capture_plan = False
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _FingerprintStats(fingerprint_id, text, backend)
+                if len(self._stats) > self.max_fingerprints:
+                    self._stats.popitem(last=False)   # least recently seen
+                    self.evicted += 1
+            else:
+                self._stats.move_to_end(key)
+            stats.add(duration_ms, row_count, size, tenant, route, error)
+            self.recorded += 1
+
+            if duration_ms < SLOW_QUERY_MS:
+                return
+            self._slow_id += 1
+            entry = {
+                'id': self._slow_id,
+                'timestamp': datetime.now().isoformat(),
+                'backend': backend,
+                'fingerprint_id': fingerprint_id,
+                'duration_ms': round(duration_ms, 1),
+                'rows': row_count,
+                'bytes': size,
+                'error': error,
+                'tenant': tenant,
+                'route': route,
+                'sql': statement.strip()[:SQL_TEXT_MAX_CHARS],
+                # sp_executesql's statement and declarations aren't bound values
+                'param_count': (len(params) - (2 if statement is not sql else 0)) if params else 0,
+                'plan': None,
+            }
+            self._slow.append(entry)
+            now = time.monotonic()
+            if explain and QUERY_CAPTURE_PLANS and now - stats.last_plan_at >= QUERY_PLAN_INTERVAL_SECONDS:
+                stats.last_plan_at = now
+                capture_plan = True
+
+        logger.info(f"Slow {backend} query {fingerprint_id} ({duration_ms:.0f}ms, {row_count} rows) "
+                    f"tenant={tenant} route={route}")
+        if capture_plan:
+            self._submit_plan(entry, explain, sql, params)
+
+    def _submit_plan(self, entry: Dict[str, Any], explain: Callable, sql: str, params: Any):
+        # One thread: plans are best-effort and must not compete with report queries
+        if self._plan_executor is None:
+            with self._lock:
+                if self._plan_executor is None:
+                    self._plan_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='query-plan')
+
+        def capture():
+            try:
+                plan = explain(sql, params)
+                entry['plan'] = plan[:QUERY_PLAN_MAX_CHARS] if plan else None
+            except Exception as e:
+                entry['plan'] = f"(plan unavailable: {e})"
+
+        self._plan_executor.submit(contextvars.Context().run, capture)
+
+    def get_stats(self, sort: str = 'total_ms', limit: int = 50, backend: Optional[str] = None,
+                  tenant: Optional[str] = None, route: Optional[str] = None) -> Dict[str, Any]:
+        """Per-fingerprint percentiles, heaviest first by `sort`"""
+        sort = sort if sort in self.SORT_KEYS else 'total_ms'
+        with self._lock:
+            fingerprints = [stats.to_dict() for stats in self._stats.values()
+                            if (backend is None or stats.backend == backend)
+                            and (tenant is None or tenant in stats.tenants)
+                            and (route is None or any(route.lower() in name.lower() for name in stats.routes))]
+            summary = {
+                'enabled': self.enabled,
+                'since': self.started_at.isoformat(),
+                'recorded': self.recorded,
+                'fingerprints_tracked': len(self._stats),
+                'fingerprint_capacity': self.max_fingerprints,
+                'evicted': self.evicted,
+                'slow_query_ms': SLOW_QUERY_MS,
+                'slow_queries_buffered': len(self._slow),
+            }
+        fingerprints.sort(key=lambda item: item[sort], reverse=True)
+        summary.update({'sort': sort, 'fingerprints': fingerprints[:limit]})
+        return summary
+
+    def get_slow_queries(self, limit: int = 50, fingerprint_id: Optional[str] = None,
+                         tenant: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Slow query log, newest first"""
+        with self._lock:
+            entries = list(self._slow)
+        entries.reverse()
+        if fingerprint_id:
+            entries = [e for e in entries if e['fingerprint_id'] == fingerprint_id]
+        if tenant:
+            entries = [e for e in entries if e['tenant'] == tenant]
+        return [dict(e) for e in entries[:limit]]
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+            self.recorded = 0
+            self.evicted = 0
+            self.started_at = datetime.now()
+
+
+class _Tracker:
+    __slots__ = ('rows',)
+
+    def __init__(self):
+        self.rows = None
+
+
+_query_telemetry = None
+_query_telemetry_lock = threading.Lock()
+
+
+def get_query_telemetry() -> QueryTelemetry:
+    """
+    Get the singleton QueryTelemetry for this process.
+    Creates it if it doesn't exist.
+    """
+    global _query_telemetry
+    if _query_telemetry is None:
+        with _query_telemetry_lock:
+            if _query_telemetry is None:
+                _query_telemetry = QueryTelemetry()
+    return _query_telemetry
@@ -0,0 +1,372 @@
+"""
+Scheduler Coordinator
+Leader election for the background schedulers (cache warmer, forecast
+snapshots, ETL) so that only ONE gunicorn worker runs each scheduled job.
+
+Every worker still starts its APScheduler, but jobs are wrapped with
+leader_only(): when the trigger fires, only the worker currently holding the
+leader lease runs the job and the others record a skip. The lease is renewed
+by a heartbeat thread; if the leader dies its lease expires and another
+worker takes over on its next heartbeat.
+
+Backends, in order of preference:
+- Redis: SET NX lease with an INCR fencing token
+- PostgreSQL: session-level pg_try_advisory_lock on a dedicated connection
+- None: single-process mode, this worker is always the leader
+
+Every acquisition issues a new, larger fencing token. A paused or partitioned
+leader can keep running a job after its lease has moved on, so leader-only
+jobs call check_leadership() before committing side effects (mart loads,
+watermarks, cache writes, forecast snapshots); it raises LeadershipLost once
+another worker has acquired the lease since the job started.
+"""
+
+import os
+import time
+import atexit
+import socket
+import logging
+import threading
+import functools
+import contextvars
+from datetime import datetime
+from typing import Callable, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+LEADER_LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEADER_LEASE', '30'))
+LEADER_HEARTBEAT_SECONDS = max(1, LEADER_LEASE_SECONDS // 3)
+
+LEADER_KEY = 'scheduler:leader'
+FENCE_KEY = 'scheduler:leader_fence'
+JOB_STATUS_PREFIX = 'scheduler:job:'
+JOB_STATUS_TTL_SECONDS = 7 * 86400
+
+# Arbitrary unique advisory lock id for the scheduler leader
+# (987654321 is already used for table initialization in postgres_service)
+LEADER_ADVISORY_LOCK_ID = 987654322
+
+# Take the lease if it is free; the fence only advances when the lease is won.
+# Returns the new fencing token, or 0 if another worker holds the lease.
+_ACQUIRE_LEASE_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return 0
+end
+local token = redis.call('incr', KEYS[2])
+redis.call('set', KEYS[1], ARGV[1] .. ':' .. token, 'EX', ARGV[2])
+return token
+"""
+
+# Renew only if we still own the lease
+_RENEW_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Fencing token of the leader-only job running in this context (None outside one)
+_job_fencing_token: contextvars.ContextVar = contextvars.ContextVar('scheduler_job_fencing_token', default=None)
+
+
+class LeadershipLost(Exception):
+    """Raised when a leader-only job's fencing token has been superseded"""
+    pass
+
+
+class SchedulerCoordinator:
+    """Elects one leader process for scheduled jobs and records job runs"""
+
+    def __init__(self):
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.backend = 'none'
+        self.fencing_token = None
+        self._redis = None
+        self._pg_conn = None
+        self._is_leader = False
+        self._lease_expires_at = 0.0
+        self._lease_value = None
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._stop = threading.Event()
+
+        self._select_backend()
+        self._heartbeat()
+        if self.backend != 'none':
+            thread = threading.Thread(target=self._heartbeat_loop, name='scheduler-leader-heartbeat', daemon=True)
+            thread.start()
+
+    # ==================== Leadership ====================
+
+    def is_leader(self) -> bool:
+        if self.backend == 'none':
+            return True
+        with self._lock:
+            return self._is_leader and time.monotonic() < self._lease_expires_at
+
+    def _select_backend(self):
+        from src.services.cache_service import cache_service
+        if cache_service.redis_client:
+            self._redis = cache_service.redis_client
+            self.backend = 'redis'
+            return
+
+        from src.services.postgres_service import get_postgres_url
+        if get_postgres_url():
+            self.backend = 'postgres'
+            return
+
+        logger.warning("Scheduler coordinator: no Redis or PostgreSQL available - running all jobs in this process")
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(LEADER_HEARTBEAT_SECONDS):
+            self._heartbeat()
+
+    def _heartbeat(self):
+        try:
+            if self.backend == 'redis':
+                self._redis_heartbeat()
+            elif self.backend == 'postgres':
+                self._postgres_heartbeat()
+        except Exception as e:
+            logger.error(f"Scheduler leader heartbeat failed: {str(e)}")
+            self._set_leader(False)
+
+    def _redis_heartbeat(self):
+        if self._is_leader and self._lease_value:
+            renewed = self._redis.eval(_RENEW_LEASE_SCRIPT, 1, LEADER_KEY, self._lease_value, LEADER_LEASE_SECONDS)
+            if renewed:
+                self._set_leader(True)
+                return
+            logger.warning(f"Scheduler leadership lost by {self.instance_id}")
+            self._set_leader(False)
+
+        token = self._redis.eval(_ACQUIRE_LEASE_SCRIPT, 2, LEADER_KEY, FENCE_KEY, self.instance_id, LEADER_LEASE_SECONDS)
+        if token:
+            token = int(token)
+            self._lease_value = f"{self.instance_id}:{token}"
+            self.fencing_token = token
+            self._set_leader(True)
+            logger.info(f"Scheduler leadership acquired by {self.instance_id} (fencing token {token})")
+
+    def _postgres_heartbeat(self):
+        import psycopg2
+        from src.services.postgres_service import get_postgres_url
+
+        if self._pg_conn is not None and self._is_leader:
+            # The advisory lock lives as long as this session; just prove it's alive
+            try:
+                with self._pg_conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                self._set_leader(True)
+                return
+            except Exception:
+                logger.warning(f"Scheduler leader connection lost by {self.instance_id}")
+                self._close_pg()
+                self._set_leader(False)
+
+        if self._pg_conn is None:
+            self._pg_conn = psycopg2.connect(get_postgres_url())
+            self._pg_conn.autocommit = True
+
+        with self._pg_conn.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", (LEADER_ADVISORY_LOCK_ID,))
+            got_lock = cursor.fetchone()[0]
+            if got_lock:
+                cursor.execute("CREATE SEQUENCE IF NOT EXISTS scheduler_leader_fence")
+                cursor.execute("SELECT nextval('scheduler_leader_fence')")
+                self.fencing_token = cursor.fetchone()[0]
+                self._set_leader(True)
+                logger.info(f"Scheduler leadership acquired by {self.instance_id} (fencing token {self.fencing_token})")
+
+    def validate_fence(self, token) -> bool:
+        """
+        True if token is still the current fencing token and this worker still
+        holds the lease, checked against the backend rather than local state
+        """
+        if self.backend == 'none':
+            return True
+        if token is None or token != self.fencing_token:
+            return False
+        if self.backend == 'redis':
+            return self._redis.get(LEADER_KEY) == f"{self.instance_id}:{token}"
+        # The advisory lock is held for as long as the leader's session is alive,
+        # and every acquisition advances the sequence
+        pg_conn = self._pg_conn
+        if pg_conn is None:
+            return False
+        with pg_conn.cursor() as cursor:
+            cursor.execute("SELECT last_value FROM scheduler_leader_fence")
+            return cursor.fetchone()[0] == token
+
+    def _set_leader(self, is_leader: bool):
+        with self._lock:
+            self._is_leader = is_leader
+            self._lease_expires_at = time.monotonic() + LEADER_LEASE_SECONDS if is_leader else 0.0
+            if not is_leader:
+                self._lease_value = None
+
+    def _close_pg(self):
+        try:
+            self._pg_conn.close()
+        except Exception:
+            pass
+        self._pg_conn = None
+
+    def shutdown(self):
+        """Give up leadership so another worker can take over immediately"""
+        self._stop.set()
+        try:
+            if self.backend == 'redis' and self._lease_value:
+                self._redis.eval(_RELEASE_LEASE_SCRIPT, 1, LEADER_KEY, self._lease_value)
+            elif self.backend == 'postgres' and self._pg_conn is not None:
+                self._close_pg()
+        except Exception:
+            pass
+        self._set_leader(False)
+
+    # ==================== Jobs ====================
+
+    def leader_only(self, job_id: str, func: Callable) -> Callable:
+        """Wrap a scheduled job so it only runs in the leader process"""
+        self._jobs.setdefault(job_id, {'runs': 0, 'skips': 0})
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.is_leader():
+                self._jobs[job_id]['skips'] += 1
+                logger.debug(f"Skipping scheduled job {job_id}: {self.instance_id} is not the scheduler leader")
+                return None
+
+            token = self.fencing_token
+            started = time.time()
+            self._jobs[job_id]['runs'] += 1
+            self._record_job(job_id, token, {
+                'last_started_at': datetime.now().isoformat(),
+                'last_status': 'running',
+                'runner': self.instance_id,
+                'fencing_token': token,
+            })
+            context_token = _job_fencing_token.set(token)
+            try:
+                result = func(*args, **kwargs)
+                self._record_job(job_id, token, {
+                    'last_finished_at': datetime.now().isoformat(),
+                    'last_status': 'failed' if result is False else 'success',
+                    'last_duration_seconds': round(time.time() - started, 2),
+                    'last_error': '',
+                })
+                return result
+            except LeadershipLost as e:
+                # A newer leader owns the job now; don't overwrite its status
+                logger.warning(f"Scheduled job {job_id} stopped on {self.instance_id}: {str(e)}")
+                self._jobs[job_id].update({'last_status': 'fenced', 'last_error': str(e)[:500]})
+                return None
+            except Exception as e:
+                self._record_job(job_id, token, {
+                    'last_finished_at': datetime.now().isoformat(),
+                    'last_status': 'failed',
+                    'last_duration_seconds': round(time.time() - started, 2),
+                    'last_error': str(e)[:500],
+                })
+                raise
+            finally:
+                _job_fencing_token.reset(context_token)
+
+        return wrapper
+
+    def _record_job(self, job_id: str, token, fields: Dict[str, Any]):
+        self._jobs[job_id].update(fields)
+        if self.backend != 'redis':
+            return
+        try:
+            if not self.validate_fence(token):
+                logger.warning(f"Not recording {job_id} status: fencing token {token} has been superseded")
+                return
+            key = f"{JOB_STATUS_PREFIX}{job_id}"
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.hset(key, mapping={k: '' if v is None else v for k, v in fields.items()})
+            pipe.expire(key, JOB_STATUS_TTL_SECONDS)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to record scheduler status for {job_id}: {str(e)}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Leader and per-job status, as seen from this worker"""
+        status = {
+            'backend': self.backend,
+            'instance_id': self.instance_id,
+            'is_leader': self.is_leader(),
+            'fencing_token': self.fencing_token if self.is_leader() else None,
+            'leader': self.instance_id if self.backend == 'none' else None,
+            'jobs': {},
+        }
+        if self.backend == 'redis':
+            try:
+                holder = self._redis.get(LEADER_KEY)
+                status['leader'] = holder.rsplit(':', 1)[0] if holder else None
+            except Exception as e:
+                status['leader_error'] = str(e)
+        elif self.is_leader():
+            status['leader'] = self.instance_id
+
+        for job_id, local in self._jobs.items():
+            job = dict(local)
+            if self.backend == 'redis':
+                try:
+                    job.update(self._redis.hgetall(f"{JOB_STATUS_PREFIX}{job_id}"))
+                except Exception:
+                    pass
+            # runs/skips are this worker's counters; the rest is cluster-wide when Redis is available
+            job['local_runs'] = job.pop('runs')
+            job['local_skips'] = job.pop('skips')
+            status['jobs'][job_id] = job
+        return status
+
+
+_coordinator = None
+_coordinator_lock = threading.Lock()
+
+
+def get_scheduler_coordinator() -> SchedulerCoordinator:
+    """
+    Get the singleton SchedulerCoordinator for this process.
+    Creates it (and attempts to become leader) if it doesn't exist.
+    """
+    global _coordinator
+    if _coordinator is None:
+        with _coordinator_lock:
+            if _coordinator is None:
+                _coordinator = SchedulerCoordinator()
+                atexit.register(_coordinator.shutdown)
+    return _coordinator
+
+
+def leader_only(job_id: str, func: Callable) -> Callable:
+    """Shortcut for get_scheduler_coordinator().leader_only(job_id, func)"""
+    return get_scheduler_coordinator().leader_only(job_id, func)
+
+
+def check_leadership():
+    """
+    Raise LeadershipLost if the leader-only job running in this context has been
+    fenced off by a newer leader. Call it right before committing side effects;
+    it is a no-op outside leader-only jobs (e.g. manual or API-triggered runs).
+    Worker threads only see the job's token if they run in a copy of its context.
+    """
+    token = _job_fencing_token.get()
+    if token is None:
+        return
+    try:
+        valid = get_scheduler_coordinator().validate_fence(token)
+    except Exception as e:
+        raise LeadershipLost(f"could not verify fencing token {token}: {str(e)}")
+    if not valid:
+        raise LeadershipLost(f"fencing token {token} has been superseded")
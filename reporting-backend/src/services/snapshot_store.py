@@ -0,0 +1,294 @@
+"""
+Closed Period Snapshot Store
+Per-tenant columnar copies of closed accounting months of the GL summary table.
+
+Closed months never change, yet the reports built on GL re-read them from
+Azure SQL on every cache miss. The snapshot ETL
+(src/etl/etl_snapshots.py) writes each closed month once as a compressed
+Arrow/Feather file:
+
+    {SNAPSHOT_DIR}/{schema}/{table}/{YYYY-MM}.arrow
+
+and the GL readers take the closed months it has with read() (memory-mapped,
+only the requested columns), querying Azure SQL for the rest - normally just
+the open month:
+
+- GLRollupEngine.load: the detailed P&L and Currie report ranges of whole
+  closed months
+- DashboardQueries.get_ledger_cube: the dashboard's trailing 25 months
+
+The trial balance (with_descriptions) and the Currie balance sheet need
+ChartOfAccounts columns and stay live. Transaction tables (GLDetail,
+InvoiceReg, WO...) are not snapshotted: their readers filter on arbitrary
+date ranges and columns, not whole closed months.
+
+Only tables with a reader belong in SNAPSHOT_TABLES: every table listed is
+written for SNAPSHOT_MONTHS months per tenant. A table is assigned to months
+by its Year/Month columns (GL) or by a date column (SnapshotTable.date_column).
+Money columns are stored as float64, the same as _clean_row hands them to the
+reports.
+
+Files are written to a temp name and renamed into place, so readers in other
+workers never see a partial file. SNAPSHOT_DIR should be a volume shared by
+every instance; an instance that can't see a snapshot just queries live.
+Requires pyarrow - without it the store is disabled and read() returns None.
+
+Usage:
+    store = get_snapshot_store()
+    frame = store.read(schema, 'GL', (2025, 9), columns=['AccountNo', 'Year', 'Month', 'MTD'])
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from src.services.gl_query_builder import GLQueryBuilder
+
+try:
+    import pyarrow as pa
+    from pyarrow import feather
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', os.path.join(os.getcwd(), 'data', 'snapshots'))
+SNAPSHOT_COMPRESSION = os.environ.get('SNAPSHOT_COMPRESSION', 'zstd')
+SNAPSHOT_ENABLED = os.environ.get('SNAPSHOT_STORE_ENABLED', 'true').lower() == 'true'
+SNAPSHOT_FILE_SUFFIX = '.arrow'
+MANIFEST_NAME = '_manifest.json'
+
+Period = Tuple[int, int]
+
+
+class SnapshotTable(NamedTuple):
+    name: str
+    select: str                       # formatted with schema; source table aliased t
+    date_column: Optional[str]        # column that assigns a row to a month (None: GL Year/Month)
+
+
+# Read by GLRollupEngine.load and DashboardQueries.get_ledger_cube
+SNAPSHOT_TABLES: Dict[str, SnapshotTable] = {
+    'GL': SnapshotTable('GL', "SELECT t.* FROM {schema}.GL t", None),
+}
+
+
+# ==================== Periods ====================
+
+def period_key(period: Period) -> str:
+    return f"{int(period[0]):04d}-{int(period[1]):02d}"
+
+
+def next_period(period: Period) -> Period:
+    year, month = int(period[0]), int(period[1])
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def month_span(start: Period, end: Period) -> List[Period]:
+    """Every (year, month) from start through end, inclusive"""
+    periods = []
+    period, end = (int(start[0]), int(start[1])), (int(end[0]), int(end[1]))
+    while period <= end:
+        periods.append(period)
+        period = next_period(period)
+    return periods
+
+
+def period_filter(qb: GLQueryBuilder, spec: SnapshotTable, first: Period, last: Period) -> str:
+    """WHERE predicate selecting spec's rows for the months first..last"""
+    if spec.date_column is None:
+        return qb.periods(first[0], first[1], last[0], last[1], year_column='t.Year', month_column='t.Month')
+    following = next_period(last)
+    return qb.date_range(date(first[0], first[1], 1), date(following[0], following[1], 1),
+                         column=spec.date_column, end_inclusive=False)
+
+
+def fetch_periods(db, schema: str, spec: SnapshotTable, first: Period, last: Period) -> pd.DataFrame:
+    """Live query for spec's rows in first..last, normalized like a snapshot"""
+    qb = GLQueryBuilder()
+    query = f"{spec.select.format(schema=schema)} WHERE {period_filter(qb, spec, first, last)}"
+    return normalize_frame(pd.DataFrame(qb.execute(db, query) or []))
+
+
+def normalize_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Give object columns stable types for Arrow: Decimal money columns become
+    float64 and mixed/unknown values become strings, so every month of a table
+    serializes (and concatenates) the same way.
+    """
+    for column in frame.columns:
+        if frame[column].dtype != object:
+            continue
+        sample = frame[column].dropna()
+        if sample.empty:
+            continue
+        first = sample.iloc[0]
+        if isinstance(first, (Decimal, float, int)) and not isinstance(first, bool):
+            frame[column] = pd.to_numeric(frame[column], errors='coerce').astype(float)
+        elif isinstance(first, (datetime, date)):
+            frame[column] = pd.to_datetime(frame[column], errors='coerce')
+        elif not isinstance(first, (str, bytes, bool)):
+            frame[column] = frame[column].map(lambda value: None if value is None else str(value))
+    return frame
+
+
+# ==================== Store ====================
+
+class SnapshotStore:
+    """Closed-month Arrow files per tenant and table"""
+
+    def __init__(self, root: str = SNAPSHOT_DIR):
+        self.root = root
+        self.enabled = HAS_PYARROW and SNAPSHOT_ENABLED
+        self._lock = threading.Lock()
+        self.snapshot_reads = 0
+        self.bytes_mapped = 0
+
+        if SNAPSHOT_ENABLED and not HAS_PYARROW:
+            logger.warning("pyarrow not installed - closed period snapshots disabled, reports query live")
+
+    def _table_dir(self, schema: str, table: str) -> str:
+        return os.path.join(self.root, schema, table)
+
+    def path(self, schema: str, table: str, period: Period) -> str:
+        return os.path.join(self._table_dir(schema, table), f"{period_key(period)}{SNAPSHOT_FILE_SUFFIX}")
+
+    def has(self, schema: str, table: str, period: Period) -> bool:
+        return self.enabled and os.path.exists(self.path(schema, table, period))
+
+    # ==================== Writing ====================
+
+    def write(self, schema: str, table: str, period: Period, frame: pd.DataFrame,
+              fingerprint: Optional[str] = None) -> int:
+        """Write one closed month (replacing any previous snapshot). Returns the size in bytes."""
+        if not self.enabled:
+            return 0
+        path = self.path(schema, table, period)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            arrow_table = pa.Table.from_pandas(normalize_frame(frame), preserve_index=False)
+            feather.write_feather(arrow_table, temp_path, compression=SNAPSHOT_COMPRESSION)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        size = os.path.getsize(path)
+        self._update_manifest(schema, table, {
+            period_key(period): {
+                'rows': len(frame),
+                'bytes': size,
+                'fingerprint': fingerprint,
+                'written_at': datetime.now().isoformat(),
+            }
+        })
+        return size
+
+    def manifest(self, schema: str, table: str) -> Dict[str, Dict[str, Any]]:
+        """{'YYYY-MM': {rows, bytes, fingerprint, written_at}} for a tenant's table"""
+        try:
+            with open(os.path.join(self._table_dir(schema, table), MANIFEST_NAME)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _update_manifest(self, schema: str, table: str, entries: Dict[str, Dict[str, Any]]):
+        # Only the ETL leader writes, so a process-local lock is enough
+        with self._lock:
+            manifest = self.manifest(schema, table)
+            manifest.update(entries)
+            path = os.path.join(self._table_dir(schema, table), MANIFEST_NAME)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(manifest, f, indent=1, sort_keys=True)
+            os.replace(temp_path, path)
+
+    # ==================== Reading ====================
+
+    def read(self, schema: str, table: str, period: Period,
+             columns: Optional[Sequence[str]] = None) -> Optional[pd.DataFrame]:
+        """One month from its snapshot (memory-mapped, only `columns`), or None if there isn't one"""
+        if not self.enabled:
+            return None
+        path = self.path(schema, table, period)
+        try:
+            # Columns added to the ERP table after a month was snapshotted (or an
+            # empty month, stored without columns) come back as missing values
+            with pa.memory_map(path) as source:
+                stored = set(pa.ipc.open_file(source).schema.names)
+            requested = [column for column in columns if column in stored] if columns else None
+            if requested == []:
+                return pd.DataFrame(columns=list(columns))
+            arrow_table = feather.read_table(path, columns=requested, memory_map=True)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Unreadable snapshot {path}, falling back to a live query: {e}")
+            return None
+        with self._lock:
+            self.snapshot_reads += 1
+            self.bytes_mapped += arrow_table.nbytes
+        frame = arrow_table.to_pandas()
+        return frame.reindex(columns=list(columns)) if columns else frame
+
+    def snapshotted_periods(self, schema: str, table: str) -> List[Period]:
+        """Months with a snapshot file for a tenant's table"""
+        try:
+            names = os.listdir(self._table_dir(schema, table))
+        except OSError:
+            return []
+        periods = []
+        for name in names:
+            if name.endswith(SNAPSHOT_FILE_SUFFIX):
+                year, _, month = name[:-len(SNAPSHOT_FILE_SUFFIX)].partition('-')
+                if year.isdigit() and month.isdigit():
+                    periods.append((int(year), int(month)))
+        return sorted(periods)
+
+    def get_stats(self, schema: Optional[str] = None) -> Dict[str, Any]:
+        stats = {
+            'enabled': self.enabled,
+            'root': self.root,
+            'compression': SNAPSHOT_COMPRESSION,
+            'snapshot_reads': self.snapshot_reads,
+            'bytes_mapped': self.bytes_mapped,
+        }
+        if schema:
+            tables = {}
+            for table in SNAPSHOT_TABLES:
+                manifest = self.manifest(schema, table)
+                periods = sorted(manifest)
+                tables[table] = {
+                    'periods': len(periods),
+                    'first': periods[0] if periods else None,
+                    'last': periods[-1] if periods else None,
+                    'rows': sum(entry.get('rows', 0) for entry in manifest.values()),
+                    'bytes': sum(entry.get('bytes', 0) for entry in manifest.values()),
+                }
+            stats['tables'] = tables
+        return stats
+
+
+_snapshot_store = None
+_snapshot_store_lock = threading.Lock()
+
+
+def get_snapshot_store() -> SnapshotStore:
+    """
+    Get the singleton SnapshotStore for this process.
+    Creates it if it doesn't exist.
+    """
+    global _snapshot_store
+    if _snapshot_store is None:
+        with _snapshot_store_lock:
+            if _snapshot_store is None:
+                _snapshot_store = SnapshotStore()
+    return _snapshot_store
@@ -0,0 +1,280 @@
+"""
+Azure SQL Connection Pool
+Thread-safe, bounded connection pools for the tenant Azure SQL databases.
+
+Pools are keyed by (server, database, username) so every AzureSQLService that
+points at the same tenant database - whether it came from get_tenant_db(),
+TenantInfo.get_azure_sql_service() or an ETL job - shares one set of warm
+connections instead of paying a TLS handshake + login on every query.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, Tuple, Any
+
+logger = logging.getLogger(__name__)
+
+# Pool tuning (per tenant database, per gunicorn worker)
+POOL_ENABLED = os.environ.get('AZURE_SQL_POOL_ENABLED', 'true').lower() == 'true'
+POOL_MAX_SIZE = int(os.environ.get('AZURE_SQL_POOL_MAX_SIZE', '10'))
+POOL_MAX_AGE_SECONDS = int(os.environ.get('AZURE_SQL_POOL_MAX_AGE', '1800'))          # Recycle after 30 min
+POOL_HEALTH_CHECK_IDLE_SECONDS = int(os.environ.get('AZURE_SQL_POOL_HEALTH_CHECK_IDLE', '60'))  # Ping if idle > 1 min
+POOL_ACQUIRE_TIMEOUT_SECONDS = int(os.environ.get('AZURE_SQL_POOL_ACQUIRE_TIMEOUT', '30'))
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no connection becomes available within the acquire timeout"""
+    pass
+
+
+class PooledConnection:
+    """A raw DB-API connection plus the bookkeeping the pool needs"""
+
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
+    @property
+    def idle_time(self) -> float:
+        return time.monotonic() - self.last_used
+
+
+class ConnectionPool:
+    """
+    Bounded pool of connections to a single Azure SQL database.
+
+    Idle connections are kept LIFO so the most recently used (and most likely
+    still alive) connection is handed out first. Connections older than
+    max_age are recycled, and connections idle longer than the health-check
+    interval are pinged with SELECT 1 before being reused.
+    """
+
+    def __init__(self, key: Tuple[str, str, str], connect: Callable[[], Any],
+                 max_size: int = POOL_MAX_SIZE,
+                 max_age: int = POOL_MAX_AGE_SECONDS,
+                 health_check_idle: int = POOL_HEALTH_CHECK_IDLE_SECONDS):
+        self.key = key
+        self._connect = connect
+        self.max_size = max_size
+        self.max_age = max_age
+        self.health_check_idle = health_check_idle
+
+        self._idle = deque()
+        self._in_use = 0
+        self._cond = threading.Condition(threading.Lock())
+
+        # Counters for get_stats()
+        self._created = 0
+        self._reused = 0
+        self._recycled = 0
+        self._health_check_failures = 0
+        self._discarded = 0
+        self._waits = 0
+        self._timeouts = 0
+
+    @property
+    def _total(self) -> int:
+        return self._in_use + len(self._idle)
+
+    def acquire(self, timeout: float = POOL_ACQUIRE_TIMEOUT_SECONDS) -> PooledConnection:
+        """Borrow a connection, creating one if the pool has spare capacity"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                # Prefer a warm idle connection
+                while self._idle:
+                    pooled = self._idle.pop()
+                    if pooled.age > self.max_age:
+                        self._recycled += 1
+                        self._close_quietly(pooled)
+                        continue
+                    self._in_use += 1
+                    break
+                else:
+                    pooled = None
+
+                if pooled is not None:
+                    break
+
+                if self._total < self.max_size:
+                    # Reserve the slot, then connect outside the lock
+                    self._in_use += 1
+                    pooled = None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolExhaustedError(
+                        f"Azure SQL pool for {self.key[0]}/{self.key[1]} exhausted "
+                        f"({self.max_size} connections in use for {timeout}s)"
+                    )
+                self._waits += 1
+                self._cond.wait(remaining)
+
+        if pooled is not None:
+            if pooled.idle_time > self.health_check_idle and not self._is_healthy(pooled):
+                with self._cond:
+                    self._health_check_failures += 1
+                self._close_quietly(pooled)
+                pooled = None
+            else:
+                with self._cond:
+                    self._reused += 1
+
+        if pooled is None:
+            try:
+                pooled = PooledConnection(self._connect())
+            except Exception:
+                self._release_slot()
+                raise
+            with self._cond:
+                self._created += 1
+
+        return pooled
+
+    def release(self, pooled: PooledConnection, discard: bool = False):
+        """Return a borrowed connection; broken or expired connections are closed"""
+        if not discard:
+            try:
+                # Never carry an open transaction over to the next borrower
+                pooled.conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard or pooled.age > self.max_age:
+            self._close_quietly(pooled)
+            with self._cond:
+                if discard:
+                    self._discarded += 1
+                else:
+                    self._recycled += 1
+            self._release_slot()
+            return
+
+        pooled.last_used = time.monotonic()
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection (borrowed ones are closed on release)"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for pooled in idle:
+            self._close_quietly(pooled)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'server': self.key[0],
+                'database': self.key[1],
+                'username': self.key[2],
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'created': self._created,
+                'reused': self._reused,
+                'recycled': self._recycled,
+                'discarded': self._discarded,
+                'health_check_failures': self._health_check_failures,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+            }
+
+    def _release_slot(self):
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _is_healthy(pooled: PooledConnection) -> bool:
+        cursor = None
+        try:
+            cursor = pooled.conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            return True
+        except Exception as e:
+            logger.warning(f"Azure SQL pooled connection failed health check: {e}")
+            return False
+        finally:
+            if cursor:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
+    @staticmethod
+    def _close_quietly(pooled: PooledConnection):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+
+class ConnectionPoolManager:
+    """Process-wide registry of ConnectionPools keyed by (server, database, username)"""
+
+    def __init__(self):
+        self._pools: Dict[Tuple[str, str, str], ConnectionPool] = {}
+        self._lock = threading.Lock()
+
+    def get_pool(self, server: str, database: str, username: str,
+                 connect: Callable[[], Any]) -> ConnectionPool:
+        key = (server, database, username)
+        pool = self._pools.get(key)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(key)
+                if pool is None:
+                    pool = ConnectionPool(key, connect)
+                    self._pools[key] = pool
+                    logger.info(f"Created Azure SQL connection pool for {server}/{database} ({username}), max_size={pool.max_size}")
+        return pool
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pools = list(self._pools.values())
+        return {
+            'enabled': POOL_ENABLED,
+            'max_size': POOL_MAX_SIZE,
+            'max_age_seconds': POOL_MAX_AGE_SECONDS,
+            'health_check_idle_seconds': POOL_HEALTH_CHECK_IDLE_SECONDS,
+            'pools': [pool.get_stats() for pool in pools],
+        }
+
+    def close_all(self):
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            pool.close_all()
+
+
+_pool_manager = None
+_pool_manager_lock = threading.Lock()
+
+
+def get_pool_manager() -> ConnectionPoolManager:
+    """
+    Get the singleton ConnectionPoolManager for this process.
+    Creates it if it doesn't exist.
+    """
+    global _pool_manager
+    if _pool_manager is None:
+        with _pool_manager_lock:
+            if _pool_manager is None:
+                _pool_manager = ConnectionPoolManager()
+    return _pool_manager